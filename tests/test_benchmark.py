@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+# Libs unittest
+import unittest
+
+# Utils libs
+import os
+import shutil
+import numpy as np
+import pandas as pd
+from ynov.monitoring import benchmark
+
+# Disable logging
+import logging
+logging.disable(logging.CRITICAL)
+
+
+def remove_dir(path):
+    if os.path.isdir(path): shutil.rmtree(path)
+
+
+class BenchmarkTests(unittest.TestCase):
+    '''Main class to test all functions in benchmark.py'''
+
+
+    def setUp(self):
+        '''SetUp fonction'''
+        # On se place dans le bon répertoire
+        # Change directory to script directory
+        abspath = os.path.abspath(__file__)
+        dname = os.path.dirname(abspath)
+        os.chdir(dname)
+
+
+    def test01_make_synthetic_dataset(self):
+        '''Test de la fonction benchmark.make_synthetic_dataset'''
+        # Fonctionnement nominal
+        df = benchmark.make_synthetic_dataset(n_rows=200, n_num_cols=4, n_cat_cols=3, n_categories=5, n_classes=3, seed=1)
+        self.assertEqual(df.shape, (200, 4 + 3 + 2))
+        self.assertEqual(sorted(df['target_classif'].unique()), ['class_0', 'class_1', 'class_2'])
+        self.assertTrue(df['target_classif'].value_counts().min() >= 60)
+        self.assertTrue(set(df['cat_0'].unique()).issubset({f'word_{j}' for j in range(5)}))
+        self.assertTrue(pd.api.types.is_float_dtype(df['target_reg']))
+        self.assertEqual(df.isna().sum().sum(), 0)
+        # Reproductible
+        pd.testing.assert_frame_equal(df, benchmark.make_synthetic_dataset(n_rows=200, n_num_cols=4, n_cat_cols=3, n_categories=5, n_classes=3, seed=1))
+        # Valeurs manquantes
+        df = benchmark.make_synthetic_dataset(n_rows=1000, n_num_cols=2, n_cat_cols=0, nan_rate=0.2)
+        self.assertEqual(list(df.columns), ['num_0', 'num_1', 'target_classif', 'target_reg'])
+        self.assertTrue(0.1 < df['num_0'].isna().mean() < 0.3)
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            benchmark.make_synthetic_dataset(n_num_cols=0)
+        with self.assertRaises(ValueError):
+            benchmark.make_synthetic_dataset(n_classes=1)
+        with self.assertRaises(ValueError):
+            benchmark.make_synthetic_dataset(n_rows=2, n_classes=3)
+        with self.assertRaises(ValueError):
+            benchmark.make_synthetic_dataset(nan_rate=1)
+
+
+    def test02_measure(self):
+        '''Test de la fonction benchmark.measure'''
+        result, duration, peak_memory = benchmark.measure(np.ones, 1000000)
+        self.assertEqual(result.shape, (1000000,))
+        self.assertTrue(duration >= 0)
+        self.assertTrue(peak_memory >= 7)
+        result, duration, peak_memory = benchmark.measure(sum, [1, 2], track_memory=False)
+        self.assertEqual(result, 3)
+        self.assertEqual(peak_memory, None)
+        with self.assertRaises(ZeroDivisionError):
+            benchmark.measure(lambda: 1 / 0)
+
+
+    def test03_run_benchmark(self):
+        '''Test de la fonction benchmark.run_benchmark'''
+        df_results = benchmark.run_benchmark(n_rows=200, n_num_cols=3, n_cat_cols=1, models=['rf_classifier', 'rf_regressor'],
+                                             with_search_hp=False)
+        self.assertEqual(list(df_results.columns), benchmark.RESULTS_COLUMNS)
+        stages = df_results['stage'].tolist()
+        for stage in ['preprocess_P1.fit', 'preprocess_P1.apply_pipeline', 'AutoBinner.fit', 'AutoBinner.transform',
+                      'EmbeddingTransformer.fit', 'EmbeddingTransformer.transform', 'rf_classifier.fit',
+                      'rf_classifier.predict', 'rf_classifier.predict_proba', 'rf_classifier.get_and_save_metrics',
+                      'rf_classifier.save', 'rf_classifier.load', 'rf_regressor.fit', 'rf_regressor.predict']:
+            self.assertIn(stage, stages)
+        self.assertNotIn('rf_regressor.predict_proba', stages)
+        self.assertNotIn('search_hp_cv_classifier', stages)
+        self.assertTrue(set(df_results['status'].unique()).issubset({'ok', 'error', 'skipped'}))
+        df_ok = df_results[df_results['status'] == 'ok']
+        self.assertTrue((df_ok['duration'] >= 0).all())
+        self.assertTrue((df_ok['peak_memory'] >= 0).all())
+        self.assertEqual(df_results.set_index('stage').loc['rf_classifier.fit', 'status'], 'ok')
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            benchmark.run_benchmark(n_rows=200, models=['toto'])
+
+
+    def test04_save_load_report(self):
+        '''Test des fonctions benchmark.save_report & benchmark.load_report'''
+        save_dir = os.path.join(os.getcwd(), 'test_benchmark')
+        remove_dir(save_dir)
+        df_results = pd.DataFrame([
+            {'stage': 'a', 'status': 'ok', 'duration': 1.0, 'peak_memory': 2.0, 'error': None},
+            {'stage': 'b', 'status': 'error', 'duration': None, 'peak_memory': None, 'error': 'ValueError()'},
+        ], columns=benchmark.RESULTS_COLUMNS)
+        file_path = os.path.join(save_dir, 'report.json')
+        benchmark.save_report(df_results, file_path, metadata={'n_rows': 10})
+        self.assertTrue(os.path.exists(file_path))
+        df_reloaded, metadata = benchmark.load_report(file_path)
+        self.assertEqual(metadata['n_rows'], 10)
+        self.assertIn('python', metadata.keys())
+        self.assertEqual(df_reloaded['stage'].tolist(), ['a', 'b'])
+        self.assertEqual(df_reloaded.loc[0, 'duration'], 1.0)
+        self.assertTrue(pd.isna(df_reloaded.loc[1, 'duration']))
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            benchmark.save_report(df_results, os.path.join(save_dir, 'report.csv'))
+        with self.assertRaises(FileNotFoundError):
+            benchmark.load_report(os.path.join(save_dir, 'toto.json'))
+
+        # Clean
+        remove_dir(save_dir)
+
+
+    def test05_compare_to_baseline(self):
+        '''Test de la fonction benchmark.compare_to_baseline'''
+        df_baseline = pd.DataFrame([
+            {'stage': 'same', 'status': 'ok', 'duration': 1.0, 'peak_memory': 10.0, 'error': None},
+            {'stage': 'slower', 'status': 'ok', 'duration': 1.0, 'peak_memory': 10.0, 'error': None},
+            {'stage': 'heavier', 'status': 'ok', 'duration': 1.0, 'peak_memory': 10.0, 'error': None},
+            {'stage': 'broken', 'status': 'ok', 'duration': 1.0, 'peak_memory': 10.0, 'error': None},
+            {'stage': 'tiny', 'status': 'ok', 'duration': 0.001, 'peak_memory': 10.0, 'error': None},
+            {'stage': 'removed', 'status': 'ok', 'duration': 1.0, 'peak_memory': 10.0, 'error': None},
+        ], columns=benchmark.RESULTS_COLUMNS)
+        df_results = pd.DataFrame([
+            {'stage': 'same', 'status': 'ok', 'duration': 1.1, 'peak_memory': 9.0, 'error': None},
+            {'stage': 'slower', 'status': 'ok', 'duration': 2.0, 'peak_memory': 10.0, 'error': None},
+            {'stage': 'heavier', 'status': 'ok', 'duration': 1.0, 'peak_memory': 20.0, 'error': None},
+            {'stage': 'broken', 'status': 'error', 'duration': None, 'peak_memory': None, 'error': 'ValueError()'},
+            {'stage': 'tiny', 'status': 'ok', 'duration': 0.01, 'peak_memory': 10.0, 'error': None},
+            {'stage': 'new', 'status': 'ok', 'duration': 1.0, 'peak_memory': 10.0, 'error': None},
+        ], columns=benchmark.RESULTS_COLUMNS)
+        df_compare = benchmark.compare_to_baseline(df_results, df_baseline).set_index('stage')
+        self.assertEqual(sorted(df_compare.index), ['broken', 'heavier', 'same', 'slower', 'tiny'])
+        self.assertEqual(df_compare['regression'].to_dict(),
+                         {'same': False, 'slower': True, 'heavier': True, 'broken': True, 'tiny': False})
+        self.assertEqual(df_compare.loc['slower', 'reason'], 'duration')
+        self.assertEqual(df_compare.loc['heavier', 'reason'], 'peak_memory')
+        self.assertEqual(df_compare.loc['broken', 'reason'], 'status')
+        self.assertAlmostEqual(df_compare.loc['slower', 'duration_ratio'], 2.0)
+        # Tolérances
+        df_compare = benchmark.compare_to_baseline(df_results, df_baseline, time_tolerance=2, memory_tolerance=2, min_duration=0).set_index('stage')
+        self.assertEqual(df_compare['regression'].to_dict(),
+                         {'same': False, 'slower': False, 'heavier': False, 'broken': True, 'tiny': True})
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            benchmark.compare_to_baseline(df_results, df_baseline, time_tolerance=-1)
+
+
+# Execution des tests
+if __name__ == '__main__':
+    # Start tests
+    unittest.main()
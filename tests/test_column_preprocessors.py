@@ -91,6 +91,17 @@ class ColumnPreprocessorsTests(unittest.TestCase):
         np.testing.assert_array_equal(transformer.fit_transform(df), transformed_arr)
         pd.testing.assert_frame_equal(df, df_copy)
 
+        # Fonctionnement dtype
+        transformer = column_preprocessors.AutoLogTransform(dtype=np.float32)
+        self.assertEqual(transformer.fit_transform(df).dtype, np.float32)
+        np.testing.assert_allclose(transformer.transform(df), transformed_arr.astype(np.float32), rtol=1e-6)
+        try:
+            utils.set_float_precision('float32')
+            transformer = column_preprocessors.AutoLogTransform().fit(df)
+        finally:
+            utils.set_float_precision(None)
+        self.assertEqual(transformer.transform(df).dtype, np.float32) # Précision globale gardée après le fit
+
         # Gestion erreurs
         transformer = column_preprocessors.AutoLogTransform()
         transformer.fit(df)
@@ -168,6 +179,12 @@ class ColumnPreprocessorsTests(unittest.TestCase):
         np.testing.assert_array_equal(transformer.fit_transform(df), transformed_arr)
         pd.testing.assert_frame_equal(df, df_copy)
 
+        # Fonctionnement dtype
+        transformer = column_preprocessors.ThresholdingTransform(thresholds=[(2, 6), (None, 100), (None, None)], dtype=np.float32)
+        new_arr = transformer.fit_transform(df)
+        self.assertEqual(new_arr.dtype, np.float32)
+        np.testing.assert_array_equal(new_arr, transformed_arr.astype(np.float32))
+
         # Gestion erreurs
         with self.assertRaises(ValueError):
             column_preprocessors.ThresholdingTransform(thresholds=None)
@@ -346,6 +363,12 @@ class ColumnPreprocessorsTests(unittest.TestCase):
         np.testing.assert_array_equal(transformer.fit_transform(df), transformed_arr)
         pd.testing.assert_frame_equal(df, df_copy)
 
+        # Fonctionnement dtype
+        transformer = column_preprocessors.EmbeddingTransformer(embedding=embedding, dtype=np.float32)
+        new_arr = transformer.fit_transform(df)
+        self.assertEqual(new_arr.dtype, np.float32)
+        np.testing.assert_array_equal(new_arr, transformed_arr.astype(np.float32))
+
         # JSON file
         json_path = os.path.join(os.getcwd(), 'tmp_json_tests.json')
         if os.path.exists(json_path):
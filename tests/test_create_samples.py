@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+# Libs unittest
+import unittest
+
+# Utils libs
+import os
+import shutil
+import importlib.util
+import numpy as np
+import pandas as pd
+from ynov import utils
+
+# Disable logging
+import logging
+logging.disable(logging.CRITICAL)
+
+
+def remove_dir(path):
+    if os.path.isdir(path): shutil.rmtree(path)
+
+
+def load_script(filename):
+    '''Import d'un script de ynov-scripts (nom de fichier non importable directement)'''
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ynov-scripts', filename)
+    spec = importlib.util.spec_from_file_location(os.path.splitext(filename)[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+create_samples = load_script('0_create_samples.py')
+
+
+def get_chunks(df, chunksize):
+    # Découpage d'une dataframe en chunks (comme pd.read_csv avec chunksize)
+    return [df.iloc[i:i + chunksize].copy() for i in range(0, df.shape[0], chunksize)]
+
+
+class CreateSamplesTests(unittest.TestCase):
+    '''Main class to test all functions in 0_create_samples.py'''
+
+
+    def setUp(self):
+        '''SetUp fonction'''
+        # On se place dans le bon répertoire
+        # Change directory to script directory
+        abspath = os.path.abspath(__file__)
+        dname = os.path.dirname(abspath)
+        os.chdir(dname)
+        # Dossier de données temporaire
+        self.dir_path = os.path.join(dname, 'test_create_samples')
+        remove_dir(self.dir_path)
+        os.makedirs(self.dir_path)
+        self.old_dir_path = utils.DIR_PATH
+        utils.DIR_PATH = self.dir_path
+        self.data_dir = utils.get_data_path()
+
+
+    def tearDown(self):
+        '''tearDown fonction'''
+        utils.DIR_PATH = self.old_dir_path
+        remove_dir(self.dir_path)
+
+
+    def test01_reservoir_sample(self):
+        '''Test de la fonction 0_create_samples.reservoir_sample'''
+        df = pd.DataFrame({'id': [str(i) for i in range(20)], 'target': ['a'] * 12 + ['b'] * 6 + ['c'] * 2})
+
+        # Nombre de lignes, ordre d'origine conservé, lignes du fichier
+        sample = create_samples.reservoir_sample(get_chunks(df, 3), n_samples=5, seed=42)
+        self.assertEqual(sample.shape, (5, 2))
+        self.assertEqual(list(sample.index), list(range(5)))
+        self.assertEqual(list(sample['id'].astype(int)), sorted(sample['id'].astype(int)))
+        pd.testing.assert_frame_equal(sample, df[df['id'].isin(sample['id'])].reset_index(drop=True))
+
+        # Seed : même échantillon, quelle que soit la taille des chunks
+        for chunksize in [1, 7, 20, 100]:
+            pd.testing.assert_frame_equal(create_samples.reservoir_sample(get_chunks(df, chunksize), n_samples=5, seed=42), sample)
+        self.assertFalse(all(create_samples.reservoir_sample(get_chunks(df, 3), n_samples=5, seed=seed).equals(sample)
+                             for seed in range(5)))
+
+        # Tirage uniforme : chaque ligne a la même probabilité d'être tirée (n_samples / nb lignes)
+        counts = np.zeros(df.shape[0])
+        nb_draws = 1000
+        for seed in range(nb_draws):
+            counts[create_samples.reservoir_sample(get_chunks(df, 6), n_samples=5, seed=seed)['id'].astype(int)] += 1
+        np.testing.assert_allclose(counts / nb_draws, 5 / 20, atol=0.06)
+
+        # Fichier plus petit que n_samples : tout le fichier
+        pd.testing.assert_frame_equal(create_samples.reservoir_sample(get_chunks(df, 3), n_samples=50, seed=42), df)
+        self.assertEqual(create_samples.reservoir_sample(get_chunks(df, 3), n_samples=0, seed=42).shape, (0, 2))
+
+        # Stratifié : exactement n_samples par classe (toute la classe si plus petite), ordre conservé
+        for chunksize in [1, 4, 20]:
+            sample = create_samples.reservoir_sample(get_chunks(df, chunksize), n_samples=3, seed=42, stratify_col='target')
+            self.assertEqual(sample['target'].value_counts().to_dict(), {'a': 3, 'b': 3, 'c': 2})
+            self.assertEqual(list(sample['id'].astype(int)), sorted(sample['id'].astype(int)))
+            pd.testing.assert_frame_equal(sample, create_samples.reservoir_sample(get_chunks(df, 20), n_samples=3, seed=42, stratify_col='target'))
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            create_samples.reservoir_sample(get_chunks(df, 3), n_samples=-1)
+        with self.assertRaises(ValueError):
+            create_samples.reservoir_sample(get_chunks(df, 3), stratify_col='toto')
+        with self.assertRaises(ValueError):
+            create_samples.reservoir_sample([])
+
+
+    def test02_process_file(self):
+        '''Test de la fonction 0_create_samples.process_file'''
+        df = pd.DataFrame({'id': [str(i) for i in range(20)], 'target': ['a', 'b'] * 10})
+        df.to_csv(os.path.join(self.data_dir, 'data.csv'), sep=';', index=None)
+        with open(os.path.join(self.data_dir, 'metadata.csv'), 'w', encoding='utf-8') as f:
+            f.write('#metadata\n')
+            df.to_csv(f, sep=';', index=None)
+
+        # Fonctionnement nominal : même échantillon que reservoir_sample, séparateur ','
+        create_samples.process_file('data.csv', sep=';', n_samples=4, seed=42, chunksize=3)
+        sample = pd.read_csv(os.path.join(self.data_dir, 'data_sample.csv'), sep=',', dtype=str)
+        pd.testing.assert_frame_equal(sample, create_samples.reservoir_sample(get_chunks(df, 3), n_samples=4, seed=42))
+
+        # Métadonnées (ligne '#') conservées en première ligne
+        create_samples.process_file('metadata.csv', sep=';', n_samples=2, seed=42, chunksize=3, stratify_col='target')
+        sample, first_line = utils.read_csv(os.path.join(self.data_dir, 'metadata_sample.csv'), sep=',', dtype=str)
+        self.assertEqual(first_line, '#metadata')
+        self.assertEqual(sample['target'].value_counts().to_dict(), {'a': 2, 'b': 2})
+
+        # Fichier déjà existant : pas réécrit
+        create_samples.process_file('data.csv', sep=';', n_samples=10, seed=42)
+        self.assertEqual(pd.read_csv(os.path.join(self.data_dir, 'data_sample.csv')).shape[0], 4)
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            create_samples.process_file('data.txt')
+        with self.assertRaises(FileNotFoundError):
+            create_samples.process_file('toto.csv')
+
+
+# Execution des tests
+if __name__ == '__main__':
+    # Start tests
+    unittest.main()
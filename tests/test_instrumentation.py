@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+# Libs unittest
+import unittest
+from unittest.mock import Mock
+
+# Utils libs
+import os
+import json
+import shutil
+import pandas as pd
+from ynov.monitoring import instrumentation
+
+# Disable logging
+import logging
+logging.disable(logging.CRITICAL)
+
+
+def remove_dir(path):
+    if os.path.isdir(path): shutil.rmtree(path)
+
+
+class Dummy:
+    '''Classe de test pour le décorateur timed'''
+
+    @instrumentation.timed()
+    def run(self, x):
+        return x * 2
+
+    @instrumentation.timed()
+    def run_nested(self, x):
+        return self.run(x) + 1
+
+
+class DummyChild(Dummy):
+    '''Classe fille qui appelle super() avec le même décorateur'''
+
+    @instrumentation.timed()
+    def run(self, x):
+        return super().run(x)
+
+
+@instrumentation.timed()
+def dummy_function(x):
+    return x + 1
+
+
+class InstrumentationTests(unittest.TestCase):
+    '''Main class to test all functions in instrumentation.py'''
+
+
+    def setUp(self):
+        '''SetUp fonction'''
+        # On se place dans le bon répertoire
+        # Change directory to script directory
+        abspath = os.path.abspath(__file__)
+        dname = os.path.dirname(abspath)
+        os.chdir(dname)
+        instrumentation.disable()
+        instrumentation.reset()
+
+
+    def tearDown(self):
+        '''tearDown fonction'''
+        instrumentation.disable()
+        instrumentation.reset()
+
+
+    def test01_disabled(self):
+        '''Test du fonctionnement par défaut (désactivé)'''
+        self.assertFalse(instrumentation.is_enabled())
+        self.assertEqual(Dummy().run(2), 4)
+        self.assertEqual(dummy_function(2), 3)
+        with instrumentation.span('test'):
+            pass
+        instrumentation.incr('counter')
+        self.assertEqual(instrumentation.get_report().shape[0], 0)
+
+
+    def test02_span_timed_incr(self):
+        '''Test des fonctions span, timed & incr'''
+        instrumentation.enable()
+        self.assertTrue(instrumentation.is_enabled())
+        self.assertEqual(Dummy().run(2), 4)
+        self.assertEqual(Dummy().run(3), 6)
+        self.assertEqual(dummy_function(2), 3)
+        with instrumentation.span('test'):
+            pass
+        instrumentation.incr('counter')
+        instrumentation.incr('counter', 5)
+        df_report = instrumentation.get_report().set_index('name')
+        self.assertEqual(df_report.loc['Dummy.run', 'count'], 2)
+        self.assertEqual(df_report.loc['dummy_function', 'count'], 1)
+        self.assertEqual(df_report.loc['test', 'count'], 1)
+        self.assertEqual(df_report.loc['test', 'type'], 'span')
+        self.assertEqual(df_report.loc['counter', 'total'], 6)
+        self.assertEqual(df_report.loc['counter', 'type'], 'counter')
+        self.assertTrue(df_report.loc['Dummy.run', 'total'] >= 0)
+        self.assertTrue(df_report.loc['Dummy.run', 'min'] <= df_report.loc['Dummy.run', 'max'])
+        self.assertEqual(list(instrumentation.get_report().columns), ['name', 'type', 'count', 'total', 'mean', 'min', 'max'])
+        # Span en erreur toujours enregistré
+        with self.assertRaises(ValueError):
+            with instrumentation.span('error'):
+                raise ValueError('test')
+        self.assertIn('error', instrumentation.get_report()['name'].values)
+        # Disable
+        instrumentation.disable()
+        Dummy().run(2)
+        self.assertEqual(instrumentation.get_report().set_index('name').loc['Dummy.run', 'count'], 2)
+        # Reset
+        instrumentation.reset()
+        self.assertEqual(instrumentation.get_report().shape[0], 0)
+
+
+    def test03_nested(self):
+        '''Test des spans imbriqués'''
+        instrumentation.enable()
+        # Noms différents -> les deux sont comptés
+        self.assertEqual(Dummy().run_nested(2), 5)
+        df_report = instrumentation.get_report().set_index('name')
+        self.assertEqual(df_report.loc['Dummy.run_nested', 'count'], 1)
+        self.assertEqual(df_report.loc['Dummy.run', 'count'], 1)
+        instrumentation.reset()
+        # Même nom (appel super()) -> compté une seule fois
+        self.assertEqual(DummyChild().run(2), 4)
+        df_report = instrumentation.get_report().set_index('name')
+        self.assertEqual(df_report.shape[0], 1)
+        self.assertEqual(df_report.loc['DummyChild.run', 'count'], 1)
+        # Nom explicite
+        with instrumentation.span('outer'):
+            with instrumentation.span('outer'):
+                pass
+        self.assertEqual(instrumentation.get_report().set_index('name').loc['outer', 'count'], 1)
+
+
+    def test04_export(self):
+        '''Test de la fonction instrumentation.export'''
+        save_dir = os.path.join(os.getcwd(), 'test_instrumentation')
+        remove_dir(save_dir)
+        os.makedirs(save_dir)
+        instrumentation.enable()
+        Dummy().run(2)
+        instrumentation.incr('counter', 3)
+
+        # Json
+        json_path = os.path.join(save_dir, 'instrumentation.json')
+        instrumentation.export(json_path)
+        self.assertTrue(os.path.exists(json_path))
+        with open(json_path, 'r', encoding='utf-8') as f:
+            json_dict = json.load(f)
+        self.assertEqual(json_dict['spans']['Dummy.run']['count'], 1)
+        self.assertEqual(json_dict['counters']['counter'], 3)
+
+        # Csv
+        csv_path = os.path.join(save_dir, 'instrumentation.csv')
+        instrumentation.export(csv_path)
+        df = pd.read_csv(csv_path)
+        self.assertEqual(sorted(df['name'].values), ['Dummy.run', 'counter'])
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            instrumentation.export(os.path.join(save_dir, 'instrumentation.txt'))
+
+        # Clean
+        remove_dir(save_dir)
+
+
+    def test05_log_to_model_logger(self):
+        '''Test de la fonction instrumentation.log_to_model_logger'''
+        instrumentation.enable()
+        Dummy().run(2)
+        instrumentation.incr('counter', 3)
+        model_logger = Mock()
+        model_logger.valid_name.return_value = True
+        instrumentation.log_to_model_logger(model_logger)
+        model_logger.log_metrics.assert_called_once()
+        metrics = model_logger.log_metrics.call_args[0][0]
+        self.assertEqual(metrics['time --- Dummy.run --- count'], 1)
+        self.assertEqual(metrics['time --- counter'], 3)
+        # Rien à logger
+        instrumentation.reset()
+        model_logger = Mock()
+        instrumentation.log_to_model_logger(model_logger)
+        model_logger.log_metrics.assert_not_called()
+
+
+# Execution des tests
+if __name__ == '__main__':
+    # Start tests
+    unittest.main()
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+# Libs unittest
+import unittest
+from unittest.mock import Mock
+
+# Utils libs
+import os
+import json
+import shutil
+import threading
+import tracemalloc
+import numpy as np
+from ynov.monitoring import memory_tracker, instrumentation
+
+# Disable logging
+import logging
+logging.disable(logging.CRITICAL)
+
+
+def remove_dir(path):
+    if os.path.isdir(path): shutil.rmtree(path)
+
+
+@instrumentation.timed()
+def allocate(n):
+    arr = np.ones(n)
+    return arr.sum()
+
+
+class MemoryTrackerTests(unittest.TestCase):
+    '''Main class to test all functions in memory_tracker.py'''
+
+
+    def setUp(self):
+        '''SetUp fonction'''
+        # On se place dans le bon répertoire
+        # Change directory to script directory
+        abspath = os.path.abspath(__file__)
+        dname = os.path.dirname(abspath)
+        os.chdir(dname)
+        memory_tracker.disable()
+        memory_tracker.reset()
+        instrumentation.disable()
+        instrumentation.reset()
+
+
+    def tearDown(self):
+        '''tearDown fonction'''
+        memory_tracker.disable()
+        memory_tracker.reset()
+        instrumentation.disable()
+        instrumentation.reset()
+
+
+    def test01_get_rss(self):
+        '''Test de la fonction memory_tracker.get_rss'''
+        rss = memory_tracker.get_rss()
+        self.assertTrue(rss is None or rss > 0)
+
+
+    def test02_enable_disable(self):
+        '''Test des fonctions memory_tracker.enable & memory_tracker.disable'''
+        self.assertFalse(memory_tracker.is_enabled())
+        # Désactivé -> rien n'est enregistré
+        with memory_tracker.track('test'):
+            np.ones(1000)
+        self.assertEqual(memory_tracker.get_report().shape[0], 0)
+        # Activé
+        was_tracing = tracemalloc.is_tracing()
+        memory_tracker.enable()
+        self.assertTrue(memory_tracker.is_enabled())
+        self.assertTrue(tracemalloc.is_tracing())
+        memory_tracker.disable()
+        self.assertFalse(memory_tracker.is_enabled())
+        self.assertEqual(tracemalloc.is_tracing(), was_tracing)
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            memory_tracker.enable(sampling_interval=0)
+
+
+    def test03_track(self):
+        '''Test de la fonction memory_tracker.track'''
+        memory_tracker.enable()
+        with memory_tracker.track('outer'):
+            with memory_tracker.track('inner'):
+                arr = np.ones(5 * 1024 ** 2 // 8)  # ~5 Mo
+                del arr
+        with memory_tracker.track('inner'):
+            pass
+        df_report = memory_tracker.get_report().set_index('name')
+        self.assertEqual(list(memory_tracker.get_report().columns),
+                         ['name', 'count', 'rss_start', 'rss_end', 'peak_rss', 'rss_increase', 'traced_peak'])
+        self.assertEqual(df_report.loc['inner', 'count'], 2)
+        self.assertEqual(df_report.loc['outer', 'count'], 1)
+        # Le pic de l'étape imbriquée est aussi compté dans l'étape englobante
+        self.assertTrue(df_report.loc['inner', 'traced_peak'] >= 4.9)
+        self.assertTrue(df_report.loc['outer', 'traced_peak'] >= 4.9)
+        self.assertTrue((df_report['peak_rss'] >= df_report['rss_start']).all())
+        self.assertTrue((df_report['rss_increase'] >= 0).all())
+        # Sans tracemalloc
+        memory_tracker.disable()
+        memory_tracker.reset()
+        memory_tracker.enable(trace_allocations=False)
+        if not tracemalloc.is_tracing():
+            with memory_tracker.track('no_trace'):
+                np.ones(1000)
+            self.assertTrue(memory_tracker.get_report().set_index('name')['traced_peak'].isna().all())
+        # Reset
+        memory_tracker.reset()
+        self.assertEqual(memory_tracker.get_report().shape[0], 0)
+
+
+    def test04_instrumentation_spans(self):
+        '''Test du suivi mémoire des spans de l'instrumentation'''
+        memory_tracker.enable()
+        # Instrumentation désactivée : seul le suivi mémoire est actif
+        self.assertFalse(instrumentation.is_enabled())
+        allocate(1000)
+        with instrumentation.span('span'):
+            pass
+        self.assertEqual(sorted(memory_tracker.get_report()['name']), ['allocate', 'span'])
+        self.assertEqual(instrumentation.get_report().shape[0], 0)
+        # Les deux actifs
+        instrumentation.enable()
+        allocate(1000)
+        self.assertEqual(memory_tracker.get_report().set_index('name').loc['allocate', 'count'], 2)
+        self.assertEqual(instrumentation.get_report().set_index('name').loc['allocate', 'count'], 1)
+
+
+    def test05_save(self):
+        '''Test de la fonction memory_tracker.save'''
+        save_dir = os.path.join(os.getcwd(), 'test_memory_tracker')
+        remove_dir(save_dir)
+        os.makedirs(save_dir)
+        memory_tracker.enable()
+        with memory_tracker.track('fit'):
+            np.ones(1000)
+        file_path = memory_tracker.save(save_dir)
+        self.assertEqual(file_path, os.path.join(save_dir, 'memory_usage.json'))
+        with open(file_path, 'r', encoding='utf-8') as f:
+            json_dict = json.load(f)
+        self.assertEqual(json_dict['unit'], 'MB')
+        self.assertEqual(json_dict['stages']['fit']['count'], 1)
+        self.assertIn('peak_rss', json_dict['stages']['fit'])
+
+        # Manage errors
+        with self.assertRaises(FileNotFoundError):
+            memory_tracker.save(os.path.join(save_dir, 'toto'))
+
+        # Clean
+        remove_dir(save_dir)
+
+
+    def test06_log_to_model_logger(self):
+        '''Test de la fonction memory_tracker.log_to_model_logger'''
+        memory_tracker.enable()
+        with memory_tracker.track('fit'):
+            np.ones(1000)
+        model_logger = Mock()
+        model_logger.valid_name.return_value = True
+        memory_tracker.log_to_model_logger(model_logger)
+        model_logger.log_metrics.assert_called_once()
+        metrics = model_logger.log_metrics.call_args[0][0]
+        self.assertIn('memory --- fit --- peak_rss', metrics.keys())
+        self.assertIn('memory --- fit --- traced_peak', metrics.keys())
+        # Rien à logger
+        memory_tracker.reset()
+        model_logger = Mock()
+        memory_tracker.log_to_model_logger(model_logger)
+        model_logger.log_metrics.assert_not_called()
+
+
+    def test07_threads(self):
+        '''Test du suivi mémoire avec plusieurs threads'''
+        memory_tracker.enable()
+        barrier = threading.Barrier(2)
+
+        def run(name, n):
+            with memory_tracker.track(f'{name}_outer'):
+                barrier.wait()
+                with memory_tracker.track(f'{name}_inner'):
+                    arr = np.ones(n)
+                    del arr
+                barrier.wait()
+
+        threads = [threading.Thread(target=run, args=('a', 5 * 1024 ** 2 // 8)), threading.Thread(target=run, args=('b', 10))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        df_report = memory_tracker.get_report().set_index('name')
+        self.assertEqual(sorted(df_report.index), ['a_inner', 'a_outer', 'b_inner', 'b_outer'])
+        # Le pic de l'étape imbriquée est compté dans l'étape englobante de son thread
+        self.assertTrue(df_report.loc['a_inner', 'traced_peak'] >= 4.9)
+        self.assertTrue(df_report.loc['a_outer', 'traced_peak'] >= 4.9)
+        self.assertEqual(memory_tracker._active, [])
+
+        # Deux étapes au contenu identique : on retire la bonne (identité)
+        record_1 = memory_tracker._start('same')
+        record_2 = memory_tracker._start('same')
+        record_1.update(record_2)
+        memory_tracker._stop(record_1)
+        self.assertEqual(len(memory_tracker._active), 1)
+        self.assertTrue(memory_tracker._active[0] is record_2)
+        self.assertTrue(memory_tracker._get_stack()[0] is record_2)
+        memory_tracker._stop(record_2)
+        self.assertEqual(memory_tracker._active, [])
+        self.assertEqual(memory_tracker._get_stack(), [])
+
+
+# Execution des tests
+if __name__ == '__main__':
+    # Start tests
+    unittest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# Libs unittest
+import unittest
+
+# Utils libs
+import os
+import shutil
+import importlib.util
+import pandas as pd
+from ynov import utils
+
+# Disable logging
+import logging
+logging.disable(logging.CRITICAL)
+
+
+def remove_dir(path):
+    if os.path.isdir(path): shutil.rmtree(path)
+
+
+def load_script(filename):
+    '''Import d'un script de ynov-scripts (nom de fichier non importable directement)'''
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ynov-scripts', filename)
+    spec = importlib.util.spec_from_file_location(os.path.splitext(filename)[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+merge_files = load_script('0_merge_files.py')
+
+
+class MergeFilesTests(unittest.TestCase):
+    '''Main class to test all functions in 0_merge_files.py'''
+
+
+    def setUp(self):
+        '''SetUp fonction'''
+        # On se place dans le bon répertoire
+        # Change directory to script directory
+        abspath = os.path.abspath(__file__)
+        dname = os.path.dirname(abspath)
+        os.chdir(dname)
+        # Dossier de données temporaire
+        self.dir_path = os.path.join(dname, 'test_merge_files')
+        remove_dir(self.dir_path)
+        os.makedirs(self.dir_path)
+        self.old_dir_path = utils.DIR_PATH
+        utils.DIR_PATH = self.dir_path
+        self.data_dir = utils.get_data_path()
+
+
+    def tearDown(self):
+        '''tearDown fonction'''
+        utils.DIR_PATH = self.old_dir_path
+        remove_dir(self.dir_path)
+
+
+    def test01_main(self):
+        '''Test de la fonction 0_merge_files.main'''
+        df1 = pd.DataFrame({'text': ['a', 'b', None, 'd', 'e'], 'target': ['1', '2', '3', '4', '5'], 'other': list(range(5))})
+        df2 = pd.DataFrame({'target': ['6', '7', '8'], 'text': ['f', 'g', 'h']})
+        df1.to_csv(os.path.join(self.data_dir, 'file1.csv'), sep=';', index=None)
+        df2.to_csv(os.path.join(self.data_dir, 'file2.csv'), sep=';', index=None)
+        df_expected = pd.DataFrame({'text': ['a', 'b', '', 'd', 'e', 'f', 'g', 'h'], 'target': [str(_) for _ in range(1, 9)]})
+
+        # Fonctionnement nominal, même résultat quel que soit le nombre de lecteurs
+        for nb_readers in [1, 3]:
+            new_filename = f'merged_{nb_readers}.csv'
+            merge_files.main(['file1.csv', 'file2.csv'], ['text', 'target'], new_filename=new_filename,
+                             sep=';', chunksize=2, nb_readers=nb_readers)
+            df_merged = pd.read_csv(os.path.join(self.data_dir, new_filename), sep=',', dtype=str, keep_default_na=False)
+            pd.testing.assert_frame_equal(df_merged, df_expected)
+            self.assertFalse(os.path.exists(os.path.join(self.data_dir, f'{new_filename}.tmp')))
+
+        # Erreur pendant la lecture (colonne manquante) : pas de fichier, partiel ou temporaire
+        for nb_readers in [1, 3]:
+            with self.assertRaises(ValueError):
+                merge_files.main(['file1.csv', 'file2.csv'], ['text', 'other'], new_filename='error.csv',
+                                 sep=';', chunksize=2, nb_readers=nb_readers)
+            self.assertFalse(os.path.exists(os.path.join(self.data_dir, 'error.csv')))
+            self.assertFalse(os.path.exists(os.path.join(self.data_dir, 'error.csv.tmp')))
+
+        # Manage errors
+        with open(os.path.join(self.data_dir, 'metadata.csv'), 'w', encoding='utf-8') as f:
+            f.write('#metadata\ntext;target\na;1\n')
+        with self.assertRaises(ValueError):
+            merge_files.main(['metadata.csv'], ['text', 'target'], new_filename='toto.csv', sep=';')
+        with self.assertRaises(FileNotFoundError):
+            merge_files.main(['file1.csv', 'toto.csv'], ['text', 'target'], new_filename='toto.csv', sep=';')
+        with self.assertRaises(FileNotFoundError):
+            merge_files.main(['file1.csv'], ['text', 'target'], new_filename='merged_1.csv', sep=';')
+        with self.assertRaises(ValueError):
+            merge_files.main(['file1.csv'], ['text', 'target'], new_filename='toto.csv', sep=';', chunksize=0)
+        with self.assertRaises(ValueError):
+            merge_files.main(['file1.csv'], ['text', 'target'], new_filename='toto.csv', sep=';', nb_readers=0)
+
+
+# Execution des tests
+if __name__ == '__main__':
+    # Start tests
+    unittest.main()
@@ -9,8 +9,10 @@ from unittest.mock import Mock
 import os
 import json
 import shutil
+import dill as pickle
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.pipeline import Pipeline
 from sklearn.exceptions import NotFittedError
 from sklearn.compose import ColumnTransformer
@@ -20,7 +22,7 @@ from sklearn.preprocessing import FunctionTransformer
 from sklearn.feature_extraction.text import TfidfVectorizer
 from ynov import utils
 from ynov.preprocessing import preprocess
-from ynov.models_training.model_class import ModelClass
+from ynov.models_training.model_class import ModelClass, InputSchema
 from ynov.models_training.model_pipeline import ModelPipeline
 
 # Disable logging
@@ -793,6 +795,34 @@ class ModelClassTests(unittest.TestCase):
         #
         remove_dir(model_dir)
 
+        # Données sparse : pas de reorder, colonnes portées par x_col, pipeline set sans densifier
+        x_input_sparse = sparse.csr_matrix(x_input.to_numpy())
+        model = ModelClass(model_dir=model_dir, model_name=model_name, x_col=x_col, y_col=y_col)
+        x_output, y_output = model._check_input_format(x_input_sparse, y_input, fit_function=True)
+        self.assertTrue(x_output is x_input_sparse) # Pas de modif.
+        pd.testing.assert_series_equal(y_output, y_input) # Pas de modif.
+        self.assertEqual(model.columns_in, x_col)
+        self.assertEqual(model.mandatory_columns, x_col)
+        x_output, _ = model._check_input_format(x_input_sparse)
+        self.assertTrue(x_output is x_input_sparse)
+        with self.assertRaises(ValueError):
+            model._check_input_format(sparse.csr_matrix(x_input_bad_format.to_numpy()))
+        remove_dir(model_dir)
+
+        # Précision globale float32 : features converties, cibles inchangées
+        model = ModelClass(model_dir=model_dir, model_name=model_name, x_col=x_col, y_col=y_col)
+        try:
+            utils.set_float_precision('float32')
+            x_output, y_output = model._check_input_format(x_input, y_input, fit_function=True)
+            x_output_sparse, _ = model._check_input_format(x_input_sparse)
+        finally:
+            utils.set_float_precision(None)
+        self.assertTrue((x_output.dtypes == np.float32).all())
+        pd.testing.assert_frame_equal(x_output, x_input, check_dtype=False)
+        pd.testing.assert_series_equal(y_output, y_input)
+        self.assertEqual(x_output_sparse.dtype, np.float32)
+        remove_dir(model_dir)
+
         # Gestion des erreurs
         with self.assertRaises(AttributeError):
             model = ModelClass(model_dir=model_dir, model_name=model_name, preprocess_pipeline=preprocess_pipeline, x_col=x_col, y_col=y_col)
@@ -822,6 +852,78 @@ class ModelClassTests(unittest.TestCase):
         remove_dir(model_dir)
 
 
+    def test07_input_schema(self):
+        '''Test de la classe ynov.models_training.model_class.InputSchema'''
+        logger = logging.getLogger('test_input_schema')
+        x_col = ['col_1', 'col_2', 'col_3']
+        df = pd.DataFrame({'col_1': [1.0, 2.0], 'col_2': [3, 4], 'col_3': ['a', 'b']})
+        df_reordered = df[['col_3', 'col_1', 'col_2']]
+
+        # Fonctionnement nominal : pas de copie si colonnes dans le bon ordre
+        schema = InputSchema(x_col, name='x')
+        self.assertEqual(schema.n_columns, 3)
+        self.assertTrue(schema.source is x_col)
+        self.assertTrue(schema.validate(df, logger) is df)
+        self.assertEqual(len(schema._cache), 1)
+
+        # Reorder, format mis en cache (une seule analyse par index de colonnes)
+        with patch.object(logger, 'warning') as mock_warning:
+            pd.testing.assert_frame_equal(schema.validate(df_reordered, logger), df)
+            pd.testing.assert_frame_equal(schema.validate(df_reordered, logger), df)
+            self.assertEqual(mock_warning.call_count, 1)
+        self.assertEqual(len(schema._cache), 2)
+
+        # Colonnes manquantes : pas de reorder
+        df_other = df.rename(columns={'col_1': 'toto'})
+        self.assertTrue(schema.validate(df_other, logger) is df_other)
+
+        # Types différents du fit -> warning
+        schema.set_dtypes(df)
+        self.assertEqual(len(schema._cache), 0)
+        with patch.object(logger, 'warning') as mock_warning:
+            schema.validate(df.astype({'col_1': str}), logger)
+            self.assertEqual(mock_warning.call_count, 1)
+
+        # Numpy & sparse : seulement le nombre de colonnes
+        arr = np.ones((2, 3))
+        arr_sparse = sparse.csr_matrix(arr)
+        with patch.object(logger, 'warning') as mock_warning:
+            self.assertTrue(schema.validate(arr, logger) is arr)
+            self.assertTrue(schema.validate(arr, logger) is arr)
+            # Pas de colonnes : warning à chaque appel, sauf sparse (colonnes portées par x_col)
+            self.assertEqual(mock_warning.call_count, 2)
+            self.assertTrue(schema.validate(arr_sparse, logger) is arr_sparse)
+            self.assertEqual(mock_warning.call_count, 2)
+
+        # y mono-colonne
+        schema_y = InputSchema('y', name='y')
+        self.assertEqual(schema_y.columns, ['y'])
+        y = pd.Series([0, 1])
+        self.assertTrue(schema_y.validate(y, logger) is y)
+
+        # Taille du cache limitée
+        for i in range(InputSchema.cache_size + 5):
+            schema.validate(pd.DataFrame(np.ones((1, 3)), columns=[f'col_{i}', 'col_2', 'col_3']), logger)
+        self.assertLessEqual(len(schema._cache), InputSchema.cache_size)
+
+        # Le cache n'est pas sauvegardé
+        self.assertEqual(pickle.loads(pickle.dumps(schema))._cache, {})
+
+        # Schéma recompilé si x_col change
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        remove_dir(model_dir)
+        model = ModelClass(model_dir=model_dir, x_col=x_col, y_col='y')
+        schema = model._get_input_schema('x')
+        self.assertTrue(model._get_input_schema('x') is schema)
+        model.x_col = ['col_1', 'col_2']
+        self.assertEqual(model._get_input_schema('x').columns, ['col_1', 'col_2'])
+        remove_dir(model_dir)
+
+        # Gestion des erreurs
+        with self.assertRaises(ValueError):
+            InputSchema(x_col).validate(df[['col_1', 'col_2']], logger)
+
+
 # Execution des tests
 if __name__ == '__main__':
     # Start tests
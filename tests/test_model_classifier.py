@@ -11,6 +11,7 @@ import json
 import shutil
 import pandas as pd
 import numpy as np
+from scipy import sparse
 from sklearn.pipeline import Pipeline
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.multiclass import OneVsRestClassifier
@@ -18,6 +19,7 @@ from ynov import utils
 from ynov.preprocessing import preprocess
 from ynov.monitoring.model_logger import ModelLogger
 from ynov.models_training.model_class import ModelClass
+from ynov.models_training import model_classifier
 from ynov.models_training.model_classifier import ModelClassifierMixin
 
 # Disable logging
@@ -242,6 +244,38 @@ class ModelClassifierMixinTests(unittest.TestCase):
         remove_dir(model_dir)
 
 
+    def test04b_model_classifier_optimize_thresholds(self):
+        '''Test de la fonction ynov.models_training.model_classifier.ModelClassifierMixin.optimize_thresholds'''
+
+        # Création d'un modèle
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        remove_dir(model_dir)
+        model_name = 'test'
+
+        # Multi label
+        model = ModelMockClassifier(model_dir=model_dir, model_name=model_name, multi_label=True)
+        model.list_classes = ['test1', 'test2']
+        model.dict_classes = {0: 'test1', 1: 'test2'}
+        self.assertTrue(model.multi_label_thresholds is None)
+        predicted_proba = np.array([[0.1, 0.9], [0.3, 0.6], [0.4, 0.8], [0.2, 0.7]])
+        # Colonnes dans le désordre : remises dans l'ordre de list_classes
+        y_true = pd.DataFrame({'test2': [1, 1, 1, 1], 'test1': [0, 1, 1, 0]})
+        thresholds = model.optimize_thresholds(y_true, predicted_proba)
+        self.assertEqual(thresholds, model.multi_label_thresholds)
+        self.assertAlmostEqual(thresholds[0], 0.25)
+        self.assertAlmostEqual(thresholds[1], 0.)
+        # Utilisés par get_classes_from_proba
+        predicted_classes = model.get_classes_from_proba(np.array([[0.26, 0.1], [0.24, 0.4]]))
+        self.assertEqual([list(_) for _ in predicted_classes], [[1, 1], [0, 1]])
+        remove_dir(model_dir)
+
+        # Manage errors
+        model = ModelMockClassifier(model_dir=model_dir, model_name=model_name, multi_label=False)
+        with self.assertRaises(ValueError):
+            model.optimize_thresholds(np.array([0, 1]), np.array([[0.8, 0.2], [0.1, 0.9]]))
+        remove_dir(model_dir)
+
+
     def test05_model_classifier_get_top_n_from_proba(self):
         '''Test de la fonction ynov.models_training.model_classifier.ModelClassifierMixin.get_top_n_from_proba'''
 
@@ -269,6 +303,43 @@ class ModelClassifierMixinTests(unittest.TestCase):
         remove_dir(model_dir)
 
 
+    def test05b_model_classifier_get_top_n_and_positions_from_proba(self):
+        '''Test de la fonction ynov.models_training.model_classifier.ModelClassifierMixin.get_top_n_and_positions_from_proba'''
+
+        # Création d'un modèle
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        remove_dir(model_dir)
+        model_name = 'test'
+
+        # Test mono_label
+        model = ModelMockClassifier(model_dir=model_dir, model_name=model_name, multi_label=False)
+        model.list_classes = ['a', 'b', 'c', 'd']
+        model.dict_classes = {0: 'a', 1: 'b', 2: 'c', 3: 'd'}
+        probas = np.array([[0.1, 0.5, 0.3, 0.1], [0.6, 0.2, 0.1, 0.1], [0.25, 0.25, 0.25, 0.25]])
+        top_n, top_n_proba, positions = model.get_top_n_and_positions_from_proba(probas, y_true=['c', 'd', 'b'], n=2)
+        np.testing.assert_array_equal(top_n[:2], np.array([['b', 'c'], ['a', 'b']]))
+        np.testing.assert_array_equal(top_n_proba, np.array([[0.5, 0.3], [0.6, 0.2], [0.25, 0.25]]))
+        # Égalités : même ordre que la version à base d'argsort (l'indice le plus grand passe devant)
+        np.testing.assert_array_equal(positions, np.array([2, 3, 3]))
+        # Classe inconnue
+        _, _, positions = model.get_top_n_and_positions_from_proba(probas, y_true=['a', 'toto', 'a'], n=4)
+        np.testing.assert_array_equal(positions, np.array([4, -1, 4]))
+        # Sans y_true
+        top_n, top_n_proba, positions = model.get_top_n_and_positions_from_proba(probas, n=4)
+        self.assertEqual(top_n.shape, (3, 4))
+        self.assertEqual(list(top_n[2]), ['d', 'c', 'b', 'a'])
+        self.assertTrue(positions is None)
+        with self.assertRaises(ValueError):
+            model.get_top_n_and_positions_from_proba(probas, n=5)
+        remove_dir(model_dir)
+
+        # Test multi_label
+        model = ModelMockClassifier(model_dir=model_dir, model_name=model_name, multi_label=True)
+        with self.assertRaises(ValueError):
+            model.get_top_n_and_positions_from_proba(probas)
+        remove_dir(model_dir)
+
+
     def test06_model_classifier_inverse_transform(self):
         '''Test de la fonction ynov.models_training.model_classifier.ModelClassifierMixin.inverse_transform'''
 
@@ -300,6 +371,8 @@ class ModelClassifierMixinTests(unittest.TestCase):
         expected_result2 = ('test3',)
         self.assertEqual(model.inverse_transform(y1), expected_result1)
         self.assertEqual(model.inverse_transform(y2), expected_result2)
+        # Sparse
+        self.assertEqual(model.inverse_transform(sparse.csr_matrix(y1)), expected_result1)
         remove_dir(model_dir)
 
 
@@ -375,6 +448,60 @@ class ModelClassifierMixinTests(unittest.TestCase):
         remove_dir(model_dir)
 
 
+    def test07b_model_classifier_confusion_matrix_plots(self):
+        '''Test des modes de plot des matrices de confusion (confusion_matrix_plots) de ynov.models_training.model_classifier.ModelClassifierMixin.get_and_save_metrics'''
+
+        # Création d'un modèle
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        remove_dir(model_dir)
+        model_name = 'test'
+        y_true = np.array([[0, 1, 0], [1, 1, 0], [0, 0, 0]])
+        y_pred = np.array([[0, 1, 1], [1, 1, 0], [0, 1, 0]])
+        expected_plots = [f'{label}_valid_confusion_matrix{suffix}.png' for label in ['test1', 'test2', 'test3'] for suffix in ['', '_normalized']]
+
+        # lazy : matrices sauvegardées, pas de plot
+        model = ModelMockClassifier(model_dir=model_dir, model_name=model_name, multi_label=True, confusion_matrix_plots='lazy')
+        model.list_classes = ['test1', 'test2', 'test3']
+        model.get_and_save_metrics(y_true, y_pred, type_data='valid')
+        plots_path = os.path.join(model.model_dir, 'plots')
+        npz_path = os.path.join(plots_path, 'confusion_matrices_valid.npz')
+        self.assertTrue(os.path.exists(npz_path))
+        self.assertFalse(os.path.exists(os.path.join(plots_path, 'valid')))
+        with np.load(npz_path) as data:
+            self.assertEqual(data['c_mats'].shape, (3, 2, 2))
+            np.testing.assert_array_equal(data['c_mats'][0], np.array([[2, 0], [0, 1]]))
+            self.assertEqual(list(data['labels'][2]), ['not_test3', 'test3'])
+        # Plots à la demande
+        model_classifier.plot_confusion_matrices_from_file(npz_path)
+        self.assertEqual(sorted(os.listdir(os.path.join(plots_path, 'valid'))), sorted(expected_plots))
+        remove_dir(model_dir)
+
+        # background : plots dans un pool de processus
+        model = ModelMockClassifier(model_dir=model_dir, model_name=model_name, multi_label=True, confusion_matrix_plots='background')
+        model.list_classes = ['test1', 'test2', 'test3']
+        model.get_and_save_metrics(y_true, y_pred, type_data='valid')
+        model_classifier.wait_for_confusion_matrix_plots()
+        self.assertEqual(sorted(os.listdir(os.path.join(model.model_dir, 'plots', 'valid'))), sorted(expected_plots))
+        remove_dir(model_dir)
+
+        # Mono-label, lazy, une partie seulement
+        model = ModelMockClassifier(model_dir=model_dir, model_name=model_name, multi_label=False, confusion_matrix_plots='lazy')
+        model.list_classes = [0, 1]
+        model.get_and_save_metrics(np.array([0, 1, 0, 1]), np.array([0, 1, 1, 0]))
+        plots_path = os.path.join(model.model_dir, 'plots')
+        self.assertEqual(os.listdir(plots_path), ['confusion_matrices.npz'])
+        model_classifier.plot_confusion_matrices_from_file(os.path.join(plots_path, 'confusion_matrices.npz'), indices=[0])
+        self.assertTrue(os.path.exists(os.path.join(plots_path, 'confusion_matrix.png')))
+        remove_dir(model_dir)
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            ModelMockClassifier(model_dir=model_dir, model_name=model_name, confusion_matrix_plots='toto')
+        with self.assertRaises(FileNotFoundError):
+            model_classifier.plot_confusion_matrices_from_file('toto.npz')
+        remove_dir(model_dir)
+
+
     def test08_model_classifier_get_metrics_simple_monolabel(self):
         '''Test de la fonction ynov.models_training.model_classifier.ModelClassifierMixin.get_metrics_simple_monolabel'''
 
@@ -420,6 +547,13 @@ class ModelClassifierMixinTests(unittest.TestCase):
         self.assertEqual(df_metrics.loc[0, :]['Accuracy'], 1.0)
         remove_dir(model_dir)
 
+        # Cibles sparse -> mêmes métriques
+        model = ModelMockClassifier(model_dir=model_dir, model_name=model_name, multi_label=True)
+        model.list_classes = ['test1', 'test2', 'test3']
+        df_metrics_sparse = model.get_metrics_simple_multilabel(sparse.csr_matrix(y_true), y_pred)
+        pd.testing.assert_frame_equal(df_metrics_sparse, df_metrics, check_dtype=False)
+        remove_dir(model_dir)
+
         # Test mono label
         model = ModelMockClassifier(model_dir=model_dir, model_name=model_name, multi_label=False)
         with self.assertRaises(ValueError):
@@ -498,6 +632,8 @@ class ModelClassifierMixinTests(unittest.TestCase):
         self.assertTrue('list_classes' in configs.keys())
         self.assertTrue('dict_classes' in configs.keys())
         self.assertTrue('multi_label' in configs.keys())
+        self.assertTrue('multi_label_thresholds' in configs.keys())
+        self.assertEqual(configs['confusion_matrix_plots'], 'sync')
         remove_dir(model_dir)
 
         # test save, level_save = 'LOW'
@@ -12,6 +12,7 @@ import shutil
 import pandas as pd
 import numpy as np
 from ynov import utils
+from ynov.models_training import utils_knn
 from ynov.models_training.classifiers.model_knn_classifier import ModelKNNClassifier
 
 # Disable logging
@@ -623,8 +624,73 @@ class ModelKNNClassifierTests(unittest.TestCase):
         # Clean
         remove_dir(model_dir)
 
+    def test07_model_knn_classifier_ivf_backend(self):
+        '''Test du backend approché (knn_backend='ivf') de ynov.models_training.classifiers.model_knn_classifier.ModelKNNClassifier'''
+
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        remove_dir(model_dir)
+
+        # Set vars
+        rng = np.random.RandomState(42)
+        x_train = pd.DataFrame({'col_1': rng.normal(size=500), 'col_2': rng.normal(size=500)})
+        y_train_mono = pd.Series(np.where(x_train['col_1'] > 0, 'a', np.where(x_train['col_2'] > 0, 'b', 'c')))
+        y_train_multi = pd.DataFrame({'y1': (x_train['col_1'] > 0).astype(int), 'y2': (x_train['col_2'] > 0).astype(int)})
+        x_col = ['col_1', 'col_2']
+
+        # Toutes les listes visitées -> même résultat que la recherche exacte
+        knn_params = {'n_neighbors': 5, 'n_lists': 10, 'n_probe': 10}
+        model = ModelKNNClassifier(x_col=x_col, y_col=['toto'], model_dir=model_dir, knn_backend='ivf', knn_params=knn_params)
+        self.assertEqual(model.knn_backend, 'ivf')
+        model.fit(x_train, y_train_mono)
+        model_exact = ModelKNNClassifier(x_col=x_col, y_col=['toto'], model_dir=model_dir, knn_params={'n_neighbors': 5})
+        model_exact.fit(x_train, y_train_mono)
+        np.testing.assert_almost_equal(model.predict_proba(x_train), model_exact.predict_proba(x_train))
+        self.assertEqual(list(model.predict(x_train)), list(model_exact.predict(x_train)))
+        remove_dir(model_dir)
+
+        # Moins de listes visitées : recall proche de 1
+        model = ModelKNNClassifier(x_col=x_col, y_col=['toto'], model_dir=model_dir, knn_backend='ivf', knn_params={'n_neighbors': 5, 'n_lists': 10, 'n_probe': 3})
+        model.fit(x_train, y_train_mono)
+        self.assertGreater(utils_knn.get_and_save_recall(model, x_train), 0.8)
+        remove_dir(model_dir)
+
+        # Multi-labels
+        model = ModelKNNClassifier(x_col=x_col, y_col=['y1', 'y2'], model_dir=model_dir, knn_backend='ivf', knn_params=knn_params, multi_label=True)
+        model.fit(x_train, y_train_multi)
+        model_exact = ModelKNNClassifier(x_col=x_col, y_col=['y1', 'y2'], model_dir=model_dir, knn_params={'n_neighbors': 5}, multi_label=True)
+        model_exact.fit(x_train, y_train_multi)
+        np.testing.assert_almost_equal(model.predict_proba(x_train), model_exact.predict_proba(x_train))
+        np.testing.assert_array_equal(model.predict(x_train), model_exact.predict(x_train))
+        remove_dir(model_dir)
+
+        # Recall dans les métriques & save / reload
+        model = ModelKNNClassifier(x_col=x_col, y_col=['toto'], model_dir=model_dir, knn_backend='ivf', knn_params=knn_params)
+        model.fit(x_train, y_train_mono)
+        model.get_and_save_metrics(y_train_mono, model.predict(x_train), df_x=x_train, type_data='train')
+        self.assertTrue(os.path.exists(os.path.join(model.model_dir, 'ann_recall_train@1.0')))
+        model.save()
+        with open(os.path.join(model.model_dir, 'configurations.json'), 'r', encoding='utf-8') as f:
+            configs = json.load(f)
+        self.assertEqual(configs['knn_backend'], 'ivf')
+        new_model = ModelKNNClassifier()
+        new_model.reload_from_standalone(configuration_path=os.path.join(model.model_dir, 'configurations.json'),
+                                         model_pipeline_path=os.path.join(model.model_dir, f"{model.model_name}_standalone.pkl"),
+                                         preprocess_pipeline_path=os.path.join(model.model_dir, 'preprocess_pipeline.pkl'))
+        self.assertEqual(new_model.knn_backend, 'ivf')
+        np.testing.assert_almost_equal(new_model.predict_proba(x_train), model.predict_proba(x_train))
+        remove_dir(new_model.model_dir)
+        remove_dir(model_dir)
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            ModelKNNClassifier(model_dir=model_dir, knn_backend='toto')
+        for multiclass_strategy in ['ovr', 'ovo']:
+            with self.assertRaises(ValueError):
+                ModelKNNClassifier(model_dir=model_dir, knn_backend='ivf', multiclass_strategy=multiclass_strategy)
+        remove_dir(model_dir)
+
 
 # Execution des tests
 if __name__ == '__main__':
     # Start tests
-    unittest.main()
\ No newline at end of file
+    unittest.main()
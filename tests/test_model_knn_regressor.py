@@ -188,8 +188,54 @@ class ModelKNNRegressorTests(unittest.TestCase):
         # Clean
         remove_dir(model_dir)
 
+    def test05_model_knn_regressor_ivf_backend(self):
+        '''Test du backend approché (knn_backend='ivf') de ynov.models_training.regressors.model_knn_regressor.ModelKNNRegressor'''
+
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        remove_dir(model_dir)
+
+        # Set vars
+        rng = np.random.RandomState(42)
+        x_train = pd.DataFrame({'col_1': rng.normal(size=500), 'col_2': rng.normal(size=500)})
+        y_train_regressor = pd.Series(x_train['col_1'] * 2 + x_train['col_2'])
+        x_col = ['col_1', 'col_2']
+        y_col_mono = ['toto']
+
+        # Toutes les listes visitées -> même résultat que la recherche exacte
+        knn_params = {'n_neighbors': 5, 'n_lists': 10, 'n_probe': 10}
+        model = ModelKNNRegressor(x_col=x_col, y_col=y_col_mono, model_dir=model_dir, knn_backend='ivf', knn_params=knn_params)
+        self.assertEqual(model.knn_backend, 'ivf')
+        self.assertEqual(model.pipeline['knn'].n_probe, 10)
+        model.fit(x_train, y_train_regressor)
+        model_exact = ModelKNNRegressor(x_col=x_col, y_col=y_col_mono, model_dir=model_dir, knn_params={'n_neighbors': 5})
+        model_exact.fit(x_train, y_train_regressor)
+        np.testing.assert_almost_equal(model.predict(x_train), model_exact.predict(x_train), decimal=4)
+
+        # Recall dans les métriques
+        model.get_and_save_metrics(y_train_regressor, model.predict(x_train), df_x=x_train, type_data='train')
+        self.assertTrue(os.path.exists(os.path.join(model.model_dir, 'ann_recall_train@1.0')))
+
+        # Save / reload : l'index est sauvegardé avec la pipeline
+        model.save()
+        with open(os.path.join(model.model_dir, 'configurations.json'), 'r', encoding='utf-8') as f:
+            configs = json.load(f)
+        self.assertEqual(configs['knn_backend'], 'ivf')
+        new_model = ModelKNNRegressor()
+        new_model.reload_from_standalone(configuration_path=os.path.join(model.model_dir, 'configurations.json'),
+                                         model_pipeline_path=os.path.join(model.model_dir, f"{model.model_name}_standalone.pkl"),
+                                         preprocess_pipeline_path=os.path.join(model.model_dir, 'preprocess_pipeline.pkl'))
+        self.assertEqual(new_model.knn_backend, 'ivf')
+        np.testing.assert_almost_equal(new_model.predict(x_train), model.predict(x_train))
+        remove_dir(new_model.model_dir)
+        remove_dir(model_dir)
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            ModelKNNRegressor(model_dir=model_dir, knn_backend='toto')
+        remove_dir(model_dir)
+
 
 # Execution des tests
 if __name__ == '__main__':
     # Start tests
-    unittest.main()
\ No newline at end of file
+    unittest.main()
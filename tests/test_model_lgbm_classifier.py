@@ -11,6 +11,7 @@ import json
 import shutil
 import pandas as pd
 import numpy as np
+from scipy import sparse
 from ynov import utils
 from ynov.models_training.classifiers.model_lgbm_classifier import ModelLGBMClassifier
 
@@ -162,6 +163,13 @@ class ModelLGBMClassifierTests(unittest.TestCase):
         proba = model.predict(x_train, return_proba=True)
         self.assertEqual(proba.shape, (len(x_train), len(y_col_multi)))
         remove_dir(model_dir)
+        # Classification - Multi label - cibles sparse
+        model = ModelLGBMClassifier(x_col=x_col, y_col=y_col_multi, model_dir=model_dir, multi_label=True)
+        model.fit(x_train, sparse.csr_matrix(y_train_multi.values))
+        self.assertEqual(model.list_classes, y_col_multi)
+        preds = model.predict(x_train)
+        self.assertEqual(preds.shape, (len(x_train), len(y_col_multi)))
+        remove_dir(model_dir)
         model = ModelLGBMClassifier(x_col=x_col, y_col=y_col_multi, model_dir=model_dir, multi_label=True, multiclass_strategy='ovr')
         model.fit(x_train, y_train_multi)
         preds = model.predict(x_train)
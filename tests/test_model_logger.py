@@ -13,7 +13,7 @@ import mlflow
 import pandas as pd
 import numpy as np
 from ynov import utils
-from ynov.monitoring.model_logger import ModelLogger, is_running, is_local, is_mlflow_up
+from ynov.monitoring.model_logger import ModelLogger, is_running, is_running_cached, reset_hosts_health, is_local, is_mlflow_up
 
 # Disable logging
 import logging
@@ -246,6 +246,79 @@ class ModelLoggerTests(unittest.TestCase):
         if os.path.exists(save_dir):
             shutil.rmtree(save_dir)
 
+    @patch('ynov.monitoring.model_logger.time.monotonic')
+    @patch('ynov.monitoring.model_logger.is_running')
+    def test11_is_running_cached(self, mock_is_running, mock_monotonic):
+        '''Test de la fonction ynov.monitoring.model_logger.is_running_cached'''
+        logger = logging.getLogger('test')
+        host = 'http://toto.titi.tata.test'
+        port = 80
+
+        # Host up -> un seul check réseau tant que le TTL n'est pas expiré
+        reset_hosts_health()
+        mock_is_running.return_value = True
+        mock_monotonic.return_value = 0
+        for _ in range(100):
+            self.assertTrue(is_running_cached(host, port, logger, ttl=60, max_backoff=600))
+        self.assertEqual(mock_is_running.call_count, 1)
+        # TTL expiré -> nouveau check
+        mock_monotonic.return_value = 61
+        self.assertTrue(is_running_cached(host, port, logger, ttl=60, max_backoff=600))
+        self.assertEqual(mock_is_running.call_count, 2)
+
+        # Host down -> circuit breaker avec backoff exponentiel
+        reset_hosts_health()
+        mock_is_running.reset_mock()
+        mock_is_running.return_value = False
+        mock_monotonic.return_value = 0
+        self.assertFalse(is_running_cached(host, port, logger, ttl=10, max_backoff=30))
+        self.assertEqual(mock_is_running.call_count, 1)
+        # Pas de nouvelle tentative pendant le backoff (10s)
+        mock_monotonic.return_value = 9
+        self.assertFalse(is_running_cached(host, port, logger, ttl=10, max_backoff=30))
+        self.assertEqual(mock_is_running.call_count, 1)
+        # Nouvelle tentative après le backoff -> KO, backoff doublé (20s)
+        mock_monotonic.return_value = 10
+        self.assertFalse(is_running_cached(host, port, logger, ttl=10, max_backoff=30))
+        self.assertEqual(mock_is_running.call_count, 2)
+        mock_monotonic.return_value = 29
+        self.assertFalse(is_running_cached(host, port, logger, ttl=10, max_backoff=30))
+        self.assertEqual(mock_is_running.call_count, 2)
+        # Backoff borné par max_backoff (30s)
+        mock_monotonic.return_value = 30
+        self.assertFalse(is_running_cached(host, port, logger, ttl=10, max_backoff=30))
+        self.assertEqual(mock_is_running.call_count, 3)
+        mock_monotonic.return_value = 60
+        # Le serveur revient -> état réinitialisé
+        mock_is_running.return_value = True
+        self.assertTrue(is_running_cached(host, port, logger, ttl=10, max_backoff=30))
+        self.assertEqual(mock_is_running.call_count, 4)
+        mock_monotonic.return_value = 65
+        self.assertTrue(is_running_cached(host, port, logger, ttl=10, max_backoff=30))
+        self.assertEqual(mock_is_running.call_count, 4)
+        reset_hosts_health()
+
+    def test12_model_logger_health_check_params(self):
+        '''Test des paramètres health_check de ynov.monitoring.model_logger.ModelLogger'''
+        save_dir = os.path.join(os.getcwd(), 'ml_flow_test')
+        if os.path.exists(save_dir):
+            shutil.rmtree(save_dir)
+        model = ModelLogger(os.path.relpath(save_dir), health_check_ttl=5, health_check_max_backoff=50)
+        self.assertEqual(model.health_check_ttl, 5)
+        self.assertEqual(model.health_check_max_backoff, 50)
+        # Clear
+        model.stop_run()
+        if os.path.exists(save_dir):
+            shutil.rmtree(save_dir)
+
+        host = 'http://toto.titi.tata.test'
+
+        # Check errors
+        with self.assertRaises(ValueError):
+            ModelLogger(tracking_uri=host, experiment_name='test', health_check_ttl=-1)
+        with self.assertRaises(ValueError):
+            ModelLogger(tracking_uri=host, experiment_name='test', health_check_ttl=60, health_check_max_backoff=10)
+
 
 # Execution des tests
 if __name__ == '__main__':
@@ -12,7 +12,9 @@ import shutil
 import pandas as pd
 import numpy as np
 from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor, GradientBoostingRegressor
+from sklearn.linear_model import SGDClassifier, LogisticRegression
+from lightgbm import LGBMRegressor
 from ynov import utils
 from ynov.models_training.model_pipeline import ModelPipeline
 
@@ -509,6 +511,85 @@ class ModelPipelineTests(unittest.TestCase):
         remove_dir(model_dir)
 
 
+    def test06_model_pipeline_fit_incremental(self):
+        '''Test de l'entraînement incrémental de ynov.models_training.model_pipeline.ModelPipeline'''
+
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        remove_dir(model_dir)
+
+        # Set vars
+        x_train = pd.DataFrame({'col_1': [-5, -1, 0, -2, 2, -6, 3] * 10, 'col_2': [2, -1, -8, 2, 3, 12, 2] * 10})
+        y_train_mono_2 = pd.Series([0, 0, 0, 0, 1, 1, 1] * 10)
+        y_train_mono_3 = pd.Series([0, 0, 0, 2, 1, 1, 1] * 10)
+        y_train_regressor = pd.Series([-3, -2, -8, 0, 5, 6, 5] * 10)
+        x_col = ['col_1', 'col_2']
+        y_col_mono = ['toto']
+
+        def get_model(estimator, model_type='classifier'):
+            model = ModelPipeline(x_col=x_col, y_col=y_col_mono, model_dir=model_dir, pipeline=Pipeline([('estimator', estimator)]))
+            model.model_type = model_type
+            model.multi_label = False
+            return model
+
+        # warm_start : ajout d'arbres entraînés sur les nouvelles données
+        model = get_model(RandomForestClassifier(n_estimators=10))
+        model.fit(x_train, y_train_mono_2, incremental=True)  # Pas encore entraîné -> fit classique
+        self.assertEqual(model.nb_fit, 1)
+        self.assertEqual(len(model.pipeline['estimator'].estimators_), 10)
+        model.fit(x_train[:35], y_train_mono_2[:35], incremental=True)
+        self.assertEqual(model.nb_fit, 2)
+        self.assertEqual(len(model.pipeline['estimator'].estimators_), 20)
+        self.assertFalse(model.pipeline['estimator'].warm_start)
+        model.fit(x_train[35:], y_train_mono_2[35:], incremental=True, n_new_estimators=5)
+        self.assertEqual(model.nb_fit, 3)
+        self.assertEqual(len(model.pipeline['estimator'].estimators_), 25)
+        self.assertEqual(model.predict(x_train).shape, (x_train.shape[0],))
+        # Toujours une erreur hors mode incrémental
+        with self.assertRaises(RuntimeError):
+            model.fit(x_train, y_train_mono_2)
+        # Classes différentes
+        with self.assertRaises(ValueError):
+            model.fit(x_train, y_train_mono_3, incremental=True)
+        with self.assertRaises(ValueError):
+            model.fit(x_train[:3], y_train_mono_2[:3], incremental=True)
+        with self.assertRaises(ValueError):
+            model.fit(x_train, y_train_mono_2, incremental=True, n_new_estimators=0)
+        remove_dir(model_dir)
+
+        # warm_start - regressor
+        model = get_model(GradientBoostingRegressor(n_estimators=10), model_type='regressor')
+        model.fit(x_train, y_train_regressor)
+        model.fit(x_train[:35], y_train_regressor[:35], incremental=True)
+        self.assertEqual(model.nb_fit, 2)
+        self.assertEqual(model.pipeline['estimator'].n_estimators_, 20)
+        remove_dir(model_dir)
+
+        # partial_fit (sous-ensemble des classes autorisé)
+        model = get_model(SGDClassifier())
+        model.fit(x_train, y_train_mono_2)
+        coef = model.pipeline['estimator'].coef_.copy()
+        model.fit(x_train[:3], y_train_mono_2[:3], incremental=True)
+        self.assertEqual(model.nb_fit, 2)
+        self.assertFalse(np.array_equal(coef, model.pipeline['estimator'].coef_))
+        remove_dir(model_dir)
+
+        # Boosting poursuivi (init_model)
+        model = get_model(LGBMRegressor(n_estimators=10, min_child_samples=2), model_type='regressor')
+        model.fit(x_train, y_train_regressor)
+        model.fit(x_train[:35], y_train_regressor[:35], incremental=True)
+        self.assertEqual(model.nb_fit, 2)
+        self.assertEqual(model.pipeline['estimator'].booster_.num_trees(), 20)
+        remove_dir(model_dir)
+
+        # Manage errors
+        model = get_model(LogisticRegression())
+        model.fit(x_train, y_train_mono_2)
+        with self.assertRaises(RuntimeError):
+            model.fit(x_train, y_train_mono_2, incremental=True)
+        self.assertEqual(model.nb_fit, 1)
+        remove_dir(model_dir)
+
+
 # Execution des tests
 if __name__ == '__main__':
     # Start tests
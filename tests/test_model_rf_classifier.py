@@ -11,6 +11,7 @@ import json
 import shutil
 import pandas as pd
 import numpy as np
+from scipy import sparse
 from ynov import utils
 from ynov.models_training.classifiers.model_rf_classifier import ModelRFClassifier
 
@@ -162,6 +163,13 @@ class ModelRFClassifierTests(unittest.TestCase):
         proba = model.predict(x_train, return_proba=True)
         self.assertEqual(proba.shape, (len(x_train), len(y_col_multi)))
         remove_dir(model_dir)
+        # Classification - Multi label - cibles sparse
+        model = ModelRFClassifier(x_col=x_col, y_col=y_col_multi, model_dir=model_dir, multi_label=True)
+        model.fit(x_train, sparse.csr_matrix(y_train_multi.values))
+        self.assertEqual(model.list_classes, y_col_multi)
+        preds = model.predict(x_train)
+        self.assertEqual(preds.shape, (len(x_train), len(y_col_multi)))
+        remove_dir(model_dir)
         model = ModelRFClassifier(x_col=x_col, y_col=y_col_multi, model_dir=model_dir, multi_label=True, multiclass_strategy='ovr')
         model.fit(x_train, y_train_multi)
         preds = model.predict(x_train)
@@ -624,6 +632,58 @@ class ModelRFClassifierTests(unittest.TestCase):
         remove_dir(model_dir)
 
 
+    def test07_model_rf_classifier_multi_label_thresholds(self):
+        '''Test des seuils multi-label optimisés (optimize_thresholds, predict, save & reload) de ynov.models_training.classifiers.model_rf_classifier.ModelRFClassifier'''
+
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        remove_dir(model_dir)
+
+        # Set vars
+        x_train = pd.DataFrame({'col_1': [-5, -1, 0, -2, 2, -6, 3] * 10, 'col_2': [2, -1, -8, 2, 3, 12, 2] * 10})
+        y_train_multi = pd.DataFrame({'y1': [0, 0, 0, 0, 1, 1, 1] * 10, 'y2': [1, 0, 0, 1, 1, 1, 1] * 10, 'y3': [0, 0, 1, 0, 1, 0, 1] * 10})
+        x_col = ['col_1', 'col_2']
+        y_col_multi = ['y1', 'y2', 'y3']
+
+        # Seuils optimisés -> utilisés par predict
+        model = ModelRFClassifier(x_col=x_col, y_col=y_col_multi, model_dir=model_dir, multi_label=True)
+        model.fit(x_train, y_train_multi)
+        probas = model.predict(x_train, return_proba=True)
+        thresholds = model.optimize_thresholds(y_train_multi, probas)
+        self.assertEqual(len(thresholds), 3)
+        # Seuils extrêmes pour vérifier qu'ils sont bien appliqués
+        model.multi_label_thresholds = [0., 0., 1.1]
+        preds = model.predict(x_train)
+        np.testing.assert_array_equal(preds, np.array([[1, 1, 0]] * len(x_train)))
+        preds, _ = model.predict_with_proba(x_train)
+        np.testing.assert_array_equal(preds, np.array([[1, 1, 0]] * len(x_train)))
+
+        # Save / reload
+        model.save()
+        with open(os.path.join(model.model_dir, 'configurations.json'), 'r', encoding='utf-8') as f:
+            configs = json.load(f)
+        self.assertEqual(configs['multi_label_thresholds'], [0., 0., 1.1])
+        new_model = ModelRFClassifier()
+        new_model.reload_from_standalone(configuration_path=os.path.join(model.model_dir, 'configurations.json'),
+                                         model_pipeline_path=os.path.join(model.model_dir, f"{model.model_name}_standalone.pkl"),
+                                         preprocess_pipeline_path=os.path.join(model.model_dir, 'preprocess_pipeline.pkl'))
+        self.assertEqual(new_model.multi_label_thresholds, [0., 0., 1.1])
+        np.testing.assert_array_equal(new_model.predict(x_train), preds)
+        remove_dir(new_model.model_dir)
+        remove_dir(model_dir)
+
+        # Mode de plot des matrices de confusion : sauvegardé & rechargé
+        model = ModelRFClassifier(x_col=x_col, y_col=y_col_multi, model_dir=model_dir, multi_label=True, confusion_matrix_plots='lazy')
+        model.fit(x_train, y_train_multi)
+        model.save()
+        new_model = ModelRFClassifier()
+        new_model.reload_from_standalone(configuration_path=os.path.join(model.model_dir, 'configurations.json'),
+                                         model_pipeline_path=os.path.join(model.model_dir, f"{model.model_name}_standalone.pkl"),
+                                         preprocess_pipeline_path=os.path.join(model.model_dir, 'preprocess_pipeline.pkl'))
+        self.assertEqual(new_model.confusion_matrix_plots, 'lazy')
+        remove_dir(new_model.model_dir)
+        remove_dir(model_dir)
+
+
 # Execution des tests
 if __name__ == '__main__':
     # Start tests
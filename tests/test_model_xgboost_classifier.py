@@ -12,7 +12,8 @@ import shutil
 import numpy as np
 import pandas as pd
 from ynov import utils
-from ynov.models_training.classifiers.model_xgboost_classifier import ModelXgboostClassifier
+from xgboost import XGBClassifier
+from ynov.models_training.classifiers.model_xgboost_classifier import ModelXgboostClassifier, MyMultiOutputClassifier
 
 # Disable logging
 import logging
@@ -69,6 +70,30 @@ class ModelXgboostClassifierTests(unittest.TestCase):
         self.assertEqual(model.validation_split, 0.3)
         remove_dir(model_dir)
 
+        #
+        model = ModelXgboostClassifier(model_dir=model_dir)
+        self.assertEqual(model.eval_train_size, None)
+        remove_dir(model_dir)
+        model = ModelXgboostClassifier(model_dir=model_dir, eval_train_size=0.1)
+        self.assertEqual(model.eval_train_size, 0.1)
+        remove_dir(model_dir)
+
+        #
+        model = ModelXgboostClassifier(model_dir=model_dir, multi_label=True)
+        self.assertEqual(model.multi_label_strategy, 'one_model_per_label')
+        self.assertEqual(type(model.model), MyMultiOutputClassifier)
+        remove_dir(model_dir)
+        model = ModelXgboostClassifier(model_dir=model_dir, multi_label=True, multi_label_strategy='native')
+        self.assertEqual(model.multi_label_strategy, 'native')
+        self.assertEqual(type(model.model), XGBClassifier)
+        self.assertEqual(model.model.multi_strategy, 'multi_output_tree')
+        remove_dir(model_dir)
+        # Mono label : stratégie sans effet
+        model = ModelXgboostClassifier(model_dir=model_dir, multi_label_strategy='native')
+        self.assertEqual(type(model.model), XGBClassifier)
+        self.assertEqual(model.model.multi_strategy, None)
+        remove_dir(model_dir)
+
 
     def test02_model_xgboost_classifier_fit(self):
         '''Test de la fonction fit de ynov.models_training.classifiers.model_xgboost_classifier.ModelXgboostClassifier'''
@@ -127,6 +152,18 @@ class ModelXgboostClassifierTests(unittest.TestCase):
         self.assertEqual(model.list_classes, [0, 1])
         self.assertEqual(model.dict_classes, {0: 0, 1: 1})
         remove_dir(model_dir)
+        # Avec évaluation d'un sous-échantillon du train
+        model = ModelXgboostClassifier(x_col=x_col, y_col=y_col_mono, model_dir=model_dir, xgboost_params={'n_estimators': 5}, eval_train_size=0.5)
+        model.fit(x_train, y_train_mono_2, x_valid=x_train, y_valid=y_train_mono_2)
+        self.assertTrue(model.trained)
+        evals_result = model.model.evals_result()
+        self.assertEqual(sorted(evals_result.keys()), ['validation_0', 'validation_1'])
+        remove_dir(model_dir)
+        # Sans -> seule la validation est évaluée
+        model = ModelXgboostClassifier(x_col=x_col, y_col=y_col_mono, model_dir=model_dir, xgboost_params={'n_estimators': 5})
+        model.fit(x_train, y_train_mono_2, x_valid=x_train, y_valid=y_train_mono_2)
+        self.assertEqual(list(model.model.evals_result().keys()), ['validation_0'])
+        remove_dir(model_dir)
 
         # Classification - Mono label - Multi Class
         model = ModelXgboostClassifier(x_col=x_col, y_col=y_col_mono, model_dir=model_dir, xgboost_params={'n_estimators': 5})
@@ -567,6 +604,220 @@ class ModelXgboostClassifierTests(unittest.TestCase):
         remove_dir(model_dir)
 
 
+    def test07_model_xgboost_classifier_fit_external_memory(self):
+        '''Test de la fonction ynov.models_training.classifiers.model_xgboost_classifier.ModelXgboostClassifier.fit en mémoire externe'''
+
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        data_dir = os.path.join(os.getcwd(), 'test_data_xgboost_external')
+        remove_dir(model_dir)
+        remove_dir(data_dir)
+        os.makedirs(data_dir)
+
+        # Set vars
+        df_train = pd.DataFrame({'col_1': [-5, -1, 0, -2, 2, -6, 3] * 10, 'col_2': [2, -1, -8, 2, 3, 12, 2] * 10,
+                                 'y_mono_2': [0, 0, 0, 0, 1, 1, 1] * 10, 'y_mono_3': [0, 0, 0, 2, 1, 1, 1] * 10,
+                                 'y_str': ['a', 'a', 'a', 'a', 'b', 'b', 'b'] * 10})
+        x_col = ['col_1', 'col_2']
+        train_path = os.path.join(data_dir, 'train.csv')
+        valid_path = os.path.join(data_dir, 'valid.csv')
+        # Fichier avec métadonnées en première ligne (cf. 1_preprocess_data.py)
+        with open(train_path, 'w', encoding='utf-8') as f:
+            f.write('#preprocess_P1\n')
+        df_train.to_csv(train_path, mode='a', sep=',', index=False, encoding='utf-8')
+        # Validation avec des classes décalées -> early stopping rapide
+        df_valid = df_train.copy()
+        df_valid['y_mono_3'] = np.roll(df_valid['y_mono_3'].values, 3)
+        df_valid.to_csv(valid_path, sep=',', index=False, encoding='utf-8')
+
+        # Mono label - 2 classes - chemin de fichier & validation en mémoire
+        model = ModelXgboostClassifier(x_col=x_col, y_col='y_mono_2', model_dir=model_dir, xgboost_params={'n_estimators': 5})
+        model.fit(train_path, None, x_valid=df_train[x_col], y_valid=df_train['y_mono_2'], chunksize=20)
+        self.assertTrue(model.trained)
+        self.assertEqual(model.nb_fit, 1)
+        self.assertEqual(model.list_classes, [0, 1])
+        self.assertEqual(model.dict_classes, {0: 0, 1: 1})
+        self.assertEqual(model.columns_in, x_col)
+        self.assertEqual(model.predict_proba(df_train[x_col]).shape, (df_train.shape[0], 2))
+        model_in_memory = ModelXgboostClassifier(x_col=x_col, y_col='y_mono_2', model_dir=model_dir, xgboost_params={'n_estimators': 5})
+        model_in_memory.fit(df_train[x_col], df_train['y_mono_2'], x_valid=df_train[x_col], y_valid=df_train['y_mono_2'])
+        np.testing.assert_array_equal(model.predict(df_train[x_col]), model_in_memory.predict(df_train[x_col]))
+        # Sauvegarde & rechargement inchangés
+        model.save()
+        new_model = ModelXgboostClassifier()
+        new_model.reload_from_standalone(configuration_path=os.path.join(model.model_dir, 'configurations.json'),
+                                         xgboost_path=os.path.join(model.model_dir, f"{model.model_name}.model"),
+                                         preprocess_pipeline_path=os.path.join(model.model_dir, 'preprocess_pipeline.pkl'))
+        np.testing.assert_array_almost_equal(model.predict_proba(df_train[x_col]), new_model.predict_proba(df_train[x_col]))
+        remove_dir(model_dir)
+        remove_dir(new_model.model_dir)
+
+        # Mono label - 3 classes - fonction retournant des chunks & fichier de validation, x_col/y_col non renseignés
+        model = ModelXgboostClassifier(model_dir=model_dir, xgboost_params={'n_estimators': 50}, early_stopping_rounds=2)
+        chunks_factory = lambda: (df_train[x_col + ['y_mono_3']].iloc[i:i + 25] for i in range(0, df_train.shape[0], 25))
+        model.fit(chunks_factory, 'y_mono_3', x_valid=valid_path)
+        self.assertEqual(model.x_col, x_col)
+        self.assertEqual(model.y_col, 'y_mono_3')
+        self.assertEqual(model.list_classes, [0, 1, 2])
+        self.assertEqual(model.model.objective, 'multi:softprob')
+        self.assertEqual(model.predict_proba(df_train[x_col]).shape, (df_train.shape[0], 3))
+        # Early stopping sur la validation
+        self.assertTrue(len(model.model.evals_result()['validation_0']['mlogloss']) < 50)
+        self.assertTrue(model.model.best_iteration < 49)
+        remove_dir(model_dir)
+
+        # Manage errors
+        model = ModelXgboostClassifier(x_col=x_col, y_col='y_str', model_dir=model_dir)
+        with self.assertRaises(ValueError):
+            model.fit(train_path, None, x_valid=valid_path)
+        model = ModelXgboostClassifier(x_col=x_col, model_dir=model_dir)
+        with self.assertRaises(ValueError):
+            model.fit(train_path, None, x_valid=valid_path)
+        with self.assertRaises(ValueError):
+            model.fit(train_path, 'y_mono_2')
+        with self.assertRaises(ValueError):
+            model.fit(chunks_factory(), 'y_mono_3', x_valid=valid_path)
+        with self.assertRaises(FileNotFoundError):
+            model.fit(os.path.join(data_dir, 'toto.csv'), 'y_mono_2', x_valid=valid_path)
+        model = ModelXgboostClassifier(x_col=x_col, y_col=['y_mono_2', 'y_mono_3'], model_dir=model_dir, multi_label=True)
+        with self.assertRaises(NotImplementedError):
+            model.fit(train_path, None, x_valid=valid_path)
+
+        # Clean
+        remove_dir(model_dir)
+        remove_dir(data_dir)
+
+
+    def test08_my_multi_output_classifier_fit(self):
+        '''Test de la fonction ynov.models_training.classifiers.model_xgboost_classifier.MyMultiOutputClassifier.fit'''
+
+        # Set vars
+        x_train = pd.DataFrame({'col_1': [-5, -1, 0, -2, 2, -6, 3] * 10, 'col_2': [2, -1, -8, 2, 3, 12, 2] * 10})
+        y_train = pd.DataFrame({'y1': [0, 0, 0, 0, 1, 1, 1] * 10, 'y2': [1, 0, 0, 1, 1, 1, 1] * 10, 'y3': [0, 0, 1, 0, 1, 0, 1] * 10})
+        x_valid, y_valid = x_train.iloc[:20], y_train.iloc[:20]
+
+        # Labels en parallèle == séquentiel
+        model_seq = MyMultiOutputClassifier(XGBClassifier(n_estimators=5, n_jobs=2), n_jobs=None)
+        model_seq.fit(x_train, y_train, eval_set=[(x_valid, y_valid)], verbose=False)
+        model_par = MyMultiOutputClassifier(XGBClassifier(n_estimators=5, n_jobs=2), n_jobs=-1)
+        model_par.fit(x_train, y_train, eval_set=[(x_valid, y_valid)], verbose=False)
+        self.assertEqual(len(model_par.estimators_), 3)
+        np.testing.assert_array_almost_equal(np.array(model_seq.predict_proba(x_train)), np.array(model_par.predict_proba(x_train)))
+        # Le nombre de threads d'origine est remis après le fit
+        self.assertTrue(all(estimator.n_jobs == 2 for estimator in model_par.estimators_))
+        # Validation sur le bon label
+        self.assertEqual(len(model_par.estimators_[0].evals_result()['validation_0']['logloss']), 5)
+        # Sans eval_set
+        model_par = MyMultiOutputClassifier(XGBClassifier(n_estimators=5), n_jobs=2)
+        model_par.fit(x_train, y_train)
+        self.assertEqual(model_par.predict(x_train).shape, y_train.shape)
+        self.assertTrue(all(estimator.n_jobs is None for estimator in model_par.estimators_))
+        # Threads imposés via l'alias nthread : pris en compte & remis après le fit
+        model_par = MyMultiOutputClassifier(XGBClassifier(n_estimators=5, nthread=2), n_jobs=-1)
+        model_par.fit(x_train, y_train)
+        self.assertEqual(model_par.predict(x_train).shape, y_train.shape)
+        self.assertTrue(all(estimator.get_params()['nthread'] == 2 and estimator.n_jobs is None for estimator in model_par.estimators_))
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            MyMultiOutputClassifier(XGBClassifier(n_estimators=5), n_jobs=2).fit(x_train, y_train['y1'])
+
+
+    def test09_model_xgboost_classifier_native_multi_label(self):
+        '''Test de la stratégie multi-label 'native' de ynov.models_training.classifiers.model_xgboost_classifier.ModelXgboostClassifier'''
+
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        remove_dir(model_dir)
+
+        # Set vars
+        x_train = pd.DataFrame({'col_1': [-5, -1, 0, -2, 2, -6, 3] * 10, 'col_2': [2, -1, -8, 2, 3, 12, 2] * 10})
+        y_train_multi = pd.DataFrame({'y1': [0, 0, 0, 0, 1, 1, 1] * 10, 'y2': [1, 0, 0, 1, 1, 1, 1] * 10, 'y3': [0, 0, 1, 0, 1, 0, 1] * 10})
+        x_col = ['col_1', 'col_2']
+        y_col_multi = ['y1', 'y2', 'y3']
+
+        # Fit, même contrat que la stratégie un modèle par label
+        model = ModelXgboostClassifier(x_col=x_col, y_col=y_col_multi, model_dir=model_dir, multi_label=True,
+                                       multi_label_strategy='native', xgboost_params={'n_estimators': 5})
+        model.fit(x_train, y_train_multi)
+        self.assertEqual(model.list_classes, y_col_multi)
+        self.assertEqual(model.dict_classes, {0: 'y1', 1: 'y2', 2: 'y3'})
+        probas = model.predict_proba(x_train)
+        self.assertEqual(probas.shape, (x_train.shape[0], 3))
+        self.assertTrue(((probas >= 0) & (probas <= 1)).all())
+        preds = model.predict(x_train)
+        self.assertEqual(preds.shape, (x_train.shape[0], 3))
+        self.assertTrue(np.issubdtype(preds.dtype, np.integer))
+        np.testing.assert_array_equal(preds, (probas > 0.5).astype(int))
+        self.assertEqual(model.inverse_transform(preds[:1]), [tuple(col for col, pred in zip(y_col_multi, preds[0]) if pred == 1)])
+
+        # Sauvegarde standalone (un seul booster) & rechargement
+        model.save()
+        xgboost_path = os.path.join(model.model_dir, f"{model.model_name}.model")
+        self.assertTrue(os.path.exists(xgboost_path))
+        with open(os.path.join(model.model_dir, 'configurations.json'), 'r', encoding='utf-8') as f:
+            configs = json.load(f)
+        self.assertEqual(configs['multi_label_strategy'], 'native')
+        new_model = ModelXgboostClassifier()
+        new_model.reload_from_standalone(configuration_path=os.path.join(model.model_dir, 'configurations.json'), xgboost_path=xgboost_path,
+                                         preprocess_pipeline_path=os.path.join(model.model_dir, 'preprocess_pipeline.pkl'))
+        self.assertEqual(new_model.multi_label_strategy, 'native')
+        np.testing.assert_array_almost_equal(probas, new_model.predict_proba(x_train))
+        np.testing.assert_array_equal(preds, new_model.predict(x_train))
+        remove_dir(model_dir)
+        remove_dir(new_model.model_dir)
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            ModelXgboostClassifier(model_dir=model_dir, multi_label=True, multi_label_strategy='toto')
+        remove_dir(model_dir)
+
+
+
+    def test10_model_xgboost_classifier_fit_incremental(self):
+        '''Test de l'entraînement incrémental de ynov.models_training.classifiers.model_xgboost_classifier.ModelXgboostClassifier'''
+
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        remove_dir(model_dir)
+
+        # Set vars
+        x_train = pd.DataFrame({'col_1': [-5, -1, 0, -2, 2, -6, 3] * 10, 'col_2': [2, -1, -8, 2, 3, 12, 2] * 10})
+        y_train = pd.Series([0, 0, 0, 2, 1, 1, 1] * 10)
+
+        # Boosting poursuivi à partir du booster existant
+        model = ModelXgboostClassifier(x_col=['col_1', 'col_2'], y_col='y', model_dir=model_dir,
+                                       xgboost_params={'n_estimators': 5}, early_stopping_rounds=None)
+        model.fit(x_train, y_train)
+        self.assertEqual(model.model.get_booster().num_boosted_rounds(), 5)
+        model.fit(x_train[:35], y_train[:35], x_valid=x_train, y_valid=y_train, incremental=True)
+        self.assertEqual(model.nb_fit, 2)
+        self.assertEqual(model.model.get_booster().num_boosted_rounds(), 10)
+        self.assertEqual(model.predict(x_train).shape, (x_train.shape[0],))
+        # Mémoire externe
+        model.fit(lambda: iter([pd.concat([x_train, y_train.rename('y')], axis=1)]), 'y', x_valid=x_train, y_valid=y_train, incremental=True)
+        self.assertEqual(model.nb_fit, 3)
+        self.assertEqual(model.model.get_booster().num_boosted_rounds(), 15)
+        # Toujours une erreur hors mode incrémental
+        with self.assertRaises(RuntimeError):
+            model.fit(x_train, y_train)
+        # Classes différentes
+        with self.assertRaises(ValueError):
+            model.fit(x_train, pd.Series([0, 0, 0, 0, 1, 1, 1] * 10), incremental=True)
+        # Un xgboost par label : pas de mode incrémental
+        y_train_multi = pd.DataFrame({'y1': [0, 0, 0, 0, 1, 1, 1] * 10, 'y2': [1, 0, 0, 1, 1, 1, 1] * 10})
+        model = ModelXgboostClassifier(model_dir=model_dir, multi_label=True, xgboost_params={'n_estimators': 5})
+        model.fit(x_train, y_train_multi)
+        with self.assertRaises(RuntimeError):
+            model.fit(x_train, y_train_multi, incremental=True)
+        remove_dir(model_dir)
+        model = ModelXgboostClassifier(model_dir=model_dir, multi_label=True, multi_label_strategy='native', xgboost_params={'n_estimators': 5})
+        model.fit(x_train, y_train_multi)
+        model.fit(x_train, y_train_multi, incremental=True)
+        self.assertEqual(model.model.get_booster().num_boosted_rounds(), 10)
+        self.assertEqual(model.predict_proba(x_train).shape, (x_train.shape[0], 2))
+
+        # Clean
+        remove_dir(model_dir)
+
+
 # Execution des tests
 if __name__ == '__main__':
     # Start tests
@@ -69,6 +69,14 @@ class ModelXgboostRegressorTests(unittest.TestCase):
         self.assertEqual(model.validation_split, 0.3)
         remove_dir(model_dir)
 
+        #
+        model = ModelXgboostRegressor(model_dir=model_dir)
+        self.assertEqual(model.eval_train_size, None)
+        remove_dir(model_dir)
+        model = ModelXgboostRegressor(model_dir=model_dir, eval_train_size=0.1)
+        self.assertEqual(model.eval_train_size, 0.1)
+        remove_dir(model_dir)
+
     def test02_model_xgboost_regressor_fit(self):
         '''Test de la fonction fit de ynov.models_training.regressors.model_xgboost_regressor.ModelXgboostRegressor'''
 
@@ -117,6 +125,18 @@ class ModelXgboostRegressorTests(unittest.TestCase):
         self.assertEqual(model.x_col, x_col)
         self.assertEqual(model.y_col, y_col_mono)
         remove_dir(model_dir)
+        # Avec évaluation d'un sous-échantillon du train
+        model = ModelXgboostRegressor(x_col=x_col, y_col=y_col_mono, model_dir=model_dir, xgboost_params={'n_estimators': 5}, eval_train_size=0.5)
+        model.fit(x_train, y_train_regressor, x_valid=x_train, y_valid=y_train_regressor)
+        self.assertTrue(model.trained)
+        evals_result = model.model.evals_result()
+        self.assertEqual(sorted(evals_result.keys()), ['validation_0', 'validation_1'])
+        remove_dir(model_dir)
+        # Sans -> seule la validation est évaluée
+        model = ModelXgboostRegressor(x_col=x_col, y_col=y_col_mono, model_dir=model_dir, xgboost_params={'n_estimators': 5})
+        model.fit(x_train, y_train_regressor, x_valid=x_train, y_valid=y_train_regressor)
+        self.assertEqual(list(model.model.evals_result().keys()), ['validation_0'])
+        remove_dir(model_dir)
 
         #
         ############
@@ -339,6 +359,92 @@ class ModelXgboostRegressorTests(unittest.TestCase):
         remove_dir(model_dir)
 
 
+
+    def test06_model_xgboost_regressor_fit_external_memory(self):
+        '''Test de la fonction ynov.models_training.regressors.model_xgboost_regressor.ModelXgboostRegressor.fit en mémoire externe'''
+
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        data_dir = os.path.join(os.getcwd(), 'test_data_xgboost_external')
+        remove_dir(model_dir)
+        remove_dir(data_dir)
+        os.makedirs(data_dir)
+
+        # Set vars
+        df_train = pd.DataFrame({'col_1': [-5, -1, 0, -2, 2, -6, 3] * 10, 'col_2': [2, -1, -8, 2, 3, 12, 2] * 10,
+                                 'y': [-12.2, -1, 0, 0.5, 1.2, 8.3, 5.6] * 10})
+        x_col = ['col_1', 'col_2']
+        train_path = os.path.join(data_dir, 'train.csv')
+        with open(train_path, 'w', encoding='utf-8') as f:
+            f.write('#preprocess_P1\n')
+        df_train.to_csv(train_path, mode='a', sep=',', index=False, encoding='utf-8')
+
+        # Chemin de fichier
+        model = ModelXgboostRegressor(x_col=x_col, y_col='y', model_dir=model_dir, xgboost_params={'n_estimators': 5})
+        model.fit(train_path, None, x_valid=df_train[x_col], y_valid=df_train['y'], chunksize=20)
+        self.assertTrue(model.trained)
+        self.assertEqual(model.nb_fit, 1)
+        model_in_memory = ModelXgboostRegressor(x_col=x_col, y_col='y', model_dir=model_dir, xgboost_params={'n_estimators': 5})
+        model_in_memory.fit(df_train[x_col], df_train['y'], x_valid=df_train[x_col], y_valid=df_train['y'])
+        np.testing.assert_array_almost_equal(model.predict(df_train[x_col]), model_in_memory.predict(df_train[x_col]), decimal=4)
+        model.save()
+        self.assertTrue(os.path.exists(os.path.join(model.model_dir, f"{model.model_name}.model")))
+        remove_dir(model_dir)
+
+        # Fonction retournant des chunks, x_col/y_col non renseignés
+        model = ModelXgboostRegressor(model_dir=model_dir, xgboost_params={'n_estimators': 50}, early_stopping_rounds=2)
+        model.fit(lambda: (df_train.iloc[i:i + 25] for i in range(0, df_train.shape[0], 25)), 'y',
+                  x_valid=df_train[x_col], y_valid=df_train['y'])
+        self.assertEqual(model.x_col, x_col)
+        self.assertEqual(model.y_col, 'y')
+        self.assertEqual(model.predict(df_train[x_col]).shape, (df_train.shape[0],))
+        remove_dir(model_dir)
+
+        # Manage errors
+        model = ModelXgboostRegressor(x_col=x_col, y_col='y', model_dir=model_dir)
+        with self.assertRaises(ValueError):
+            model.fit(train_path, None)
+        with self.assertRaises(ValueError):
+            model.fit(train_path, None, x_valid=df_train[x_col])
+        with self.assertRaises(ValueError):
+            model.fit(os.path.join(data_dir, 'train.txt'), None, x_valid=df_train[x_col], y_valid=df_train['y'])
+
+        # Clean
+        remove_dir(model_dir)
+        remove_dir(data_dir)
+
+
+
+    def test07_model_xgboost_regressor_fit_incremental(self):
+        '''Test de l'entraînement incrémental de ynov.models_training.regressors.model_xgboost_regressor.ModelXgboostRegressor'''
+
+        model_dir = os.path.join(os.getcwd(), 'model_test_123456789')
+        remove_dir(model_dir)
+
+        # Set vars
+        x_train = pd.DataFrame({'col_1': [-5, -1, 0, -2, 2, -6, 3] * 10, 'col_2': [2, -1, -8, 2, 3, 12, 2] * 10})
+        y_train = pd.Series([-12.2, -1, 0, 0.5, 1.2, 8.3, 5.6] * 10)
+
+        # Boosting poursuivi à partir du booster existant
+        model = ModelXgboostRegressor(x_col=['col_1', 'col_2'], y_col='y', model_dir=model_dir,
+                                      xgboost_params={'n_estimators': 5}, early_stopping_rounds=None)
+        model.fit(x_train, y_train)
+        self.assertEqual(model.model.get_booster().num_boosted_rounds(), 5)
+        model.fit(x_train[:35], y_train[:35], x_valid=x_train, y_valid=y_train, incremental=True)
+        self.assertEqual(model.nb_fit, 2)
+        self.assertEqual(model.model.get_booster().num_boosted_rounds(), 10)
+        self.assertEqual(model.predict(x_train).shape, (x_train.shape[0],))
+        # Mémoire externe
+        model.fit(lambda: iter([pd.concat([x_train, y_train.rename('y')], axis=1)]), 'y', x_valid=x_train, y_valid=y_train, incremental=True)
+        self.assertEqual(model.nb_fit, 3)
+        self.assertEqual(model.model.get_booster().num_boosted_rounds(), 15)
+        # Toujours une erreur hors mode incrémental
+        with self.assertRaises(RuntimeError):
+            model.fit(x_train, y_train)
+
+        # Clean
+        remove_dir(model_dir)
+
+
 # Execution des tests
 if __name__ == '__main__':
     # Start tests
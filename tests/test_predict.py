@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+# Libs unittest
+import unittest
+
+# Utils libs
+import os
+import json
+import shutil
+import importlib.util
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from ynov import utils
+from ynov.models_training import utils_models
+from ynov.models_training.regressors import model_rf_regressor
+
+# Disable logging
+import logging
+logging.disable(logging.CRITICAL)
+
+
+def remove_dir(path):
+    if os.path.isdir(path): shutil.rmtree(path)
+
+
+def load_script(filename):
+    '''Import d'un script de ynov-scripts (nom de fichier non importable directement)'''
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ynov-scripts', filename)
+    spec = importlib.util.spec_from_file_location(os.path.splitext(filename)[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+predict = load_script('4_predict.py')
+
+
+class PredictTests(unittest.TestCase):
+    '''Main class to test all functions in 4_predict.py'''
+
+
+    def setUp(self):
+        '''SetUp fonction'''
+        # On se place dans le bon répertoire
+        # Change directory to script directory
+        abspath = os.path.abspath(__file__)
+        dname = os.path.dirname(abspath)
+        os.chdir(dname)
+        # Dossier de données & modèles temporaire
+        self.dir_path = os.path.join(dname, 'test_predict')
+        remove_dir(self.dir_path)
+        os.makedirs(self.dir_path)
+        self.old_dir_path = utils.DIR_PATH
+        utils.DIR_PATH = self.dir_path
+        self.data_dir = utils.get_data_path()
+
+
+    def tearDown(self):
+        '''tearDown fonction'''
+        utils.DIR_PATH = self.old_dir_path
+        remove_dir(self.dir_path)
+
+
+    def fit_and_save(self, model_name, preprocess_pipeline, df, y, excluded_cols=None):
+        '''Entraine & sauvegarde un modèle RF sur les données preprocessed (sans les colonnes excluded_cols)'''
+        if preprocess_pipeline.sparse_output_:
+            x_prep, columns = utils_models.apply_pipeline(df, preprocess_pipeline, sparse_output=True)
+            df_prep = pd.DataFrame(x_prep.toarray(), columns=columns)
+        else:
+            df_prep = utils_models.apply_pipeline(df, preprocess_pipeline)
+        x_col = [col for col in df_prep.columns if col not in (excluded_cols or [])]
+        model_dir = os.path.join(utils.get_models_path(), model_name)
+        model = model_rf_regressor.ModelRFRegressor(model_dir=model_dir, model_name=model_name, x_col=x_col, y_col='y',
+                                                    preprocess_pipeline=preprocess_pipeline,
+                                                    rf_params={'n_estimators': 5, 'random_state': 42})
+        model.fit(df_prep[x_col], y)
+        model.save(json_data={'preprocess_str': 'no_preprocess'})
+        return model, df_prep[x_col]
+
+
+    def test01_main_multi_models(self):
+        '''Test de la fonction 4_predict.main_multi_models'''
+        rng = np.random.RandomState(42)
+        df = pd.DataFrame({'id': range(30), 'cat': rng.choice(['a', 'b', 'c'], size=30),
+                           'num': rng.normal(size=30), 'num_2': rng.normal(size=30)})
+        df['y'] = df['num'] * 2 + (df['cat'] == 'a')
+        df.to_csv(os.path.join(self.data_dir, 'data.csv'), sep=';', index=None)
+
+        # Deux modèles sur une même pipeline sparse (l'un avec des colonnes exclues), un sur une autre pipeline
+        sparse_pipeline = ColumnTransformer([('cat', OneHotEncoder(), ['cat']), ('num', 'passthrough', ['num', 'num_2'])],
+                                            sparse_threshold=1.0).fit(df)
+        self.assertTrue(sparse_pipeline.sparse_output_)
+        dense_pipeline = ColumnTransformer([('num', StandardScaler(), ['num', 'num_2'])]).fit(df)
+        model_1, df_prep_1 = self.fit_and_save('model_1', sparse_pipeline, df, df['y'])
+        model_2, df_prep_2 = self.fit_and_save('model_2', sparse_pipeline, df, df['y'], excluded_cols=['num_2'])
+        model_3, df_prep_3 = self.fit_and_save('model_3', dense_pipeline, df, df['y'])
+        self.assertEqual(len(model_2.x_col), len(model_1.x_col) - 1)
+
+        # Fonctionnement nominal : une colonne de prédictions par modèle, deux groupes de preprocessing
+        model_dirs = ['model_1', 'model_2', 'model_3']
+        predict.main_multi_models('data.csv', sep=';', encoding='utf-8', model_dirs=model_dirs, y_col=['y'], n_jobs=2)
+        predictions_dir = os.path.join(self.data_dir, 'predictions', 'data')
+        save_dir = os.path.join(predictions_dir, os.listdir(predictions_dir)[0])
+        df_preds = pd.read_csv(os.path.join(save_dir, 'predictions.csv'))
+        self.assertEqual(list(df_preds.columns), ['id'] + model_dirs)
+        self.assertEqual(df_preds.shape[0], df.shape[0])
+        for model, df_prep, model_dir in zip([model_1, model_2, model_3], [df_prep_1, df_prep_2, df_prep_3], model_dirs):
+            np.testing.assert_almost_equal(df_preds[model_dir].values, model.predict(df_prep))
+            self.assertTrue(os.path.isdir(os.path.join(save_dir, model_dir)))
+        with open(os.path.join(save_dir, 'configurations.json'), 'r', encoding='utf-8') as f:
+            configs = json.load(f)
+        self.assertEqual(configs['model_dirs'], model_dirs)
+        self.assertEqual(sorted(sorted(group) for group in configs['preprocessing_groups']), [['model_1', 'model_2'], ['model_3']])
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            predict.main_multi_models('data.csv', sep=';', encoding='utf-8', model_dirs=['model_1', 'model_1'])
+        with self.assertRaises(FileNotFoundError):
+            predict.main_multi_models('toto.csv', sep=';', encoding='utf-8', model_dirs=model_dirs)
+
+
+# Execution des tests
+if __name__ == '__main__':
+    # Start tests
+    unittest.main()
@@ -165,6 +165,55 @@ class PreprocessTests(unittest.TestCase):
         self.assertEqual(output_features, ['col_1', 'col_3', 'col_2_0.0', 'col_2_1.0', 'vec_dernier', 'vec_test', 'toto'])
 
 
+    def test06_get_columns_from_pipeline(self):
+        '''Test de la fonction preprocess.get_columns_from_pipeline'''
+        # Pipeline (sortie sparse)
+        col_2_pipeline = make_pipeline(SimpleImputer(strategy='most_frequent'), OneHotEncoder(handle_unknown='ignore'))
+        transformers = [
+            ('col_2', col_2_pipeline, ['col_2']),
+            ('text', CountVectorizer(), 'text'),
+        ]
+        pipeline = ColumnTransformer(transformers, remainder='drop', sparse_threshold=1.0)
+        # DataFrame
+        df = pd.DataFrame({'col_2': [0.0, None, 1.0, 1.0],
+                           'text': ['ceci est un test', 'un autre test', 'et un troisième test', 'et un dernier']})
+        pipeline.fit(df)
+        nb_columns = pipeline.transform(df).shape[1]
+
+        # Fonctionnement nominal
+        columns = preprocess.get_columns_from_pipeline(pipeline, nb_columns)
+        self.assertEqual(columns, ['col_2_0.0', 'col_2_1.0', 'vec_autre', 'vec_ceci', 'vec_dernier', 'vec_est',
+                                   'vec_et', 'vec_test', 'vec_troisième', 'vec_un'])
+
+        # Pipeline pas fit ou mauvais nombre de colonnes -> None
+        self.assertEqual(preprocess.get_columns_from_pipeline(ColumnTransformer(transformers), nb_columns), None)
+        self.assertEqual(preprocess.get_columns_from_pipeline(pipeline, nb_columns + 1), None)
+
+
+    def test07_preprocess_P1(self):
+        '''Test de la fonction preprocess.preprocess_P1'''
+        # Vals à tester
+        content = pd.DataFrame({'col_1': [-5, -1, 0, 2, -6, 3], 'col_2': [2., -1., np.nan, 3., 12., 2.],
+                                'text': ['toto', 'titi', 'tata', 'tutu', 'tyty', 'tete']})
+
+        # Fonctionnement nominal
+        pipeline = preprocess.preprocess_P1()
+        new_x = pipeline.fit_transform(content)
+        self.assertEqual(new_x.shape, (6, 2))
+        self.assertEqual(new_x.dtype, np.float64)
+
+        # Précision globale float32 -> sortie float32, mêmes valeurs & mêmes colonnes
+        try:
+            utils.set_float_precision('float32')
+            pipeline_32 = preprocess.preprocess_P1()
+        finally:
+            utils.set_float_precision(None)
+        new_x_32 = pipeline_32.fit_transform(content)
+        self.assertEqual(new_x_32.dtype, np.float32)
+        np.testing.assert_allclose(new_x_32, new_x, rtol=1e-5)
+        self.assertEqual(preprocess.get_columns_from_pipeline(pipeline_32, 2), preprocess.get_columns_from_pipeline(pipeline, 2))
+
+
 # Execution des tests
 if __name__ == '__main__':
     # Start tests
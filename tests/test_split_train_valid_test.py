@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+
+# Libs unittest
+import unittest
+
+# Utils libs
+import os
+import shutil
+import importlib.util
+import numpy as np
+import pandas as pd
+from ynov import utils
+
+# Disable logging
+import logging
+logging.disable(logging.CRITICAL)
+
+
+def remove_dir(path):
+    if os.path.isdir(path): shutil.rmtree(path)
+
+
+def load_script(filename):
+    '''Import d'un script de ynov-scripts (nom de fichier non importable directement)'''
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ynov-scripts', filename)
+    spec = importlib.util.spec_from_file_location(os.path.splitext(filename)[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+split_train_valid_test = load_script('0_split_train_valid_test.py')
+
+
+class SplitTrainValidTestTests(unittest.TestCase):
+    '''Main class to test all functions in 0_split_train_valid_test.py'''
+
+
+    def setUp(self):
+        '''SetUp fonction'''
+        # On se place dans le bon répertoire
+        # Change directory to script directory
+        abspath = os.path.abspath(__file__)
+        dname = os.path.dirname(abspath)
+        os.chdir(dname)
+        # Dossier de données temporaire
+        self.dir_path = os.path.join(dname, 'test_split_train_valid_test')
+        remove_dir(self.dir_path)
+        os.makedirs(self.dir_path)
+        self.old_dir_path = utils.DIR_PATH
+        utils.DIR_PATH = self.dir_path
+        self.data_dir = utils.get_data_path()
+
+
+    def tearDown(self):
+        '''tearDown fonction'''
+        utils.DIR_PATH = self.old_dir_path
+        remove_dir(self.dir_path)
+
+
+    def read_splits(self, basename):
+        '''Lecture des fichiers train/valid/test créés (données & première ligne)'''
+        return [utils.read_csv(os.path.join(self.data_dir, f"{basename}_{split}.csv"), dtype=str, keep_default_na=False)
+                for split in split_train_valid_test.SPLITS]
+
+
+    def test01_main_random_stratified(self):
+        '''Test de la fonction 0_split_train_valid_test.main - splits random & stratified'''
+        df = pd.DataFrame({'id': [str(i) for i in range(1000)], 'target': ['a'] * 600 + ['b'] * 300 + ['c'] * 100})
+        df = df.sample(frac=1, random_state=42)
+        # Le fichier commence par une seule classe : ordre d'apparition des classes différent selon les chunks
+        df = pd.concat([df[df['target'] == 'c'].iloc[:10], df.drop(df[df['target'] == 'c'].index[:10])]).reset_index(drop=True)
+        df.to_csv(os.path.join(self.data_dir, 'data.csv'), sep=';', index=None)
+
+        for split_type in ['random', 'stratified']:
+            # Seed : même résultat quelle que soit la taille des chunks
+            results = []
+            for chunksize in [7, 100, 5000]:
+                split_train_valid_test.main('data.csv', split_type, 60, 30, 10, y_col='target', sep=';', seed=42,
+                                            chunksize=chunksize, output_name=f'{split_type}_{chunksize}')
+                results.append(self.read_splits(f'{split_type}_{chunksize}'))
+            for result in results[1:]:
+                for (df_split, _), (df_split_ref, _) in zip(result, results[0]):
+                    pd.testing.assert_frame_equal(df_split, df_split_ref)
+            # Toutes les lignes, une seule fois, dans l'ordre d'origine
+            df_splits = [df_split for df_split, _ in results[0]]
+            self.assertEqual(sorted(pd.concat(df_splits)['id'].astype(int)), list(range(1000)))
+            for df_split in df_splits:
+                self.assertTrue(df_split.index.equals(pd.RangeIndex(df_split.shape[0])))
+                self.assertEqual(list(df_split['id']), [id_ for id_ in df['id'] if id_ in set(df_split['id'])])
+            # Seed différente : autre résultat
+            split_train_valid_test.main('data.csv', split_type, 60, 30, 10, y_col='target', sep=';', seed=43,
+                                        chunksize=7, output_name=f'{split_type}_seed')
+            self.assertFalse(self.read_splits(f'{split_type}_seed')[0][0].equals(df_splits[0]))
+
+        # Random : proportions approchées
+        df_splits = [df_split for df_split, _ in self.read_splits('random_7')]
+        for df_split, perc in zip(df_splits, [0.6, 0.3, 0.1]):
+            self.assertAlmostEqual(df_split.shape[0] / 1000, perc, delta=0.05)
+
+        # Stratified : proportions de chaque classe à deux lignes près, malgré les frontières de chunks (chunksize 7)
+        df_splits = [df_split for df_split, _ in self.read_splits('stratified_7')]
+        for cl, nb_cl in [('a', 600), ('b', 300), ('c', 100)]:
+            for df_split, perc in zip(df_splits, [0.6, 0.3, 0.1]):
+                self.assertLessEqual(abs((df_split['target'] == cl).sum() - perc * nb_cl), 2)
+
+        # Métadonnées : première ligne de chaque fichier
+        with open(os.path.join(self.data_dir, 'metadata.csv'), 'w', encoding='utf-8') as f:
+            f.write('#metadata\n')
+            df.to_csv(f, sep=';', index=None)
+        split_train_valid_test.main('metadata.csv', 'random', 60, 30, 10, sep=';', seed=42, chunksize=100)
+        for df_split, first_line in self.read_splits('metadata'):
+            self.assertEqual(first_line, '#metadata')
+            self.assertEqual(list(df_split.columns), ['id', 'target'])
+        pd.testing.assert_frame_equal(pd.concat([df_split for df_split, _ in self.read_splits('metadata')]).reset_index(drop=True),
+                                      pd.concat([df_split for df_split, _ in self.read_splits('random_7')]).reset_index(drop=True))
+
+        # Manage errors
+        with self.assertRaises(TypeError):
+            split_train_valid_test.main('data.csv', 'stratified', 60, 30, 10, y_col=['target'], sep=';')
+        with self.assertRaises(ValueError):
+            split_train_valid_test.main('data.txt', 'random', 60, 30, 10, sep=';')
+        with self.assertRaises(ValueError):
+            split_train_valid_test.main('data.csv', 'toto', 60, 30, 10, sep=';')
+        with self.assertRaises(ValueError):
+            split_train_valid_test.main('data.csv', 'stratified', 60, 30, 10, sep=';')
+        with self.assertRaises(ValueError):
+            split_train_valid_test.main('data.csv', 'random', 60, 30, 10, sep=';', append=True)
+        with self.assertRaises(FileNotFoundError):
+            split_train_valid_test.main('toto.csv', 'random', 60, 30, 10, sep=';')
+        # Colonne manquante : pas de fichier, partiel ou temporaire
+        with self.assertRaises(ValueError):
+            split_train_valid_test.main('data.csv', 'stratified', 60, 30, 10, y_col='toto', sep=';', output_name='error')
+        self.assertEqual([f for f in os.listdir(self.data_dir) if f.startswith('error') or f.endswith('.tmp')], [])
+
+
+    def test02_write_splits(self):
+        '''Test de la fonction 0_split_train_valid_test.write_splits'''
+        df = pd.DataFrame({'id': [str(i) for i in range(50)], 'value': [str(i % 3) for i in range(50)]})
+        chunks = [df.iloc[i:i + 4] for i in range(0, 50, 4)]
+        paths = [os.path.join(self.data_dir, f"data_{split}.csv") for split in split_train_valid_test.SPLITS]
+
+        # Fonctionnement nominal : répartition selon les codes de l'assigner, métadata en première ligne
+        assigner = split_train_valid_test.RandomAssigner(np.array([0.5, 0.8]), np.random.default_rng(42))
+        nb_rows = split_train_valid_test.write_splits(chunks, assigner, paths, first_line='#metadata', max_prefetch=1)
+        self.assertEqual(sum(nb_rows), 50)
+        for path, nb in zip(paths, nb_rows):
+            df_split, first_line = utils.read_csv(path, dtype=str)
+            self.assertEqual(first_line, '#metadata')
+            self.assertEqual(df_split.shape[0], nb)
+        self.assertEqual([f for f in os.listdir(self.data_dir) if f.endswith('.tmp')], [])
+
+        # Erreur d'un writer (dossier inexistant) : erreur remontée, pas de fichier partiel ou temporaire
+        error_paths = [os.path.join(self.data_dir, 'error_train.csv'), os.path.join(self.data_dir, 'toto', 'error_valid.csv'),
+                       os.path.join(self.data_dir, 'error_test.csv')]
+        with self.assertRaises(FileNotFoundError):
+            split_train_valid_test.write_splits(chunks, assigner, error_paths, max_prefetch=1)
+        self.assertEqual([f for f in os.listdir(self.data_dir) if f.startswith('error')], [])
+
+
+    def test03_main_hash_append(self):
+        '''Test de la fonction 0_split_train_valid_test.main - split hash & append'''
+        df = pd.DataFrame({'id': [f'id_{i}' for i in range(300)], 'value': [str(i) for i in range(300)]})
+        with open(os.path.join(self.data_dir, 'data.csv'), 'w', encoding='utf-8') as f:
+            f.write('#metadata\n')
+            df.to_csv(f, sep=';', index=None)
+
+        # Affectation stable : un même ID dans le même jeu, quels que soient l'ordre des lignes et les chunks
+        split_train_valid_test.main('data.csv', 'hash', 60, 30, 10, sep=';', id_col='id', chunksize=7, output_name='hash')
+        assignment = {id_: split for split, (df_split, _) in zip(split_train_valid_test.SPLITS, self.read_splits('hash'))
+                      for id_ in df_split['id']}
+        self.assertEqual(sorted(assignment.keys()), sorted(df['id']))
+        df_shuffled = df.sample(frac=1, random_state=42)
+        df_shuffled.to_csv(os.path.join(self.data_dir, 'shuffled.csv'), sep=';', index=None)
+        split_train_valid_test.main('shuffled.csv', 'hash', 60, 30, 10, sep=';', id_col='id', chunksize=100, output_name='shuffled')
+        for split, (df_split, _) in zip(split_train_valid_test.SPLITS, self.read_splits('shuffled')):
+            self.assertTrue(all(assignment[id_] == split for id_ in df_split['id']))
+        # Seed différente : autre affectation
+        split_train_valid_test.main('data.csv', 'hash', 60, 30, 10, sep=';', id_col='id', seed=42, output_name='hash_seed')
+        self.assertFalse(self.read_splits('hash_seed')[0][0]['id'].equals(self.read_splits('hash')[0][0]['id']))
+
+        # Append : uniquement les nouveaux ID, sans en-tête ni métadata répétés, anciens ID au même jeu
+        df_new = pd.concat([df.iloc[250:], pd.DataFrame({'id': [f'id_{i}' for i in range(300, 400)],
+                                                         'value': [str(i) for i in range(300, 400)]})])
+        with open(os.path.join(self.data_dir, 'data_new.csv'), 'w', encoding='utf-8') as f:
+            f.write('#metadata\n')
+            df_new.to_csv(f, sep=';', index=None)
+        split_train_valid_test.main('data_new.csv', 'hash', 60, 30, 10, sep=';', id_col='id', chunksize=7, output_name='hash', append=True)
+        ids = []
+        for split, (df_split, first_line) in zip(split_train_valid_test.SPLITS, self.read_splits('hash')):
+            self.assertEqual(first_line, '#metadata')
+            self.assertEqual(list(df_split.columns), ['id', 'value'])
+            self.assertTrue(all(assignment.get(id_, split) == split for id_ in df_split['id']))
+            with open(os.path.join(self.data_dir, f'hash_{split}.csv'), 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            self.assertEqual(lines.count('#metadata'), 1)
+            self.assertEqual(lines.count('id,value'), 1)
+            ids.extend(df_split['id'])
+        self.assertEqual(sorted(ids), sorted(f'id_{i}' for i in range(400)))
+        # Même résultat qu'un split hash de l'ensemble des données
+        pd.concat([df, df_new.iloc[50:]]).to_csv(os.path.join(self.data_dir, 'data_all.csv'), sep=';', index=None)
+        split_train_valid_test.main('data_all.csv', 'hash', 60, 30, 10, sep=';', id_col='id', output_name='hash_all')
+        for (df_split, _), (df_split_all, _) in zip(self.read_splits('hash'), self.read_splits('hash_all')):
+            pd.testing.assert_frame_equal(df_split, df_split_all)
+        # Append sans fichiers existants : fichiers créés normalement
+        split_train_valid_test.main('data.csv', 'hash', 60, 30, 10, sep=';', id_col='id', output_name='hash_new', append=True)
+        for split, (df_split, first_line) in zip(split_train_valid_test.SPLITS, self.read_splits('hash_new')):
+            self.assertEqual(first_line, '#metadata')
+            self.assertEqual(sorted(df_split['id']), sorted(id_ for id_, id_split in assignment.items() if id_split == split))
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            split_train_valid_test.main('data.csv', 'hash', 60, 30, 10, sep=';')
+        with self.assertRaises(ValueError):
+            split_train_valid_test.main('data.csv', 'hash', 60, 30, 10, sep=';', id_col='toto', output_name='error')
+        # Append à des fichiers avec d'autres colonnes : erreur, fichiers existants inchangés
+        df.rename(columns={'value': 'other'}).to_csv(os.path.join(self.data_dir, 'other.csv'), sep=';', index=None)
+        contents = []
+        for split in split_train_valid_test.SPLITS:
+            with open(os.path.join(self.data_dir, f'hash_{split}.csv'), 'r', encoding='utf-8') as f:
+                contents.append(f.read())
+        with self.assertRaises(ValueError):
+            split_train_valid_test.main('other.csv', 'hash', 60, 30, 10, sep=';', id_col='id', output_name='hash', append=True)
+        for split, content in zip(split_train_valid_test.SPLITS, contents):
+            with open(os.path.join(self.data_dir, f'hash_{split}.csv'), 'r', encoding='utf-8') as f:
+                self.assertEqual(f.read(), content)
+        self.assertEqual([f for f in os.listdir(self.data_dir) if f.startswith('error') or f.endswith('.tmp')], [])
+
+
+# Execution des tests
+if __name__ == '__main__':
+    # Start tests
+    unittest.main()
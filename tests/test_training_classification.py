@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+# Libs unittest
+import unittest
+from unittest.mock import patch
+from unittest.mock import Mock
+
+# Utils libs
+import os
+import shutil
+import importlib.util
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer
+from ynov import utils
+from ynov.monitoring import instrumentation, memory_tracker
+
+# Disable logging
+import logging
+logging.disable(logging.CRITICAL)
+
+
+def remove_dir(path):
+    if os.path.isdir(path): shutil.rmtree(path)
+
+
+def load_script(filename):
+    '''Import d'un script de ynov-scripts (nom de fichier non importable directement)'''
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ynov-scripts', filename)
+    spec = importlib.util.spec_from_file_location(os.path.splitext(filename)[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+training_classification = load_script('3_training_classification.py')
+
+
+class TrainingClassificationTests(unittest.TestCase):
+    '''Main class to test all functions in 3_training_classification.py'''
+
+
+    def setUp(self):
+        '''SetUp fonction'''
+        # On se place dans le bon répertoire
+        # Change directory to script directory
+        abspath = os.path.abspath(__file__)
+        dname = os.path.dirname(abspath)
+        os.chdir(dname)
+        # Dossier des modèles temporaire
+        self.dir_path = os.path.join(dname, 'test_training_classification')
+        remove_dir(self.dir_path)
+        os.makedirs(self.dir_path)
+        self.old_dir_path = utils.DIR_PATH
+        utils.DIR_PATH = self.dir_path
+
+
+    def tearDown(self):
+        '''tearDown fonction'''
+        utils.DIR_PATH = self.old_dir_path
+        utils.set_float_precision(None)
+        instrumentation.disable()
+        instrumentation.reset()
+        memory_tracker.disable()
+        memory_tracker.reset()
+        remove_dir(self.dir_path)
+
+
+    @patch.object(training_classification, 'ModelLogger', return_value=Mock())
+    def test01_train_models(self, mock_model_logger):
+        '''Test de la fonction 3_training_classification.train_models'''
+        rng = np.random.RandomState(42)
+        x_col = ['col_1', 'col_2']
+        df = pd.DataFrame({'col_1': rng.normal(size=100), 'col_2': rng.normal(size=100)})
+        y = pd.Series(np.where(df['col_1'] > 0, 'a', 'b'))
+        data = {'x_train': df.iloc[:70], 'y_train': y.iloc[:70], 'x_valid': df.iloc[70:], 'y_valid': y.iloc[70:],
+                'series_to_add_train': [], 'series_to_add_valid': []}
+        preprocess_pipeline = ColumnTransformer([('passthrough', 'passthrough', x_col)]).fit(df)
+        model_params = {'x_col': x_col, 'y_col': 'y', 'level_save': 'LOW', 'preprocess_pipeline': preprocess_pipeline, 'multi_label': False}
+        models_config = [
+            {'model_cls': 'model_logistic_regression_classifier.ModelLogisticRegressionClassifier'},
+            {'model_cls': 'model_rf_classifier.ModelRFClassifier', 'params': {'rf_params': {'n_estimators': 5, 'max_depth': 1}}},
+            {'model_cls': 'model_knn_classifier.ModelKNNClassifier', 'params': {'knn_params': {'toto': 1}}},  # Erreur
+        ]
+
+        # Fonctionnement nominal : un dossier par modèle, leaderboard trié par F1-Score, erreurs reportées
+        df_leaderboard = training_classification.train_models(models_config, data, model_params, {'filename': 'toto.csv'})
+        self.assertEqual(df_leaderboard.shape[0], 3)
+        self.assertEqual(list(df_leaderboard['index']), [0, 1, 2])
+        self.assertEqual(list(df_leaderboard['status'][:2]), ['OK', 'OK'])
+        self.assertTrue(df_leaderboard['status'].iloc[2].startswith('ERROR'))
+        self.assertTrue(df_leaderboard['F1-Score'].iloc[0] >= df_leaderboard['F1-Score'].iloc[1])
+        run_dir = os.path.dirname(df_leaderboard['model_dir'].iloc[0])
+        self.assertTrue(os.path.exists(os.path.join(run_dir, 'leaderboard.csv')))
+        for model_dir in df_leaderboard['model_dir'][:2]:
+            self.assertTrue(os.path.exists(os.path.join(model_dir, 'configurations.json')))
+        self.assertFalse(os.path.exists(os.path.join(run_dir, 'shared_data')))
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            training_classification.train_models([{'params': {}}], data, model_params, {})
+        with self.assertRaises(ValueError):
+            training_classification.train_models([{'model_cls': 'model_toto.ModelToto'}], data, model_params, {})
+
+
+    def test02_process_settings(self):
+        '''Test des fonctions 3_training_classification.get_process_settings & apply_process_settings'''
+        # Par défaut
+        settings = training_classification.get_process_settings()
+        self.assertEqual(settings, {'float_precision': None, 'instrumentation': False, 'memory_tracker': None})
+
+        # Paramètres activés (e.g. --float32) : récupérés puis réappliqués (e.g. dans un processus de train_models)
+        utils.set_float_precision('float32')
+        instrumentation.enable()
+        memory_tracker.enable(trace_allocations=False, sampling_interval=0.05)
+        settings = training_classification.get_process_settings()
+        self.assertEqual(settings, {'float_precision': 'float32', 'instrumentation': True,
+                                    'memory_tracker': {'trace_allocations': False, 'sampling_interval': 0.05}})
+        utils.set_float_precision(None)
+        instrumentation.disable()
+        memory_tracker.disable()
+        training_classification.apply_process_settings(settings)
+        self.assertEqual(utils.FLOAT_PRECISION, 'float32')
+        self.assertTrue(instrumentation.is_enabled())
+        self.assertTrue(memory_tracker.is_enabled())
+        self.assertEqual(memory_tracker.get_settings(), {'trace_allocations': False, 'sampling_interval': 0.05})
+
+        # Appliqués au début de train_model_task
+        utils.set_float_precision(None)
+        task = {'index': 0, 'model_config': {'model_cls': 'model_toto.ModelToto'}, 'model_dir': self.dir_path,
+                'model_params': {}, 'json_data': {}, 'kwargs': {}, 'settings': settings}
+        row = training_classification.train_model_task(task, {})
+        self.assertTrue(row['status'].startswith('ERROR'))
+        self.assertEqual(utils.FLOAT_PRECISION, 'float32')
+
+
+# Execution des tests
+if __name__ == '__main__':
+    # Start tests
+    unittest.main()
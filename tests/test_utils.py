@@ -10,6 +10,7 @@ import os
 import shutil
 import pandas as pd
 import numpy as np
+from scipy import sparse
 from ynov import utils
 
 # Disable logging
@@ -249,6 +250,166 @@ class UtilsTests(unittest.TestCase):
         self.assertEqual(flattened_list, expected_result)
 
 
+    def test12_read_npz(self):
+        '''Test de la fonction utils.read_npz'''
+        # Data
+        x = sparse.csr_matrix(np.array([[0, 1.5, 0], [0, 0, 0], [2, 0, 3]]))
+        columns = ['col1', 'col2', 'col3']
+        df_y = pd.DataFrame({'y_str': ['a', 'b', 'c'], 'y_int': [0, 1, 1]})
+        fake_filepath = 'fake_npz.npz'
+        if os.path.exists(fake_filepath):
+            os.remove(fake_filepath)
+
+        # Fonctionnement nominal
+        utils.to_npz(x, fake_filepath, columns, first_line='#preprocess_P1', df_y=df_y)
+        reloaded_x, reloaded_columns, reloaded_df_y, first_line = utils.read_npz(fake_filepath)
+        self.assertTrue(sparse.isspmatrix_csr(reloaded_x))
+        np.testing.assert_array_equal(reloaded_x.toarray(), x.toarray())
+        self.assertEqual(reloaded_columns, columns)
+        pd.testing.assert_frame_equal(reloaded_df_y, df_y)
+        self.assertEqual(first_line, '#preprocess_P1')
+        # Sans cibles ni première ligne
+        utils.to_npz(x, fake_filepath, columns)
+        _, _, reloaded_df_y, first_line = utils.read_npz(fake_filepath)
+        self.assertEqual(reloaded_df_y, None)
+        self.assertEqual(first_line, None)
+
+        # Vérification des erreurs
+        with self.assertRaises(ValueError):
+            utils.read_npz('test_dataset.csv')
+        with self.assertRaises(FileNotFoundError):
+            utils.read_npz('toto.npz')
+
+        # Clear
+        if os.path.exists(fake_filepath):
+            os.remove(fake_filepath)
+
+
+    def test13_to_npz(self):
+        '''Test de la fonction utils.to_npz'''
+        # Data
+        x = np.array([[0, 1.5, 0], [0, 0, 0], [2, 0, 3]])
+        fake_filepath = 'fake_npz.npz'
+        if os.path.exists(fake_filepath):
+            os.remove(fake_filepath)
+
+        # Fonctionnement nominal (array-like -> CSR, colonnes non str -> str)
+        utils.to_npz(x, fake_filepath, [0, 1, 2], compressed=False)
+        self.assertTrue(os.path.exists(fake_filepath))
+        reloaded_x, reloaded_columns, _, _ = utils.read_npz(fake_filepath)
+        self.assertEqual(reloaded_x.nnz, 3)
+        np.testing.assert_array_equal(reloaded_x.toarray(), x)
+        self.assertEqual(reloaded_columns, ['0', '1', '2'])
+
+        # Vérification des erreurs
+        with self.assertRaises(ValueError):
+            utils.to_npz(x, 'fake_npz.csv', [0, 1, 2])
+        with self.assertRaises(ValueError):
+            utils.to_npz(x, fake_filepath, [0, 1])
+        with self.assertRaises(ValueError):
+            utils.to_npz(x, fake_filepath, [0, 1, 2], df_y=pd.DataFrame({'y': [0, 1]}))
+
+        # Clear
+        if os.path.exists(fake_filepath):
+            os.remove(fake_filepath)
+
+
+    def test14_set_float_precision(self):
+        '''Test des fonctions utils.set_float_precision & utils.get_float_dtype'''
+        try:
+            # Fonctionnement nominal
+            self.assertEqual(utils.get_float_dtype(), None)
+            utils.set_float_precision('float32')
+            self.assertEqual(utils.FLOAT_PRECISION, 'float32')
+            self.assertEqual(utils.get_float_dtype(), np.float32)
+            utils.set_float_precision('float64')
+            self.assertEqual(utils.get_float_dtype(), np.float64)
+            utils.set_float_precision(None)
+            self.assertEqual(utils.get_float_dtype(), None)
+
+            # Vérification du type du/des input(s)
+            with self.assertRaises(ValueError):
+                utils.set_float_precision('float16')
+        finally:
+            utils.set_float_precision(None)
+
+    def test15_cast_float_precision(self):
+        '''Test de la fonction utils.cast_float_precision'''
+        df = pd.DataFrame({'a': [1.5, 2.5], 'b': [1, 2], 'c': ['x', 'y'], 'd': [True, False]})
+        x = np.array([[1.5, 2.0], [0.0, 3.0]])
+        x_sparse = sparse.csr_matrix(x)
+        try:
+            # Pas de précision définie -> pas de conversion (mêmes objets)
+            self.assertTrue(utils.cast_float_precision(df) is df)
+            self.assertTrue(utils.cast_float_precision(x) is x)
+
+            # float32
+            utils.set_float_precision('float32')
+            new_df = utils.cast_float_precision(df)
+            self.assertEqual(new_df['a'].dtype, np.float32)
+            self.assertEqual(new_df['b'].dtype, np.float32)
+            self.assertEqual(new_df['c'].dtype, object)
+            self.assertEqual(new_df['d'].dtype, bool)
+            self.assertEqual(df['a'].dtype, np.float64) # Original non modifié
+            self.assertEqual(utils.cast_float_precision(x).dtype, np.float32)
+            self.assertEqual(utils.cast_float_precision(x_sparse).dtype, np.float32)
+            self.assertEqual(utils.cast_float_precision(pd.Series([1, 2])).dtype, np.float32)
+            # Déjà au bon type -> pas de copie
+            x_32 = x.astype(np.float32)
+            self.assertTrue(utils.cast_float_precision(x_32) is x_32)
+            new_df_32 = df[['a']].astype(np.float32)
+            self.assertTrue(utils.cast_float_precision(new_df_32) is new_df_32)
+        finally:
+            utils.set_float_precision(None)
+
+    def test16_downcast_df(self):
+        '''Test de la fonction utils.downcast_df'''
+        df = pd.DataFrame({'float': [1.5, 2.5, 3.5, 4.5], 'int': [1, 2, 300, 4], 'cat': ['a', 'b', 'a', 'a'],
+                           'text': ['w', 'x', 'y', 'z'], 'list': [['a'], ['b'], [], ['a']], 'bool': [True, False, True, True]})
+
+        # Fonctionnement nominal
+        new_df = utils.downcast_df(df)
+        self.assertEqual(new_df['float'].dtype, np.float32)
+        self.assertEqual(new_df['int'].dtype, np.int16)
+        self.assertEqual(new_df['cat'].dtype, 'category')
+        self.assertEqual(new_df['text'].dtype, object) # Trop de valeurs différentes
+        self.assertEqual(new_df['list'].dtype, object)
+        self.assertEqual(new_df['bool'].dtype, bool)
+        self.assertEqual(list(new_df['int']), [1, 2, 300, 4])
+        self.assertEqual(df['float'].dtype, np.float64) # Original non modifié
+        self.assertLess(new_df[['float', 'int', 'cat']].memory_usage(deep=True).sum(), df[['float', 'int', 'cat']].memory_usage(deep=True).sum())
+
+        # Fonctionnement arguments
+        new_df = utils.downcast_df(df, categorical=False)
+        self.assertEqual(new_df['cat'].dtype, object)
+        new_df = utils.downcast_df(df, max_category_ratio=1.0)
+        self.assertEqual(new_df['text'].dtype, 'category')
+
+        # Fonctionnement read_csv
+        fake_filepath = 'fake_downcast.csv'
+        df.drop('list', axis=1).to_csv(fake_filepath, index=False)
+        try:
+            reloaded_df, _ = utils.read_csv(fake_filepath)
+            self.assertEqual(reloaded_df['float'].dtype, np.float64)
+            reloaded_df, _ = utils.read_csv(fake_filepath, downcast=True)
+            self.assertEqual(reloaded_df['float'].dtype, np.float32)
+            self.assertEqual(reloaded_df['cat'].dtype, 'category')
+            # Précision globale float32 -> réduction par défaut
+            utils.set_float_precision('float32')
+            reloaded_df, _ = utils.read_csv(fake_filepath)
+            self.assertEqual(reloaded_df['float'].dtype, np.float32)
+            # Par chunks -> pas de catégories
+            chunks, _ = utils.read_csv(fake_filepath, chunksize=2)
+            chunks = list(chunks)
+            self.assertEqual(len(chunks), 2)
+            self.assertEqual(chunks[0]['float'].dtype, np.float32)
+            self.assertEqual(chunks[0]['cat'].dtype, object)
+        finally:
+            utils.set_float_precision(None)
+            if os.path.exists(fake_filepath):
+                os.remove(fake_filepath)
+
+
 # Execution des tests
 if __name__ == '__main__':
     # Start tests
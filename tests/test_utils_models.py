@@ -10,6 +10,8 @@ import os
 import shutil
 import dill as pickle
 import numpy as np
+from scipy import sparse
+from sklearn.metrics import f1_score
 import pandas as pd
 from sklearn.pipeline import Pipeline, make_pipeline
 from sklearn.compose import ColumnTransformer, make_column_transformer, make_column_selector
@@ -20,8 +22,8 @@ from sklearn.impute import SimpleImputer
 from sklearn.exceptions import NotFittedError
 from ynov import utils
 from ynov.models_training import utils_models
-from ynov.models_training.classifiers import model_rf_classifier, model_dense_classifier, model_xgboost_classifier
-from ynov.models_training.regressors import model_rf_regressor, model_dense_regressor, model_xgboost_regressor
+from ynov.models_training.classifiers import model_rf_classifier, model_xgboost_classifier
+from ynov.models_training.regressors import model_rf_regressor, model_xgboost_regressor
 from ynov.preprocessing import preprocess
 
 # Disable logging
@@ -33,6 +35,11 @@ def remove_dir(path):
     if os.path.isdir(path): shutil.rmtree(path)
 
 
+def sum_shared_data(task, data):
+    # Tâche de test pour run_on_shared_data (doit être picklable)
+    return task * float(data['x'].sum().sum() + data['y'].sum()), isinstance(data['y'].values, np.memmap)
+
+
 class UtilsModelsTests(unittest.TestCase):
     '''Main class to test all functions in utils_models.py'''
 
@@ -145,6 +152,15 @@ class UtilsModelsTests(unittest.TestCase):
         self.assertEqual(sorted(classes), sorted(subset_classes))
         pd.testing.assert_frame_equal(df_mlb, df_subset_expected, check_dtype=False)
 
+        # Fonctionnement sparse_output
+        y_mlb, classes = utils_models.preprocess_model_multilabel(df, 'y_col', sparse_output=True)
+        self.assertTrue(sparse.isspmatrix_csr(y_mlb))
+        self.assertEqual(sorted(classes), ['x1', 'x2', 'x3', 'x4'])
+        np.testing.assert_array_equal(y_mlb.toarray(), df_expected[classes].values)
+        y_mlb, classes = utils_models.preprocess_model_multilabel(df, 'y_col', classes=subset_classes, sparse_output=True)
+        self.assertEqual(classes, subset_classes)
+        np.testing.assert_array_equal(y_mlb.toarray(), df_subset_expected[subset_classes].values)
+
         # Vérification du type du/des input(s)
         with self.assertRaises(TypeError):
             utils_models.preprocess_model_multilabel(df, [42])
@@ -209,9 +225,6 @@ class UtilsModelsTests(unittest.TestCase):
         y_train_regression = pd.Series([-3, -2, -8, 5, 6, 5])
         model_dir = os.path.join(utils.get_models_path(), 'test_model')
         model_name = 'test_model_name'
-        batch_size = 8
-        epochs = 3
-        patience = 5
         early_stopping_rounds = 3
 
         ####################################################
@@ -262,68 +275,6 @@ class UtilsModelsTests(unittest.TestCase):
 
         ####################################################
 
-        # Tests sur un fake model - Dense classifier
-        remove_dir(model_dir)
-        model = model_dense_classifier.ModelDenseClassifier(model_dir=model_dir, model_name=model_name,
-                                                            batch_size=batch_size, epochs=epochs, patience=patience)
-        model.fit(x_train, y_train_classification)
-        model.save()
-
-        # Reload
-        new_model, new_config = utils_models.load_model(model_dir='test_model')
-        # On fait qqs tests
-        self.assertEqual(new_config['model_name'], model_name)
-        self.assertEqual(new_config['batch_size'], batch_size)
-        self.assertEqual(new_config['epochs'], epochs)
-        self.assertEqual(new_config['patience'], patience)
-        self.assertEqual(new_model.model_name, model_name)
-        self.assertEqual(list(new_model.predict(x_test)), list(model.predict(x_test)))
-        self.assertEqual([list(_) for _ in new_model.predict_proba(x_test)], [list(_) for _ in model.predict_proba(x_test)])
-
-        # Pareil, mais avec chemin
-        new_model, new_config = utils_models.load_model(model_dir=model_dir, is_path=True)
-        # On fait qqs tests
-        self.assertEqual(new_config['model_name'], model_name)
-        self.assertEqual(new_config['batch_size'], batch_size)
-        self.assertEqual(new_config['epochs'], epochs)
-        self.assertEqual(new_config['patience'], patience)
-        self.assertEqual(new_model.model_name, model_name)
-        self.assertEqual(list(new_model.predict(x_test)), list(model.predict(x_test)))
-        self.assertEqual([list(_) for _ in new_model.predict_proba(x_test)], [list(_) for _ in model.predict_proba(x_test)])
-        remove_dir(model_dir)
-
-        ####################################################
-
-        # Tests sur un fake model - Dense regressor
-        remove_dir(model_dir)
-        model = model_dense_regressor.ModelDenseRegressor(model_dir=model_dir, model_name=model_name,
-                                                          batch_size=batch_size, epochs=epochs, patience=patience)
-        model.fit(x_train, y_train_regression)
-        model.save()
-
-        # Reload
-        new_model, new_config = utils_models.load_model(model_dir='test_model')
-        # On fait qqs tests
-        self.assertEqual(new_config['model_name'], model_name)
-        self.assertEqual(new_config['batch_size'], batch_size)
-        self.assertEqual(new_config['epochs'], epochs)
-        self.assertEqual(new_config['patience'], patience)
-        self.assertEqual(new_model.model_name, model_name)
-        self.assertEqual(list(new_model.predict(x_test)), list(model.predict(x_test)))
-
-        # Pareil, mais avec chemin
-        new_model, new_config = utils_models.load_model(model_dir=model_dir, is_path=True)
-        # On fait qqs tests
-        self.assertEqual(new_config['model_name'], model_name)
-        self.assertEqual(new_config['batch_size'], batch_size)
-        self.assertEqual(new_config['epochs'], epochs)
-        self.assertEqual(new_config['patience'], patience)
-        self.assertEqual(new_model.model_name, model_name)
-        self.assertEqual(list(new_model.predict(x_test)), list(model.predict(x_test)))
-        remove_dir(model_dir)
-
-        ####################################################
-
         # Tests sur un fake model - XGboost classifier
         remove_dir(model_dir)
         model = model_xgboost_classifier.ModelXgboostClassifier(model_dir=model_dir, model_name=model_name,
@@ -465,6 +416,20 @@ class UtilsModelsTests(unittest.TestCase):
         with self.assertRaises(ValueError):
             preprocessed_df2 = utils_models.apply_pipeline(new_X, pipeline2)
 
+        # Sortie sparse -> CSR & colonnes à part, sans densifier
+        pipeline_sparse = ColumnTransformer([('cat', cat_pipeline, ['Pclass', 'Sex', 'Embarked']), ('text', CountVectorizer(), 'Name')],
+                                            remainder='drop', sparse_threshold=1.0)
+        pipeline_sparse.fit(X, y)
+        preprocessed_x, columns = utils_models.apply_pipeline(X, pipeline_sparse, sparse_output=True)
+        self.assertTrue(sparse.isspmatrix_csr(preprocessed_x))
+        self.assertEqual(preprocessed_x.shape[1], len(columns))
+        self.assertEqual(columns[:3], ['Pclass_1', 'Pclass_2', 'Pclass_3'])
+        np.testing.assert_array_equal(preprocessed_x.toarray(), pipeline_sparse.transform(X).toarray())
+        # Sortie dense -> CSR aussi
+        preprocessed_x, columns = utils_models.apply_pipeline(X, pipeline1, sparse_output=True)
+        self.assertTrue(sparse.isspmatrix_csr(preprocessed_x))
+        self.assertEqual(preprocessed_x.shape, (100, 17))
+
 
     def test10_predict(self):
         '''Test de la fonction ynov.models_training.utils_models.predict'''
@@ -801,6 +766,238 @@ class UtilsModelsTests(unittest.TestCase):
             model = utils_models.search_hp_cv_classifier(model_cls, model_params_mono, hp_params, 'accuracy', kwargs_fit_mono, n_splits=1)
 
 
+    def test13_get_xgboost_fit_data(self):
+        '''Test de la fonction utils_models.get_xgboost_fit_data'''
+
+        # Set vars
+        x_train = pd.DataFrame({'col_1': np.arange(100, dtype=float), 'col_2': np.arange(100, dtype=float) * 2})
+        y_train = pd.Series(np.arange(100) % 2)
+        x_valid = x_train.iloc[:10]
+        y_valid = y_train.iloc[:10]
+
+        # Avec jeu de validation, sans shuffle -> pas de copie
+        x, y, eval_set = utils_models.get_xgboost_fit_data(x_train, y_train, x_valid=x_valid, y_valid=y_valid, with_shuffle=False)
+        self.assertEqual(type(x), np.ndarray)
+        self.assertTrue(np.shares_memory(x, x_train.to_numpy()))
+        np.testing.assert_array_equal(x, x_train.to_numpy())
+        np.testing.assert_array_equal(y, y_train.to_numpy())
+        self.assertEqual(len(eval_set), 1)
+        np.testing.assert_array_equal(eval_set[0][0], x_valid.to_numpy())
+        np.testing.assert_array_equal(eval_set[0][1], y_valid.to_numpy())
+        # Avec shuffle -> x & y mélangés de la même façon
+        x, y, eval_set = utils_models.get_xgboost_fit_data(x_train, y_train, x_valid=x_valid, y_valid=y_valid, with_shuffle=True)
+        self.assertEqual(sorted(x[:, 0].tolist()), x_train['col_1'].tolist())
+        np.testing.assert_array_equal(y, x[:, 0].astype(int) % 2)
+        # Sans jeu de validation -> split
+        x, y, eval_set = utils_models.get_xgboost_fit_data(x_train, y_train, validation_split=0.2)
+        self.assertEqual(x.shape, (80, 2))
+        self.assertEqual(eval_set[0][0].shape, (20, 2))
+        self.assertEqual(sorted(x[:, 0].tolist() + eval_set[0][0][:, 0].tolist()), x_train['col_1'].tolist())
+        np.testing.assert_array_equal(y, x[:, 0].astype(int) % 2)
+        # Evaluation du train (sous-échantillon), la validation toujours en dernier
+        x, y, eval_set = utils_models.get_xgboost_fit_data(x_train, y_train, x_valid=x_valid, y_valid=y_valid, eval_train_size=0.5)
+        self.assertEqual(len(eval_set), 2)
+        self.assertEqual(eval_set[0][0].shape, (50, 2))
+        np.testing.assert_array_equal(eval_set[0][1], eval_set[0][0][:, 0].astype(int) % 2)
+        np.testing.assert_array_equal(eval_set[1][0], x_valid.to_numpy())
+        x, y, eval_set = utils_models.get_xgboost_fit_data(x_train, y_train, x_valid=x_valid, y_valid=y_valid, eval_train_size=30)
+        self.assertEqual(eval_set[0][0].shape, (30, 2))
+        # Train complet -> mêmes objets
+        x, y, eval_set = utils_models.get_xgboost_fit_data(x_train, y_train, x_valid=x_valid, y_valid=y_valid, eval_train_size=1.0)
+        self.assertTrue(eval_set[0][0] is x)
+        # Multi label
+        y_train_multi = pd.DataFrame({'y1': np.arange(100) % 2, 'y2': np.arange(100) % 3 == 0}).astype(int)
+        x, y, eval_set = utils_models.get_xgboost_fit_data(x_train, y_train_multi)
+        self.assertEqual(y.shape, (80, 2))
+        self.assertEqual(eval_set[0][1].shape, (20, 2))
+        # Sparse -> reste CSR (pas de densification)
+        x_train_sparse = sparse.csc_matrix(x_train.to_numpy())
+        x, y, eval_set = utils_models.get_xgboost_fit_data(x_train_sparse, y_train, x_valid=sparse.csr_matrix(x_valid.to_numpy()),
+                                                           y_valid=y_valid, eval_train_size=0.5)
+        self.assertTrue(sparse.isspmatrix_csr(x))
+        self.assertEqual(sorted(x[:, 0].toarray().ravel().tolist()), x_train['col_1'].tolist())
+        np.testing.assert_array_equal(y, x[:, 0].toarray().ravel().astype(int) % 2)
+        self.assertTrue(sparse.isspmatrix_csr(eval_set[0][0]))
+        self.assertEqual(eval_set[0][0].shape, (50, 2))
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            utils_models.get_xgboost_fit_data(x_train, y_train, eval_train_size=0.)
+        with self.assertRaises(ValueError):
+            utils_models.get_xgboost_fit_data(x_train, y_train, eval_train_size=1.5)
+        with self.assertRaises(ValueError):
+            utils_models.get_xgboost_fit_data(x_train, y_train, eval_train_size=0)
+        with self.assertRaises(ValueError):
+            utils_models.get_xgboost_fit_data(x_train, y_train, eval_train_size='toto')
+
+
+    @patch('joblib.cpu_count', return_value=8)
+    def test14_balance_n_jobs(self, mock_cpu_count):
+        '''Test de la fonction utils_models.balance_n_jobs'''
+        # Séquentiel -> tous les coeurs pour chaque tâche
+        self.assertEqual(utils_models.balance_n_jobs(100), (1, 8))
+        # Tous les coeurs -> répartis entre les tâches
+        self.assertEqual(utils_models.balance_n_jobs(100, n_jobs=-1), (8, 1))
+        self.assertEqual(utils_models.balance_n_jobs(100, n_jobs=4), (4, 2))
+        self.assertEqual(utils_models.balance_n_jobs(100, n_jobs=-5), (4, 2))
+        self.assertEqual(utils_models.balance_n_jobs(100, n_jobs=-20), (1, 8))
+        # Pas plus de jobs que de tâches
+        self.assertEqual(utils_models.balance_n_jobs(3, n_jobs=-1), (3, 2))
+        # Threads par tâche imposés
+        self.assertEqual(utils_models.balance_n_jobs(100, n_jobs=-1, inner_n_jobs=2), (4, 2))
+        self.assertEqual(utils_models.balance_n_jobs(100, n_jobs=2, inner_n_jobs=2), (2, 2))
+        self.assertEqual(utils_models.balance_n_jobs(100, n_jobs=-1, inner_n_jobs=4), (2, 4))
+        self.assertEqual(utils_models.balance_n_jobs(100, n_jobs=-1, inner_n_jobs=16), (1, 16))
+        self.assertEqual(utils_models.balance_n_jobs(100, n_jobs=2, inner_n_jobs=-1), (2, 4))
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            utils_models.balance_n_jobs(0)
+        with self.assertRaises(ValueError):
+            utils_models.balance_n_jobs(10, n_jobs=0)
+
+
+    def test15_get_one_hot_probas(self):
+        '''Test de la fonction utils_models.get_one_hot_probas'''
+        # Classes str
+        probas = utils_models.get_one_hot_probas(np.array(['b', 'a', 'c', 'b']), ['a', 'b', 'c'])
+        np.testing.assert_array_equal(probas, np.array([[0., 1., 0.], [1., 0., 0.], [0., 0., 1.], [0., 1., 0.]]))
+        # Classes int, liste
+        probas = utils_models.get_one_hot_probas([2, 0], [0, 1, 2])
+        np.testing.assert_array_equal(probas, np.array([[0., 0., 1.], [1., 0., 0.]]))
+        # Vide
+        self.assertEqual(utils_models.get_one_hot_probas(np.array([]), ['a', 'b']).shape, (0, 2))
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            utils_models.get_one_hot_probas(np.array(['a', 'd']), ['a', 'b', 'c'])
+
+
+    def test16_indicators_to_tuples(self):
+        '''Test de la fonction utils_models.indicators_to_tuples'''
+        indicators = np.array([[0, 0, 1], [1, 1, 0], [0, 0, 0]])
+        probas = np.array([[0.1, 0.2, 0.7], [0.6, 0.8, 0.3], [0.1, 0.1, 0.1]])
+        # Classes
+        self.assertEqual(utils_models.indicators_to_tuples(indicators, ['a', 'b', 'c']), [('c',), ('a', 'b'), ()])
+        # Probas (valeurs par ligne)
+        self.assertEqual(utils_models.indicators_to_tuples(indicators, probas), [(0.7,), (0.6, 0.8), ()])
+        # Sparse, avec un zéro explicite
+        sparse_indicators = sparse.csr_matrix(indicators)
+        sparse_indicators.data[0] = 0
+        self.assertEqual(utils_models.indicators_to_tuples(sparse_indicators, ['a', 'b', 'c']), [(), ('a', 'b'), ()])
+        # Vide
+        self.assertEqual(utils_models.indicators_to_tuples(np.zeros((0, 3)), ['a', 'b', 'c']), [])
+
+
+    def test17_get_optimal_thresholds(self):
+        '''Test de la fonction utils_models.get_optimal_thresholds'''
+        y_true = np.array([[1, 0, 0, 1], [1, 1, 0, 1], [0, 1, 0, 1], [0, 0, 0, 1]])
+        y_proba = np.array([[0.9, 0.5, 0.1, 0.2], [0.7, 0.5, 0.2, 0.3], [0.4, 0.5, 0.3, 0.4], [0.1, 0.2, 0.4, 0.5]])
+        thresholds = utils_models.get_optimal_thresholds(y_true, y_proba)
+        # Label 1 : coupure entre 0.7 et 0.4 ; label 2 : ex-aequo à 0.5, coupure entre 0.5 et 0.2
+        # Label 3 : pas de positif -> seuil par défaut ; label 4 : tout positif -> 0
+        np.testing.assert_almost_equal(thresholds, np.array([0.55, 0.35, 0.5, 0.]))
+        # Même résultat en sparse, par blocs de colonnes, et même F1 qu'une recherche exhaustive
+        np.testing.assert_almost_equal(utils_models.get_optimal_thresholds(sparse.csr_matrix(y_true), y_proba, max_block_size=4), thresholds)
+        rng = np.random.RandomState(42)
+        y_proba = rng.rand(200, 3).round(2)
+        y_true = (rng.rand(200, 3) < y_proba).astype(int)
+        thresholds = utils_models.get_optimal_thresholds(y_true, y_proba)
+        for i in range(3):
+            best_f1 = max(f1_score(y_true[:, i], y_proba[:, i] >= threshold) for threshold in np.unique(y_proba[:, i]))
+            self.assertAlmostEqual(f1_score(y_true[:, i], y_proba[:, i] >= thresholds[i]), best_f1)
+        # Vide
+        np.testing.assert_almost_equal(utils_models.get_optimal_thresholds(np.zeros((0, 2)), np.zeros((0, 2))), np.array([0.5, 0.5]))
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            utils_models.get_optimal_thresholds(np.zeros((2, 2)), np.zeros((2, 3)))
+        with self.assertRaises(ValueError):
+            utils_models.get_optimal_thresholds(np.zeros((2, 2)), -np.ones((2, 2)))
+
+
+    def test18_get_model_class(self):
+        '''Test de la fonction utils_models.get_model_class'''
+        self.assertEqual(utils_models.get_model_class('model_rf_classifier.ModelRFClassifier'), model_rf_classifier.ModelRFClassifier)
+        self.assertEqual(utils_models.get_model_class('model_rf_regressor.ModelRFRegressor'), model_rf_regressor.ModelRFRegressor)
+        self.assertEqual(utils_models.get_model_class('regressors.model_rf_regressor.ModelRFRegressor'), model_rf_regressor.ModelRFRegressor)
+
+        # Manage errors
+        with self.assertRaises(ValueError):
+            utils_models.get_model_class('ModelRFClassifier')
+        with self.assertRaises(ValueError):
+            utils_models.get_model_class('model_toto.ModelToto')
+        with self.assertRaises(ValueError):
+            utils_models.get_model_class('model_rf_classifier.ModelToto')
+        with self.assertRaises(ValueError):
+            utils_models.get_model_class('classifiers.model_rf_regressor.ModelRFRegressor')
+
+
+    def test19_shared_data(self):
+        '''Test des fonctions utils_models.dump_shared_data, utils_models.load_shared_data & utils_models.run_on_shared_data'''
+        folder = os.path.join(os.getcwd(), 'test_shared_data')
+        remove_dir(folder)
+        x = pd.DataFrame({'a': np.arange(10.), 'b': np.arange(10.) * 2})
+        y = pd.Series(np.arange(10))
+        x_sparse = sparse.random(10, 4, density=0.3, format='csr', random_state=42)
+
+        # dump & load : données identiques, arrays memory-mapped
+        paths = utils_models.dump_shared_data({'x': x, 'y': y, 'x_sparse': x_sparse}, folder)
+        self.assertEqual(sorted(paths.keys()), ['x', 'x_sparse', 'y'])
+        data = utils_models.load_shared_data(paths)
+        pd.testing.assert_frame_equal(data['x'], x)
+        np.testing.assert_array_equal(data['y'].values, y.values)
+        self.assertTrue(data['y'].index.equals(y.index))
+        self.assertEqual((data['x_sparse'] != x_sparse).nnz, 0)
+        self.assertTrue(isinstance(data['y'].values, np.memmap))
+        del data
+        remove_dir(folder)
+
+        # run_on_shared_data : résultats dans l'ordre des tâches, dossier supprimé à la fin
+        results = utils_models.run_on_shared_data(sum_shared_data, [1, 2, 3], {'x': x, 'y': y}, n_jobs=2, folder=folder)
+        self.assertEqual([result[0] for result in results], [180., 360., 540.])
+        self.assertTrue(all(result[1] for result in results))
+        self.assertFalse(os.path.exists(folder))
+        self.assertEqual(utils_models.run_on_shared_data(sum_shared_data, [], {'x': x, 'y': y}), [])
+
+
+    def test20_get_pipeline_fingerprint(self):
+        '''Test de la fonction utils_models.get_pipeline_fingerprint'''
+        df = pd.DataFrame({'a': np.arange(10.), 'b': np.arange(10.) * 2})
+        pipeline = ColumnTransformer([('scaler', StandardScaler(), ['a', 'b'])])
+        pipeline.fit(df)
+        fingerprint = utils_models.get_pipeline_fingerprint(pipeline)
+        self.assertEqual(type(fingerprint), str)
+
+        # Même pipeline après sauvegarde / chargement -> même empreinte
+        reloaded_pipeline = pickle.loads(pickle.dumps(pipeline))
+        self.assertEqual(utils_models.get_pipeline_fingerprint(reloaded_pipeline), fingerprint)
+
+        # Même définition, mais fit sur d'autres données -> empreinte différente
+        other_pipeline = ColumnTransformer([('scaler', StandardScaler(), ['a', 'b'])])
+        other_pipeline.fit(df * 2)
+        self.assertNotEqual(utils_models.get_pipeline_fingerprint(other_pipeline), fingerprint)
+
+        # Pas de pipeline
+        self.assertEqual(utils_models.get_pipeline_fingerprint(None), None)
+
+
+    def test21_get_target_columns(self):
+        '''Test des fonctions utils_models.get_target_columns & utils_models.get_target_column'''
+        y = np.array([[0, 1, 1], [1, 0, 1], [0, 0, 1], [1, 1, 0]])
+        # Dense
+        y_dense = utils_models.get_target_columns(pd.DataFrame(y))
+        self.assertEqual(type(y_dense), np.ndarray)
+        np.testing.assert_array_equal(utils_models.get_target_column(y_dense, 1), y[:, 1])
+        # Sparse -> CSC, seule la colonne du label est densifiée
+        y_sparse = utils_models.get_target_columns(sparse.csr_matrix(y))
+        self.assertTrue(sparse.isspmatrix_csc(y_sparse))
+        for i in range(3):
+            column = utils_models.get_target_column(y_sparse, i)
+            self.assertEqual(column.shape, (4,))
+            np.testing.assert_array_equal(column, y[:, i])
+
+
 # Execution des tests
 if __name__ == '__main__':
     # Start tests
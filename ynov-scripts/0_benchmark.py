@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+## Benchmark des performances (temps & mémoire) sur données synthétiques
+# Auteurs : Agence dataservices
+# Date : 19/10/2026
+#
+# Ex: poetry run python 0_benchmark.py -n 10000 --n_classes 3 -m rf_classifier rf_regressor
+# Ex: poetry run python 0_benchmark.py --save_baseline
+#
+# Le rapport est sauvegardé dans ynov-data/benchmarks.
+# Les résultats sont comparés à la baseline et le script échoue en cas de régression.
+# Sans baseline (ou avec une baseline lancée avec d'autres paramètres), le script échoue, sauf avec --allow_no_baseline.
+
+import os
+import logging
+import argparse
+import pandas as pd
+from datetime import datetime
+
+from ynov import utils
+from ynov.monitoring import benchmark
+
+# Get logger
+logger = logging.getLogger('ynov.0_benchmark')
+
+
+def main(n_rows: int = 10000, n_num_cols: int = 10, n_cat_cols: int = 2, n_classes: int = 2, seed: int = 42,
+         models: list = None, with_search_hp: bool = True, track_memory: bool = True, baseline_path: str = None,
+         save_baseline: bool = False, allow_no_baseline: bool = False, time_tolerance: float = 0.25, memory_tolerance: float = 0.25):
+    '''Fonction principale pour lancer le benchmark
+
+    Kwargs:
+        n_rows (int): nombre de lignes du jeu de données synthétique
+        n_num_cols (int): nombre de colonnes numériques
+        n_cat_cols (int): nombre de colonnes catégorielles
+        n_classes (int): nombre de classes
+        seed (int): graine aléatoire
+        models (list): modèles à benchmarker. Si None, tous les modèles.
+        with_search_hp (bool): si search_hp_cv_classifier doit être benchmarké
+        track_memory (bool): si le pic mémoire doit être mesuré
+        baseline_path (str): chemin de la baseline (par défaut ynov-ressources/benchmark_baseline.json)
+        save_baseline (bool): si les résultats doivent remplacer la baseline
+        allow_no_baseline (bool): si le benchmark peut se terminer sans comparaison (pas de baseline, ou paramètres différents)
+        time_tolerance (float): dégradation relative du temps tolérée
+        memory_tolerance (float): dégradation relative de la mémoire tolérée
+    Raises:
+        FileNotFoundError: si la baseline n'existe pas (sauf si allow_no_baseline)
+        ValueError: si la baseline a été lancée avec d'autres paramètres (sauf si allow_no_baseline)
+        RuntimeError: si au moins une étape est en régression par rapport à la baseline
+    '''
+    logger.info("Lancement du benchmark")
+    if baseline_path is None:
+        baseline_path = os.path.join(utils.get_ressources_path(), 'benchmark_baseline.json')
+    metadata = {
+        'n_rows': n_rows,
+        'n_num_cols': n_num_cols,
+        'n_cat_cols': n_cat_cols,
+        'n_classes': n_classes,
+        'seed': seed,
+        'track_memory': track_memory,
+        'package_version': utils.get_package_version(),
+    }
+
+    # Run
+    df_results = benchmark.run_benchmark(n_rows=n_rows, n_num_cols=n_num_cols, n_cat_cols=n_cat_cols, n_classes=n_classes,
+                                         seed=seed, models=models, with_search_hp=with_search_hp, track_memory=track_memory)
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        logger.info(f"Résultats :\n{df_results.drop('error', axis=1)}")
+
+    # Save report
+    save_dir = os.path.join(utils.get_data_path(), 'benchmarks')
+    report_path = os.path.join(save_dir, datetime.now().strftime("benchmark_%Y_%m_%d-%H_%M_%S.json"))
+    benchmark.save_report(df_results, report_path, metadata=metadata)
+    logger.info(f"Rapport sauvegardé : {report_path}")
+
+    if save_baseline:
+        benchmark.save_report(df_results, baseline_path, metadata=metadata)
+        logger.info(f"Baseline mise à jour : {baseline_path}")
+        return
+
+    # Compare to baseline
+    if not os.path.exists(baseline_path):
+        msg = f"Pas de baseline trouvée ({baseline_path}). Utiliser --save_baseline pour en créer une."
+        if allow_no_baseline:
+            logger.warning(f"{msg} Pas de comparaison.")
+            return
+        raise FileNotFoundError(msg)
+    df_baseline, baseline_metadata = benchmark.load_report(baseline_path)
+    diff_params = {k: (v, baseline_metadata.get(k)) for k, v in metadata.items()
+                   if k != 'package_version' and baseline_metadata.get(k) != v}
+    if len(diff_params) > 0:
+        # Des tailles différentes ne sont pas comparables : on refuse la comparaison
+        msg = f"Paramètres différents de ceux de la baseline (actuel, baseline) : {diff_params}"
+        if allow_no_baseline:
+            logger.warning(f"{msg}. Pas de comparaison.")
+            return
+        raise ValueError(msg)
+    df_compare = benchmark.compare_to_baseline(df_results, df_baseline, time_tolerance=time_tolerance, memory_tolerance=memory_tolerance)
+    df_compare.to_csv(report_path.replace('.json', '_comparison.csv'), sep=',', index=False, encoding='utf-8')
+    df_regressions = df_compare[df_compare['regression']]
+    if df_regressions.shape[0] > 0:
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            logger.error(f"Régressions détectées :\n{df_regressions}")
+        raise RuntimeError(f"{df_regressions.shape[0]} étape(s) en régression par rapport à la baseline : {df_regressions['stage'].tolist()}")
+    logger.info("Aucune régression par rapport à la baseline")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-n', '--n_rows', type=int, default=10000, help='Nombre de lignes du jeu de données synthétique')
+    parser.add_argument('--n_num_cols', type=int, default=10, help='Nombre de colonnes numériques')
+    parser.add_argument('--n_cat_cols', type=int, default=2, help='Nombre de colonnes catégorielles')
+    parser.add_argument('--n_classes', type=int, default=2, help='Nombre de classes')
+    parser.add_argument('--seed', type=int, default=42, help='Graine aléatoire')
+    parser.add_argument('-m', '--models', nargs='+', default=None, help='Modèles à benchmarker -> si vide, tous les modèles')
+    parser.add_argument('--no_search_hp', dest='with_search_hp', action='store_false', help='Ne pas benchmarker search_hp_cv_classifier')
+    parser.add_argument('--no_memory', dest='track_memory', action='store_false', help='Ne pas mesurer la mémoire (tracemalloc ralentit les calculs)')
+    parser.add_argument('-b', '--baseline_path', default=None, help='Chemin de la baseline')
+    parser.add_argument('--save_baseline', action='store_true', help='Remplacer la baseline par les résultats')
+    parser.add_argument('--allow_no_baseline', action='store_true', help='Ne pas échouer si pas de baseline (ou baseline avec d\'autres paramètres)')
+    parser.add_argument('--time_tolerance', type=float, default=0.25, help='Dégradation relative du temps tolérée')
+    parser.add_argument('--memory_tolerance', type=float, default=0.25, help='Dégradation relative de la mémoire tolérée')
+    args = parser.parse_args()
+    main(n_rows=args.n_rows, n_num_cols=args.n_num_cols, n_cat_cols=args.n_cat_cols, n_classes=args.n_classes,
+         seed=args.seed, models=args.models, with_search_hp=args.with_search_hp, track_memory=args.track_memory,
+         baseline_path=args.baseline_path, save_baseline=args.save_baseline, allow_no_baseline=args.allow_no_baseline,
+         time_tolerance=args.time_tolerance, memory_tolerance=args.memory_tolerance)
@@ -5,12 +5,15 @@
 # Date : 02/12/2019
 #
 # Ex: poetry run python 0_create_samples.py -f original_newdataset_juinV2_2150mails.csv --encoding latin-1 --sep ; -n 100
+# Ex: poetry run python 0_create_samples.py -n 100 --seed 42 --stratify_col target --nb_workers 4
 
 import os
 import ntpath
 import logging
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 
+import numpy as np
 import pandas as pd
 from ynov import utils
 
@@ -19,7 +22,8 @@ from ynov import utils
 logger = logging.getLogger('ynov.0_create_samples')
 
 
-def main(filenames: list, sep: str = ',', encoding: str = 'utf-8', n_samples: int = 100):
+def main(filenames: list, sep: str = ',', encoding: str = 'utf-8', n_samples: int = 100, seed: int = None,
+         stratify_col: str = None, chunksize: int = 100000, nb_workers: int = 1):
     '''Fonction principale pour extraire un subset de données depuis un fichier
 
     Args:
@@ -27,7 +31,11 @@ def main(filenames: list, sep: str = ',', encoding: str = 'utf-8', n_samples: in
     Kwargs:
         sep (str): Séparateur du fichier de données
         encoding (str): Encodage du fichier de données
-        n_samples (int): Nombre de données à extraire
+        n_samples (int): Nombre de données à extraire (par classe si stratify_col)
+        seed (int): Graine aléatoire
+        stratify_col (str): Colonne pour un échantillonnage stratifié (n_samples par classe)
+        chunksize (int): Nombre de lignes lues à la fois
+        nb_workers (int): Nombre de fichiers traités en parallèle (processus)
     '''
     logger.info(f"Création de samples")
 
@@ -39,24 +47,42 @@ def main(filenames: list, sep: str = ',', encoding: str = 'utf-8', n_samples: in
         files = [os.path.join(data_path, f) for f in os.listdir(data_path)]
         filenames = [f for f in files if os.path.isfile(f) and f.endswith('.csv') and not f.endswith('_sample.csv')]
 
-    for filename in filenames:
-        # Dans le cas ou mauvais encoding, on ne gère pas les erreurs (on skip !)
-        try:
-            process_file(filename, sep=sep, encoding=encoding, n_samples=n_samples)
-        except:
-            logger.warning(f"Impossible de lire le fichier {filename} avec l'encoding {encoding} et le séparateur {sep} ! SKIP !!!")
-            continue
+    kwargs = dict(sep=sep, encoding=encoding, n_samples=n_samples, seed=seed, stratify_col=stratify_col, chunksize=chunksize)
+    if nb_workers > 1 and len(filenames) > 1:
+        with ProcessPoolExecutor(max_workers=min(nb_workers, len(filenames))) as executor:
+            futures = {filename: executor.submit(process_file, filename, **kwargs) for filename in filenames}
+            for filename, future in futures.items():
+                # Dans le cas ou mauvais encoding, on ne gère pas les erreurs (on skip !)
+                try:
+                    future.result()
+                except:
+                    logger.warning(f"Impossible de lire le fichier {filename} avec l'encoding {encoding} et le séparateur {sep} ! SKIP !!!")
+                    continue
+    else:
+        for filename in filenames:
+            # Dans le cas ou mauvais encoding, on ne gère pas les erreurs (on skip !)
+            try:
+                process_file(filename, **kwargs)
+            except:
+                logger.warning(f"Impossible de lire le fichier {filename} avec l'encoding {encoding} et le séparateur {sep} ! SKIP !!!")
+                continue
 
 
-def process_file(filename: str, sep: str = ',', encoding: str = 'utf-8', n_samples: int = 100):
+def process_file(filename: str, sep: str = ',', encoding: str = 'utf-8', n_samples: int = 100, seed: int = None,
+                 stratify_col: str = None, chunksize: int = 100000):
     '''Fonction principale pour extraire un subset de données depuis un fichier
 
+    Le fichier est lu une seule fois, par chunks : mémoire bornée par chunksize + n_samples (cf. reservoir_sample).
+
     Args:
         filename (str): Nom du fichier de données pour le test
     Kwargs:
         sep (str): Séparateur du fichier de données
         encoding (str): Encodage du fichier de données
-        n_samples (int): Nombre de données à extraire
+        n_samples (int): Nombre de données à extraire (par classe si stratify_col)
+        seed (int): Graine aléatoire
+        stratify_col (str): Colonne pour un échantillonnage stratifié (n_samples par classe)
+        chunksize (int): Nombre de lignes lues à la fois
     Raises:
         ValueError : si l'objet filename ne termine pas par .csv
         FileNotFoundError : si l'objet filename n'est pas un fichier existant
@@ -80,18 +106,71 @@ def process_file(filename: str, sep: str = ',', encoding: str = 'utf-8', n_sampl
         pass
     else:
         logger.info(f"Processing {base_file_name}.")
-        # Récupération dataset & first_line
-        df, first_line = utils.read_csv(file_path, sep=sep, encoding=encoding, dtype=str)
+        # Récupération chunks & first_line
+        chunks, first_line = utils.read_csv(file_path, sep=sep, encoding=encoding, dtype=str, downcast=False, chunksize=chunksize)
         # Get extract
-        extract = df.sample(n=min(n_samples, df.shape[0]))
+        with chunks:
+            extract = reservoir_sample(chunks, n_samples=n_samples, seed=seed, stratify_col=stratify_col)
         utils.to_csv(extract, new_path, first_line=first_line, sep=',', encoding='utf-8')
 
 
+def reservoir_sample(chunks, n_samples: int = 100, seed: int = None, stratify_col: str = None):
+    '''Fonction pour tirer un échantillon aléatoire (sans remise) en une seule passe sur des chunks
+
+    Chaque ligne reçoit une clé aléatoire uniforme, on garde les n_samples plus petites clés (par classe si stratify_col).
+    Équivalent à un tirage uniforme sur l'ensemble du fichier ; le réservoir conserve l'ordre d'origine des lignes.
+
+    Args:
+        chunks (iterable): chunks du fichier (pd.DataFrame)
+    Kwargs:
+        n_samples (int): Nombre de données à extraire (par classe si stratify_col)
+        seed (int): Graine aléatoire
+        stratify_col (str): Colonne pour un échantillonnage stratifié (n_samples par classe)
+    Raises:
+        ValueError : si n_samples n'est pas positif
+        ValueError : si stratify_col n'est pas une colonne des données
+    Returns:
+        pd.DataFrame: échantillon
+    '''
+    if n_samples < 0:
+        raise ValueError("L'objet n_samples doit être positif")
+    rng = np.random.default_rng(seed)
+    reservoir, keys = None, np.array([])
+    offset = 0
+    for chunk in chunks:
+        if stratify_col is not None and stratify_col not in chunk.columns:
+            raise ValueError(f"La colonne {stratify_col} n'est pas dans les données")
+        # Index = position dans le fichier (ordre d'origine conservé)
+        chunk.index = pd.RangeIndex(offset, offset + chunk.shape[0])
+        offset += chunk.shape[0]
+        chunk_keys = rng.random(chunk.shape[0])
+        if reservoir is None:
+            reservoir, keys = chunk.iloc[:0], chunk_keys[:0]
+        candidates = pd.concat([reservoir, chunk])
+        keys = np.concatenate([keys, chunk_keys])
+        # Sélection des plus petites clés (globalement, ou par classe)
+        if stratify_col is None:
+            selected = np.argsort(keys, kind='stable')[:n_samples]
+        else:
+            ranks = pd.Series(keys).groupby(candidates[stratify_col].to_numpy(), dropna=False).rank(method='first')
+            selected = np.flatnonzero(ranks.to_numpy() <= n_samples)
+        selected = np.sort(selected)
+        reservoir, keys = candidates.iloc[selected], keys[selected]
+    if reservoir is None:
+        raise ValueError("Le fichier ne contient aucune donnée")
+    return reservoir.reset_index(drop=True)
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', '--filenames', nargs='+', default=[], help='Nom des jeux de données à traiter -> si vide, tous les csv')
     parser.add_argument('--sep', default=',', help='Séparateur utilisé dans le jeu de données.')
     parser.add_argument('--encoding', default="utf-8", help='Encoding du csv')
-    parser.add_argument('-n', '--n_samples', type=int, default=100, help='Nombre de données à extraire')
+    parser.add_argument('-n', '--n_samples', type=int, default=100, help='Nombre de données à extraire (par classe si --stratify_col)')
+    parser.add_argument('--seed', type=int, default=None, help='Graine aléatoire')
+    parser.add_argument('--stratify_col', default=None, help='Colonne pour un échantillonnage stratifié')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Nombre de lignes lues à la fois.')
+    parser.add_argument('--nb_workers', type=int, default=1, help='Nombre de fichiers traités en parallèle.')
     args = parser.parse_args()
-    main(filenames=args.filenames, sep=args.sep, encoding=args.encoding, n_samples=args.n_samples)
\ No newline at end of file
+    main(filenames=args.filenames, sep=args.sep, encoding=args.encoding, n_samples=args.n_samples, seed=args.seed,
+         stratify_col=args.stratify_col, chunksize=args.chunksize, nb_workers=args.nb_workers)
@@ -1,4 +1,4 @@
-!/usr/bin/env python3
+#!/usr/bin/env python3
 
 ## Merge de plusieurs fichiers
 # Auteurs : Agence dataservices
@@ -10,6 +10,8 @@ import argparse
 import logging
 import ntpath
 import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
 from ynov import utils
@@ -20,20 +22,33 @@ logger = logging.getLogger('ynov.0_merge_files')
 
 
 def main(filenames: list, cols: list, new_filename: str = 'dataset.csv', sep: str = ',',
-         encoding: str = 'utf-8'):
+         encoding: str = 'utf-8', chunksize: int = 100000, nb_readers: int = 1):
     '''Fonction principale pour merger plusieurs fichiers et ajouter la target
     - /!\\ format sortie : sep , & encoding utf-8 /!\\ -
 
+    Merge en streaming : chaque fichier est lu par chunks (colonnes cols uniquement)
+    et ajouté directement au fichier de sortie -> mémoire constante, quel que soit le nombre de fichiers.
+
     Args:
-        datadir (str): path to the data dir
+        filenames (list): Nom des fichiers à merger
+        cols (list): Colonnes à garder
     Kwargs:
         new_filename (str): Nom du fichier à créer
         sep (str): Séparateur des fichiers de données
         encoding (str): Encodage des fichiers de données
+        chunksize (int): Nombre de lignes lues à la fois
+        nb_readers (int): Nombre de lecteurs en parallèle (> 1 : lecture anticipée des fichiers suivants)
     Raises:
-        ValueError : si le nouveau fichier à créer existe déjà
+        FileNotFoundError : si un des fichiers n'existe pas
+        FileNotFoundError : si le nouveau fichier à créer existe déjà
+        ValueError : si un des fichiers contient des métadata (#)
+        ValueError : si chunksize ou nb_readers n'est pas strictement positif
     '''
     logger.info("Create evolution for all files")
+    if chunksize < 1:
+        raise ValueError("L'objet chunksize doit être strictement positif")
+    if nb_readers < 1:
+        raise ValueError("L'objet nb_readers doit être strictement positif")
 
     # Get path
     data_dir = utils.get_data_path()
@@ -41,32 +56,124 @@ def main(filenames: list, cols: list, new_filename: str = 'dataset.csv', sep: st
     for path in paths:
         if not os.path.isfile(path):
             raise FileNotFoundError(f"Le fichier {path} n'existe pas.")
+        # Check if first line starts with '#'
+        with open(path, 'r', encoding=encoding) as f:
+            first_line = f.readline()
+        if first_line.startswith('#'):
+            raise ValueError('Ce script ne prend pas en compte les fichiers avec des métadata (#)')
 
     # Manage new file
     new_file_path = os.path.join(data_dir, new_filename)
     if os.path.isfile(new_file_path):
         raise FileNotFoundError(f"Le fichier {new_file_path} existe déjà.")
 
-    # Init dataframe
-    df = pd.DataFrame(columns=cols)
-    # Concat with all files
-    for path in paths:
-        # Check if first line starts with '#'
-        with open(path, 'r', encoding=encoding) as f:
-            first_line = f.readline()
-        if first_line.startswith('#'):
-            raise ValueError('Ce script ne prend pas en compte les fichiers avec des métadata (#)')
-        # Load data & concat
-        # TODO: à vérifier -> on load tout en string pour éviter les erreurs + fillna
-        df_tmp = pd.read_csv(path, sep=sep, encoding=encoding, dtype=str).fillna('')[cols]
-        df = pd.concat([df, df_tmp]).reset_index(drop=True)
-        utils.display_shape(df)
+    # Écriture dans un fichier temporaire, renommé à la fin (pas de fichier partiel en cas d'erreur)
+    tmp_file_path = f"{new_file_path}.tmp"
+    nb_rows = 0
+    try:
+        with open(tmp_file_path, 'w', encoding='utf-8', newline='') as f:
+            pd.DataFrame(columns=cols).to_csv(f, sep=',', index=None)
+            for path, chunks in iter_files_chunks(paths, cols, sep=sep, encoding=encoding,
+                                                  chunksize=chunksize, nb_readers=nb_readers):
+                nb_rows_file = 0
+                for chunk in chunks:
+                    chunk.to_csv(f, sep=',', index=None, header=False)
+                    nb_rows_file += chunk.shape[0]
+                nb_rows += nb_rows_file
+                logger.info(f"{ntpath.basename(path)} : {nb_rows_file} lignes (total : {nb_rows})")
+        os.replace(tmp_file_path, new_file_path)
+    finally:
+        if os.path.isfile(tmp_file_path):
+            os.remove(tmp_file_path)
 
     # Taille finale
-    utils.display_shape(df)
+    logger.info(f"Nombre de lignes : {nb_rows}. Nombre de colonnes : {len(cols)}.")
+
+
+def read_chunks(path: str, cols: list, sep: str = ',', encoding: str = 'utf-8', chunksize: int = 100000):
+    '''Fonction pour lire un fichier par chunks, en ne gardant que les colonnes cols
+
+    Args:
+        path (str): Chemin du fichier
+        cols (list): Colonnes à garder (dans cet ordre)
+    Kwargs:
+        sep (str): Séparateur du fichier de données
+        encoding (str): Encodage du fichier de données
+        chunksize (int): Nombre de lignes par chunk
+    Returns:
+        generator: chunks (pd.DataFrame)
+    '''
+    # On load tout en string pour éviter les erreurs + fillna
+    with pd.read_csv(path, sep=sep, encoding=encoding, dtype=str, usecols=cols, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield chunk.fillna('')[cols]
+
+
+def iter_files_chunks(paths: list, cols: list, sep: str = ',', encoding: str = 'utf-8',
+                      chunksize: int = 100000, nb_readers: int = 1, max_prefetch: int = 2):
+    '''Fonction pour parcourir les chunks de plusieurs fichiers, dans l'ordre des fichiers
+
+    Si nb_readers > 1, les fichiers suivants sont lus en parallèle (threads) pendant l'écriture du fichier courant.
+    Chaque lecteur garde au plus max_prefetch chunks d'avance -> mémoire bornée.
+
+    Args:
+        paths (list): Chemins des fichiers
+        cols (list): Colonnes à garder
+    Kwargs:
+        sep (str): Séparateur des fichiers de données
+        encoding (str): Encodage des fichiers de données
+        chunksize (int): Nombre de lignes par chunk
+        nb_readers (int): Nombre de lecteurs en parallèle
+        max_prefetch (int): Nombre maximal de chunks lus d'avance par fichier
+    Returns:
+        generator: (chemin du fichier, générateur de chunks)
+    '''
+    if nb_readers <= 1:
+        for path in paths:
+            yield path, read_chunks(path, cols, sep=sep, encoding=encoding, chunksize=chunksize)
+        return
+
+    end_of_file = object()
+    stop = [False]
+
+    def prefetch(path: str, chunks_queue: queue.Queue):
+        # Lecture d'un fichier dans une file bornée (exception transmise au consommateur)
+        try:
+            for chunk in read_chunks(path, cols, sep=sep, encoding=encoding, chunksize=chunksize):
+                if stop[0]:
+                    return
+                chunks_queue.put(chunk)
+            chunks_queue.put(end_of_file)
+        except Exception as e:
+            chunks_queue.put(e)
+
+    def consume(chunks_queue: queue.Queue):
+        while True:
+            item = chunks_queue.get()
+            if item is end_of_file:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
 
-    # Save
-    df.to_csv(new_file_path, sep=',', encoding='utf-8', index=None)
+    # Les fichiers sont lus dans l'ordre de soumission : le fichier courant a toujours un lecteur
+    queues = [queue.Queue(maxsize=max_prefetch) for _ in paths]
+    executor = ThreadPoolExecutor(max_workers=nb_readers, thread_name_prefix='ynov-merge-reader')
+    try:
+        for path, chunks_queue in zip(paths, queues):
+            executor.submit(prefetch, path, chunks_queue)
+        for i, path in enumerate(paths):
+            yield path, consume(queues[i])
+            # Libère la file du fichier consommé
+            queues[i] = None
+    finally:
+        # Arrêt anticipé (e.g. erreur) : on débloque les lecteurs en attente
+        stop[0] = True
+        for chunks_queue in queues:
+            if chunks_queue is not None:
+                while not chunks_queue.empty():
+                    chunks_queue.get_nowait()
+        executor.shutdown(wait=True, cancel_futures=True)
 
 
 if __name__ == '__main__':
@@ -76,5 +183,8 @@ if __name__ == '__main__':
     parser.add_argument('-n', '--new_filename', default='dataset.csv', help='Nom fichier à créer')
     parser.add_argument('--sep', default=',', help='Séparateur utilisé dans les jeux de données.')
     parser.add_argument('--encoding', default="utf-8", help='Encoding des csv')
+    parser.add_argument('--chunksize', type=int, default=100000, help='Nombre de lignes lues à la fois.')
+    parser.add_argument('--nb_readers', type=int, default=1, help='Nombre de fichiers lus en parallèle (lecture anticipée).')
     args = parser.parse_args()
-    main(filenames=args.filenames, cols=args.cols, new_filename=args.new_filename, sep=args.sep, encoding=args.encoding)
+    main(filenames=args.filenames, cols=args.cols, new_filename=args.new_filename, sep=args.sep, encoding=args.encoding,
+         chunksize=args.chunksize, nb_readers=args.nb_readers)
@@ -5,31 +5,43 @@
 # Date : 13/05/2020
 #
 # Ex: poetry run python 0_split_train_valid_test.py -f train_housing.csv --perc_train 70 --perc_valid 30 --perc_test 0
+# Ex: poetry run python 0_split_train_valid_test.py -f housing_20200514.csv --split_type hash --id_col id --output_name housing --append
+#
+# Split en streaming : le fichier est lu une seule fois, par chunks, et les trois fichiers de sortie
+# sont écrits en parallèle (mémoire constante, quelle que soit la taille du fichier).
+# Split 'hash' : affectation stable, fonction d'une colonne ID -> une ligne garde toujours le même jeu,
+# et --append permet de n'ajouter que les nouvelles lignes aux fichiers train/valid/test existants.
 
 import argparse
 import logging
 import os
-import random
+import queue
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 from ynov import utils
-from ynov.models_training import utils_models
 
 
 # Get logger
 logger = logging.getLogger('ynov.0_split_train_valid_test')
 
+# Noms des jeux de sortie, dans l'ordre des codes d'affectation (0, 1, 2)
+SPLITS = ['train', 'valid', 'test']
+# Pas de la suite à faible discrépance utilisée par le split stratifié (nombre d'or)
+GOLDEN_RATIO_STEP = (np.sqrt(5) - 1) / 2
+
 
 def main(filename: str, split_type: str, perc_train: float, perc_valid: float, perc_test: float,
          y_col=None, sep: str = ',', encoding: str = 'utf-8',
-         seed: int = None):
+         seed: int = None, chunksize: int = 100000, id_col=None,
+         output_name: str = None, append: bool = False):
     '''Fonction principale pour extraire un subset de données depuis un fichier
 
     Args:
         filename (str): Nom du fichier de données à traiter
-        split_type (str): Type de split à réaliser (random, stratified)
+        split_type (str): Type de split à réaliser (random, stratified, hash)
         perc_train (float): Fraction jeu de Train
         perc_valid (float): Fraction jeu de Validation
         perc_test (float): Fraction jeu de Test
@@ -37,28 +49,44 @@ def main(filename: str, split_type: str, perc_train: float, perc_valid: float, p
         y_col (str ou int): Colonne à utiliser pour split stratified
         sep (str): Séparateur du fichier de données
         encoding (str): Encodage du fichier de données
-        seed (int): seed à utiliser pour reproduire les résultats
+        seed (int): seed à utiliser pour reproduire les résultats (split hash : clé du hash, 0 par défaut)
+        chunksize (int): Nombre de lignes lues à la fois
+        id_col (str ou int): Colonne ID à utiliser pour split hash
+        output_name (str): Nom de base des fichiers créés ({output_name}_train.csv, ...) - défaut : nom du fichier
+        append (bool): Split hash uniquement - ajoute aux fichiers existants les lignes dont l'ID n'y est pas déjà
     Raises:
         TypeError : si l'objet y_col n'est pas du type str ou int
         ValueError : si l'objet filename ne termine pas par .csv
         FileNotFoundError : si l'objet filename n'est pas un fichier existant
-        ValueError : si l'objet split_type n'est pas égal à 'random' ou 'stratified'
+        ValueError : si l'objet split_type n'est pas égal à 'random', 'stratified' ou 'hash'
         ValueError : si l'objet split_type est égal à 'stratified' mais que y_col n'est pas set
+        ValueError : si l'objet split_type est égal à 'hash' mais que id_col n'est pas set
+        ValueError : si append mais que l'objet split_type n'est pas égal à 'hash'
+        ValueError : si la colonne y_col (ou id_col) n'est pas dans le fichier
+        ValueError : si append et que les colonnes d'un fichier existant sont différentes
     '''
     logger.info(f"Split train/valid/test du fichier {filename}")
     if y_col is not None and type(y_col) not in [str, int]:
         raise TypeError('L\'objet y_col doit être du type str ou int')
     if not filename.endswith('.csv'):
         raise ValueError('L\'objet filename doit terminé par ".csv".')
-    if split_type not in ['random', 'stratified']:
-        raise ValueError("L'objet split_type doit être égal à 'random' ou 'stratified'")
+    if split_type not in ['random', 'stratified', 'hash']:
+        raise ValueError("L'objet split_type doit être égal à 'random', 'stratified' ou 'hash'")
     if split_type == 'stratified' and y_col is None:
         raise ValueError("y_col doit être set avec l'option 'stratified'")
+    if split_type == 'hash' and id_col is None:
+        raise ValueError("id_col doit être set avec l'option 'hash'")
+    if append and split_type != 'hash':
+        raise ValueError("L'option append n'est possible qu'avec le split 'hash' (affectation stable)")
 
-    # Set seed
-    if seed is not None:
-        random.seed(seed)
-        np.random.seed(seed)
+    # Set seed (tirée au hasard si non renseignée, loggée pour pouvoir reproduire les résultats)
+    # Split hash : clé fixe par défaut, pour une affectation stable d'une exécution à l'autre
+    if seed is None and split_type == 'hash':
+        seed = 0
+    elif seed is None:
+        seed = int(np.random.SeedSequence().entropy % (2**32))
+        logger.info(f"Seed utilisée : {seed}")
+    rng = np.random.default_rng(seed)
 
     # Get path
     data_dir = utils.get_data_path()
@@ -66,11 +94,6 @@ def main(filename: str, split_type: str, perc_train: float, perc_valid: float, p
     if not os.path.isfile(file_path):
         raise FileNotFoundError(f"Le fichier {file_path} n'existe pas.")
 
-    # Get dataframe
-    # TODO: à vérifier -> on load tout en string pour éviter les erreurs + fillna
-    df, first_line = utils.read_csv(file_path, sep=sep, encoding=encoding, dtype=str)
-    df = df.fillna('')
-
     # Normalisation perc_train, perc_valid, perc_test
     perc_sum = perc_train + perc_valid + perc_test
     perc_train = perc_train / perc_sum
@@ -79,92 +102,280 @@ def main(filename: str, split_type: str, perc_train: float, perc_valid: float, p
     logger.info(f'Pourcentage train : {perc_train * 100}%')
     logger.info(f'Pourcentage validation : {perc_valid * 100}%')
     logger.info(f'Pourcentage test : {perc_test * 100}%')
+    thresholds = np.array([perc_train, perc_train + perc_valid])
+
+    # Get chunks
+    # TODO: à vérifier -> on load tout en string pour éviter les erreurs + fillna
+    chunks, first_line = utils.read_csv(file_path, sep=sep, encoding=encoding, dtype=str, downcast=False, chunksize=chunksize)
+    chunks = (chunk.fillna('') for chunk in chunks)
+
+    # Output paths
+    basename = output_name if output_name is not None else Path(filename).stem
+    paths = [os.path.join(data_dir, f"{basename}_{split}.csv") for split in SPLITS]
 
     # Split
     if split_type == 'random':
-        df_train, df_valid, df_test = split_random(df, perc_train, perc_valid, perc_test)
-    else: # split_type == 'stratified'
-        df_train, df_valid, df_test = split_stratified(df, y_col, perc_train, perc_valid, perc_test, seed=seed)
+        assigner = RandomAssigner(thresholds, rng)
+    elif split_type == 'stratified':
+        assigner = StratifiedAssigner(thresholds, y_col, seed=seed)
+    else:  # split_type == 'hash'
+        assigner = HashAssigner(thresholds, id_col, seed=seed)
+        if append:
+            assigner.load_known_ids(paths, chunksize=chunksize)
+
+    # Save
+    nb_rows = write_splits(chunks, assigner, paths, first_line=first_line, append=append)
 
     # Display info
-    logger.info(f"Nombre de ligne dans le dataset d'origine : {df.shape[0]}")
-    logger.info(f"Nombre de ligne dans le dataset de train : {df_train.shape[0]} ({df_train.shape[0] / df.shape[0] * 100} %)")
-    logger.info(f"Nombre de ligne dans le dataset de validations : {df_valid.shape[0]} ({df_valid.shape[0] / df.shape[0] * 100} %)")
-    logger.info(f"Nombre de ligne dans le dataset de test : {df_test.shape[0]} ({df_test.shape[0] / df.shape[0] * 100} %)")
+    nb_total = max(sum(nb_rows), 1)
+    if append:
+        logger.info(f"Nombre de lignes déjà présentes (ignorées) : {assigner.nb_known_rows}")
+        logger.info(f"Nombre de nouvelles lignes : {sum(nb_rows)}")
+    else:
+        logger.info(f"Nombre de ligne dans le dataset d'origine : {sum(nb_rows)}")
+    logger.info(f"Nombre de ligne dans le dataset de train : {nb_rows[0]} ({nb_rows[0] / nb_total * 100} %)")
+    logger.info(f"Nombre de ligne dans le dataset de validations : {nb_rows[1]} ({nb_rows[1] / nb_total * 100} %)")
+    logger.info(f"Nombre de ligne dans le dataset de test : {nb_rows[2]} ({nb_rows[2] / nb_total * 100} %)")
 
-    # Save
-    basename = Path(filename).stem
-    utils.to_csv(df_train, os.path.join(data_dir, f"{basename}_train.csv"), first_line=first_line,
-                 sep=',', encoding='utf-8')
-    utils.to_csv(df_valid, os.path.join(data_dir, f"{basename}_valid.csv"), first_line=first_line,
-                 sep=',', encoding='utf-8')
-    utils.to_csv(df_test, os.path.join(data_dir, f"{basename}_test.csv"), first_line=first_line,
-                 sep=',', encoding='utf-8')
 
+class RandomAssigner:
+    '''Affectation aléatoire des lignes à train/valid/test (tirage uniforme seedé, indépendant du découpage en chunks)'''
 
-def split_random(df: pd.DataFrame, perc_train: float, perc_valid: float, perc_test: float):
-    '''Fonction pour faire un split random
+    def __init__(self, thresholds: np.ndarray, rng: np.random.Generator):
+        '''Initialisation de la classe
 
-    Args:
-        df (pd.DataFrame): données à écrire
-        perc_train (float): Fraction jeu de Train
-        perc_valid (float): Fraction jeu de Validation
-        perc_test (float): Fraction jeu de Test
+        Args:
+            thresholds (np.ndarray): bornes cumulées [perc_train, perc_train + perc_valid]
+            rng (np.random.Generator): générateur aléatoire
+        '''
+        self.thresholds = thresholds
+        self.rng = rng
+
+    def assign(self, chunk: pd.DataFrame):
+        '''Affecte les lignes d'un chunk
+
+        Args:
+            chunk (pd.DataFrame): données
+        Returns:
+            np.ndarray: code du jeu de chaque ligne (0 : train, 1 : valid, 2 : test)
+        '''
+        return np.searchsorted(self.thresholds, self.rng.random(chunk.shape[0]), side='right')
+
+
+class StratifiedAssigner:
+    '''Affectation stratifiée des lignes à train/valid/test, via un compteur par classe
+
+    La n-ième ligne d'une classe reçoit la valeur (offset + n * (nombre d'or - 1)) mod 1 : suite à faible discrépance,
+    les proportions de chaque classe respectent les pourcentages à une ou deux lignes près, sans connaître
+    la taille des classes à l'avance. L'offset de chaque classe est un hash (seedé) de la classe :
+    il ne dépend pas de l'ordre d'apparition des classes, donc pas du découpage en chunks.
+    '''
+
+    def __init__(self, thresholds: np.ndarray, y_col, seed: int = 0):
+        '''Initialisation de la classe
+
+        Args:
+            thresholds (np.ndarray): bornes cumulées [perc_train, perc_train + perc_valid]
+            y_col (str ou int): Colonne à utiliser pour le split
+        Kwargs:
+            seed (int): clé du hash des offsets
+        '''
+        self.thresholds = thresholds
+        self.y_col = y_col
+        # Clé siphash de 16 caractères (cf. HashAssigner)
+        self.hash_key = f"{seed % 10**16:016d}"
+        self.counters = {}
+        self.offsets = {}
+
+    def assign(self, chunk: pd.DataFrame):
+        '''Affecte les lignes d'un chunk
+
+        Args:
+            chunk (pd.DataFrame): données
+        Raises:
+            ValueError : si la colonne y_col n'est pas dans les données
+        Returns:
+            np.ndarray: code du jeu de chaque ligne (0 : train, 1 : valid, 2 : test)
+        '''
+        if self.y_col not in chunk.columns:
+            raise ValueError(f"La colonne {self.y_col} n'est pas dans le fichier")
+        classes, inverse = np.unique(chunk[self.y_col].to_numpy(), return_inverse=True)
+        # Position de chaque ligne dans sa classe (dans le chunk), puis décalage par les compteurs
+        positions = pd.Series(inverse).groupby(inverse).cumcount().to_numpy()
+        counts = np.bincount(inverse, minlength=len(classes))
+        starts, offsets = np.zeros(len(classes)), np.zeros(len(classes))
+        for i, cl in enumerate(classes):
+            if cl not in self.counters:
+                self.counters[cl] = 0
+                self.offsets[cl] = pd.util.hash_array(np.array([str(cl)], dtype=object), hash_key=self.hash_key)[0] / 2**64
+            starts[i], offsets[i] = self.counters[cl], self.offsets[cl]
+            self.counters[cl] += counts[i]
+        values = np.mod(offsets[inverse] + (starts[inverse] + positions) * GOLDEN_RATIO_STEP, 1)
+        return np.searchsorted(self.thresholds, values, side='right')
+
+
+class HashAssigner:
+    '''Affectation stable des lignes à train/valid/test, fonction d'un hash de la colonne ID
+
+    Une même valeur d'ID est toujours affectée au même jeu (pour une même seed et des mêmes pourcentages) :
+    ajouter des données ne modifie pas l'affectation des lignes existantes.
     '''
-    # On s'assure de ne pas modifier la dataframe d'origine (utile ?)
-    df = df.copy().reset_index(drop=True)
-    # Sélection train
-    df_train = df.sample(frac=perc_train)
-    idx_train = df_train.index
-    df = df[~df.index.isin(idx_train)]
-    # Sélection valid (avec update perc_valid)
-    perc_valid = perc_valid / (perc_test + perc_valid)
-    df_valid = df.sample(frac=perc_valid)
-    idx_valid = df_valid.index
-    df = df[~df.index.isin(idx_valid)]
-    # Sélection test (le reste)
-    df_test = df
-    # Return
-    return df_train, df_valid, df_test
-
-
-def split_stratified(df: pd.DataFrame, y_col, perc_train: float, perc_valid: float, perc_test: float, seed: int = None):
-    '''Fonction pour faire un split stratified
+
+    def __init__(self, thresholds: np.ndarray, id_col, seed: int = 0):
+        '''Initialisation de la classe
+
+        Args:
+            thresholds (np.ndarray): bornes cumulées [perc_train, perc_train + perc_valid]
+            id_col (str ou int): Colonne ID
+        Kwargs:
+            seed (int): clé du hash
+        '''
+        self.thresholds = thresholds
+        self.id_col = id_col
+        # Clé siphash de 16 caractères (cf. pd.util.hash_array), stable d'une exécution / machine à l'autre
+        self.hash_key = f"{seed % 10**16:016d}"
+        self.known_hashes = None
+        self.nb_known_rows = 0
+
+    def hash_ids(self, chunk: pd.DataFrame):
+        '''Hash de la colonne ID d'un chunk
+
+        Args:
+            chunk (pd.DataFrame): données
+        Raises:
+            ValueError : si la colonne id_col n'est pas dans les données
+        Returns:
+            np.ndarray: hash (uint64) de chaque ligne
+        '''
+        if self.id_col not in chunk.columns:
+            raise ValueError(f"La colonne {self.id_col} n'est pas dans le fichier")
+        return pd.util.hash_array(chunk[self.id_col].to_numpy(dtype=object), hash_key=self.hash_key)
+
+    def load_known_ids(self, paths: list, chunksize: int = 100000):
+        '''Charge les ID déjà présents dans des fichiers existants (hash uniquement : 8 octets par ligne)
+
+        Args:
+            paths (list): chemins des fichiers (ignorés s'ils n'existent pas)
+        Kwargs:
+            chunksize (int): Nombre de lignes lues à la fois
+        '''
+        hashes = [np.array([], dtype=np.uint64)]
+        for path in paths:
+            if os.path.isfile(path):
+                chunks, _ = utils.read_csv(path, dtype=str, downcast=False, chunksize=chunksize, usecols=[self.id_col])
+                with chunks:
+                    hashes.extend(self.hash_ids(chunk.fillna('')) for chunk in chunks)
+        self.known_hashes = np.unique(np.concatenate(hashes))
+        logger.info(f"{len(self.known_hashes)} ID déjà présents dans les fichiers existants")
+
+    def assign(self, chunk: pd.DataFrame):
+        '''Affecte les lignes d'un chunk
+
+        Args:
+            chunk (pd.DataFrame): données
+        Returns:
+            np.ndarray: code du jeu de chaque ligne (0 : train, 1 : valid, 2 : test, -1 : ID déjà présent)
+        '''
+        hashes = self.hash_ids(chunk)
+        # Hash -> valeur uniforme dans [0, 1)
+        codes = np.searchsorted(self.thresholds, hashes / 2**64, side='right')
+        if self.known_hashes is not None:
+            known = np.isin(hashes, self.known_hashes, assume_unique=False)
+            self.nb_known_rows += int(known.sum())
+            codes[known] = -1
+        return codes
+
+
+def write_splits(chunks, assigner, paths: list, first_line: str = None, append: bool = False, max_prefetch: int = 2):
+    '''Fonction pour répartir des chunks entre plusieurs fichiers, écrits en parallèle (un thread par fichier)
+
+    Les fichiers sont écrits sous un nom temporaire, renommés à la fin (pas de fichiers partiels en cas d'erreur).
+    En mode append, les fichiers existants sont complétés directement (sans en-tête ni métadata).
 
     Args:
-        df (pd.DataFrame): données à écrire
-        y_col (str ou int): Colonne à utiliser pour split stratified
-        perc_train (float): Fraction jeu de Train
-        perc_valid (float): Fraction jeu de Validation
-        perc_test (float): Fraction jeu de Test
+        chunks (iterable): chunks à répartir (pd.DataFrame)
+        assigner (?): objet avec une méthode assign(chunk) -> code du fichier de chaque ligne
+        paths (list): chemins des fichiers à créer (dans l'ordre des codes)
     Kwargs:
-        seed (int): seed à utiliser pour reproduire les résultats
+        first_line (str): Première ligne à écrire (métadata)
+        append (bool): si les fichiers existants doivent être complétés
+        max_prefetch (int): Nombre maximal de chunks en attente d'écriture par fichier
     Raises:
-        TypeError : si l'objet y_col n'est pas du type str ou int
+        ValueError : si append et que les colonnes d'un fichier existant sont différentes de celles des chunks
+    Returns:
+        list: nombre de lignes écrites dans chaque fichier
     '''
-    if type(y_col) not in [str, int]:
-        raise TypeError('L\'objet y_col doit être du type str ou int')
-    # On s'assure de ne pas modifier la dataframe d'origine (utile ?)
-    df = df.copy().reset_index(drop=True)
-    # Get random seed
-    if seed is None:
-        seed = random.randint(1, 100000)
-    # Sélection train
-    df_train, df_v_plus_t = utils_models.stratified_split(df, y_col, test_size=perc_valid + perc_test, seed=seed)
-    # Update perc_test
-    perc_test = perc_test / (perc_test + perc_valid)
-    df_valid, df_test = utils_models.stratified_split(df_v_plus_t, y_col, test_size=perc_test, seed=seed)
-    # On rajoute les index "perdu" (min_classes)
-    df_lost = df[~df.index.isin(df_train.index.append(df_test.index).append(df_valid.index))]
-    df_train = pd.concat([df_train, df_lost], sort=False)
-    # Return
-    return df_train, df_valid, df_test
+    appended = [append and os.path.isfile(path) for path in paths]
+    tmp_paths = [path if is_appended else f"{path}.tmp" for path, is_appended in zip(paths, appended)]
+    queues = [queue.Queue(maxsize=max_prefetch) for _ in paths]
+    nb_rows = [0] * len(paths)
+
+    def write(tmp_path: str, chunks_queue: queue.Queue, is_appended: bool):
+        # Écriture d'un fichier, jusqu'à la sentinelle None (en-tête écrit avec le premier chunk)
+        with open(tmp_path, 'a' if is_appended else 'w', encoding='utf-8', newline='') as f:
+            if first_line is not None and not is_appended:
+                f.write(first_line + '\n')
+            header = not is_appended
+            while True:
+                chunk = chunks_queue.get()
+                if chunk is None:
+                    return
+                chunk.to_csv(f, sep=',', index=None, header=header)
+                header = False
+
+    def check_columns(chunk: pd.DataFrame):
+        # Mode append : les colonnes des fichiers existants doivent être identiques
+        for path, is_appended in zip(paths, appended):
+            if is_appended:
+                df_existing, _ = utils.read_csv(path, dtype=str, downcast=False, nrows=0)
+                if list(df_existing.columns) != list(chunk.columns):
+                    raise ValueError(f"Les colonnes du fichier {path} sont différentes de celles des données à ajouter")
+
+    def put(i: int, item, future):
+        # Put bloquant, sauf si le writer s'est arrêté (erreur)
+        while True:
+            try:
+                queues[i].put(item, timeout=1)
+                return
+            except queue.Full:
+                if future.done():
+                    future.result()
+                    raise RuntimeError(f"Le writer de {paths[i]} s'est arrêté")
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(paths), thread_name_prefix='ynov-split-writer') as executor:
+            futures = [executor.submit(write, tmp_path, chunks_queue, is_appended)
+                       for tmp_path, chunks_queue, is_appended in zip(tmp_paths, queues, appended)]
+            try:
+                for i_chunk, chunk in enumerate(chunks):
+                    if i_chunk == 0 and any(appended):
+                        check_columns(chunk)
+                    codes = assigner.assign(chunk)
+                    for i, future in enumerate(futures):
+                        mask = codes == i
+                        nb_rows[i] += int(mask.sum())
+                        put(i, chunk[mask], future)
+            finally:
+                # Arrêt des writers encore actifs (un writer en erreur est déjà arrêté)
+                for i, future in enumerate(futures):
+                    if not future.done():
+                        queues[i].put(None)
+            for future in futures:
+                future.result()
+        for tmp_path, path, is_appended in zip(tmp_paths, paths, appended):
+            if not is_appended:
+                os.replace(tmp_path, path)
+    finally:
+        for tmp_path, is_appended in zip(tmp_paths, appended):
+            if not is_appended and os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+    return nb_rows
 
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('-f', '--filename', default='dataset.csv', help='Nom du jeu de données à traiter.')
-    parser.add_argument('--split_type', default='random', help='Type de split à effectuer. Possibilités: random, stratified')
+    parser.add_argument('--split_type', default='random', help='Type de split à effectuer. Possibilités: random, stratified, hash')
     parser.add_argument('--perc_train', default=0.6, type=float, help='Repartition du jeu de train')
     parser.add_argument('--perc_valid', default=0.2, type=float, help='Repartition du jeu de valid')
     parser.add_argument('--perc_test', default=0.2, type=float, help='Repartition du jeu de test')
@@ -172,7 +383,12 @@ if __name__ == '__main__':
     parser.add_argument('--sep', default=',', help='Séparateur utilisé dans le jeu de données.')
     parser.add_argument('--encoding', default="utf-8", help='Encoding du csv')
     parser.add_argument('--seed', default=None, type=int, help="Seed à utiliser pour reproduire les résultats. Defaut: None")
+    parser.add_argument('--chunksize', default=100000, type=int, help='Nombre de lignes lues à la fois.')
+    parser.add_argument('--id_col', default=None, help='Colonne ID à utiliser pour split hash')
+    parser.add_argument('--output_name', default=None, help='Nom de base des fichiers créés (défaut : nom du fichier)')
+    parser.add_argument('--append', action='store_true', help='Split hash : ajoute uniquement les nouvelles lignes aux fichiers existants')
     args = parser.parse_args()
     main(filename=args.filename, split_type=args.split_type, perc_train=args.perc_train,
          perc_valid=args.perc_valid, perc_test=args.perc_test, y_col=args.y_col,
-         sep=args.sep, encoding=args.encoding, seed=args.seed)
\ No newline at end of file
+         sep=args.sep, encoding=args.encoding, seed=args.seed, chunksize=args.chunksize, id_col=args.id_col,
+         output_name=args.output_name, append=args.append)
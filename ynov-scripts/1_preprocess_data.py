@@ -13,6 +13,7 @@ import dill as pickle
 import logging
 import argparse
 import pandas as pd
+from scipy import sparse
 from pathlib import Path
 from datetime import datetime
 
@@ -32,7 +33,7 @@ def main(filenames: list, preprocessing: str, target_col, sep: str = ',', encodi
             - On récupère une NOUVELLE Pipeline
             - On fit_transform sur le jeu de données
             - On sauvegarde la pipeline
-            - On sauvegarde le fichier preprocessed
+            - On sauvegarde le fichier preprocessed (.csv, ou .npz si la sortie de la pipeline est sparse)
 
     Il est donc important de noter qu'il ne faut PAS preprocess les jeux de validation/test ici !
     En effet, on crée une pipeline par jeu de données (donc moyenne, écart type, etc., peuvent être différents)
@@ -84,19 +85,29 @@ def main(filenames: list, preprocessing: str, target_col, sep: str = ',', encodi
                 raise FileNotFoundError(f"Le fichier {dataset_path} n'existe pas.")
             # Get dataset
             df = pd.read_csv(dataset_path, sep=sep, encoding=encoding)
+            # Précision float32 : types réduits dès la lecture (cf. utils.set_float_precision)
+            if utils.FLOAT_PRECISION == 'float32':
+                df = utils.downcast_df(df)
             # Split X, y
             y = df[target_col]
             X = df.drop(target_col, axis=1)
             # Apply pipeline
             new_X = preprocess_pipeline.fit_transform(X, y)
-            # Try to retrieve new columns name (experimental)
-            new_df = pd.DataFrame(new_X)
-            new_df = preprocess.retrieve_columns_from_pipeline(new_df, preprocess_pipeline)
-            # Reinject y
-            for col in target_col:
-                if col in new_df.columns:
-                    new_df.rename(columns={col: f'new_{col}'}, inplace=True)
-            new_df[target_col] = y
+            # Sortie sparse (e.g. OneHotEncoder, CountVectorizer) : on ne densifie pas, colonnes gardées à part
+            is_sparse = sparse.issparse(new_X)
+            if is_sparse:
+                new_columns = preprocess.get_columns_from_pipeline(preprocess_pipeline, new_X.shape[1])
+                if new_columns is None:
+                    new_columns = list(range(new_X.shape[1]))
+            else:
+                # Try to retrieve new columns name (experimental)
+                new_df = pd.DataFrame(new_X)
+                new_df = preprocess.retrieve_columns_from_pipeline(new_df, preprocess_pipeline)
+                # Reinject y
+                for col in target_col:
+                    if col in new_df.columns:
+                        new_df.rename(columns={col: f'new_{col}'}, inplace=True)
+                new_df[target_col] = y
             # On sauvegarde la pipeline de preprocessing
             # Idée: sauvegarde des pipelines dans un dossier pour être rechargé à la création d'un modèle
             # Elle sera de nouveau sauvegarder dans le modèle pour ne plus dépendre de la sauvegarde dans le dossier pipelines
@@ -116,10 +127,15 @@ def main(filenames: list, preprocessing: str, target_col, sep: str = ',', encodi
                 f.write(f"'preprocess_str': {preprocess_str}")
                 f.write('\n')
                 f.write(f"'preprocess_pipeline': {str(preprocess_pipeline)}")
-            # Save dataframe (utf-8, ',')
+            # Save dataframe (utf-8, ',') ou, si sparse, un .npz (features CSR, colonnes & cibles)
             basename = Path(filename).stem
-            dataset_preprocessed_path = os.path.join(data_path, f'{basename}_{preprocess_str}.csv')
-            utils.to_csv(new_df, dataset_preprocessed_path, first_line=f'#{pipeline_name}', sep=',', encoding='utf-8')
+            if is_sparse:
+                dataset_preprocessed_path = os.path.join(data_path, f'{basename}_{preprocess_str}.npz')
+                utils.to_npz(new_X, dataset_preprocessed_path, new_columns, first_line=f'#{pipeline_name}',
+                             df_y=y.reset_index(drop=True))
+            else:
+                dataset_preprocessed_path = os.path.join(data_path, f'{basename}_{preprocess_str}.csv')
+                utils.to_csv(new_df, dataset_preprocessed_path, first_line=f'#{pipeline_name}', sep=',', encoding='utf-8')
 
 
 def get_pipeline_dir(preprocess_str: str):
@@ -151,5 +167,10 @@ if __name__ == '__main__':
     parser.add_argument('--target_col', nargs='+', required=True, help='Colonne(s) cible(s) du dataframe')
     parser.add_argument('--sep', default=',', help='Séparateur utilisé dans le jeu de données.')
     parser.add_argument('--encoding', default="utf-8", help='Encoding du csv')
+    parser.add_argument('--float32', dest='float32', action='store_true', help="Précision float32 : données lues & traitées en float32 (mémoire divisée par 2)")
     args = parser.parse_args()
+    # Précision globale des données numériques
+    if args.float32:
+        utils.set_float_precision('float32')
+        logger.info("Précision float32 : données numériques lues & traitées en float32")
     main(filenames=args.filenames, preprocessing=args.preprocessing, target_col=args.target_col, sep=args.sep, encoding=args.encoding)
\ No newline at end of file
@@ -50,10 +50,21 @@ def main(filenames: list, pipeline: str, target_col, sep: str = ',', encoding: s
             raise FileNotFoundError(f"Le fichier {dataset_path} n'existe pas.")
         # Get dataset
         df = pd.read_csv(dataset_path, sep=sep, encoding=encoding)
+        # Précision float32 : types réduits dès la lecture (cf. utils.set_float_precision)
+        if utils.FLOAT_PRECISION == 'float32':
+            df = utils.downcast_df(df)
         # Split X, y
         y = df[target_col]
         X = df.drop(target_col, axis=1)
+        basename = Path(filename).stem
         # Apply pipeline
+        # Sortie sparse (e.g. OneHotEncoder, CountVectorizer) : CSR & colonnes à part -> .npz, sans densifier
+        if getattr(preprocess_pipeline, 'sparse_output_', False):
+            new_X, new_columns = utils_models.apply_pipeline(X, preprocess_pipeline, sparse_output=True)
+            dataset_preprocessed_path = os.path.join(data_path, f'{basename}_{preprocess_str}.npz')
+            utils.to_npz(new_X, dataset_preprocessed_path, new_columns, first_line=f'#{pipeline}',
+                         df_y=y.reset_index(drop=True))
+            continue
         new_X = utils_models.apply_pipeline(X, preprocess_pipeline)
         # Try to retrieve new columns name (experimental)
         new_df = pd.DataFrame(new_X)
@@ -64,7 +75,6 @@ def main(filenames: list, pipeline: str, target_col, sep: str = ',', encoding: s
                 new_df.rename(columns={col: f'new_{col}'}, inplace=True)
         new_df[target_col] = y
         # Save dataframe (utf-8, ',')
-        basename = Path(filename).stem
         dataset_preprocessed_path = os.path.join(data_path, f'{basename}_{preprocess_str}.csv')
         utils.to_csv(new_df, dataset_preprocessed_path, first_line=f'#{pipeline}', sep=',', encoding='utf-8')
 
@@ -76,5 +86,10 @@ if __name__ == '__main__':
     parser.add_argument('--target_col', nargs='+', required=True, help='Colonne(s) cible(s) du dataframe')
     parser.add_argument('--sep', default=',', help='Séparateur utilisé dans le jeu de données.')
     parser.add_argument('--encoding', default="utf-8", help='Encoding du csv')
+    parser.add_argument('--float32', dest='float32', action='store_true', help="Précision float32 : données lues & traitées en float32 (mémoire divisée par 2)")
     args = parser.parse_args()
+    # Précision globale des données numériques
+    if args.float32:
+        utils.set_float_precision('float32')
+        logger.info("Précision float32 : données numériques lues & traitées en float32")
     main(filenames=args.filenames, pipeline=args.pipeline, target_col=args.target_col, sep=args.sep, encoding=args.encoding)
\ No newline at end of file
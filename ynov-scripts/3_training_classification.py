@@ -6,6 +6,8 @@
 
 
 # e.g. poetry run python 3_training_classification.py --filename dataset_train_preprocess_P1.csv --filename_valid dataset_valid_preprocess_P1.csv --y_col Survived
+# Plusieurs modèles en parallèle, avec leaderboard (cf. train_models) :
+# e.g. poetry run python 3_training_classification.py --filename dataset_train_preprocess_P1.csv --y_col Survived --models_config models_classification.json --n_jobs 4
 
 
 import os
@@ -15,6 +17,7 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 import warnings
 import gc
 import re
+import json
 import time
 import shutil
 import logging
@@ -23,12 +26,12 @@ import pandas as pd
 from typing import List
 from datetime import datetime
 from ynov import utils
-from ynov.models_training import utils_models
-from ynov.models_training.classifiers import (model_rf_classifier, model_dense_classifier,
-                                                          model_ridge_classifier, model_logistic_regression_classifier,
-                                                          model_sgd_classifier, model_svm_classifier, model_knn_classifier,
-                                                          model_gbt_classifier, model_lgbm_classifier, model_xgboost_classifier)
+from ynov.models_training import utils_models, model_classifier
+from ynov.models_training.classifiers import (model_rf_classifier, model_logistic_regression_classifier,
+                                                          model_knn_classifier, model_gbt_classifier,
+                                                          model_lgbm_classifier, model_xgboost_classifier)
 from ynov.preprocessing import preprocess
+from ynov.monitoring import instrumentation, memory_tracker
 from ynov.monitoring.model_logger import ModelLogger
 
 
@@ -42,13 +45,15 @@ logger = logging.getLogger('ynov.3_training_classification')
 
 def main(filename: str, y_col: list, excluded_cols: list = None,
          filename_valid: str = None, min_rows: int = None, nb_iter_keras: int = 1,
-         level_save: str = 'HIGH', model = None):
+         level_save: str = 'HIGH', optimize_thresholds: bool = False, confusion_matrix_plots: str = 'sync',
+         model = None, models_config = None, n_jobs: int = None):
     '''Fonction principale pour l'apprentissage d'un algo de ML
 
     /!\ Par défaut on utilise toutes les colonnes, sauf si précisé dans excluded_cols /!\
 
     Args:
         filename (str): Nom du fichier de données pour apprentissage
+            .csv, ou .npz si le preprocessing produit des données sparse (cf. 1_preprocess_data.py)
         y_col (list): nom des colonnes à utiliser pour l'apprentissage - y
     Kwargs:
         excluded_cols (list): Colonne(s) à ne pas utiliser
@@ -59,28 +64,39 @@ def main(filename: str, y_col: list, excluded_cols: list = None,
             LOW: statistiques + configurations + logger keras - /!\\ modèle non réutilisable /!\\ -
             MEDIUM: LOW + hdf5 + pkl + plots
             HIGH: MEDIUM + predictions
+        optimize_thresholds (bool): Multi-label : si les seuils de décision de chaque label doivent être optimisés (F1) sur la validation
+        confusion_matrix_plots (str): plots des matrices de confusion, 'sync', 'lazy' ou 'background' (cf. ModelClassifierMixin)
         model (modelClass): modèle à utilisé par les tests fonctionnels, ne pas supprimer ! Inutile sinon.
+        models_config (list | str): modèles à entraîner en parallèle (liste, ou chemin d'un .json), cf. train_models
+            Si renseigné, remplace le modèle unique ; les modèles & un leaderboard sont sauvegardés dans ynov-models/multi_training/
+        n_jobs (int): nombre de modèles entraînés en parallèle (si models_config)
     Raises:
-        ValueError : si l'objet filename ne termine pas par .csv
-        ValueError : si l'objet filename_valid ne termine pas par .csv
+        ValueError : si l'objet filename ne termine pas par .csv ou .npz
+        ValueError : si l'objet filename_valid ne termine pas par .csv ou .npz
+        ValueError : si les fichiers de train et de validation ne sont pas au même format
         ValueError : si l'objet level_save n'est pas une option valable (['LOW', 'MEDIUM', 'HIGH'])
         FileNotFoundError : si l'objet filename n'est pas un fichier existant
         FileNotFoundError : si l'objet filename_valid n'est pas un fichier existant
+        FileNotFoundError : si l'objet models_config est un chemin qui n'existe pas
     '''
     logger.info("Apprentissage d'un algo de ML")
-    if not filename.endswith('.csv'):
-        raise ValueError('L\'objet filename doit terminé par ".csv".')
-    if filename_valid is not None and not filename_valid.endswith('.csv'):
-        raise ValueError('L\'objet filename doit terminé par ".csv".')
+    if not filename.endswith(('.csv', '.npz')):
+        raise ValueError('L\'objet filename doit terminé par ".csv" ou ".npz".')
+    if filename_valid is not None and not filename_valid.endswith(('.csv', '.npz')):
+        raise ValueError('L\'objet filename doit terminé par ".csv" ou ".npz".')
+    if filename_valid is not None and filename.endswith('.npz') != filename_valid.endswith('.npz'):
+        raise ValueError("Les fichiers de train et de validation doivent être au même format (.csv ou .npz)")
     if level_save not in ['LOW', 'MEDIUM', 'HIGH']:
         raise ValueError(f"L'objet level_save ({level_save}) n'est pas une option valide (['LOW', 'MEDIUM', 'HIGH'])")
+    if isinstance(models_config, str):
+        models_config = load_models_config(models_config)
 
     ##############################################
     # Gestion dataset train
     ##############################################
 
     # Get dataset
-    df, preprocess_pipeline_dir = load_dataset(filename)
+    df, preprocess_pipeline_dir, sparse_data = load_dataset(filename)
 
     # Get pipeline
     preprocess_pipeline, preprocess_str = utils_models.load_pipeline(preprocess_pipeline_dir)
@@ -157,7 +173,7 @@ def main(filename: str, y_col: list, excluded_cols: list = None,
     # Get valid dataset (/!\ on considère que le fichier a le même preprocessing /!\)
     if filename_valid is not None:
         logger.info(f"Utilisation du fichier {filename_valid} comme jeu de valid.")
-        df_valid, preprocess_pipeline_dir_valid = load_dataset(filename_valid)
+        df_valid, preprocess_pipeline_dir_valid, sparse_data_valid = load_dataset(filename_valid)
         if preprocess_pipeline_dir_valid != preprocess_pipeline_dir:
             logger.warning("")
             logger.warning("Attention, le fichier de validation n'a pas la même pipeline de preprocessing que le fichier de training !")
@@ -188,7 +204,8 @@ def main(filename: str, y_col: list, excluded_cols: list = None,
     # La fonction load_pipeline backup sur no preprocess
     # Mais on doit fit cette pipeline pour être compatible avec la suite
     # Le fit se fait sur le fichier d'entrée (df)
-    if preprocess_pipeline_dir is None:
+    # (pas possible sur des données sparse, la pipeline est alors set par le modèle)
+    if preprocess_pipeline_dir is None and sparse_data is None:
         preprocess_pipeline.fit(df.drop(y_col, axis=1), df[y_col])
 
 
@@ -206,8 +223,13 @@ def main(filename: str, y_col: list, excluded_cols: list = None,
     x_col = [col for col in df_train.columns if col not in cols_to_remove]
 
     # Get x, y for both train and valid
-    x_train = df_train[x_col]
-    x_valid = df_valid[x_col]
+    if sparse_data is None:
+        x_train = df_train[x_col]
+        x_valid = df_valid[x_col]
+    # Features sparse (.npz) : lignes sélectionnées par index, sans densifier (colonnes portées par x_col)
+    else:
+        x_train, x_col = get_sparse_x(df_train, sparse_data, excluded_cols)
+        x_valid, _ = get_sparse_x(df_valid, sparse_data_valid if filename_valid is not None else sparse_data, excluded_cols)
     y_train = df_train[y_col]
     y_valid = df_valid[y_col]
 
@@ -233,23 +255,11 @@ def main(filename: str, y_col: list, excluded_cols: list = None,
     # model = utils_models.search_hp_cv_classifier(model_cls, model_params, hp_params, scoring_fn, kwargs_fit, n_splits=n_splits) # Retourne un model avec les meilleurs params (to be fitted on the whole dataset)
     # TODO:
 
-    if model is None:
-        model = model_ridge_classifier.ModelRidgeClassifier(x_col=x_col, y_col=y_col, level_save=level_save,
-                                                            preprocess_pipeline=preprocess_pipeline,
-                                                            ridge_params={'alpha': 1.0},
-                                                            multi_label=multi_label)
-        # model = model_logistic_regression_classifier.ModelLogisticRegressionClassifier(x_col=x_col, y_col=y_col, level_save=level_save,
-        #                                                                                preprocess_pipeline=preprocess_pipeline,
-        #                                                                                lr_params={'penalty': 'l2', 'C': 1.0, 'max_iter': 100},
-        #                                                                                multi_label=multi_label)
-        # model = model_svm_classifier.ModelSVMClassifier(x_col=x_col, y_col=y_col, level_save=level_save,
-        #                                                 preprocess_pipeline=preprocess_pipeline,
-        #                                                 svm_params={'C': 1.0, 'kernel': 'linear'},
-        #                                                 multi_label=multi_label)
-        # model = model_sgd_classifier.ModelSGDClassifier(x_col=x_col, y_col=y_col, level_save=level_save,
-        #                                                 preprocess_pipeline=preprocess_pipeline,
-        #                                                 sgd_params={'loss': 'hinge', 'penalty': 'elasticnet', 'l1_ratio': 0.5},
-        #                                                 multi_label=multi_label)
+    if model is None and models_config is None:
+        model = model_logistic_regression_classifier.ModelLogisticRegressionClassifier(x_col=x_col, y_col=y_col, level_save=level_save,
+                                                                                       preprocess_pipeline=preprocess_pipeline,
+                                                                                       lr_params={'penalty': 'l2', 'C': 1.0, 'max_iter': 100},
+                                                                                       multi_label=multi_label, confusion_matrix_plots=confusion_matrix_plots)
         # model = model_knn_classifier.ModelKNNClassifier(x_col=x_col, y_col=y_col, level_save=level_save,
         #                                                 preprocess_pipeline=preprocess_pipeline,
         #                                                 knn_params={'n_neighbors': 7, 'weights': 'distance'},
@@ -275,11 +285,56 @@ def main(filename: str, y_col: list, excluded_cols: list = None,
         #                                                   lgbm_params={'num_leaves': 31, 'max_depth': -1,
         #                                                                'learning_rate': 0.1, 'n_estimators': 100},
         #                                                   multi_label=multi_label)
-        # model = model_dense_classifier.ModelDenseClassifier(x_col=x_col, y_col=y_col, level_save=level_save,
-        #                                                     preprocess_pipeline=preprocess_pipeline,
-        #                                                     batch_size=64, epochs=99, patience=5,
-        #                                                     multi_label=multi_label, nb_iter_keras=nb_iter_keras)
 
+    ##############################################
+    # Entrainement, sauvegarde & métriques du modèle
+    ##############################################
+
+    # Series to add
+    cols_to_add: List[pd.Series] = []  # TODO : Mettre ici les colonnes à ajouter dans les données à sauvegarder, par exemple des colonnes de excluded_cols
+    data = {
+        'x_train': x_train, 'y_train': y_train, 'x_valid': x_valid, 'y_valid': y_valid,
+        'series_to_add_train': [df_train[col] for col in cols_to_add],
+        'series_to_add_valid': [df_valid[col] for col in cols_to_add],
+    }
+    json_data = {
+        'filename': filename,
+        'min_rows': min_rows,
+        'preprocess_str': preprocess_str,
+        'excluded_cols': excluded_cols,
+    }
+    del df, df_train, df_valid
+    gc.collect()
+    kwargs_train = {'with_valid': filename_valid is not None, 'preprocess_pipeline_dir': preprocess_pipeline_dir,
+                    'optimize_thresholds': optimize_thresholds}
+
+    # Plusieurs modèles : entraînés en parallèle sur les mêmes données, puis leaderboard
+    if models_config is not None:
+        model_params = {'x_col': x_col, 'y_col': y_col, 'level_save': level_save,
+                        'preprocess_pipeline': preprocess_pipeline, 'multi_label': multi_label,
+                        'confusion_matrix_plots': confusion_matrix_plots}
+        train_models(models_config, data, model_params, json_data, n_jobs=n_jobs, **kwargs_train)
+    else:
+        train_and_evaluate(model, data, json_data, **kwargs_train)
+
+
+def train_and_evaluate(model, data: dict, json_data: dict, with_valid: bool = True,
+                       preprocess_pipeline_dir: str = None, optimize_thresholds: bool = False):
+    '''Fonction pour entraîner, sauvegarder & évaluer un modèle
+
+    Args:
+        model (ModelClass): modèle à entraîner
+        data (dict): x_train, y_train, x_valid, y_valid, series_to_add_train & series_to_add_valid
+        json_data (dict): informations à sauvegarder avec le modèle
+    Kwargs:
+        with_valid (bool): si le jeu de validation doit être donné au fit (fichier de validation dédié)
+        preprocess_pipeline_dir (str): dossier de la pipeline de preprocessing
+        optimize_thresholds (bool): Multi-label : si les seuils de décision de chaque label doivent être optimisés (F1) sur la validation
+    Returns:
+        float: temps d'entraînement (secondes)
+        pd.DataFrame: métriques sur la validation
+    '''
+    x_train, y_train, x_valid, y_valid = data['x_train'], data['y_train'], data['x_valid'], data['y_valid']
 
     # Display if GPU is being used
     model.display_if_gpu_activated()
@@ -290,26 +345,22 @@ def main(filename: str, y_col: list, excluded_cols: list = None,
 
     start_time = time.time()
     logger.info("Entrainement du modèle")
-    if filename_valid is not None:
+    if with_valid:
         model.fit(x_train, y_train, x_valid=x_valid, y_valid=y_valid, with_shuffle=False)
     else:
         model.fit(x_train, y_train, with_shuffle=False)
     fit_time = time.time() - start_time
 
+    # Multi-label : seuils de décision optimisés sur la validation (sauvegardés avec le modèle)
+    if optimize_thresholds and model.multi_label:
+        model.optimize_thresholds(y_valid, model.predict(x_valid, return_proba=True))
+
     ##############################################
     # Sauvegarde du modèle
     ##############################################
 
     # Save model
-    model.save(
-        json_data={
-            'filename': filename,
-            'min_rows': min_rows,
-            'preprocess_str': preprocess_str,
-            'fit_time': f"{round(fit_time, 2)}s",
-            'excluded_cols': excluded_cols,
-        }
-    )
+    model.save(json_data={**json_data, 'fit_time': f"{round(fit_time, 2)}s"})
     # On essaie aussi de save les infos de la pipeline de preprocessing
     if preprocess_pipeline_dir is not None:
         info_file = os.path.join(preprocess_pipeline_dir, 'pipeline.info')
@@ -335,43 +386,169 @@ def main(filename: str, y_col: list, excluded_cols: list = None,
     # par exemple l'embedding utilisé ou les données utilisées
     # model_logget.log_param(key, value) pour enregistrer des informations relatives aux paramètres du modèle
     # par exemple le learning rate
-
-    # Series to add
-    cols_to_add: List[pd.Series] = []  # TODO : Mettre ici les colonnes à ajouter dans les données à sauvegarder, par exemple des colonnes de excluded_cols
-    series_to_add_train = [df_train[col] for col in cols_to_add]
-    series_to_add_valid = [df_valid[col] for col in cols_to_add]
     gc.collect()
 
     # Get results
     y_pred_train = model.predict(x_train, return_proba=False)
     #model_logger.set_tag(key='type_metric', value='train')
-    model.get_and_save_metrics(y_train, y_pred_train, df_x=x_train, series_to_add=series_to_add_train, type_data='train', model_logger=model_logger)
+    model.get_and_save_metrics(y_train, y_pred_train, df_x=x_train, series_to_add=data['series_to_add_train'], type_data='train', model_logger=model_logger)
     gc.collect()
     # Get preds on valid
     y_pred_valid = model.predict(x_valid, return_proba=False)
     #model_logger.set_tag(key='type_metric', value='valid')
-    model.get_and_save_metrics(y_valid, y_pred_valid, df_x=x_valid, series_to_add=series_to_add_valid, type_data='valid', model_logger=model_logger)
+    df_stats_valid = model.get_and_save_metrics(y_valid, y_pred_valid, df_x=x_valid, series_to_add=data['series_to_add_valid'], type_data='valid', model_logger=model_logger)
+    # Plots en arrière-plan (confusion_matrix_plots='background') : on attend leur fin, les erreurs sont levées ici
+    model_classifier.wait_for_confusion_matrix_plots()
     gc.collect()
 
+    # Export instrumentation (si activée)
+    if instrumentation.is_enabled():
+        instrumentation.export(os.path.join(model.model_dir, 'instrumentation.json'))
+        instrumentation.log_to_model_logger(model_logger)
+    # Export suivi mémoire (si activé), à côté de configurations.json
+    if memory_tracker.is_enabled():
+        memory_tracker.save(model.model_dir)
+        memory_tracker.log_to_model_logger(model_logger)
+
     # Stop MLflow
     model_logger.stop_run()
+    return fit_time, df_stats_valid
+
+
+def train_models(models_config: list, data: dict, model_params: dict, json_data: dict, n_jobs: int = None, **kwargs):
+    '''Fonction pour entraîner plusieurs modèles en parallèle (processus) sur les mêmes données, puis écrire un leaderboard
 
+    Les données ne sont chargées & préparées qu'une fois, puis partagées (memory-mapping) entre les processus.
+    Les modèles sont sauvegardés dans un même dossier ynov-models/multi_training/multi_training_{date}/,
+    avec le leaderboard (métriques sur la validation, trié par F1-Score).
 
+    Args:
+        models_config (list): modèles à entraîner, e.g. [{'model_cls': 'model_rf_classifier.ModelRFClassifier',
+            'params': {'rf_params': {'n_estimators': 50}}}, ...] (cf. utils_models.get_model_class)
+        data (dict): x_train, y_train, x_valid, y_valid, series_to_add_train & series_to_add_valid
+        model_params (dict): paramètres communs à tous les modèles (x_col, y_col, level_save, preprocess_pipeline, multi_label, confusion_matrix_plots)
+        json_data (dict): informations à sauvegarder avec chaque modèle
+    Kwargs:
+        n_jobs (int): nombre de modèles entraînés en parallèle (convention joblib : None -> 1, -1 -> tous les coeurs)
+        kwargs: kwargs pour train_and_evaluate (with_valid, preprocess_pipeline_dir, optimize_thresholds)
+    Raises:
+        ValueError : si un modèle n'a pas de 'model_cls'
+    Returns:
+        pd.DataFrame: leaderboard
+    '''
+    if any('model_cls' not in model_config for model_config in models_config):
+        raise ValueError("Chaque modèle de models_config doit avoir une entrée 'model_cls'")
+    # Vérification des classes avant de lancer les entraînements
+    for model_config in models_config:
+        utils_models.get_model_class(model_config['model_cls'])
+    run_dir = os.path.join(utils.get_models_path(), 'multi_training', datetime.now().strftime("multi_training_%Y_%m_%d-%H_%M_%S"))
+    os.makedirs(run_dir)
+    tasks = [{'index': i, 'model_config': model_config, 'model_dir': os.path.join(run_dir, f"{i:02d}_{model_config['model_cls'].split('.')[-1]}"),
+              'model_params': model_params, 'json_data': json_data, 'kwargs': kwargs, 'settings': get_process_settings()}
+             for i, model_config in enumerate(models_config)]
+    logger.info(f"Entrainement de {len(tasks)} modèles (dossier {run_dir})")
+    results = utils_models.run_on_shared_data(train_model_task, tasks, data, n_jobs=n_jobs, folder=os.path.join(run_dir, 'shared_data'))
+
+    # Leaderboard
+    df_leaderboard = pd.DataFrame(results)
+    if 'F1-Score' in df_leaderboard.columns:
+        df_leaderboard = df_leaderboard.sort_values('F1-Score', ascending=False, na_position='last')
+    leaderboard_path = os.path.join(run_dir, 'leaderboard.csv')
+    df_leaderboard.to_csv(leaderboard_path, sep=',', index=False, encoding='utf-8')
+    logger.info(f"Leaderboard sauvegardé dans {leaderboard_path}")
+    logger.info(f"\n{df_leaderboard.to_string(index=False)}")
+    return df_leaderboard
+
+
+def train_model_task(task: dict, data: dict):
+    '''Fonction pour entraîner un modèle de train_models (exécutée dans un processus dédié)
+
+    Une erreur d'un modèle n'arrête pas les autres : elle est reportée dans le leaderboard.
+
+    Args:
+        task (dict): index, model_config, model_dir, model_params, json_data, kwargs & settings
+        data (dict): données partagées
+    Returns:
+        dict: ligne du leaderboard
+    '''
+    # Nouveau processus : état des modules à réappliquer (--float32, instrumentation, suivi mémoire)
+    apply_process_settings(task['settings'])
+    model_config = task['model_config']
+    row = {'index': task['index'], 'model_cls': model_config['model_cls'], 'model_dir': task['model_dir'], 'status': 'OK', 'fit_time': None}
+    try:
+        model_cls = utils_models.get_model_class(model_config['model_cls'])
+        model = model_cls(model_dir=task['model_dir'], **task['model_params'], **model_config.get('params', {}))
+        fit_time, df_stats_valid = train_and_evaluate(model, data, task['json_data'], **task['kwargs'])
+        row['fit_time'] = round(fit_time, 2)
+        global_stats = df_stats_valid[df_stats_valid['Label'] == 'All'].iloc[0]
+        row.update({col: global_stats[col] for col in ['F1-Score', 'Accuracy', 'Precision', 'Recall']})
+    except Exception as e:
+        logger.error(f"Echec de l'entrainement du modèle {model_config['model_cls']} : {repr(e)}")
+        row['status'] = f"ERROR : {repr(e)}"
+    return row
+
+
+def get_process_settings():
+    '''Fonction pour récupérer les paramètres globaux du processus, à réappliquer dans les processus de train_models
+
+    Returns:
+        dict: float_precision, instrumentation & memory_tracker (paramètres si actif, None sinon)
+    '''
+    return {
+        'float_precision': utils.FLOAT_PRECISION,
+        'instrumentation': instrumentation.is_enabled(),
+        'memory_tracker': memory_tracker.get_settings() if memory_tracker.is_enabled() else None,
+    }
+
+
+def apply_process_settings(settings: dict):
+    '''Fonction pour appliquer les paramètres globaux récupérés par get_process_settings
+
+    Args:
+        settings (dict): paramètres (cf. get_process_settings)
+    '''
+    utils.set_float_precision(settings['float_precision'])
+    if settings['instrumentation']:
+        instrumentation.enable()
+    if settings['memory_tracker'] is not None:
+        memory_tracker.enable(**settings['memory_tracker'])
+
+
+def load_models_config(path: str):
+    '''Fonction pour charger la liste des modèles à entraîner (cf. train_models) depuis un .json
+
+    Args:
+        path (str): chemin du fichier, ou nom d'un fichier du dossier des configurations
+    Raises:
+        FileNotFoundError : si le fichier n'existe pas
+    Returns:
+        list: modèles à entraîner
+    '''
+    if not os.path.isfile(path):
+        path = os.path.join(utils.get_configs_path(), path)
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"Le fichier {path} n'existe pas")
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@instrumentation.timed()
 def load_dataset(filename: str):
     '''Fonction pour charger un jeu de données & le preprocess associé
 
     Args:
         filename (str): Nom du jeu de données pour apprentissage
     Raises:
-        ValueError : si l'objet filename ne termine par par '.csv'
+        ValueError : si l'objet filename ne termine par par '.csv' ou '.npz'
         FileNotFoundError : si le fichier n'existe pas
     Returns:
-        DataFrame: dataframe pour l'apprentissage
+        DataFrame: dataframe pour l'apprentissage (cibles uniquement si .npz)
         str: dossier de la pipeline de preprocessing
+        tuple: si .npz, features sparse (CSR) & noms des colonnes, None sinon
     '''
     logger.info("Chargement du jeu de données")
-    if not filename.endswith('.csv'):
-        raise ValueError('L\'objet filename doit terminé par ".csv".')
+    if not filename.endswith(('.csv', '.npz')):
+        raise ValueError('L\'objet filename doit terminé par ".csv" ou ".npz".')
 
     # Get dataset
     data_dir = utils.get_data_path()
@@ -380,7 +557,13 @@ def load_dataset(filename: str):
         raise FileNotFoundError(f"Le fichier {file_path} n'existe pas")
 
     # Load dataset
-    df, first_line = utils.read_csv(file_path, sep=',', encoding='utf-8')
+    # .npz : features sparse gardées à part, la DataFrame ne contient que les cibles (index = ligne des features)
+    if filename.endswith('.npz'):
+        x_sparse, x_sparse_col, df, first_line = utils.read_npz(file_path)
+        sparse_data = (x_sparse, x_sparse_col)
+    else:
+        df, first_line = utils.read_csv(file_path, sep=',', encoding='utf-8')
+        sparse_data = None
     # Attention de bien avoir géré les NaNs dans le preprocessing !
 
     # Get preprocess type
@@ -390,7 +573,26 @@ def load_dataset(filename: str):
         preprocess_pipeline_dir = None # Ne devrait certainement jamais être le cas
 
     # Return
-    return df, preprocess_pipeline_dir
+    return df, preprocess_pipeline_dir, sparse_data
+
+
+def get_sparse_x(df: pd.DataFrame, sparse_data: tuple, excluded_cols: list):
+    '''Fonction pour récupérer les features sparse correspondant aux lignes d'une dataframe (cibles)
+
+    Args:
+        df (pd.DataFrame): dataframe (index = ligne des features, cf. load_dataset)
+        sparse_data (tuple): features sparse (CSR) & noms des colonnes
+        excluded_cols (list): Colonne(s) à ne pas utiliser
+    Returns:
+        sparse.csr_matrix: features
+        list: noms des colonnes
+    '''
+    x_sparse, x_sparse_col = sparse_data
+    kept_index = [i for i, col in enumerate(x_sparse_col) if col not in excluded_cols]
+    x = x_sparse[df.index.to_numpy()]
+    if len(kept_index) != len(x_sparse_col):
+        x = x[:, kept_index]
+    return x, [x_sparse_col[i] for i in kept_index]
 
 
 if __name__ == '__main__':
@@ -403,8 +605,13 @@ if __name__ == '__main__':
     parser.add_argument('-i', '--nb_iter_keras', type=int, default=1, help='Nombre de répétition du modèle pour obtenir une meilleure stabilité')
     parser.add_argument('-l', '--level_save', default='HIGH', help="Niveau de sauvegarde. Possibilités : ['LOW', 'MEDIUM', 'HIGH']")
     parser.add_argument('--force_cpu', dest='on_cpu', action='store_true', help="Entrainement forcé sur CPU (= pas GPU)")
+    parser.add_argument('--float32', dest='float32', action='store_true', help="Précision float32 : données lues & traitées en float32 (mémoire divisée par 2)")
+    parser.add_argument('--optimize_thresholds', dest='optimize_thresholds', action='store_true', help="Multi-label : optimisation des seuils de décision de chaque label sur la validation")
+    parser.add_argument('--confusion_matrix_plots', default='sync', choices=['sync', 'lazy', 'background'], help="Plots des matrices de confusion : 'sync', 'lazy' (pas de plots, matrices sauvegardées) ou 'background' (pool de processus)")
+    parser.add_argument('--models_config', default=None, help="Fichier .json des modèles à entraîner en parallèle, e.g. [{\"model_cls\": \"model_rf_classifier.ModelRFClassifier\", \"params\": {\"rf_params\": {\"n_estimators\": 50}}}]")
+    parser.add_argument('--n_jobs', type=int, default=None, help="Nombre de modèles entraînés en parallèle (avec --models_config, -1 : tous les coeurs)")
 
-    parser.set_defaults(on_cpu=False)
+    parser.set_defaults(on_cpu=False, optimize_thresholds=False)
     args = parser.parse_args()
     # On check si on ne force pas le CPU
     if args.on_cpu:
@@ -412,7 +619,13 @@ if __name__ == '__main__':
         logger.info("----------------------------------------")
         logger.info("UTILISATION CPU FORCEE PAR L'UTILISATEUR")
         logger.info("----------------------------------------")
+    # Précision globale des données numériques
+    if args.float32:
+        utils.set_float_precision('float32')
+        logger.info("Précision float32 : données numériques lues & traitées en float32")
     # Main
     main(filename=args.filename, y_col=args.y_col, excluded_cols=args.excluded_cols,
          min_rows=args.min_rows, filename_valid=args.filename_valid,
-         nb_iter_keras=args.nb_iter_keras, level_save=args.level_save)
\ No newline at end of file
+         nb_iter_keras=args.nb_iter_keras, level_save=args.level_save,
+         optimize_thresholds=args.optimize_thresholds, confusion_matrix_plots=args.confusion_matrix_plots,
+         models_config=args.models_config, n_jobs=args.n_jobs)
\ No newline at end of file
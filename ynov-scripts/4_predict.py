@@ -6,6 +6,8 @@
 
 
 # e.g. poetry run python 4_predict.py --filename test_housing.csv --model model_rf_regressor_2024_11_16-18_40_57
+# Plusieurs modèles (une colonne de prédictions par modèle, preprocessing commun fait une seule fois) :
+# e.g. poetry run python 4_predict.py --filename test_housing.csv --model model_rf_regressor_2024_11_16-18_40_57 model_lgbm_regressor_2024_11_16-18_52_03
 
 
 import os
@@ -14,6 +16,7 @@ import json
 import dill as pickle
 import logging
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 import pandas as pd
 from typing import List
@@ -22,29 +25,36 @@ from datetime import datetime
 
 from ynov import utils
 from ynov.preprocessing import preprocess
-from ynov.models_training import model_class, utils_models
+from ynov.monitoring import instrumentation
+from ynov.models_training import model_class, model_classifier, utils_models
 
 
 # Get logger
 logger = logging.getLogger('ynov.4_predict')
 
 
-def main(filename: str, sep: str, encoding: str, model_dir: str, y_col: list = None):
+def main(filename: str, sep: str, encoding: str, model_dir, y_col: list = None, n_jobs: int = None):
     '''Fonction principale pour l'application d'un algo de ML pour obtenir des prédictions
 
     Args:
         filename (str): Nom du fichier de données pour le test
         sep (str): séparateur du fichier de données
         encoding (str): Encodage du fichier de données
-        model_dir (str): Nom du modèle à utiliser
+        model_dir (str | list): Nom du modèle à utiliser, ou liste de modèles (cf. main_multi_models)
     Kwargs:
         y_col (list): Colonne(s) du dataframe à utiliser pour y_true (def: None)
+        n_jobs (int): Plusieurs modèles : nombre de modèles appliqués en parallèle (threads)
     Raises:
         ValueError : si l'objet filename ne termine pas par .csv
         FileNotFoundError : si l'objet filename n'est pas un fichier existant
     '''
     if not filename.endswith('.csv'):
         raise ValueError('L\'objet filename doit terminé par ".csv".')
+    # Plusieurs modèles : une seule lecture du fichier & un seul preprocessing par pipeline
+    if isinstance(model_dir, (list, tuple)):
+        if len(model_dir) > 1:
+            return main_multi_models(filename, sep=sep, encoding=encoding, model_dirs=list(model_dir), y_col=y_col, n_jobs=n_jobs)
+        model_dir = model_dir[0]
 
     # Process
     data_dir = utils.get_data_path()
@@ -62,8 +72,7 @@ def main(filename: str, sep: str, encoding: str, model_dir: str, y_col: list = N
 
     # Try to keep only needed/wanted columns
     # It is useful if --excluded_cols used in training
-    if all([col in df_prep.columns for col in model.x_col]):
-        df_prep = df_prep[model.x_col]
+    df_prep = select_model_columns(df_prep, model)
 
     # Get predictions
     logger.info("Prédictions sur le jeu de données")
@@ -97,27 +106,145 @@ def main(filename: str, sep: str, encoding: str, model_dir: str, y_col: list = N
 
     # Get metrics if y_col is not None
     if y_col is not None:
+        save_metrics(df, y_col, y_pred, model, save_dir)
+
+    # Export instrumentation (si activée)
+    if instrumentation.is_enabled():
+        instrumentation.export(os.path.join(save_dir, 'instrumentation.json'))
+
+
+def main_multi_models(filename: str, sep: str, encoding: str, model_dirs: list, y_col: list = None, n_jobs: int = None):
+    '''Fonction pour appliquer plusieurs modèles à un même fichier
+
+    Le fichier est lu une seule fois. Les modèles sont regroupés par pipeline de preprocessing
+    (cf. utils_models.get_pipeline_fingerprint) : le preprocessing est appliqué une seule fois par groupe,
+    puis les données preprocessed sont données à chaque modèle du groupe (en parallèle, threads).
+    Un seul fichier de sortie : une colonne de prédictions par modèle (nom du modèle).
+
+    Args:
+        filename (str): Nom du fichier de données pour le test
+        sep (str): séparateur du fichier de données
+        encoding (str): Encodage du fichier de données
+        model_dirs (list): Noms des modèles à utiliser
+    Kwargs:
+        y_col (list): Colonne(s) du dataframe à utiliser pour y_true (def: None)
+        n_jobs (int): nombre de modèles appliqués en parallèle (threads, None -> 1, -1 -> tous les coeurs)
+    Raises:
+        ValueError : si un modèle est donné plusieurs fois
+        FileNotFoundError : si l'objet filename n'est pas un fichier existant
+    '''
+    if len(set(model_dirs)) != len(model_dirs):
+        raise ValueError("Un même modèle ne peut pas être donné plusieurs fois")
+
+    # Process
+    data_dir = utils.get_data_path()
+    df_path = os.path.join(data_dir, filename)
+    if not os.path.isfile(df_path):
+        raise FileNotFoundError(f"Le fichier {filename} n'existe pas.")
+
+    # Load models & group them by preprocessing pipeline
+    logger.info(f"Chargement de {len(model_dirs)} modèles")
+    models = {}
+    groups = {}
+    for model_dir in model_dirs:
+        model, model_conf = utils_models.load_model(model_dir=model_dir)
+        models[model_dir] = (model, model_conf)
+        groups.setdefault(utils_models.get_pipeline_fingerprint(model.preprocess_pipeline), []).append(model_dir)
+    logger.info(f"{len(groups)} pipeline(s) de preprocessing différente(s) pour {len(model_dirs)} modèles")
+
+    # Load dataset (une seule fois)
+    logger.info("Chargement du dataset")
+    df, _ = utils.read_csv(df_path, sep=sep, encoding=encoding)
+
+    # Preprocessing par groupe, puis prédictions de chaque modèle du groupe
+    n_jobs, _ = utils_models.balance_n_jobs(len(model_dirs), n_jobs)
+    predictions = {}
+    for group_model_dirs in groups.values():
+        logger.info(f"Preprocessing commun aux modèles {group_model_dirs}")
+        # Toutes les colonnes de la pipeline : chaque modèle garde les siennes (--excluded_cols à l'entrainement)
+        df_prep, prep_columns = apply_preprocessing(df, models[group_model_dirs[0]][0])
+
+        def predict_model(model_dir: str):
+            model = models[model_dir][0]
+            return model_dir, list(model.predict(select_model_columns(df_prep, model, prep_columns=prep_columns), return_proba=False))
+
+        logger.info("Prédictions sur le jeu de données")
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            predictions.update(executor.map(predict_model, group_model_dirs))
+        del df_prep
+
+    # Add preds to original - non preprocessed - dataframe (une colonne par modèle, dans l'ordre donné)
+    for model_dir in model_dirs:
+        model = models[model_dir][0]
+        df[model_dir] = list(model.inverse_transform(np.array(predictions[model_dir])))
+
+    # Save result
+    logger.info("Sauvegarde")
+    save_dir = os.path.join(data_dir, 'predictions', Path(filename).stem, datetime.now().strftime("predictions_%Y_%m_%d-%H_%M_%S"))
+    if not os.path.isdir(save_dir):
+        os.makedirs(save_dir)
+    file_path = os.path.join(save_dir, "predictions.csv")
+    df[["id"] + model_dirs].to_csv(file_path, sep=',', encoding='utf-8', index=None)
+
+    # Also save some info into a configs file
+    conf_path = os.path.join(save_dir, 'configurations.json')
+    conf = {
+        'model_dirs': model_dirs,
+        'models': {model_dir: {'preprocess_str': model_conf['preprocess_str'], 'model_name': model_conf['model_name']}
+                   for model_dir, (_, model_conf) in models.items()},
+        'preprocessing_groups': list(groups.values()),
+    }
+    with open(conf_path, 'w', encoding='utf-8') as f:
+        json.dump(conf, f, indent=4)
+
+    # Get metrics if y_col is not None (un sous-dossier par modèle)
+    if y_col is not None:
+        for model_dir in model_dirs:
+            save_metrics(df, y_col, predictions[model_dir], models[model_dir][0], os.path.join(save_dir, model_dir))
+
+    # Export instrumentation (si activée)
+    if instrumentation.is_enabled():
+        instrumentation.export(os.path.join(save_dir, 'instrumentation.json'))
+
+
+def save_metrics(df: pd.DataFrame, y_col: list, y_pred: list, model, save_dir: str):
+    '''Fonction pour calculer & sauvegarder les métriques d'un modèle sur le fichier
+
+    Args:
+        df (pd.DataFrame): dataframe chargée (contenant y_col)
+        y_col (list): Colonne(s) du dataframe à utiliser pour y_true
+        y_pred (list): prédictions du modèle
+        model (ModelClass): modèle utilisé pour les prédictions
+        save_dir (str): dossier où sauvegarder les métriques
+    Raises:
+        NotImplementedError : si plusieurs colonnes y_col pour un modèle de régression
+    '''
 
-        ### TODO
-        ### Faire en sorte d'avoir le bon format en entrée (comme dans 2_training.py)
-        ### TODO
+    ### TODO
+    ### Faire en sorte d'avoir le bon format en entrée (comme dans 2_training.py)
+    ### TODO
 
-        if model.model_type == 'classifier':
-            if len(y_col) > 1:
-                y_true = df[y_col].astype(int)  # Need to cast OHE encoded var into integers
-            else:
-                y_true = df[y_col[0]].astype(str)
+    if model.model_type == 'classifier':
+        if len(y_col) > 1:
+            y_true = df[y_col].astype(int)  # Need to cast OHE encoded var into integers
         else:
-            if len(y_col) > 1:
-                raise NotImplementedError("Les modèles de type regression ne supporte pas (encore) le multioutput")
-            else:
-                y_true = df[y_col[0]].astype(float)
+            y_true = df[y_col[0]].astype(str)
+    else:
+        if len(y_col) > 1:
+            raise NotImplementedError("Les modèles de type regression ne supporte pas (encore) le multioutput")
+        else:
+            y_true = df[y_col[0]].astype(float)
 
-        cols_to_add: List[pd.Series] = []  # TODO : Mettre ici les colonnes à ajouter dans les données à sauvegarder
-        series_to_add = [df[col] for col in cols_to_add]
-        # Change model directory to save dir & get preds
-        model.model_dir = save_dir
-        model.get_and_save_metrics(y_true, y_pred, series_to_add=series_to_add, type_data='with_y_true')
+    cols_to_add: List[pd.Series] = []  # TODO : Mettre ici les colonnes à ajouter dans les données à sauvegarder
+    series_to_add = [df[col] for col in cols_to_add]
+    # Change model directory to save dir & get preds
+    if not os.path.isdir(save_dir):
+        os.makedirs(save_dir)
+    model.model_dir = save_dir
+    model.get_and_save_metrics(y_true, y_pred, series_to_add=series_to_add, type_data='with_y_true')
+    # Modèle entrainé avec confusion_matrix_plots='background' : on attend les plots (et leurs erreurs)
+    if model.model_type == 'classifier':
+        model_classifier.wait_for_confusion_matrix_plots()
 
 
 def load_dataset_test(df_path: str, sep: str, encoding: str, model):
@@ -133,7 +260,7 @@ def load_dataset_test(df_path: str, sep: str, encoding: str, model):
         FileNotFoundError : si le chemin df_path ne pointe pas sur fichier existant
     Returns:
         pd.DataFrame: dataframe chargée
-        pd.DataFrame: dataframe chargée - preprocessed
+        pd.DataFrame: dataframe chargée - preprocessed (sparse.csr_matrix si la pipeline produit des données sparse)
     '''
     if not os.path.isfile(df_path):
         raise FileNotFoundError(f"Le fichier {df_path} n'existe pas.")
@@ -141,15 +268,65 @@ def load_dataset_test(df_path: str, sep: str, encoding: str, model):
     # Get dataset
     df, _ = utils.read_csv(df_path, sep=sep, encoding=encoding)
 
+    # Return
+    return df, preprocess_dataset(df, model)
+
+
+def preprocess_dataset(df: pd.DataFrame, model):
+    ''' Fonction pour appliquer le preprocessing d'un modèle à un dataset
+
+    Args:
+        df (pd.DataFrame): dataframe chargée
+        model (ModelClass): modèle à utiliser pour les prédictions
+    Returns:
+        pd.DataFrame: dataframe preprocessed (sparse.csr_matrix si la pipeline produit des données sparse)
+    '''
     # Apply preprocessing
-    if model.preprocess_pipeline is not None:
-        df_prep = utils_models.apply_pipeline(df, model.preprocess_pipeline)
+    # Sortie sparse : on ne garde que les colonnes du modèle (utile si --excluded_cols à l'entrainement)
+    df_prep, prep_columns = apply_preprocessing(df, model)
+
+    # Return
+    return select_model_columns(df_prep, model, prep_columns=prep_columns)
+
+
+def apply_preprocessing(df: pd.DataFrame, model):
+    ''' Fonction pour appliquer la pipeline de preprocessing d'un modèle à un dataset (toutes les colonnes en sortie)
+
+    Args:
+        df (pd.DataFrame): dataframe chargée
+        model (ModelClass): modèle dont on applique la pipeline
+    Returns:
+        pd.DataFrame: dataframe preprocessed (sparse.csr_matrix si la pipeline produit des données sparse)
+        list: noms des colonnes de la sortie sparse (None sinon)
+    '''
+    # Sortie sparse : CSR, sans densifier
+    if model.preprocess_pipeline is not None and getattr(model.preprocess_pipeline, 'sparse_output_', False):
+        return utils_models.apply_pipeline(df, model.preprocess_pipeline, sparse_output=True)
+    elif model.preprocess_pipeline is not None:
+        return utils_models.apply_pipeline(df, model.preprocess_pipeline), None
     else:
-        df_prep = df.copy()
         logger.warning("On ne trouve pas de pipeline de preprocessing - on considère no preprocessing, mais ce n'est pas normal !")
+        return df.copy(), None
 
-    # Return
-    return df, df_prep
+
+def select_model_columns(df_prep, model, prep_columns: list = None):
+    ''' Fonction pour ne garder que les colonnes d'un modèle, si possible (utile si --excluded_cols à l'entrainement)
+
+    Args:
+        df_prep (?): données preprocessed
+        model (ModelClass): modèle à utiliser pour les prédictions
+    Kwargs:
+        prep_columns (list): données sparse (CSR) : noms des colonnes de df_prep (sinon, CSR inchangée)
+    Returns:
+        ?: données preprocessed (colonnes du modèle si toutes présentes)
+    '''
+    if hasattr(df_prep, 'columns') and all([col in df_prep.columns for col in model.x_col]):
+        df_prep = df_prep[model.x_col]
+    elif prep_columns is not None:
+        prep_index = {str(col): i for i, col in enumerate(prep_columns)}
+        if len(prep_columns) != len(model.x_col) and all([str(col) in prep_index for col in model.x_col]):
+            df_prep = df_prep[:, [prep_index[str(col)] for col in model.x_col]]
+    return df_prep
 
 
 if __name__ == '__main__':
@@ -159,8 +336,10 @@ if __name__ == '__main__':
     parser.add_argument('--encoding', default="utf-8", help='Encoding du csv')
     parser.add_argument('-y', '--y_col', nargs='+', default=None, help='Colonne(s) en sortie du modèle (y)')
     # model_X should be the model's directory name: e.g. model_tfidf_svm_2019_12_05-12_57_18
-    parser.add_argument('-m', '--model_dir', default=None, help='Nom du model à utiliser')
+    parser.add_argument('-m', '--model_dir', nargs='+', default=None, help='Nom du model à utiliser (plusieurs : une colonne de prédictions par modèle)')
+    parser.add_argument('--n_jobs', type=int, default=None, help='Plusieurs modèles : nombre de modèles appliqués en parallèle (-1 : tous les coeurs)')
     parser.add_argument('--force_cpu', dest='on_cpu', action='store_true', help="Entrainement forcé sur CPU (= pas GPU)")
+    parser.add_argument('--float32', dest='float32', action='store_true', help="Précision float32 : données lues & traitées en float32 (mémoire divisée par 2)")
     parser.set_defaults(on_cpu=False)
     args = parser.parse_args()
     # On check si on ne force pas le CPU
@@ -169,5 +348,9 @@ if __name__ == '__main__':
         logger.info("----------------------------------------")
         logger.info("UTILISATION CPU FORCEE PAR L'UTILISATEUR")
         logger.info("----------------------------------------")
+    # Précision globale des données numériques
+    if args.float32:
+        utils.set_float_precision('float32')
+        logger.info("Précision float32 : données numériques lues & traitées en float32")
     # Main
-    main(filename=args.filename, sep=args.sep, encoding=args.encoding, model_dir=args.model_dir, y_col=args.y_col)
\ No newline at end of file
+    main(filename=args.filename, sep=args.sep, encoding=args.encoding, model_dir=args.model_dir, y_col=args.y_col, n_jobs=args.n_jobs)
\ No newline at end of file
@@ -14,15 +14,17 @@ import logging
 import numpy as np
 import pandas as pd
 import dill as pickle
+from typing import List
 from datetime import datetime
 from sklearn.pipeline import Pipeline
 from sklearn.neighbors import KNeighborsClassifier
 from sklearn.multioutput import MultiOutputClassifier
 from sklearn.multiclass import OneVsRestClassifier, OneVsOneClassifier
 from ynov import utils
-from ynov.models_training import utils_models
+from ynov.models_training import utils_models, utils_knn
 from ynov.models_training.model_pipeline import ModelPipeline
 from ynov.models_training.model_classifier import ModelClassifierMixin
+from ynov.monitoring import instrumentation
 
 
 class ModelKNNClassifier(ModelClassifierMixin, ModelPipeline):
@@ -30,17 +32,27 @@ class ModelKNNClassifier(ModelClassifierMixin, ModelPipeline):
 
     _default_name = 'model_knn_classifier'
 
-    def __init__(self, knn_params: dict = {}, multiclass_strategy: str = None, **kwargs):
+    def __init__(self, knn_params: dict = {}, multiclass_strategy: str = None, knn_backend: str = 'sklearn', **kwargs):
         '''Initialisation de la classe (voir ModelPipeline, ModelClass & ModelClassifierMixin pour arguments supplémentaires)
 
         Kwargs:
             knn_params (dict) : paramètres pour le K-nearest Neighbors
             multiclass_strategy (str): stratégie multiclass, 'ovr' (OneVsRest), ou 'ovo' (OneVsOne). Si None, on laisse l'algo tel quel.
+            knn_backend (str): recherche des voisins, 'sklearn' (exacte) ou 'ivf' (approchée, cf. utils_knn).
+                Avec 'ivf', knn_params accepte n_neighbors, weights, n_lists, n_probe, n_iter & random_state.
         Raises:
             ValueError: si multiclass_strategy n'est pas 'ovo' ou 'ovr' (si pas None)
+            ValueError: si knn_backend n'est pas 'sklearn' ou 'ivf'
+            ValueError: si multiclass_strategy avec knn_backend 'ivf'
         '''
         if multiclass_strategy is not None and multiclass_strategy not in ['ovo', 'ovr']:
             raise ValueError(f"La valeur de 'multiclass_strategy' doit être 'ovo' ou 'ovr' (pas {multiclass_strategy})")
+        if knn_backend not in ['sklearn', 'ivf']:
+            raise ValueError(f"La valeur de 'knn_backend' doit être 'sklearn' ou 'ivf' (pas {knn_backend})")
+        # Chaque sous-estimateur construirait son propre index sur tout le train (mémoire x n_classes)
+        # L'estimateur approché est nativement multiclass : pas besoin de stratégie
+        if knn_backend == 'ivf' and multiclass_strategy is not None:
+            raise ValueError("Le backend 'ivf' ne supporte pas de 'multiclass_strategy' (nativement multiclass)")
         # Init.
         super().__init__(**kwargs)
 
@@ -48,7 +60,11 @@ class ModelKNNClassifier(ModelClassifierMixin, ModelPipeline):
         self.logger = logging.getLogger(__name__)
 
         # Gestion modèles
-        self.knn = KNeighborsClassifier(**knn_params)
+        self.knn_backend = knn_backend
+        if knn_backend == 'ivf':
+            self.knn = utils_knn.ApproximateKNeighborsClassifier(**knn_params)
+        else:
+            self.knn = KNeighborsClassifier(**knn_params)
         self.multiclass_strategy = multiclass_strategy
 
         # On ne gère pas le multilabel / mutliclass
@@ -66,6 +82,7 @@ class ModelKNNClassifier(ModelClassifierMixin, ModelPipeline):
             self.pipeline = Pipeline([('knn', self.knn)])
 
     @utils.trained_needed
+    @instrumentation.timed()
     def predict_proba(self, x_test: pd.DataFrame, **kwargs):
         '''Prédictions probabilité sur test
             'ovo' ne peut pas prédire de probas. Par défaut on retourne 1. si classe pred, sinon 0.
@@ -82,10 +99,29 @@ class ModelKNNClassifier(ModelClassifierMixin, ModelPipeline):
             preds = self.pipeline.predict(x_test)
             # Format ['a', 'b', 'c', 'a', ..., 'b']
             # Transform to "proba"
-            transform_dict = {col: [0. if _ != i else 1. for _ in range(len(self.list_classes))] for i, col in enumerate(self.list_classes)}
-            probas = np.array([transform_dict[x] for x in preds])
+            probas = utils_models.get_one_hot_probas(preds, self.list_classes)
         return probas
 
+    def get_and_save_metrics(self, y_true, y_pred, df_x: pd.DataFrame = None, series_to_add: List[pd.Series] = None, type_data: str = '', model_logger=None):
+        '''Fonction pour obtenir et sauvegarder les métriques d'un modèle (voir ModelClassifierMixin)
+        Avec un backend approché, on ajoute le recall de l'index par rapport à la recherche exacte (si df_x est fourni)
+
+        Args:
+            y_true (?): array-like, shape = [n_samples, n_features]
+            y_pred (?): array-like, shape = [n_samples, n_features]
+        Kwargs:
+            df_x (?): DataFrame en entrée de la prédiction
+            series_to_add (list): liste de pd.Series à ajouter à la dataframe
+            type_data (str): type du dataset (validation, test, ...)
+            model_logger (ModelLogger): classe custom pour logger les métriques dans ML Flow
+        Returns:
+            pd.DataFrame: la df qui contient les statistiques
+        '''
+        df_stats = super().get_and_save_metrics(y_true, y_pred, df_x=df_x, series_to_add=series_to_add, type_data=type_data, model_logger=model_logger)
+        if self.knn_backend != 'sklearn' and df_x is not None:
+            utils_knn.get_and_save_recall(self, df_x, type_data=type_data, model_logger=model_logger)
+        return df_stats
+
     def save(self, json_data: dict = None):
         '''Sauvegarde du modèle
 
@@ -99,6 +135,7 @@ class ModelKNNClassifier(ModelClassifierMixin, ModelPipeline):
             json_data = {}
 
         json_data['multiclass_strategy'] = self.multiclass_strategy
+        json_data['knn_backend'] = self.knn_backend
 
         # Save
         super().save(json_data=json_data)
@@ -153,10 +190,13 @@ class ModelKNNClassifier(ModelClassifierMixin, ModelPipeline):
         self.list_classes = configs['list_classes'] if 'list_classes' in configs.keys() else self.list_classes
         self.dict_classes = configs['dict_classes'] if 'dict_classes' in configs.keys() else self.dict_classes
         self.multi_label = configs['multi_label'] if 'multi_label' in configs.keys() else self.multi_label
+        self.multi_label_thresholds = configs['multi_label_thresholds'] if 'multi_label_thresholds' in configs.keys() else None
+        self.confusion_matrix_plots = configs['confusion_matrix_plots'] if 'confusion_matrix_plots' in configs.keys() else self.confusion_matrix_plots
         self.level_save = configs['level_save'] if 'level_save' in configs.keys() else self.level_save
         self.nb_fit = configs['nb_fit'] if 'nb_fit' in configs.keys() else 1 # On considère 1 unique fit par défaut
         self.trained = configs['trained'] if 'trained' in configs.keys() else True # On considère trained par défaut
         self.multiclass_strategy = configs['multiclass_strategy'] if 'multiclass_strategy' in configs.keys() else self.multiclass_strategy
+        self.knn_backend = configs['knn_backend'] if 'knn_backend' in configs.keys() else 'sklearn'
 
         # Reload pipeline model
         with open(model_pipeline_path, 'rb') as f:
@@ -17,12 +17,12 @@ import dill as pickle
 from datetime import datetime
 from sklearn.pipeline import Pipeline
 from sklearn.linear_model import LogisticRegression
-from sklearn.multioutput import MultiOutputClassifier
 from sklearn.multiclass import OneVsRestClassifier, OneVsOneClassifier
 from ynov import utils
 from ynov.models_training import utils_models
 from ynov.models_training.model_pipeline import ModelPipeline
 from ynov.models_training.model_classifier import ModelClassifierMixin
+from ynov.monitoring import instrumentation
 
 
 class ModelLogisticRegressionClassifier(ModelClassifierMixin, ModelPipeline):
@@ -63,9 +63,10 @@ class ModelLogisticRegressionClassifier(ModelClassifierMixin, ModelPipeline):
 
         # Le LogisticRegression ne supporte pas nativement le multi_label
         if self.multi_label:
-            self.pipeline = Pipeline([('lr', MultiOutputClassifier(self.lr))])
+            self.pipeline = Pipeline([('lr', utils_models.SparseTargetMultiOutputClassifier(self.lr))])
 
     @utils.trained_needed
+    @instrumentation.timed()
     def predict_proba(self, x_test: pd.DataFrame, **kwargs):
         '''Prédictions probabilité sur test
             'ovo' ne peut pas prédire de probas. Par défaut on retourne 1. si classe pred, sinon 0.
@@ -82,8 +83,7 @@ class ModelLogisticRegressionClassifier(ModelClassifierMixin, ModelPipeline):
             preds = self.pipeline.predict(x_test)
             # Format ['a', 'b', 'c', 'a', ..., 'b']
             # Transform to "proba"
-            transform_dict = {col: [0. if _ != i else 1. for _ in range(len(self.list_classes))] for i, col in enumerate(self.list_classes)}
-            probas = np.array([transform_dict[x] for x in preds])
+            probas = utils_models.get_one_hot_probas(preds, self.list_classes)
         return probas
 
     def save(self, json_data: dict = None):
@@ -153,6 +153,8 @@ class ModelLogisticRegressionClassifier(ModelClassifierMixin, ModelPipeline):
         self.list_classes = configs['list_classes'] if 'list_classes' in configs.keys() else self.list_classes
         self.dict_classes = configs['dict_classes'] if 'dict_classes' in configs.keys() else self.dict_classes
         self.multi_label = configs['multi_label'] if 'multi_label' in configs.keys() else self.multi_label
+        self.multi_label_thresholds = configs['multi_label_thresholds'] if 'multi_label_thresholds' in configs.keys() else None
+        self.confusion_matrix_plots = configs['confusion_matrix_plots'] if 'confusion_matrix_plots' in configs.keys() else self.confusion_matrix_plots
         self.level_save = configs['level_save'] if 'level_save' in configs.keys() else self.level_save
         self.nb_fit = configs['nb_fit'] if 'nb_fit' in configs.keys() else 1 # On considère 1 unique fit par défaut
         self.trained = configs['trained'] if 'trained' in configs.keys() else True # On considère trained par défaut
@@ -16,17 +16,22 @@ import pandas as pd
 import dill as pickle
 from datetime import datetime
 from xgboost import XGBClassifier
-from sklearn.model_selection import train_test_split
+from scipy import sparse
 from sklearn.multioutput import MultiOutputClassifier
-from sklearn.utils.validation import _check_fit_params, _deprecate_positional_args
+from sklearn.utils.validation import has_fit_parameter, _deprecate_positional_args
 from sklearn.utils.multiclass import check_classification_targets
-from sklearn.base import is_classifier
+from sklearn.base import is_classifier, clone
 from joblib import Parallel, delayed
 from sklearn.multioutput import _fit_estimator
+try:
+    from sklearn.utils.validation import _check_fit_params
+except ImportError:  # sklearn >= 1.3
+    from sklearn.utils.validation import _check_method_params as _check_fit_params
 from ynov import utils
-from ynov.models_training import utils_models
+from ynov.models_training import utils_models, utils_xgboost
 from ynov.models_training.model_class import ModelClass
 from ynov.models_training.model_classifier import ModelClassifierMixin
+from ynov.monitoring import instrumentation
 
 
 class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
@@ -34,7 +39,8 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
 
     _default_name = 'model_xgboost_classifier'
 
-    def __init__(self, xgboost_params: dict = {}, early_stopping_rounds: int = 5, validation_split: float = 0.2, **kwargs):
+    def __init__(self, xgboost_params: dict = {}, early_stopping_rounds: int = 5, validation_split: float = 0.2,
+                 eval_train_size=None, multi_label_strategy: str = 'one_model_per_label', **kwargs):
         '''Initialisation de la classe (voir ModelClass & ModelClassifierMixin pour arguments supplémentaires)
 
         Kwargs:
@@ -43,7 +49,17 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
             early_stopping_rounds (int):
             validation_split (float): fraction validation split.
                 Utile seulement si pas de jeu de validation en entrée du fit.
+            eval_train_size (float ou int): taille du sous-échantillon du train évalué à chaque itération
+                (float -> fraction, int -> nombre de lignes). Si None, seule la validation est évaluée.
+            multi_label_strategy (str): stratégie multi-label
+                'one_model_per_label' -> un xgboost par label (MultiOutputClassifier)
+                'native' -> un unique xgboost multi-output (xgboost >= 2.0, arbres multi-output),
+                    prédictions bien moins coûteuses avec beaucoup de labels
+        Raises:
+            ValueError: si multi_label_strategy n'est pas une stratégie connue
         '''
+        if multi_label_strategy not in ['one_model_per_label', 'native']:
+            raise ValueError(f"L'objet multi_label_strategy ({multi_label_strategy}) n'est pas une stratégie connue ('one_model_per_label', 'native')")
         # Init.
         super().__init__(**kwargs)
 
@@ -54,6 +70,8 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
         self.xgboost_params = xgboost_params
         self.early_stopping_rounds = early_stopping_rounds
         self.validation_split = validation_split
+        self.eval_train_size = eval_train_size
+        self.multi_label_strategy = multi_label_strategy
 
         # Set objective (if not in params) & init. model
         if 'objective' not in self.xgboost_params.keys():
@@ -63,14 +81,45 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
         # https://stackoverflow.com/questions/57986259/multiclass-classification-with-xgboost-classifier
         self.model = XGBClassifier(**self.xgboost_params)
 
-        # Si multilabel, on utilise MultiOutputClassifier
+        # Si multilabel, on utilise MultiOutputClassifier, ou un unique xgboost multi-output si possible
         if self.multi_label:
-            self.model = MyMultiOutputClassifier(self.model)
+            if self.multi_label_strategy == 'native' and not self._native_multi_label_available():
+                self.logger.warning("La version de xgboost ne gère pas les arbres multi-output -> un modèle par label")
+                self.multi_label_strategy = 'one_model_per_label'
+            if self.multi_label_strategy == 'native':
+                native_params = {'tree_method': 'hist', 'multi_strategy': 'multi_output_tree', **self.xgboost_params}
+                self.model = XGBClassifier(**native_params)
+            else:
+                self.model = MyMultiOutputClassifier(self.model, n_jobs=-1)
+
+    @staticmethod
+    def _native_multi_label_available():
+        '''Indique si xgboost gère le multi-label avec un unique modèle (arbres multi-output, xgboost >= 2.0)
+
+        Returns:
+            bool: si la stratégie 'native' est disponible
+        '''
+        return 'multi_strategy' in XGBClassifier().get_params()
 
-    def fit(self, x_train, y_train, x_valid=None, y_valid=None, with_shuffle: bool = True, **kwargs):
+    def _is_multi_output_classifier(self):
+        '''Indique si le modèle est un MultiOutputClassifier (un xgboost par label)
+
+        Returns:
+            bool: si self.model est un MyMultiOutputClassifier
+        '''
+        return isinstance(self.model, MyMultiOutputClassifier)
+
+    @instrumentation.timed()
+    def fit(self, x_train, y_train, x_valid=None, y_valid=None, with_shuffle: bool = True, chunksize: int = 100000,
+            incremental: bool = False, **kwargs):
         '''Entrainement du modèle
            **kwargs permet la comptabilité avec les modèles keras
 
+        Mémoire externe : x_train peut aussi être le chemin d'un fichier (.csv, e.g. sortie de 1_preprocess_data.py,
+        ou .parquet) ou une fonction retournant des chunks (DataFrames). y_train est alors le nom de la colonne cible
+        (ou None pour utiliser y_col) et x_valid le chemin d'un fichier de validation ou des données en mémoire.
+        Le train est lu par chunks (cf. utils_xgboost), la mémoire utilisée reste bornée.
+
         Args:
             x_train (?): array-like, shape = [n_samples, n_features]
             y_train (?): array-like, shape = [n_samples, n_features]
@@ -79,24 +128,34 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
         Kwargs:
             with_shuffle (boolean): si x, y doivent être mélangés avant le fit
                 Experimental: fonctionnement à vérifier en fonction différents formats x, y
+            chunksize (int): nombre de lignes par chunk (mémoire externe, fichiers uniquement)
+            incremental (bool): si un modèle déjà entraîné doit continuer son boosting sur les nouvelles données
+                (n_estimators nouveaux arbres ajoutés au booster existant). Sans effet si le modèle n'est pas encore entraîné.
         Raises:
-            RuntimeError: si on essaie d'entrainer un modèle déjà fit
+            RuntimeError: si on essaie d'entrainer un modèle déjà fit (hors mode incrémental)
         '''
-        # TODO: voir si on peut continuer l'entrainement d'un xgboost
-        if self.trained:
+        if self.trained and not incremental:
             self.logger.error("Il n'est pas prévu de pouvoir réentrainer un modèle de type xgboost")
-            self.logger.error("Veuillez entrainer un nouveau modèle")
+            self.logger.error("Veuillez entrainer un nouveau modèle (ou utiliser incremental=True)")
             raise RuntimeError("Impossible de réentrainer un modèle de type pipeline sklearn")
+        # Booster à partir duquel continuer le boosting (mode incrémental)
+        xgb_model = self._get_booster_to_continue() if self.trained else None
+
+        # Mémoire externe
+        if utils_xgboost.is_external_data(x_train):
+            self._fit_external_memory(x_train, y_col=y_train, x_valid=x_valid, y_valid=y_valid, chunksize=chunksize,
+                                      xgb_model=xgb_model)
+            return
 
         # On check le format des entrants
         x_train, y_train = self._check_input_format(x_train, y_train, fit_function=True)
         # Si validation, on check aussi le format (mais fit_function à None)
         if y_valid is not None and x_valid is not None:
             x_valid, y_valid = self._check_input_format(x_valid, y_valid, fit_function=False)
-        # Sinon, on split random
-        else:
-            self.logger.warning(f"Attention, pas de jeu de validation. On va donc split le jeu de training (fraction valid = {self.validation_split})")
-            x_train, x_valid, y_train, y_valid = train_test_split(x_train, y_train, test_size=self.validation_split)
+
+        # Mode incrémental : xgboost impose les mêmes classes
+        if xgb_model is not None and not self.multi_label and set(np.unique(y_train)) != set(self.list_classes):
+            raise ValueError(f"Les classes des nouvelles données ({list(np.unique(y_train))}) ne correspondent pas à celles du modèle ({self.list_classes})")
 
         # Récupération des colonnes en entrées pour la suite
         if hasattr(y_train, 'columns'):
@@ -104,26 +163,24 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
         else:
             original_list_classes = None
 
-        # Shuffle x, y if wanted
-        if with_shuffle:
-            p = np.random.permutation(len(x_train))
-            x_train = np.array(x_train)[p]
-            y_train = np.array(y_train)[p]
-        # Else still transform to numpy array
-        else:
-            x_train = np.array(x_train)
-            y_train = np.array(y_train)
-
-        # Also get x_valid & y_valid as numpy
-        x_valid = np.array(x_valid)
-        y_valid = np.array(y_valid)
-
-
-        # Set eval set and train
-        eval_set = [(x_train, y_train), (x_valid, y_valid)] # If there’s more than one item in eval_set, the last entry will be used for early stopping.
-        prior_objective = self.model.objective if not self.multi_label else self.model.estimator.objective
-        self.model.fit(x_train, y_train, eval_set=eval_set, early_stopping_rounds=self.early_stopping_rounds, verbose=True)
-        post_objective = self.model.objective if not self.multi_label else self.model.estimator.objective
+        # Conversion numpy, split & shuffle par index (pas de copies inutiles)
+        # xgboost construit ensuite une unique (Quantile)DMatrix pour le train
+        x_train, y_train, eval_set = utils_models.get_xgboost_fit_data(x_train, y_train, x_valid=x_valid, y_valid=y_valid,
+                                                                       validation_split=self.validation_split,
+                                                                       with_shuffle=with_shuffle,
+                                                                       eval_train_size=self.eval_train_size)
+
+        # Cibles multi-label sparse : un xgboost par label densifie colonne par colonne, le modèle natif a besoin d'un array
+        if sparse.issparse(y_train) and not self._is_multi_output_classifier():
+            y_train = y_train.toarray()
+            eval_set = [(x, y.toarray() if sparse.issparse(y) else y) for x, y in eval_set]
+
+        # Early stopping sur le dernier élément de eval_set (validation)
+        estimator = self.model if not self._is_multi_output_classifier() else self.model.estimator
+        estimator.set_params(early_stopping_rounds=self.early_stopping_rounds)
+        prior_objective = estimator.objective
+        self.model.fit(x_train, y_train, eval_set=eval_set, verbose=True, xgb_model=xgb_model)
+        post_objective = estimator.objective
         if prior_objective != post_objective:
             self.logger.warning("ATTENTION: la fonction d'objectif à automatiquement été changée par XGBOOST")
             self.logger.warning(f"Avant: {prior_objective}")
@@ -135,6 +192,9 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
         else:
             if original_list_classes is not None:
                 self.list_classes = original_list_classes
+            # Cibles sans noms de colonnes (e.g. sparse) : classes données par y_col (cf. preprocess_model_multilabel)
+            elif type(self.y_col) == list and len(self.y_col) == y_train.shape[1]:
+                self.list_classes = list(self.y_col)
             else:
                 self.logger.warning(
                     "Impossible de lire l'information sur le nom des colonnes de y_train -> la transformation inverse ne sera pas possible"
@@ -149,7 +209,67 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
         self.trained = True
         self.nb_fit += 1
 
+    def _get_booster_to_continue(self):
+        '''Retourne le booster à partir duquel continuer le boosting (mode incrémental)
+
+        Raises:
+            RuntimeError: si multi-label avec un xgboost par label (stratégie 'one_model_per_label')
+        Returns:
+            Booster: booster du modèle entraîné
+        '''
+        if self._is_multi_output_classifier():
+            raise RuntimeError("Entraînement incrémental impossible avec un xgboost par label (cf. multi_label_strategy='native')")
+        return self.model.get_booster()
+
+    def _fit_external_memory(self, data, y_col=None, x_valid=None, y_valid=None, chunksize: int = 100000, xgb_model=None):
+        '''Entrainement du modèle en mémoire externe (cf. utils_xgboost)
+
+        Les classes doivent être encodées entre 0 et n_classes - 1 (contrainte xgboost).
+
+        Args:
+            data (str | function): chemin d'un fichier ou fonction retournant des chunks
+        Kwargs:
+            y_col (str): colonne cible. Si None, on utilise self.y_col.
+            x_valid (?): chemin d'un fichier .csv de validation, ou array-like, shape = [n_samples, n_features]
+            y_valid (?): array-like, shape = [n_samples]
+            chunksize (int): nombre de lignes par chunk (fichiers uniquement)
+            xgb_model (Booster): booster à partir duquel continuer le boosting (mode incrémental)
+        Raises:
+            NotImplementedError: si multi-label
+            ValueError: si les classes ne sont pas encodées entre 0 et n_classes - 1
+        '''
+        if self.multi_label:
+            raise NotImplementedError("L'entraînement en mémoire externe ne gère pas le multi-label")
+        chunks_factory, x_valid, y_valid = utils_xgboost.prepare_external_data(self, data, y_col=y_col, x_valid=x_valid,
+                                                                               y_valid=y_valid, chunksize=chunksize)
+        # Une passe sur la cible pour récupérer les classes
+        unique_labels = utils_xgboost.get_unique_labels(chunks_factory, self.y_col)
+        if not np.array_equal(unique_labels, np.arange(len(unique_labels))):
+            raise ValueError("En mémoire externe, les classes doivent être encodées entre 0 et n_classes - 1")
+        n_classes = len(unique_labels)
+        if xgb_model is not None and n_classes != len(self.list_classes):
+            raise ValueError(f"Le nombre de classes ({n_classes}) ne correspond pas à celui du modèle ({len(self.list_classes)})")
+
+        prior_objective = self.model.objective
+        utils_xgboost.train_external_memory(self.model, chunks_factory, self.x_col, self.y_col, x_valid, y_valid,
+                                            early_stopping_rounds=self.early_stopping_rounds, n_classes=n_classes,
+                                            xgb_model=xgb_model)
+        post_objective = self.model.objective
+        if prior_objective != post_objective:
+            self.logger.warning("ATTENTION: la fonction d'objectif à automatiquement été changée par XGBOOST")
+            self.logger.warning(f"Avant: {prior_objective}")
+            self.logger.warning(f"Après: {post_objective}")
+
+        # Set list classes & dict_classes
+        self.list_classes = list(range(n_classes))
+        self.dict_classes = {i: col for i, col in enumerate(self.list_classes)}
+
+        # Set trained
+        self.trained = True
+        self.nb_fit += 1
+
     @utils.trained_needed
+    @instrumentation.timed()
     def predict(self, x_test: pd.DataFrame, return_proba: bool = False, **kwargs):
         '''Prédictions sur test
 
@@ -163,6 +283,9 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
         # Si on veut des probas, on utilise predict_proba
         if return_proba:
             return self.predict_proba(x_test, **kwargs)
+        # Multi-label avec seuils optimisés : classes obtenues à partir des probas
+        elif self._use_multi_label_thresholds():
+            return self.get_classes_from_proba(self.predict_proba(x_test, **kwargs))
         # Sinon, on retourne les predictions :
         else:
             # On check le format des entrants
@@ -170,9 +293,13 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
             # Attention, "The method returns the model from the last iteration"
             # Mais : "Predict with X. If the model is trained with early stopping, then best_iteration is used automatically."
             y_pred = self.model.predict(x_test)
+            # Multi-label natif : xgboost retourne des floats
+            if self.multi_label and not self._is_multi_output_classifier():
+                y_pred = y_pred.astype(int)
             return y_pred
 
     @utils.trained_needed
+    @instrumentation.timed()
     def predict_proba(self, x_test: pd.DataFrame, **kwargs):
         '''Prédictions probabilité sur test
 
@@ -209,17 +336,19 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
         json_data['xgboost_params'] = self.xgboost_params
         json_data['early_stopping_rounds'] = self.early_stopping_rounds
         json_data['validation_split'] = self.validation_split
+        json_data['eval_train_size'] = self.eval_train_size
+        json_data['multi_label_strategy'] = self.multi_label_strategy
 
         # Save xgboost standalone
         if self.level_save in ['MEDIUM', 'HIGH']:
-            if not self.multi_label:
+            if not self._is_multi_output_classifier():
                 if self.trained:
                     save_path = os.path.join(self.model_dir, f'{self.model_name}.model')
                     self.model.save_model(save_path)
                 else:
                     self.logger.warning("Impossible de sauvegarder le XGboost en standalone car pas encore fitted")
             else:
-                # Si multilabel, on utilise un multioutput, et on fit plusieurs xgboost au final (cf. strategy sklearn)
+                # Si multilabel (stratégie one_model_per_label), on utilise un multioutput, et on fit plusieurs xgboost au final (cf. strategy sklearn)
                 # Du coup on ne peut pas sauvegarder un seul xgboost, donc on sauvegarde en pkl
                 # Problème : on ne sera pas compatible avec les montées de versions :'(
                 save_path = os.path.join(self.model_dir, f"{self.model_name}.pkl")
@@ -279,16 +408,22 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
         self.xgboost_params = configs['xgboost_params'] if 'xgboost_params' in configs.keys() else self.xgboost_params
         self.early_stopping_rounds = configs['early_stopping_rounds'] if 'early_stopping_rounds' in configs.keys() else self.early_stopping_rounds
         self.validation_split = configs['validation_split'] if 'validation_split' in configs.keys() else self.validation_split
+        self.eval_train_size = configs['eval_train_size'] if 'eval_train_size' in configs.keys() else self.eval_train_size
+        self.multi_label_strategy = configs['multi_label_strategy'] if 'multi_label_strategy' in configs.keys() else 'one_model_per_label'
         # self.model_dir = # On décide de garder le dossier créé
         self.list_classes = configs['list_classes'] if 'list_classes' in configs.keys() else self.list_classes
         self.dict_classes = configs['dict_classes'] if 'dict_classes' in configs.keys() else self.dict_classes
         self.multi_label = configs['multi_label'] if 'multi_label' in configs.keys() else self.multi_label
+        self.multi_label_thresholds = configs['multi_label_thresholds'] if 'multi_label_thresholds' in configs.keys() else None
+        self.confusion_matrix_plots = configs['confusion_matrix_plots'] if 'confusion_matrix_plots' in configs.keys() else self.confusion_matrix_plots
         self.level_save = configs['level_save'] if 'level_save' in configs.keys() else self.level_save
         self.nb_fit = configs['nb_fit'] if 'nb_fit' in configs.keys() else 1 # On considère 1 unique fit par défaut
         self.trained = configs['trained'] if 'trained' in configs.keys() else True # On considère trained par défaut
 
         # Reload xgboost model
-        if not self.multi_label:
+        if not self.multi_label or self.multi_label_strategy == 'native':
+            if self._is_multi_output_classifier():
+                self.model = XGBClassifier(**self.xgboost_params)
             self.model.load_model(xgboost_path)
         else:
             with open(xgboost_path, 'rb') as f:
@@ -307,6 +442,9 @@ class ModelXgboostClassifier(ModelClassifierMixin, ModelClass):
 # From : https://stackoverflow.com/questions/66785587/how-do-i-use-validation-sets-on-multioutputregressor-for-xgbregressor
 # From : https://github.com/scikit-learn/scikit-learn/blob/2beed5584/sklearn/multioutput.py#L293
 # From : https://github.com/scikit-learn/scikit-learn/blob/2beed55847ee70d363bdbfe14ee4401438fba057/sklearn/multioutput.py#L64
+# Parallélisme : les labels sont entraînés dans des threads (xgboost libère le GIL), X & eval_set sont donc
+# partagés entre les jobs sans copie. Les coeurs sont répartis entre labels parallèles et threads de chaque
+# xgboost (cf. utils_models.balance_n_jobs) pour éviter la sur-souscription.
 class MyMultiOutputClassifier(MultiOutputClassifier):
 
     @_deprecate_positional_args
@@ -356,22 +494,51 @@ class MyMultiOutputClassifier(MultiOutputClassifier):
 
         fit_params_validated = _check_fit_params(X, fit_params)
 
+        # New : répartition des coeurs entre labels & threads de chaque xgboost
+        n_outputs = y.shape[1]
+        estimator_params = self.estimator.get_params()
+        # n_jobs, ou son alias xgboost nthread
+        threads_params = [param for param in ['n_jobs', 'nthread'] if param in estimator_params]
+        estimator_n_jobs = next((estimator_params[param] for param in threads_params if estimator_params[param] is not None), None)
+        n_jobs, inner_n_jobs = utils_models.balance_n_jobs(n_outputs, n_jobs=self.n_jobs, inner_n_jobs=estimator_n_jobs)
+        estimator = clone(self.estimator)
+        if len(threads_params) > 0:
+            estimator.set_params(**{param: inner_n_jobs for param in threads_params})
+
+        # New : conversion unique (float32, format interne xgboost) des données partagées entre les jobs
+        shared = {}
+        def to_shared(data):
+            if sparse.issparse(data):
+                return data
+            if id(data) not in shared:
+                shared[id(data)] = np.ascontiguousarray(data, dtype=np.float32)
+            return shared[id(data)]
+        X = to_shared(X)
+
+        # New : cibles sparse -> format CSC (accès colonne), seule la colonne du label est densifiée
+        y = utils_models.get_target_columns(y)
+
         # New : extract eval_set
         if 'eval_set' in fit_params_validated.keys():
-            eval_set = fit_params_validated.pop('eval_set')
-            self.estimators_ = Parallel(n_jobs=self.n_jobs)(
+            eval_set = [(to_shared(X_test), utils_models.get_target_columns(Y_test)) for X_test, Y_test in fit_params_validated.pop('eval_set')]
+            self.estimators_ = Parallel(n_jobs=n_jobs, prefer='threads')(
                 delayed(_fit_estimator)(
-                    self.estimator, X, y[:, i], sample_weight,
+                    estimator, X, utils_models.get_target_column(y, i), sample_weight,
                     **fit_params_validated,
-                    eval_set=[(X_test, Y_test[:, i]) for X_test, Y_test in eval_set])
-                for i in range(y.shape[1]))
+                    eval_set=[(X_test, utils_models.get_target_column(Y_test, i)) for X_test, Y_test in eval_set])
+                for i in range(n_outputs))
         # Pas d'eval_set
         else:
-            self.estimators_ = Parallel(n_jobs=self.n_jobs)(
+            self.estimators_ = Parallel(n_jobs=n_jobs, prefer='threads')(
                 delayed(_fit_estimator)(
-                    self.estimator, X, y[:, i], sample_weight,
+                    estimator, X, utils_models.get_target_column(y, i), sample_weight,
                     **fit_params_validated)
-                for i in range(y.shape[1]))
+                for i in range(n_outputs))
+
+        # On remet le nombre de threads d'origine pour les prédictions (labels prédits séquentiellement)
+        if len(threads_params) > 0:
+            for fitted_estimator in self.estimators_:
+                fitted_estimator.set_params(**{param: estimator_params[param] for param in threads_params})
         return self
 
 
@@ -6,6 +6,7 @@
 #
 # Classes :
 # - ModelClass -> Classe parent modèle
+# - InputSchema -> Schéma des données en entrée d'un modèle, compilé une fois (vérifications mises en cache)
 
 
 import os
@@ -15,6 +16,7 @@ import dill as pickle
 import logging
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from typing import List
 from datetime import datetime
 from sklearn.compose import ColumnTransformer
@@ -24,6 +26,7 @@ from sklearn.utils.validation import check_is_fitted
 from ynov import utils
 from ynov.preprocessing import preprocess
 from ynov.models_training import utils_models
+from ynov.monitoring import instrumentation
 from ynov.monitoring.model_logger import ModelLogger
 
 
@@ -113,6 +116,9 @@ class ModelClass:
         # Other options
         self.level_save = level_save
 
+        # Schémas des données en entrée, compilés au premier appel (cf. _check_input_format)
+        self._input_schemas = {}
+
         # is trained ?
         self.trained = False
         self.nb_fit = 0
@@ -176,6 +182,7 @@ class ModelClass:
         '''
         raise NotImplementedError("'get_and_save_metrics' needs to be overrided")
 
+    @instrumentation.timed()
     def save(self, json_data: dict = None):
         '''Sauvegarde du modèle
 
@@ -268,6 +275,7 @@ class ModelClass:
             os.makedirs(model_dir)
         return model_dir
 
+    @instrumentation.timed()
     def _check_input_format(self, x_input, y_input = None, fit_function: bool = False):
         '''Fonction pour vérifier l'intégrité des entrants d'une fonction
         On check le bon nombre de colonnes et on reorder
@@ -276,9 +284,11 @@ class ModelClass:
             - Colonnes pas dans le bon ordre
         Si fit & x_col et/ou y_col not defined -> warning & on utilise les colonnes en entrées
         On en profite aussi pour set pipeline, columns_in et mandatory_columns si à None
+        Les features numériques sont converties à la précision globale si définie (cf. utils.set_float_precision)
 
         Args:
-            x_input (?): array-like, shape = [n_samples, n_features]
+            x_input (?): array-like or sparse matrix, shape = [n_samples, n_features]
+                Si sparse, les colonnes sont celles de x_col (non vérifiables, pas de reorder)
         Kwargs:
             y_input (?): array-like, shape = [n_samples, n_features]
                 Obligatoire si fit_function
@@ -323,64 +333,55 @@ class ModelClass:
             if self.preprocess_pipeline is None: # i.e. pas de pipeline précisée à l'init. de la classe
                 preprocess_str = "no_preprocess"
                 preprocess_pipeline = preprocess.get_pipeline(preprocess_str) # Attention, besoin d'être fit
-                preprocess_pipeline.fit(x_input) # On fit pour set les colonnes nécessaires à la pipeline
+                # Sparse : la pipeline (sélection de colonnes) attend une DataFrame -> fit sur une seule ligne densifiée
+                x_fit = pd.DataFrame(x_input[:1].toarray(), columns=self.x_col) if sparse.issparse(x_input) else x_input
+                preprocess_pipeline.fit(x_fit) # On fit pour set les colonnes nécessaires à la pipeline
                 self.preprocess_pipeline = preprocess_pipeline
                 self.columns_in, self.mandatory_columns = utils_models.get_columns_pipeline(self.preprocess_pipeline)
 
-        # Vérifications x_input
+        # Vérifications x_input (schéma compilé une fois, cf. InputSchema)
         if self.x_col is None:
             self.logger.warning("Impossible de vérifier le format d'entrée (x) car x_col n'est pas set...")
         else:
-            # On check le format de x_input
-            x_col_len = len(self.x_col)
-            if x_input_shape != x_col_len:
-                raise ValueError(f"Les données en entrées (x) n'ont pas le bon format ({x_input_shape} != {x_col_len})")
-            # On check la présence des colonnes
-            if hasattr(x_input, 'columns'):
-                can_reorder = True
-                for col in self.x_col:
-                    if col not in x_input.columns:
-                        can_reorder = False
-                        self.logger.warning(f"La colonne {col} est manquante dans les données en entrées (x)")
-                # Si on ne peut pas reorder, message warning, sinon on check si besoin
-                if not can_reorder:
-                    self.logger.warning("On est pas ISO sur le nom des colonnes, mais on continue car bon nombre de colonnes")
-                else:
-                    if list(x_input.columns) != self.x_col:
-                        self.logger.warning("Les colonnes des données en entrées (x) ne sont pas dans le bon ordre -> reorder automatique !")
-                        x_input = x_input[self.x_col]
-            else:
-                self.logger.warning(f"Les données en entrées (x) n'expose pas l'attribut 'columns' -> impossible de vérifier l'ordre des colonnes")
+            x_schema = self._get_input_schema('x')
+            if fit_function == True:
+                x_schema.set_dtypes(x_input)
+            x_input = x_schema.validate(x_input, self.logger)
 
         # Vérifications y_input
         if y_input is not None:
             if self.y_col is None:
                 self.logger.warning("Impossible de vérifier le format d'entrée (y) car y_col n'est pas set...")
             else:
-                # On check le format de y_input
-                y_col_len = len(self.y_col) if type(self.y_col) == list else 1
-                if y_input_shape != y_col_len:
-                    raise ValueError(f"Les données en entrées (y) n'ont pas le bon format ({y_input_shape} != {y_col_len})")
-                # On check la présence des colonnes
-                if hasattr(y_input, 'columns'):
-                    can_reorder = True
-                    for col in self.y_col:
-                        if col not in y_input.columns:
-                            can_reorder = False
-                            self.logger.warning(f"La colonne {col} est manquante dans les données en entrées (y)")
-                    # Si on ne peut pas reorder, message warning, sinon on check si besoin
-                    if not can_reorder:
-                        self.logger.warning("On est pas ISO sur le nom des colonnes, mais on continue car bon nombre de colonnes")
-                    else:
-                        if list(y_input.columns) != self.y_col:
-                            self.logger.warning("Les colonnes des données en entrées (y) ne sont pas dans le bon ordre -> reorder automatique !")
-                            y_input = y_input[self.y_col]
-                else:
-                    self.logger.warning(f"Les données en entrées (y) n'expose pas l'attribut 'columns' -> impossible de vérifier l'ordre des colonnes")
+                y_input = self._get_input_schema('y').validate(y_input, self.logger)
+
+        # Features converties à la précision globale si définie (e.g. float32, cf. utils.set_float_precision)
+        # xgboost, lightgbm & les arbres sklearn travaillent en float32 : pas de copie float64 intermédiaire
+        x_input = utils.cast_float_precision(x_input)
 
         # Return
         return x_input, y_input
 
+    def _get_input_schema(self, name: str):
+        '''Fonction pour récupérer le schéma des données en entrée (x ou y), compilé à partir de x_col / y_col
+
+        Le schéma est recompilé uniquement si x_col / y_col a été modifié (nouvel objet).
+
+        Args:
+            name (str): 'x' ou 'y'
+        Returns:
+            InputSchema: schéma des données en entrée
+        '''
+        columns = self.x_col if name == 'x' else self.y_col
+        # Modèles sauvegardés avant l'ajout des schémas
+        if not hasattr(self, '_input_schemas'):
+            self._input_schemas = {}
+        schema = self._input_schemas.get(name)
+        if schema is None or schema.source is not columns:
+            schema = InputSchema(columns, name=name)
+            self._input_schemas[name] = schema
+        return schema
+
     def display_if_gpu_activated(self):
         '''Fonction pour afficher si on utilise un GPU'''
         if self._is_gpu_activated():
@@ -423,6 +424,119 @@ class ModelClass:
         # Par défaut, pas de GPU
         return False
 
+
+class InputSchema:
+    '''Schéma des données en entrée d'un modèle (x ou y), compilé une seule fois par modèle
+
+    Les vérifications d'une DataFrame (présence & ordre des colonnes, types) sont mises en cache par identité
+    de l'index des colonnes (pd.Index, immuable) : un même format n'est analysé, et signalé, qu'une seule fois.
+    Chemin rapide : colonnes déjà dans le bon ordre -> données retournées telles quelles (pas de copie).
+    '''
+
+    # Nombre de formats de colonnes gardés en cache
+    cache_size = 16
+
+    def __init__(self, columns, name: str = 'x'):
+        '''Initialisation de la classe
+
+        Args:
+            columns (str ou int ou list): colonnes attendues (x_col ou y_col)
+        Kwargs:
+            name (str): nom des données ('x' ou 'y'), utilisé dans les messages
+        '''
+        self.source = columns # Référence à x_col / y_col, pour détecter une modification
+        self.columns = list(columns) if type(columns) == list else [columns]
+        self.n_columns = len(self.columns)
+        self.index = pd.Index(self.columns)
+        self.name = name
+        self.numeric_columns = None # Colonnes numériques au fit (cf. set_dtypes)
+        self._cache = {} # id(columns) -> (columns, indexer ou None)
+
+    def __getstate__(self):
+        '''Le cache n'est pas sauvegardé (identités propres à la session)'''
+        state = self.__dict__.copy()
+        state['_cache'] = {}
+        return state
+
+    def set_dtypes(self, x_input):
+        '''Fonction pour enregistrer les types des données de fit (vérifiés sur les nouveaux formats de colonnes)
+
+        Args:
+            x_input (?): array-like or sparse matrix, shape = [n_samples, n_features]
+        '''
+        if hasattr(x_input, 'dtypes') and hasattr(x_input, 'columns'):
+            self.numeric_columns = {col: pd.api.types.is_numeric_dtype(dtype) for col, dtype in x_input.dtypes.items()}
+            self._cache = {}
+
+    def validate(self, data, logger: logging.Logger):
+        '''Fonction pour valider des données par rapport au schéma (nombre de colonnes, reorder si besoin)
+
+        Args:
+            data (?): array-like or sparse matrix, shape = [n_samples, n_features]
+            logger (logging.Logger): logger pour les warnings
+        Raises:
+            ValueError: si les données n'ont pas le bon nombre de colonnes
+        Returns:
+            ?: data, éventuellement reordered si besoin
+        '''
+        n_columns = data.shape[-1] if len(data.shape) > 1 else 1
+        if n_columns != self.n_columns:
+            raise ValueError(f"Les données en entrées ({self.name}) n'ont pas le bon format ({n_columns} != {self.n_columns})")
+        columns = getattr(data, 'columns', None)
+        if columns is None:
+            # Sparse : noms de colonnes portés à part (x_col), on ne vérifie que le nombre de colonnes
+            if not sparse.issparse(data):
+                logger.warning(f"Les données en entrées ({self.name}) n'expose pas l'attribut 'columns' -> impossible de vérifier l'ordre des colonnes")
+            return data
+        # Cache par identité de l'index des colonnes
+        cached = self._cache.get(id(columns))
+        if cached is None or cached[0] is not columns:
+            if len(self._cache) >= self.cache_size:
+                self._cache.pop(next(iter(self._cache)))
+            cached = (columns, self._compile(data, logger))
+            self._cache[id(columns)] = cached
+        indexer = cached[1]
+        return data if indexer is None else data.iloc[:, indexer]
+
+    def _compile(self, data, logger: logging.Logger):
+        '''Fonction pour analyser un nouveau format de colonnes
+
+        Args:
+            data (pd.DataFrame): données à analyser
+            logger (logging.Logger): logger pour les warnings
+        Returns:
+            np.ndarray: positions des colonnes attendues (reorder), None si pas de reorder
+        '''
+        columns = data.columns
+        self._check_dtypes(data, logger)
+        # Chemin rapide : colonnes déjà dans le bon ordre
+        if columns.equals(self.index):
+            return None
+        missing_columns = [col for col in self.columns if col not in columns]
+        for col in missing_columns:
+            logger.warning(f"La colonne {col} est manquante dans les données en entrées ({self.name})")
+        # Si on ne peut pas reorder, message warning, sinon reorder
+        if len(missing_columns) > 0 or not columns.is_unique:
+            logger.warning("On est pas ISO sur le nom des colonnes, mais on continue car bon nombre de colonnes")
+            return None
+        logger.warning(f"Les colonnes des données en entrées ({self.name}) ne sont pas dans le bon ordre -> reorder automatique !")
+        return columns.get_indexer(self.index)
+
+    def _check_dtypes(self, data, logger: logging.Logger):
+        '''Fonction pour signaler les colonnes dont le type (numérique ou non) diffère du fit
+
+        Args:
+            data (pd.DataFrame): données à analyser
+            logger (logging.Logger): logger pour les warnings
+        '''
+        if self.numeric_columns is None:
+            return
+        for col, dtype in data.dtypes.items():
+            is_numeric = self.numeric_columns.get(col)
+            if is_numeric is not None and is_numeric != pd.api.types.is_numeric_dtype(dtype):
+                logger.warning(f"La colonne {col} ({self.name}) n'a pas le même type qu'à l'entraînement ({dtype})")
+
+
 if __name__ == '__main__':
     logger = logging.getLogger(__name__)
     logger.error("Ce script ne doit pas être exécuté, il s'agit d'un package.")
\ No newline at end of file
@@ -6,14 +6,22 @@
 #
 # Classes :
 # - ModelClassifierMixin -> Classe parent classifier
+#
+# Fonctions :
+# - plot_confusion_matrix -> Plot & sauvegarde d'une matrice de confusion
+# - plot_confusion_matrices_from_file -> Plots des matrices de confusion sauvegardées (npz) par get_and_save_metrics
+# - wait_for_confusion_matrix_plots -> Attend la fin des plots lancés en arrière-plan
 
 
 import os
 import re
 import json
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
 import numpy as np
 import pandas as pd
+from scipy import sparse
 import seaborn as sns
 from typing import List
 import matplotlib.pyplot as plt
@@ -22,15 +30,20 @@ from sklearn.metrics import (accuracy_score, auc, confusion_matrix, f1_score,
                              recall_score, roc_curve)
 from ynov import utils
 from ynov.models_training import utils_models
+from ynov.monitoring import instrumentation
 from ynov.monitoring.model_logger import ModelLogger
 
 sns.set(style="darkgrid")
 
+# Pool de processus pour les plots en arrière-plan (créé à la demande) & plots en cours
+_plot_executor = None
+_plot_futures = []
+
 
 class ModelClassifierMixin:
     '''Classe parent (Mixin) pour les modèles de type classifier'''
 
-    def __init__(self, level_save: str = 'HIGH', multi_label: bool = False, **kwargs):
+    def __init__(self, level_save: str = 'HIGH', multi_label: bool = False, confusion_matrix_plots: str = 'sync', **kwargs):
         '''Initialisation de la classe parent - Classifier
 
         Kwargs:
@@ -39,13 +52,21 @@ class ModelClassifierMixin:
                 MEDIUM: LOW + hdf5 + pkl + plots
                 HIGH: MEDIUM + predictions
             multi_label (bool): si la classification doit être multi label
+            confusion_matrix_plots (str): plots des matrices de confusion de get_and_save_metrics (level_save MEDIUM / HIGH)
+                Les matrices sont toujours sauvegardées dans plots/confusion_matrices*.npz
+                sync: plots immédiats
+                lazy: pas de plot, à générer plus tard avec plot_confusion_matrices_from_file
+                background: plots dans un pool de processus, sans attendre (cf. wait_for_confusion_matrix_plots)
         Raises:
             ValueError : si l'objet level_save n'est pas une option valable (['LOW', 'MEDIUM', 'HIGH'])
+            ValueError : si l'objet confusion_matrix_plots n'est pas une option valable (['sync', 'lazy', 'background'])
         '''
         super().__init__(level_save=level_save, **kwargs)  # forwards level_save & all unused arguments
 
         if level_save not in ['LOW', 'MEDIUM', 'HIGH']:
             raise ValueError(f"L'objet level_save ({level_save}) n'est pas une option valide (['LOW', 'MEDIUM', 'HIGH'])")
+        if confusion_matrix_plots not in ['sync', 'lazy', 'background']:
+            raise ValueError(f"L'objet confusion_matrix_plots ({confusion_matrix_plots}) n'est pas une option valide (['sync', 'lazy', 'background'])")
 
         # Get logger
         self.logger = logging.getLogger(__name__)
@@ -59,9 +80,12 @@ class ModelClassifierMixin:
         # Liste classes à traiter (set on fit)
         self.list_classes = None
         self.dict_classes = None
+        # Seuils de décision par label (multi-label uniquement, cf. optimize_thresholds). Si None, 0.5.
+        self.multi_label_thresholds = None
 
         # Other options
         self.level_save = level_save
+        self.confusion_matrix_plots = confusion_matrix_plots
 
     @utils.trained_needed
     def predict_with_proba(self, x_test: pd.DataFrame):
@@ -94,16 +118,8 @@ class ModelClassifierMixin:
         if self.multi_label:
             raise ValueError("La fonction 'get_predict_position' n'est pas disponible en mode multi-label")
         # Process
-        # Cast en pd.Series
-        y_true = pd.Series(y_true)
-        # Get predicted proba
         predicted_proba = self.predict(x_test, return_proba=True)
-        # Get position
-        order = predicted_proba.argsort()
-        ranks = len(self.dict_classes.values()) - order.argsort()
-        df_probas = pd.DataFrame(ranks, columns=self.dict_classes.values())
-        predict_positions = np.array([df_probas.loc[i, cl] if cl in df_probas.columns else -1 for i, cl in enumerate(y_true)])
-        return predict_positions
+        return self._get_positions_from_proba(predicted_proba, y_true)
 
     def get_classes_from_proba(self, predicted_proba):
         '''Function pour récupérer les classes à partir de probabilités
@@ -114,12 +130,53 @@ class ModelClassifierMixin:
             (?): array of shape = [n_samples, n_classes] -> classes
         '''
         if not self.multi_label:
-            predicted_class = np.vectorize(lambda x: self.dict_classes[x])(predicted_proba.argmax(axis=-1))
+            predicted_class = self._get_classes_array()[np.asarray(predicted_proba.argmax(axis=-1)).ravel()]
         else:
             # Si multi label, retourne list de 0 et de 1
-            predicted_class = np.vectorize(lambda x: 1 if x >= 0.5 else 0)(predicted_proba)
+            thresholds = np.asarray(self.multi_label_thresholds) if self._use_multi_label_thresholds() else 0.5
+            predicted_class = (predicted_proba >= thresholds).astype(int)
         return predicted_class
 
+    def _use_multi_label_thresholds(self):
+        '''Indique si les prédictions doivent être calculées à partir des probas et des seuils optimisés
+
+        Returns:
+            bool: si multi-label avec des seuils optimisés
+        '''
+        # getattr : modèles sauvegardés avant l'ajout des seuils
+        return self.multi_label and getattr(self, 'multi_label_thresholds', None) is not None
+
+    def optimize_thresholds(self, y_true, predicted_proba):
+        '''Fonction pour calculer les seuils de décision optimaux (F1) de chaque label, à partir de probas de validation
+        Les seuils sont ensuite utilisés par predict & get_classes_from_proba, et sauvegardés dans configurations.json
+
+        Args:
+            y_true (?): array-like or sparse matrix, shape = [n_samples, n_classes], indicatrices 0/1
+                Si DataFrame, les colonnes sont remises dans l'ordre de list_classes
+            predicted_proba (?): array-like, shape = [n_samples, n_classes] -> probabilités
+        Raises:
+            ValueError: non disponible en mode mono label
+        Returns:
+            list: seuils, dans l'ordre de list_classes
+        '''
+        if not self.multi_label:
+            raise ValueError("La fonction 'optimize_thresholds' n'est disponible qu'en mode multi-label")
+        if isinstance(y_true, pd.DataFrame):
+            y_true = y_true[self.list_classes].values
+        thresholds = utils_models.get_optimal_thresholds(y_true, predicted_proba)
+        self.multi_label_thresholds = [float(_) for _ in thresholds]
+        for label, threshold in zip(self.list_classes, self.multi_label_thresholds):
+            self.logger.info(f"Seuil optimisé {label} : {round(threshold, 5)}")
+        return self.multi_label_thresholds
+
+    def _get_classes_array(self):
+        '''Fonction pour obtenir les classes sous forme d'array, dans l'ordre des indices de dict_classes
+
+        Returns:
+            np.ndarray: shape = [n_classes]
+        '''
+        return np.array([self.dict_classes[i] for i in range(len(self.dict_classes))])
+
     def get_top_n_from_proba(self, predicted_proba, n: int = 5):
         '''Function pour récupérer les TOP N prédictions depuis des probas
 
@@ -138,10 +195,63 @@ class ModelClassifierMixin:
         if n > len(self.list_classes):
             raise ValueError("Plus de classes demandées que de classes dans le modèle")
         # Process
-        idx = predicted_proba.argsort()[:, -n:][:, ::-1]
-        top_n_proba = list(np.take_along_axis(predicted_proba, idx, axis=1))
-        top_n = list(np.vectorize(lambda x: self.dict_classes[x])(idx))
-        return top_n, top_n_proba
+        top_n, top_n_proba, _ = self.get_top_n_and_positions_from_proba(predicted_proba, n=n)
+        return list(top_n), list(top_n_proba)
+
+    def get_top_n_and_positions_from_proba(self, predicted_proba, y_true=None, n: int = 5):
+        '''Function pour récupérer en une fois les TOP N prédictions, leurs probas et la position de y_true
+        Calcul vectorisé (argpartition, pas de DataFrame), adapté à de gros volumes (millions de lignes)
+
+        Args:
+            predicted_proba (?): array-like, shape = [n_samples, n_classes] -> probabilités
+        kwargs:
+            y_true (?): array-like, shape = [n_samples], classes réelles. Si None, pas de calcul de positions.
+            n (int): nombre de classes à retourner
+        Raises:
+            ValueError: non disponible en mode multi label
+            ValueError: si le nomre de classes à retourner est plus grand que le nombre de classes du modèle
+        Returns:
+            np.ndarray: shape = [n_samples, n] -> top n predicted class
+            np.ndarray: shape = [n_samples, n] -> probas des top n predicted class
+            np.ndarray: shape = [n_samples] -> position de y_true (commence à 1, -1 si classe inconnue), None si pas de y_true
+        '''
+        if self.multi_label:
+            raise ValueError("La fonction 'get_top_n_and_positions_from_proba' n'est pas disponible en mode multi-label")
+        if n > len(self.list_classes):
+            raise ValueError("Plus de classes demandées que de classes dans le modèle")
+        predicted_proba = np.asarray(predicted_proba)
+        # Top n : argpartition (O(n_classes)) puis tri des n seuls retenus
+        if n < predicted_proba.shape[1]:
+            idx = np.argpartition(-predicted_proba, n - 1, axis=1)[:, :n]
+        else:
+            idx = np.tile(np.arange(predicted_proba.shape[1]), (predicted_proba.shape[0], 1))
+        top_n_proba = np.take_along_axis(predicted_proba, idx, axis=1)
+        # Tri par proba décroissante, puis indice décroissant (même ordre que get_predict_position)
+        order = np.lexsort((-idx, -top_n_proba), axis=1)
+        idx = np.take_along_axis(idx, order, axis=1)
+        top_n_proba = np.take_along_axis(top_n_proba, order, axis=1)
+        top_n = self._get_classes_array()[idx]
+        positions = self._get_positions_from_proba(predicted_proba, y_true) if y_true is not None else None
+        return top_n, top_n_proba, positions
+
+    def _get_positions_from_proba(self, predicted_proba, y_true):
+        '''Fonction pour obtenir la position de y_true dans les probabilités (commence à 1, -1 si classe inconnue)
+        Pas de tri : position = 1 + nombre de classes mieux classées (à égalité de probas, l'indice le plus grand passe devant)
+
+        Args:
+            predicted_proba (?): array-like, shape = [n_samples, n_classes] -> probabilités
+            y_true (?): array-like, shape = [n_samples], classes réelles
+        Returns:
+            np.ndarray: shape = [n_samples]
+        '''
+        predicted_proba = np.asarray(predicted_proba)
+        # Encodage des classes réelles (-1 si inconnue)
+        y_true_idx = pd.Index(self._get_classes_array()).get_indexer(np.asarray(y_true))
+        known = y_true_idx >= 0
+        true_proba = predicted_proba[np.arange(predicted_proba.shape[0]), np.where(known, y_true_idx, 0)][:, None]
+        class_idx = np.arange(predicted_proba.shape[1])[None, :]
+        better = (predicted_proba > true_proba) | ((predicted_proba == true_proba) & (class_idx > y_true_idx[:, None]))
+        return np.where(known, better.sum(axis=1) + 1, -1)
 
     def inverse_transform(self, y):
         '''Fonction pour obtenir une liste de classes à partir de prédicitons
@@ -162,18 +272,20 @@ class ModelClassifierMixin:
             # Manage 1D array (only one pred)
             if len(y.shape) == 1:
                 return tuple(np.array(self.list_classes).compress(y))
-            # Several preds
+            # Several preds (dense or sparse)
             else:
-                return [tuple(np.array(self.list_classes).compress(indicators)) for indicators in y]
+                return utils_models.indicators_to_tuples(y, self.list_classes)
         # If mono-label, just cast in list if y is np array
         else:
             return list(y) if type(y) == np.ndarray else y
 
+    @instrumentation.timed()
     def get_and_save_metrics(self, y_true, y_pred, df_x: pd.DataFrame = None, series_to_add: List[pd.Series] = None, type_data: str = '', model_logger=None):
         '''Fonction pour obtenir et sauvegarder les métriques d'un modèle
 
         Args:
             y_true (?): array-like, shape = [n_samples, n_features]
+                Multi-label : array-like ou matrice sparse (non densifiée)
             y_pred (?): array-like, shape = [n_samples, n_features]
         Kwargs:
             df_x (?): DataFrame en entrée de la prédiction
@@ -189,9 +301,9 @@ class ModelClassifierMixin:
             if sum([1 if type(_) == pd.Series else 0 for _ in series_to_add]) != len(series_to_add):
                 raise TypeError("L'objet series_to_add doit être composé de pd.Series uniquement")
 
-        # Cast to np.array
-        y_true = np.array(y_true)
-        y_pred = np.array(y_pred)
+        # Cast to np.array (sauf sparse, gardé tel quel)
+        y_true = y_true if sparse.issparse(y_true) else np.array(y_true)
+        y_pred = y_pred if sparse.issparse(y_pred) else np.array(y_pred)
 
         # Sauvegarde d'un fichier de prédiction si souhaité
         if self.level_save == 'HIGH':
@@ -199,8 +311,8 @@ class ModelClassifierMixin:
             y_true_df = list(self.inverse_transform(y_true))
             y_pred_df = list(self.inverse_transform(y_pred))
 
-            # Concat dans une dataframe
-            if df_x is not None:
+            # Concat dans une dataframe (les features sparse ne sont pas sauvegardées : densification trop coûteuse)
+            if df_x is not None and not sparse.issparse(df_x):
                 df = df_x.copy()
                 df['y_true'] = y_true_df
                 df['y_pred'] = y_pred_df
@@ -220,13 +332,10 @@ class ModelClassifierMixin:
         # Récupération f1 score / acc_tot / trues / falses / precision / recall / support globaux
         if self.multi_label:
             f1_weighted = f1_score(y_true, y_pred, average='weighted', zero_division=0)
-            trues = np.sum(np.all(np.equal(y_true, y_pred), axis=1))
-            falses = len(y_true) - trues
-            acc_tot = trues / len(y_true)
+            trues, falses, support = self._get_multi_label_trues_and_support(y_true, y_pred)
+            acc_tot = trues / (trues + falses)
             precision_weighted = precision_score(y_true, y_pred, average='weighted', zero_division=0)
             recall_weighted = recall_score(y_true, y_pred, average='weighted', zero_division=0)
-            support = list(pd.DataFrame(y_true).sum().values)
-            support = [_ / sum(support) for _ in support] + [1.0]
         else:
             # On fait quand même du 'weighted' si mono-label, car possibilité multiclasses !
             f1_weighted = f1_score(y_true, y_pred, average='weighted', zero_division=0)
@@ -263,20 +372,19 @@ class ModelClassifierMixin:
         # Ajout metrics en fonction multi/mono label & gestion conf. matrices
         labels = self.list_classes
         log_stats = len(labels) < 50
+        # Matrices de confusion à plot : (c_mat, labels, type_data, subdir)
+        c_mats_to_plot = []
         if self.multi_label:
             # Détails par catégories
             mcm = multilabel_confusion_matrix(y_true, y_pred)
             for i, label in enumerate(labels):
                 c_mat = mcm[i]
-                df_stats = df_stats.append(self._update_info_from_c_mat(c_mat, label, log_info=log_stats), ignore_index=True)
+                df_stats = pd.concat([df_stats, pd.DataFrame([self._update_info_from_c_mat(c_mat, label, log_info=log_stats)])], ignore_index=True)
                 # Plot individual confusion matrix if level_save > LOW
                 if self.level_save in ['MEDIUM', 'HIGH']:
                     none_class = 'not_' + label
                     tmp_label = re.sub(r',|:|\s', '_', label)
-                    self._plot_confusion_matrix(c_mat, [none_class, label], type_data=f"{tmp_label}_{type_data}",
-                                                normalized=False, subdir=type_data)
-                    self._plot_confusion_matrix(c_mat, [none_class, label], type_data=f"{tmp_label}_{type_data}",
-                                                normalized=True, subdir=type_data)
+                    c_mats_to_plot.append((c_mat, [none_class, label], f"{tmp_label}_{type_data}", type_data))
         else:
             # Plot confusion matrices if level_save > LOW
             if self.level_save in ['MEDIUM', 'HIGH']:
@@ -289,8 +397,7 @@ class ModelClassifierMixin:
                 else:
                     # Global stats
                     c_mat = confusion_matrix(y_true, y_pred, labels=labels)
-                    self._plot_confusion_matrix(c_mat, labels, type_data=type_data, normalized=False)
-                    self._plot_confusion_matrix(c_mat, labels, type_data=type_data, normalized=True)
+                    c_mats_to_plot.append((c_mat, labels, type_data, None))
 
             # Get stats per class
             for label in labels:
@@ -298,7 +405,11 @@ class ModelClassifierMixin:
                 y_true_tmp = [label if _ == label else none_class for _ in y_true]
                 y_pred_tmp = [label if _ == label else none_class for _ in y_pred]
                 c_mat_tmp = confusion_matrix(y_true_tmp, y_pred_tmp, labels=[none_class, label])
-                df_stats = df_stats.append(self._update_info_from_c_mat(c_mat_tmp, label, log_info=log_stats), ignore_index=True)
+                df_stats = pd.concat([df_stats, pd.DataFrame([self._update_info_from_c_mat(c_mat_tmp, label, log_info=log_stats)])], ignore_index=True)
+
+        # Sauvegarde (npz) & plots des matrices de confusion
+        if len(c_mats_to_plot) > 0:
+            self._save_and_plot_confusion_matrices(c_mats_to_plot, type_data=type_data)
 
         # Ajout statistiques globales
         global_stats = {
@@ -318,7 +429,7 @@ class ModelClassifierMixin:
             'Predicted positive': None,
             'Predicted negative': None,
         }
-        df_stats = df_stats.append(global_stats, ignore_index=True)
+        df_stats = pd.concat([df_stats, pd.DataFrame([global_stats])], ignore_index=True)
 
         # Ajout support
         df_stats['Support'] = support
@@ -405,7 +516,7 @@ class ModelClassifierMixin:
             y_true_tmp = [label if _ == label else none_class for _ in y_true]
             y_pred_tmp = [label if _ == label else none_class for _ in y_pred]
             c_mat_tmp = confusion_matrix(y_true_tmp, y_pred_tmp, labels=[none_class, label])
-            df_stats = df_stats.append(self._update_info_from_c_mat(c_mat_tmp, label, log_info=False), ignore_index=True)
+            df_stats = pd.concat([df_stats, pd.DataFrame([self._update_info_from_c_mat(c_mat_tmp, label, log_info=False)])], ignore_index=True)
 
         # Ajout statistiques globales
         global_stats = {
@@ -425,7 +536,7 @@ class ModelClassifierMixin:
             'Predicted positive': None,
             'Predicted negative': None,
         }
-        df_stats = df_stats.append(global_stats, ignore_index=True)
+        df_stats = pd.concat([df_stats, pd.DataFrame([global_stats])], ignore_index=True)
 
         # Ajout support
         df_stats['Support'] = support
@@ -448,19 +559,16 @@ class ModelClassifierMixin:
         if not self.multi_label:
             raise ValueError("La fonction get_metrics_simple_multilabel ne fonctionne que pour les cas multilabels")
 
-        # Cast to np.array
-        y_true = np.array(y_true)
-        y_pred = np.array(y_pred)
+        # Cast to np.array (sauf sparse, gardé tel quel)
+        y_true = y_true if sparse.issparse(y_true) else np.array(y_true)
+        y_pred = y_pred if sparse.issparse(y_pred) else np.array(y_pred)
 
         # Récupération f1 score / acc_tot / trues / falses / precision / recall / support globaux
         f1_weighted = f1_score(y_true, y_pred, average='weighted', zero_division=0)
-        trues = np.sum(np.all(np.equal(y_true, y_pred), axis=1))
-        falses = len(y_true) - trues
-        acc_tot = trues / len(y_true)
+        trues, falses, support = self._get_multi_label_trues_and_support(y_true, y_pred)
+        acc_tot = trues / (trues + falses)
         precision_weighted = precision_score(y_true, y_pred, average='weighted', zero_division=0)
         recall_weighted = recall_score(y_true, y_pred, average='weighted', zero_division=0)
-        support = list(pd.DataFrame(y_true).sum().values)
-        support = [_ / sum(support) for _ in support] + [1.0]
 
         # DataFrame metrics
         df_stats = pd.DataFrame(columns=['Label', 'F1-Score', 'Accuracy',
@@ -476,7 +584,7 @@ class ModelClassifierMixin:
         mcm = multilabel_confusion_matrix(y_true, y_pred)
         for i, label in enumerate(labels):
             c_mat = mcm[i]
-            df_stats = df_stats.append(self._update_info_from_c_mat(c_mat, label, log_info=False), ignore_index=True)
+            df_stats = pd.concat([df_stats, pd.DataFrame([self._update_info_from_c_mat(c_mat, label, log_info=False)])], ignore_index=True)
 
         # Ajout statistiques globales
         global_stats = {
@@ -496,7 +604,7 @@ class ModelClassifierMixin:
             'Predicted positive': None,
             'Predicted negative': None,
         }
-        df_stats = df_stats.append(global_stats, ignore_index=True)
+        df_stats = pd.concat([df_stats, pd.DataFrame([global_stats])], ignore_index=True)
 
         # Ajout support
         df_stats['Support'] = support
@@ -504,6 +612,30 @@ class ModelClassifierMixin:
         # Return dataframe
         return df_stats
 
+    def _get_multi_label_trues_and_support(self, y_true, y_pred):
+        '''Fonction pour obtenir le nombre de lignes parfaitement prédites & le support (fréquence) de chaque label
+        Cibles sparse : calcul sur les matrices CSR, sans densifier
+
+        Args:
+            y_true (?): array-like or sparse matrix, shape = [n_samples, n_labels]
+            y_pred (?): array-like or sparse matrix, shape = [n_samples, n_labels]
+        Returns:
+            int: nombre de lignes parfaitement prédites
+            int: nombre de lignes avec au moins une erreur
+            list: support de chaque label (+ 1.0 pour 'All')
+        '''
+        if sparse.issparse(y_true) or sparse.issparse(y_pred):
+            to_csr = lambda y: y.tocsr() if sparse.issparse(y) else sparse.csr_matrix(np.asarray(y))
+            nb_errors = (to_csr(y_true) != to_csr(y_pred)).getnnz(axis=1)
+            trues = int(np.sum(nb_errors == 0))
+            support = list(np.asarray(y_true.sum(axis=0)).ravel()) if sparse.issparse(y_true) else list(np.asarray(y_true).sum(axis=0))
+        else:
+            trues = np.sum(np.all(np.equal(y_true, y_pred), axis=1))
+            support = list(pd.DataFrame(y_true).sum().values)
+        falses = y_true.shape[0] - trues if sparse.issparse(y_true) else len(y_true) - trues
+        support = [_ / sum(support) for _ in support] + [1.0]
+        return trues, falses, support
+
     def _update_info_from_c_mat(self, c_mat: np.ndarray, label: str, log_info: bool = True):
         '''Function to update a dataframe for the funcion get_and_save_metrics, given a confusion matrix
 
@@ -558,6 +690,44 @@ class ModelClassifierMixin:
             'Predicted negative': predicted_negative,
         }
 
+    def _save_and_plot_confusion_matrices(self, c_mats_to_plot: list, type_data: str = ''):
+        '''Sauvegarde des matrices de confusion (npz compact) & plots selon self.confusion_matrix_plots
+
+        Args:
+            c_mats_to_plot (list): liste de tuples (c_mat, labels, type_data, subdir), matrices de même taille
+        Kwargs:
+            type_data (str): type du dataset (validation, test, ...)
+        Returns:
+            str: chemin du fichier npz
+        '''
+        plots_path = os.path.join(self.model_dir, 'plots')
+        if not os.path.exists(plots_path):
+            os.makedirs(plots_path)
+        npz_path = os.path.join(plots_path, f"confusion_matrices{'_' + type_data if len(type_data) > 0 else ''}.npz")
+        np.savez_compressed(npz_path,
+                            c_mats=np.stack([c_mat for c_mat, _, _, _ in c_mats_to_plot]),
+                            labels=np.array([[str(label) for label in labels] for _, labels, _, _ in c_mats_to_plot]),
+                            names=np.array([name for _, _, name, _ in c_mats_to_plot]),
+                            subdirs=np.array([subdir if subdir is not None else '' for _, _, _, subdir in c_mats_to_plot]))
+
+        # getattr : modèles sauvegardés avant l'ajout de l'option
+        confusion_matrix_plots = getattr(self, 'confusion_matrix_plots', 'sync')
+        if confusion_matrix_plots == 'sync':
+            plot_confusion_matrices_from_file(npz_path)
+        elif confusion_matrix_plots == 'background':
+            global _plot_executor
+            nb_workers = os.cpu_count() or 1
+            if _plot_executor is None:
+                # spawn : pas de fork d'un processus avec des threads (xgboost, lightgbm, ...)
+                _plot_executor = ProcessPoolExecutor(max_workers=nb_workers, mp_context=multiprocessing.get_context('spawn'))
+            # Une tâche par worker
+            for indices in np.array_split(np.arange(len(c_mats_to_plot)), min(nb_workers, len(c_mats_to_plot))):
+                _plot_futures.append(_plot_executor.submit(plot_confusion_matrices_from_file, npz_path, indices.tolist()))
+            self.logger.info(f"Plots des matrices de confusion en arrière-plan ({npz_path})")
+        else:
+            self.logger.info(f"Matrices de confusion sauvegardées dans {npz_path}, plots avec plot_confusion_matrices_from_file")
+        return npz_path
+
     def _plot_confusion_matrix(self, c_mat: np.ndarray, labels: list, type_data: str = '',
                                normalized: bool = False, subdir: str = None):
         '''Function to plot a confusion matrix
@@ -570,46 +740,10 @@ class ModelClassifierMixin:
             normalized (bool): si la matrice de confusion doit être normalisée
             subdir (str): sub directory for plot
         '''
-
-        # Get title
-        if normalized:
-            title = f"Normalized confusion matrix{' - ' + type_data if len(type_data) > 0 else ''}"
-        else:
-            title = f"Confusion matrix, without normalization{' - ' + type_data if len(type_data) > 0 else ''}"
-
-        # Init. plot
-        width = round(10 + 0.5 * len(c_mat))
-        height = round(4 / 5 * width)
-        fig, ax = plt.subplots(figsize=(width, height))
-
-        # Plot
-        if normalized:
-            c_mat = c_mat.astype('float') / c_mat.sum(axis=1)[:, np.newaxis]
-            sns.heatmap(c_mat, annot=True, fmt=".2f", cmap=plt.cm.Blues, ax=ax)
-        else:
-            sns.heatmap(c_mat, annot=True, fmt="d", cmap=plt.cm.Blues, ax=ax)
-
-        # labels, title and ticks
-        ax.set_xlabel('Predicted classes', fontsize=height * 2)
-        ax.set_ylabel('Real classes', fontsize=height * 2)
-        ax.set_title(title, fontsize=width * 2)
-        ax.xaxis.set_ticklabels(labels)
-        ax.yaxis.set_ticklabels(labels)
-        plt.setp(ax.get_xticklabels(), rotation=30, horizontalalignment='right')
-        plt.setp(ax.get_yticklabels(), rotation=30, horizontalalignment='right')
-        plt.tight_layout()
-
-        # Save
         plots_path = os.path.join(self.model_dir, 'plots')
         if subdir is not None:  # Ajout subdir
             plots_path = os.path.join(plots_path, subdir)
-        file_name = f"{type_data + '_' if len(type_data) > 0 else ''}confusion_matrix{'_normalized' if normalized else ''}.png"
-        if not os.path.exists(plots_path):
-            os.makedirs(plots_path)
-        plt.savefig(os.path.join(plots_path, file_name))
-
-        # Close figures
-        plt.close('all')
+        plot_confusion_matrix(c_mat, labels, plots_path, type_data=type_data, normalized=normalized)
 
     def save(self, json_data: dict = None):
         '''Sauvegarde du modèle
@@ -626,11 +760,100 @@ class ModelClassifierMixin:
         json_data['list_classes'] = self.list_classes
         json_data['dict_classes'] = self.dict_classes
         json_data['multi_label'] = self.multi_label
+        json_data['multi_label_thresholds'] = self.multi_label_thresholds
+        json_data['confusion_matrix_plots'] = self.confusion_matrix_plots
 
         # Save
         super().save(json_data=json_data)
 
 
+def plot_confusion_matrix(c_mat: np.ndarray, labels: list, plots_path: str, type_data: str = '', normalized: bool = False):
+    '''Function to plot a confusion matrix
+
+    Args:
+        c_mat (np.ndarray): matrice de confusion
+        labels (list): labels à plot
+        plots_path (str): dossier de sauvegarde du plot
+    Kwargs:
+        type_data (str): type du dataset (validation, test, ...)
+        normalized (bool): si la matrice de confusion doit être normalisée
+    '''
+
+    # Get title
+    if normalized:
+        title = f"Normalized confusion matrix{' - ' + type_data if len(type_data) > 0 else ''}"
+    else:
+        title = f"Confusion matrix, without normalization{' - ' + type_data if len(type_data) > 0 else ''}"
+
+    # Init. plot
+    width = round(10 + 0.5 * len(c_mat))
+    height = round(4 / 5 * width)
+    fig, ax = plt.subplots(figsize=(width, height))
+
+    # Plot
+    if normalized:
+        c_mat = c_mat.astype('float') / c_mat.sum(axis=1)[:, np.newaxis]
+        sns.heatmap(c_mat, annot=True, fmt=".2f", cmap=plt.cm.Blues, ax=ax)
+    else:
+        sns.heatmap(c_mat, annot=True, fmt="d", cmap=plt.cm.Blues, ax=ax)
+
+    # labels, title and ticks
+    ax.set_xlabel('Predicted classes', fontsize=height * 2)
+    ax.set_ylabel('Real classes', fontsize=height * 2)
+    ax.set_title(title, fontsize=width * 2)
+    ax.xaxis.set_ticklabels(labels)
+    ax.yaxis.set_ticklabels(labels)
+    plt.setp(ax.get_xticklabels(), rotation=30, horizontalalignment='right')
+    plt.setp(ax.get_yticklabels(), rotation=30, horizontalalignment='right')
+    plt.tight_layout()
+
+    # Save
+    file_name = f"{type_data + '_' if len(type_data) > 0 else ''}confusion_matrix{'_normalized' if normalized else ''}.png"
+    os.makedirs(plots_path, exist_ok=True)  # exist_ok : plots en parallèle
+    plt.savefig(os.path.join(plots_path, file_name))
+
+    # Close figures
+    plt.close('all')
+
+
+def plot_confusion_matrices_from_file(npz_path: str, indices: list = None):
+    '''Plots des matrices de confusion sauvegardées par get_and_save_metrics (2 plots par matrice : brute & normalisée)
+
+    Les plots sont sauvegardés à côté du fichier npz (dans le sous-dossier de chaque matrice).
+
+    Args:
+        npz_path (str): chemin du fichier plots/confusion_matrices*.npz
+    Kwargs:
+        indices (list): indices des matrices à plot. Si None, toutes.
+    Raises:
+        FileNotFoundError: si le fichier npz n'existe pas
+    '''
+    if not os.path.exists(npz_path):
+        raise FileNotFoundError(f"Le fichier {npz_path} n'existe pas")
+    plots_path = os.path.dirname(npz_path)
+    with np.load(npz_path) as data:
+        c_mats, labels, names, subdirs = data['c_mats'], data['labels'], data['names'], data['subdirs']
+    if indices is None:
+        indices = range(len(c_mats))
+    for i in indices:
+        for normalized in [False, True]:
+            plot_confusion_matrix(c_mats[i], list(labels[i]), os.path.join(plots_path, str(subdirs[i])),
+                                  type_data=str(names[i]), normalized=normalized)
+
+
+def wait_for_confusion_matrix_plots():
+    '''Attend la fin des plots de matrices de confusion lancés en arrière-plan (confusion_matrix_plots='background')
+
+    Raises:
+        Exception: la première erreur levée par un plot
+    '''
+    global _plot_futures
+    futures, _plot_futures = _plot_futures, []
+    wait(futures)
+    for future in futures:
+        future.result()
+
+
 if __name__ == '__main__':
     logger = logging.getLogger(__name__)
     logger.error("Ce script ne doit pas être exécuté, il s'agit d'un package.")
\ No newline at end of file
@@ -10,15 +10,20 @@
 
 import logging
 import os
+import math
+import inspect
 import dill as pickle
 from datetime import datetime
 
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from sklearn.pipeline import Pipeline
+from sklearn.multiclass import OneVsRestClassifier
 from ynov import utils
 from ynov.models_training import utils_models
 from ynov.models_training.model_class import ModelClass
+from ynov.monitoring import instrumentation
 
 
 class ModelPipeline(ModelClass):
@@ -44,24 +49,34 @@ class ModelPipeline(ModelClass):
         # Gestion modèle - à implémenter par les classes enfants
         self.pipeline = pipeline
 
-    def fit(self, x_train, y_train, **kwargs):
+    @instrumentation.timed()
+    def fit(self, x_train, y_train, incremental: bool = False, n_new_estimators: int = None, **kwargs):
         '''Entrainement du modèle
            **kwargs permet la comptabilité avec les modèles keras
         Args:
             x_train (?): array-like or sparse matrix of shape = [n_samples, n_features]
             y_train (?): array-like, shape = [n_samples, n_features]
+        Kwargs:
+            incremental (bool): si un modèle déjà entraîné doit continuer son entraînement sur les nouvelles données
+                (cf. _fit_incremental). Sans effet si le modèle n'est pas encore entraîné.
+            n_new_estimators (int): nombre d'estimateurs à ajouter en mode incrémental (modèles warm_start uniquement)
         Raises:
-            RuntimeError: si on essaie d'entrainer un modèle déjà fit
+            RuntimeError: si on essaie d'entrainer un modèle déjà fit (hors mode incrémental)
             ValueError: si le type de modèle n'est pas classifier ou regressor
         '''
-        if self.trained:
+        if self.trained and not incremental:
             self.logger.error("Il n'est pas prévu de pouvoir réentrainer un modèle de type pipeline sklearn")
-            self.logger.error("Veuillez entrainer un nouveau modèle")
+            self.logger.error("Veuillez entrainer un nouveau modèle (ou utiliser incremental=True)")
             raise RuntimeError("Impossible de réentrainer un modèle de type pipeline sklearn")
 
         # On check le format des entrants
         x_train, y_train = self._check_input_format(x_train, y_train, fit_function=True)
 
+        # Entraînement incrémental
+        if self.trained:
+            self._fit_incremental(x_train, y_train, n_new_estimators=n_new_estimators)
+            return
+
         if self.model_type == 'classifier':
             self._fit_classifier(x_train, y_train, **kwargs)
         elif self.model_type == 'regressor':
@@ -74,10 +89,18 @@ class ModelPipeline(ModelClass):
            **kwargs permet la comptabilité avec les modèles keras
         Args:
             x_train (?): array-like or sparse matrix of shape = [n_samples, n_features]
-            y_train (?): array-like, shape = [n_samples, n_features]
+            y_train (?): array-like or sparse matrix (multi-label), shape = [n_samples, n_features]
         '''
+        # Cibles multi-label sparse : gérées sans densification par OneVsRest & SparseTargetMultiOutputClassifier
+        # Les estimateurs multi-output natifs (e.g. RandomForest, KNN) stockent des cibles denses -> conversion
+        if sparse.issparse(y_train):
+            if np.setdiff1d(y_train.data, [0, 1]).size > 0:
+                self.logger.warning("La plupart des pipeline sklearn ne supportent pas le multiclass-multilabel")
+            if not isinstance(self.pipeline[-1], (OneVsRestClassifier, utils_models.SparseTargetMultiOutputClassifier)):
+                self.logger.info("L'estimateur ne gère pas les cibles sparse -> conversion en array dense")
+                y_train = y_train.toarray()
         # On check "juste" si pas multiclass multilabel (pas gérable par la plupart des pipelines SKLEARN)
-        if self.multi_label:
+        elif self.multi_label:
             df_tmp = pd.DataFrame(y_train)
             for col in df_tmp:
                 uniques = df_tmp[col].unique()
@@ -97,6 +120,9 @@ class ModelPipeline(ModelClass):
         else:
             if hasattr(y_train, 'columns'):
                 self.list_classes = list(y_train.columns)
+            # Cibles sans noms de colonnes (e.g. sparse) : classes données par y_col (cf. preprocess_model_multilabel)
+            elif type(self.y_col) == list and len(self.y_col) == y_train.shape[1]:
+                self.list_classes = list(self.y_col)
             else:
                 self.logger.warning(
                     "Impossible de lire l'information sur le nom des colonnes de y_train -> la transformation inverse ne sera pas possible"
@@ -125,7 +151,81 @@ class ModelPipeline(ModelClass):
         self.trained = True
         self.nb_fit += 1
 
+    def _fit_incremental(self, x_train, y_train, n_new_estimators: int = None):
+        '''Continue l'entraînement d'un modèle déjà entraîné, sur les nouvelles données uniquement
+
+        Selon le dernier estimateur de la pipeline :
+            - partial_fit si disponible (e.g. SGD, Naive Bayes)
+            - boosting poursuivi à partir du booster existant si le fit accepte init_model (e.g. LightGBM)
+            - ajout d'estimateurs via warm_start sinon (e.g. Random Forest, Gradient Boosting)
+        Les éventuelles étapes précédentes de la pipeline ne sont pas réentraînées.
+
+        Args:
+            x_train (?): array-like or sparse matrix of shape = [n_samples, n_features]
+            y_train (?): array-like, shape = [n_samples, n_features]
+        Kwargs:
+            n_new_estimators (int): nombre d'estimateurs à ajouter (warm_start uniquement).
+                Si None, autant qu'en moyenne lors des fits précédents.
+        Raises:
+            RuntimeError: si le dernier estimateur de la pipeline ne permet pas d'entraînement incrémental
+            ValueError: si les classes des nouvelles données ne correspondent pas à celles du modèle
+        '''
+        name, estimator = self.pipeline.steps[-1]
+        if len(self.pipeline.steps) > 1:
+            x_train = self.pipeline[:-1].transform(x_train)
+        fit_parameters = inspect.signature(estimator.fit).parameters
+        estimator_params = estimator.get_params()
+
+        if hasattr(estimator, 'partial_fit'):
+            self._check_incremental_classes(y_train, allow_subset=True)
+            estimator.partial_fit(x_train, y_train)
+        elif 'init_model' in fit_parameters and hasattr(estimator, 'booster_'):
+            self._check_incremental_classes(y_train)
+            # Nouveaux arbres (n_estimators) ajoutés au booster existant
+            estimator.fit(x_train, y_train, init_model=estimator.booster_)
+        elif 'warm_start' in estimator_params and hasattr(estimator, 'estimators_'):
+            self._check_incremental_classes(y_train)
+            n_estimators = len(estimator.estimators_)
+            if n_new_estimators is None:
+                n_new_estimators = int(math.ceil(n_estimators / max(self.nb_fit, 1)))
+            if n_new_estimators < 1:
+                raise ValueError("L'objet n_new_estimators doit être strictement positif")
+            warm_start = estimator_params['warm_start']
+            estimator.set_params(warm_start=True, n_estimators=n_estimators + n_new_estimators)
+            estimator.fit(x_train, y_train)
+            estimator.set_params(warm_start=warm_start)
+        else:
+            raise RuntimeError(f"L'estimateur {name} ({type(estimator).__name__}) ne permet pas d'entraînement incrémental")
+
+        # Set trained
+        self.trained = True
+        self.nb_fit += 1
+
+    def _check_incremental_classes(self, y_train, allow_subset: bool = False):
+        '''Vérifie que les classes des nouvelles données correspondent à celles du modèle (classifiers uniquement)
+
+        Args:
+            y_train (?): array-like, shape = [n_samples, n_features]
+        Kwargs:
+            allow_subset (bool): si les nouvelles données peuvent ne contenir qu'une partie des classes
+        Raises:
+            ValueError: si les classes des nouvelles données ne correspondent pas à celles du modèle
+        '''
+        if self.model_type != 'classifier' or self.list_classes is None:
+            return
+        if self.multi_label:
+            n_labels = y_train.shape[1] if len(y_train.shape) > 1 else 1
+            if n_labels != len(self.list_classes):
+                raise ValueError(f"Le nombre de labels ({n_labels}) ne correspond pas à celui du modèle ({len(self.list_classes)})")
+            return
+        new_classes = set(np.unique(y_train))
+        if not new_classes.issubset(self.list_classes):
+            raise ValueError(f"Classes inconnues du modèle : {new_classes - set(self.list_classes)}")
+        if not allow_subset and new_classes != set(self.list_classes):
+            raise ValueError(f"Toutes les classes du modèle doivent être présentes dans les nouvelles données (manquantes : {set(self.list_classes) - new_classes})")
+
     @utils.trained_needed
+    @instrumentation.timed()
     def predict(self, x_test: pd.DataFrame, return_proba: bool = False, **kwargs):
         '''Prédictions sur test
 
@@ -142,6 +242,10 @@ class ModelPipeline(ModelClass):
         if return_proba == True and self.model_type != 'classifier':
             raise ValueError(f"Les modèles de type {self.model_type} n'implémente ne gère pas les probabilités")
 
+        # Multi-label avec seuils optimisés (cf. ModelClassifierMixin) : classes obtenues à partir des probas
+        if not return_proba and hasattr(self, '_use_multi_label_thresholds') and self._use_multi_label_thresholds():
+            return self.get_classes_from_proba(self.predict_proba(x_test))
+
         # On check le format des entrants
         x_test, _ = self._check_input_format(x_test)
 
@@ -152,6 +256,7 @@ class ModelPipeline(ModelClass):
             return self.predict_proba(x_test)
 
     @utils.trained_needed
+    @instrumentation.timed()
     def predict_proba(self, x_test: pd.DataFrame, **kwargs):
         '''Prédictions probabilité sur test - Classifier only
 
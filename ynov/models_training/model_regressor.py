@@ -14,6 +14,7 @@ import json
 import logging
 import numpy as np
 import pandas as pd
+from scipy import sparse
 import seaborn as sns
 from typing import List
 import matplotlib.pyplot as plt
@@ -22,6 +23,7 @@ from sklearn.linear_model import LinearRegression
 from yellowbrick.regressor import ResidualsPlot, PredictionError
 from ynov import utils
 from ynov.models_training import utils_models
+from ynov.monitoring import instrumentation
 from ynov.monitoring.model_logger import ModelLogger
 
 sns.set(style="darkgrid")
@@ -67,6 +69,7 @@ class ModelRegressorMixin:
         '''
         return list(y) if type(y) == np.ndarray else y
 
+    @instrumentation.timed()
     def get_and_save_metrics(self, y_true, y_pred, df_x: pd.DataFrame = None, series_to_add: List[pd.Series] = None, type_data: str = '', model_logger=None):
         '''Fonction pour obtenir et sauvegarder les métriques d'un modèle
 
@@ -97,8 +100,8 @@ class ModelRegressorMixin:
             y_true_df = list(self.inverse_transform(y_true))
             y_pred_df = list(self.inverse_transform(y_pred))
 
-            # Concat dans une dataframe
-            if df_x is not None:
+            # Concat dans une dataframe (les features sparse ne sont pas sauvegardées : densification trop coûteuse)
+            if df_x is not None and not sparse.issparse(df_x):
                 df = df_x.copy()
                 df['y_true'] = y_true_df
                 df['y_pred'] = y_pred_df
@@ -151,7 +154,7 @@ class ModelRegressorMixin:
             'Explained variance': metric_explained_variance_score,
             'Coefficient of determination': metric_r2,
         }
-        df_stats = df_stats.append(global_stats, ignore_index=True)
+        df_stats = pd.concat([df_stats, pd.DataFrame([global_stats])], ignore_index=True)
 
         # Sauvegarde du csv
         file_path = os.path.join(self.model_dir, f"mae{'_' + type_data if len(type_data) > 0 else ''}@{metric_mae}.csv")
@@ -258,7 +261,7 @@ class ModelRegressorMixin:
             'Explained variance': metric_explained_variance_score,
             'Coefficient of determination': metric_r2,
         }
-        df_stats = df_stats.append(global_stats, ignore_index=True)
+        df_stats = pd.concat([df_stats, pd.DataFrame([global_stats])], ignore_index=True)
 
         # Return dataframe
         return df_stats
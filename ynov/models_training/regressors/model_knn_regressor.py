@@ -14,11 +14,12 @@ import logging
 import numpy as np
 import pandas as pd
 import dill as pickle
+from typing import List
 from datetime import datetime
 from sklearn.neighbors import KNeighborsRegressor
 from sklearn.pipeline import Pipeline
 from ynov import utils
-from ynov.models_training import utils_models
+from ynov.models_training import utils_models, utils_knn
 from ynov.models_training.model_pipeline import ModelPipeline
 from ynov.models_training.model_regressor import ModelRegressorMixin
 
@@ -28,12 +29,18 @@ class ModelKNNRegressor(ModelRegressorMixin, ModelPipeline):
 
     _default_name = 'model_knn_regressor'
 
-    def __init__(self, knn_params: dict = {}, **kwargs):
+    def __init__(self, knn_params: dict = {}, knn_backend: str = 'sklearn', **kwargs):
         '''Initialisation de la classe (voir ModelPipeline, ModelClass & ModelRegressorMixin pour arguments supplémentaires)
 
         Kwargs:
             knn_params (dict) : paramètres pour le K-nearest Neighbors
+            knn_backend (str): recherche des voisins, 'sklearn' (exacte) ou 'ivf' (approchée, cf. utils_knn).
+                Avec 'ivf', knn_params accepte n_neighbors, weights, n_lists, n_probe, n_iter & random_state.
+        Raises:
+            ValueError: si knn_backend n'est pas 'sklearn' ou 'ivf'
         '''
+        if knn_backend not in ['sklearn', 'ivf']:
+            raise ValueError(f"La valeur de 'knn_backend' doit être 'sklearn' ou 'ivf' (pas {knn_backend})")
         # Init.
         super().__init__(**kwargs)
 
@@ -41,10 +48,34 @@ class ModelKNNRegressor(ModelRegressorMixin, ModelPipeline):
         self.logger = logging.getLogger(__name__)
 
         # Gestion modèles
-        self.knn = KNeighborsRegressor(**knn_params)
+        self.knn_backend = knn_backend
+        if knn_backend == 'ivf':
+            self.knn = utils_knn.ApproximateKNeighborsRegressor(**knn_params)
+        else:
+            self.knn = KNeighborsRegressor(**knn_params)
         # On def. une pipeline pour compatibilité autres modèles
         self.pipeline = Pipeline([('knn', self.knn)])
 
+    def get_and_save_metrics(self, y_true, y_pred, df_x: pd.DataFrame = None, series_to_add: List[pd.Series] = None, type_data: str = '', model_logger=None):
+        '''Fonction pour obtenir et sauvegarder les métriques d'un modèle (voir ModelRegressorMixin)
+        Avec un backend approché, on ajoute le recall de l'index par rapport à la recherche exacte (si df_x est fourni)
+
+        Args:
+            y_true (?): array-like, shape = [n_samples, n_features]
+            y_pred (?): array-like, shape = [n_samples, n_features]
+        Kwargs:
+            df_x (?): DataFrame en entrée de la prédiction
+            series_to_add (list): liste de pd.Series à ajouter à la dataframe
+            type_data (str): type du dataset (validation, test, ...)
+            model_logger (ModelLogger): classe custom pour logger les métriques dans ML Flow
+        Returns:
+            pd.DataFrame: la df qui contient les statistiques
+        '''
+        df_stats = super().get_and_save_metrics(y_true, y_pred, df_x=df_x, series_to_add=series_to_add, type_data=type_data, model_logger=model_logger)
+        if self.knn_backend != 'sklearn' and df_x is not None:
+            utils_knn.get_and_save_recall(self, df_x, type_data=type_data, model_logger=model_logger)
+        return df_stats
+
     def save(self, json_data: dict = None):
         '''Sauvegarde du modèle
 
@@ -58,6 +89,7 @@ class ModelKNNRegressor(ModelRegressorMixin, ModelPipeline):
             json_data = {}
 
         # Pas besoin de sauvegarder les params des steps de la pipeline, déjà fait dans model_pipeline
+        json_data['knn_backend'] = self.knn_backend
 
         # Save
         super().save(json_data=json_data)
@@ -104,6 +136,7 @@ class ModelKNNRegressor(ModelRegressorMixin, ModelPipeline):
         self.level_save = configs['level_save'] if 'level_save' in configs.keys() else self.level_save
         self.nb_fit = configs['nb_fit'] if 'nb_fit' in configs.keys() else 1 # On considère 1 unique fit par défaut
         self.trained = configs['trained'] if 'trained' in configs.keys() else True # On considère trained par défaut
+        self.knn_backend = configs['knn_backend'] if 'knn_backend' in configs.keys() else 'sklearn'
 
         # Reload pipeline model
         with open(model_pipeline_path, 'rb') as f:
@@ -16,11 +16,11 @@ import pandas as pd
 import dill as pickle
 from datetime import datetime
 from xgboost import XGBRegressor
-from sklearn.model_selection import train_test_split
 from ynov import utils
-from ynov.models_training import utils_models
+from ynov.models_training import utils_models, utils_xgboost
 from ynov.models_training.model_class import ModelClass
 from ynov.models_training.model_regressor import ModelRegressorMixin
+from ynov.monitoring import instrumentation
 
 
 class ModelXgboostRegressor(ModelRegressorMixin, ModelClass):
@@ -28,7 +28,8 @@ class ModelXgboostRegressor(ModelRegressorMixin, ModelClass):
 
     _default_name = 'model_xgboost_regressor'
 
-    def __init__(self, xgboost_params: dict = {}, early_stopping_rounds: int = 5, validation_split: float = 0.2, **kwargs):
+    def __init__(self, xgboost_params: dict = {}, early_stopping_rounds: int = 5, validation_split: float = 0.2,
+                 eval_train_size=None, **kwargs):
         '''Initialisation de la classe (voir ModelClass & ModelRegressorMixin pour arguments supplémentaires)
 
         Kwargs:
@@ -37,6 +38,8 @@ class ModelXgboostRegressor(ModelRegressorMixin, ModelClass):
             early_stopping_rounds (int):
             validation_split (float): fraction validation split.
                 Utile seulement si pas de jeu de validation en entrée du fit.
+            eval_train_size (float ou int): taille du sous-échantillon du train évalué à chaque itération
+                (float -> fraction, int -> nombre de lignes). Si None, seule la validation est évaluée.
         '''
         # Init.
         super().__init__(**kwargs)
@@ -48,6 +51,7 @@ class ModelXgboostRegressor(ModelRegressorMixin, ModelClass):
         self.xgboost_params = xgboost_params
         self.early_stopping_rounds = early_stopping_rounds
         self.validation_split = validation_split
+        self.eval_train_size = eval_train_size
 
         # Set objective (if not in params) & init. model
         if 'objective' not in self.xgboost_params.keys():
@@ -55,10 +59,17 @@ class ModelXgboostRegressor(ModelRegressorMixin, ModelClass):
              # list of objectives https://xgboost.readthedocs.io/en/latest/parameter.html#learning-task-parameters
         self.model = XGBRegressor(**self.xgboost_params)
 
-    def fit(self, x_train, y_train, x_valid=None, y_valid=None, with_shuffle: bool = True, **kwargs):
+    @instrumentation.timed()
+    def fit(self, x_train, y_train, x_valid=None, y_valid=None, with_shuffle: bool = True, chunksize: int = 100000,
+            incremental: bool = False, **kwargs):
         '''Entrainement du modèle
            **kwargs permet la comptabilité avec les modèles keras
 
+        Mémoire externe : x_train peut aussi être le chemin d'un fichier (.csv, e.g. sortie de 1_preprocess_data.py,
+        ou .parquet) ou une fonction retournant des chunks (DataFrames). y_train est alors le nom de la colonne cible
+        (ou None pour utiliser y_col) et x_valid le chemin d'un fichier de validation ou des données en mémoire.
+        Le train est lu par chunks (cf. utils_xgboost), la mémoire utilisée reste bornée.
+
         Args:
             x_train (?): array-like, shape = [n_samples, n_features]
             y_train (?): array-like, shape = [n_samples, n_features]
@@ -67,44 +78,42 @@ class ModelXgboostRegressor(ModelRegressorMixin, ModelClass):
         Kwargs:
             with_shuffle (boolean): si x, y doivent être mélangés avant le fit
                 Experimental: fonctionnement à vérifier en fonction différents formats x, y
+            chunksize (int): nombre de lignes par chunk (mémoire externe, fichiers uniquement)
+            incremental (bool): si un modèle déjà entraîné doit continuer son boosting sur les nouvelles données
+                (n_estimators nouveaux arbres ajoutés au booster existant). Sans effet si le modèle n'est pas encore entraîné.
         Raises:
-            RuntimeError: si on essaie d'entrainer un modèle déjà fit
+            RuntimeError: si on essaie d'entrainer un modèle déjà fit (hors mode incrémental)
         '''
-        # TODO: voir si on peut continuer l'entrainement d'un xgboost
-        if self.trained:
+        if self.trained and not incremental:
             self.logger.error("Il n'est pas prévu de pouvoir réentrainer un modèle de type xgboost")
-            self.logger.error("Veuillez entrainer un nouveau modèle")
+            self.logger.error("Veuillez entrainer un nouveau modèle (ou utiliser incremental=True)")
             raise RuntimeError("Impossible de réentrainer un modèle de type pipeline sklearn")
+        # Booster à partir duquel continuer le boosting (mode incrémental)
+        xgb_model = self._get_booster_to_continue() if self.trained else None
+
+        # Mémoire externe
+        if utils_xgboost.is_external_data(x_train):
+            self._fit_external_memory(x_train, y_col=y_train, x_valid=x_valid, y_valid=y_valid, chunksize=chunksize,
+                                      xgb_model=xgb_model)
+            return
 
         # On check le format des entrants
         x_train, y_train = self._check_input_format(x_train, y_train, fit_function=True)
         # Si validation, on check aussi le format (mais fit_function à None)
         if y_valid is not None and x_valid is not None:
             x_valid, y_valid = self._check_input_format(x_valid, y_valid, fit_function=False)
-        # Sinon, on split random
-        else:
-            self.logger.warning(f"Attention, pas de jeu de validation. On va donc split le jeu de training (fraction valid = {self.validation_split})")
-            x_train, x_valid, y_train, y_valid = train_test_split(x_train, y_train, test_size=self.validation_split)
-
-        # Shuffle x, y if wanted
-        if with_shuffle:
-            p = np.random.permutation(len(x_train))
-            x_train = np.array(x_train)[p]
-            y_train = np.array(y_train)[p]
-        # Else still transform to numpy array
-        else:
-            x_train = np.array(x_train)
-            y_train = np.array(y_train)
-
-        # Also get x_valid & y_valid as numpy
-        x_valid = np.array(x_valid)
-        y_valid = np.array(y_valid)
-
-
-        # Set eval set and train
-        eval_set = [(x_train, y_train), (x_valid, y_valid)] # If there’s more than one item in eval_set, the last entry will be used for early stopping.
+
+        # Conversion numpy, split & shuffle par index (pas de copies inutiles)
+        # xgboost construit ensuite une unique (Quantile)DMatrix pour le train
+        x_train, y_train, eval_set = utils_models.get_xgboost_fit_data(x_train, y_train, x_valid=x_valid, y_valid=y_valid,
+                                                                       validation_split=self.validation_split,
+                                                                       with_shuffle=with_shuffle,
+                                                                       eval_train_size=self.eval_train_size)
+
+        # Early stopping sur le dernier élément de eval_set (validation)
+        self.model.set_params(early_stopping_rounds=self.early_stopping_rounds)
         prior_objective = self.model.objective
-        self.model.fit(x_train, y_train, eval_set=eval_set, early_stopping_rounds=self.early_stopping_rounds, verbose=True)
+        self.model.fit(x_train, y_train, eval_set=eval_set, verbose=True, xgb_model=xgb_model)
         post_objective = self.model.objective
         if prior_objective != post_objective:
             self.logger.warning("ATTENTION: la fonction d'objectif à automatiquement été changée par XGBOOST")
@@ -115,7 +124,37 @@ class ModelXgboostRegressor(ModelRegressorMixin, ModelClass):
         self.trained = True
         self.nb_fit += 1
 
+    def _get_booster_to_continue(self):
+        '''Retourne le booster à partir duquel continuer le boosting (mode incrémental)
+
+        Returns:
+            Booster: booster du modèle entraîné
+        '''
+        return self.model.get_booster()
+
+    def _fit_external_memory(self, data, y_col=None, x_valid=None, y_valid=None, chunksize: int = 100000, xgb_model=None):
+        '''Entrainement du modèle en mémoire externe (cf. utils_xgboost)
+
+        Args:
+            data (str | function): chemin d'un fichier ou fonction retournant des chunks
+        Kwargs:
+            y_col (str): colonne cible. Si None, on utilise self.y_col.
+            x_valid (?): chemin d'un fichier .csv de validation, ou array-like, shape = [n_samples, n_features]
+            y_valid (?): array-like, shape = [n_samples]
+            chunksize (int): nombre de lignes par chunk (fichiers uniquement)
+            xgb_model (Booster): booster à partir duquel continuer le boosting (mode incrémental)
+        '''
+        chunks_factory, x_valid, y_valid = utils_xgboost.prepare_external_data(self, data, y_col=y_col, x_valid=x_valid,
+                                                                               y_valid=y_valid, chunksize=chunksize)
+        utils_xgboost.train_external_memory(self.model, chunks_factory, self.x_col, self.y_col, x_valid, y_valid,
+                                            early_stopping_rounds=self.early_stopping_rounds, xgb_model=xgb_model)
+
+        # Set trained
+        self.trained = True
+        self.nb_fit += 1
+
     @utils.trained_needed
+    @instrumentation.timed()
     def predict(self, x_test: pd.DataFrame, return_proba: bool = False, **kwargs):
         '''Prédictions sur test
 
@@ -139,6 +178,7 @@ class ModelXgboostRegressor(ModelRegressorMixin, ModelClass):
         return y_pred
 
     @utils.trained_needed
+    @instrumentation.timed()
     def predict_proba(self, x_test):
         '''Prédictions probabilité sur test
 
@@ -168,6 +208,7 @@ class ModelXgboostRegressor(ModelRegressorMixin, ModelClass):
         json_data['xgboost_params'] = self.xgboost_params
         json_data['early_stopping_rounds'] = self.early_stopping_rounds
         json_data['validation_split'] = self.validation_split
+        json_data['eval_train_size'] = self.eval_train_size
 
         # Save xgboost standalone
         if self.level_save in ['MEDIUM', 'HIGH']:
@@ -222,6 +263,7 @@ class ModelXgboostRegressor(ModelRegressorMixin, ModelClass):
         self.xgboost_params = configs['xgboost_params'] if 'xgboost_params' in configs.keys() else self.xgboost_params
         self.early_stopping_rounds = configs['early_stopping_rounds'] if 'early_stopping_rounds' in configs.keys() else self.early_stopping_rounds
         self.validation_split = configs['validation_split'] if 'validation_split' in configs.keys() else self.validation_split
+        self.eval_train_size = configs['eval_train_size'] if 'eval_train_size' in configs.keys() else self.eval_train_size
         # self.model_dir = # On décide de garder le dossier créé
         self.level_save = configs['level_save'] if 'level_save' in configs.keys() else self.level_save
         self.nb_fit = configs['nb_fit'] if 'nb_fit' in configs.keys() else 1 # On considère 1 unique fit par défaut
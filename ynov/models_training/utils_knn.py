@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+
+## Utils - recherche approchée des plus proches voisins (index IVF, NumPy)
+# Auteurs : Agence dataservices
+# Date : 19/10/2026
+#
+# Classes :
+# - IVFIndex -> Index approché des plus proches voisins (inverted file, k-means)
+# - ApproximateKNeighborsClassifier -> K-nearest Neighbors approché - Classification (API sklearn)
+# - ApproximateKNeighborsRegressor -> K-nearest Neighbors approché - Regression (API sklearn)
+#
+# Fonctions :
+# - compute_recall -> Calcule le recall de la recherche approchée par rapport à la recherche exacte
+# - get_and_save_recall -> Calcule, log et sauvegarde le recall de l'index approché d'un modèle KNN
+#
+# Principe (IVF) : les données d'entraînement sont réparties en n_lists clusters (k-means).
+# Pour une requête, on ne cherche les voisins que dans les n_probe clusters les plus proches :
+# coût ~ n_probe * n / n_lists distances au lieu de n. Plus n_probe est grand, meilleur est le recall.
+
+
+import os
+import math
+import logging
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin, RegressorMixin
+from sklearn.neighbors import NearestNeighbors
+from sklearn.utils.validation import check_array, check_is_fitted
+
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de distances calculées à la fois (limite la mémoire)
+_MAX_BLOCK_SIZE = 2 ** 24
+
+
+def _squared_distances(queries: np.ndarray, points: np.ndarray, points_sq_norms: np.ndarray):
+    '''Distances euclidiennes au carré entre requêtes et points
+
+    Args:
+        queries (np.ndarray): shape = [n_queries, n_features]
+        points (np.ndarray): shape = [n_points, n_features]
+        points_sq_norms (np.ndarray): normes au carré des points, shape = [n_points]
+    Returns:
+        np.ndarray: shape = [n_queries, n_points]
+    '''
+    distances = -2 * queries @ points.T
+    distances += np.einsum('ij,ij->i', queries, queries)[:, None]
+    distances += points_sq_norms[None, :]
+    np.maximum(distances, 0, out=distances)
+    return distances
+
+
+def _argmin_blocks(data: np.ndarray, centroids: np.ndarray):
+    '''Index du centroïde le plus proche de chaque ligne (calcul par blocs)
+
+    Args:
+        data (np.ndarray): shape = [n_samples, n_features]
+        centroids (np.ndarray): shape = [n_centroids, n_features]
+    Returns:
+        np.ndarray: shape = [n_samples]
+    '''
+    centroids_sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+    block_size = max(_MAX_BLOCK_SIZE // max(centroids.shape[0], 1), 1)
+    return np.concatenate([
+        _squared_distances(data[i:i + block_size], centroids, centroids_sq_norms).argmin(axis=1)
+        for i in range(0, data.shape[0], block_size)
+    ])
+
+
+class IVFIndex:
+    '''Index approché des plus proches voisins (inverted file, k-means)'''
+
+    def __init__(self, n_lists: int = None, n_probe: int = 8, n_iter: int = 10, random_state: int = 42):
+        '''Initialisation de la classe
+
+        Kwargs:
+            n_lists (int): nombre de clusters. Si None, racine carrée du nombre de lignes.
+            n_probe (int): nombre de clusters visités par requête
+            n_iter (int): nombre d'itérations du k-means
+            random_state (int): graine aléatoire
+        Raises:
+            ValueError: si n_probe ou n_iter n'est pas strictement positif
+        '''
+        if n_probe < 1:
+            raise ValueError("L'objet n_probe doit être strictement positif")
+        if n_iter < 1:
+            raise ValueError("L'objet n_iter doit être strictement positif")
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.random_state = random_state
+
+    def fit(self, data: np.ndarray):
+        '''Construction de l'index
+
+        Args:
+            data (np.ndarray): shape = [n_samples, n_features]
+        Returns:
+            IVFIndex: self
+        '''
+        data = np.ascontiguousarray(data, dtype=np.float32)
+        n_samples = data.shape[0]
+        n_lists = self.n_lists if self.n_lists is not None else int(round(math.sqrt(n_samples)))
+        n_lists = min(max(n_lists, 1), n_samples)
+        rng = np.random.RandomState(self.random_state)
+
+        # k-means (Lloyd) sur un échantillon
+        sample = data[rng.choice(n_samples, size=min(n_samples, 256 * n_lists), replace=False)]
+        centroids = sample[rng.choice(sample.shape[0], size=n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assignment = _argmin_blocks(sample, centroids)
+            counts = np.bincount(assignment, minlength=n_lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            non_empty = counts > 0
+            centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+
+        # Listes inversées : données triées par cluster (lecture contiguë à la requête)
+        assignment = _argmin_blocks(data, centroids)
+        order = np.argsort(assignment, kind='stable')
+        self.centroids_ = centroids
+        self.offsets_ = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+        self.ids_ = order
+        self.data_ = data[order]
+        self.sq_norms_ = np.einsum('ij,ij->i', self.data_, self.data_)
+        return self
+
+    def query(self, queries: np.ndarray, n_neighbors: int, n_probe: int = None):
+        '''Recherche approchée des plus proches voisins
+
+        Args:
+            queries (np.ndarray): shape = [n_queries, n_features]
+            n_neighbors (int): nombre de voisins
+        Kwargs:
+            n_probe (int): nombre de clusters visités (si None, self.n_probe)
+        Returns:
+            np.ndarray: distances, shape = [n_queries, n_neighbors]
+            np.ndarray: indices (dans les données d'entraînement), shape = [n_queries, n_neighbors]
+        '''
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        n_queries, n_lists = queries.shape[0], self.centroids_.shape[0]
+        n_neighbors = min(n_neighbors, self.data_.shape[0])
+        n_probe = min(n_probe if n_probe is not None else self.n_probe, n_lists)
+
+        # Clusters à visiter pour chaque requête
+        centroids_sq_norms = np.einsum('ij,ij->i', self.centroids_, self.centroids_)
+        centroids_distances = _squared_distances(queries, self.centroids_, centroids_sq_norms)
+        if n_probe < n_lists:
+            probes = np.argpartition(centroids_distances, n_probe - 1, axis=1)[:, :n_probe]
+        else:
+            probes = np.tile(np.arange(n_lists), (n_queries, 1))
+
+        # Recherche cluster par cluster, en gardant les n_neighbors meilleurs candidats de chaque requête
+        best_distances = np.full((n_queries, n_neighbors), np.inf, dtype=np.float32)
+        best_positions = np.full((n_queries, n_neighbors), -1, dtype=np.int64)
+        for list_id in range(n_lists):
+            start, end = self.offsets_[list_id], self.offsets_[list_id + 1]
+            if start == end:
+                continue
+            query_ids = np.flatnonzero((probes == list_id).any(axis=1))
+            if len(query_ids) == 0:
+                continue
+            distances = _squared_distances(queries[query_ids], self.data_[start:end], self.sq_norms_[start:end])
+            positions = np.broadcast_to(np.arange(start, end), distances.shape)
+            all_distances = np.concatenate([best_distances[query_ids], distances], axis=1)
+            all_positions = np.concatenate([best_positions[query_ids], positions], axis=1)
+            top = np.argpartition(all_distances, n_neighbors - 1, axis=1)[:, :n_neighbors]
+            best_distances[query_ids] = np.take_along_axis(all_distances, top, axis=1)
+            best_positions[query_ids] = np.take_along_axis(all_positions, top, axis=1)
+
+        # Pas assez de candidats dans les clusters visités -> recherche exacte pour ces requêtes
+        missing = np.flatnonzero((best_positions < 0).any(axis=1))
+        if len(missing) > 0:
+            distances = _squared_distances(queries[missing], self.data_, self.sq_norms_)
+            top = np.argpartition(distances, n_neighbors - 1, axis=1)[:, :n_neighbors]
+            best_distances[missing] = np.take_along_axis(distances, top, axis=1)
+            best_positions[missing] = top
+
+        # Tri par distance croissante
+        order = np.argsort(best_distances, axis=1)
+        best_distances = np.sqrt(np.take_along_axis(best_distances, order, axis=1))
+        best_positions = np.take_along_axis(best_positions, order, axis=1)
+        return best_distances, self.ids_[best_positions]
+
+
+class _ApproximateKNeighborsMixin:
+    '''Partie commune des K-nearest Neighbors approchés'''
+
+    def _fit_index(self, x):
+        '''Construction de l'index
+
+        Args:
+            x (?): array-like, shape = [n_samples, n_features]
+        Returns:
+            np.ndarray: x validé
+        '''
+        if self.weights not in ['uniform', 'distance']:
+            raise ValueError(f"L'objet weights ({self.weights}) doit être 'uniform' ou 'distance'")
+        x = check_array(x, dtype=np.float32)
+        self.n_features_in_ = x.shape[1]
+        self.index_ = IVFIndex(n_lists=self.n_lists, n_probe=self.n_probe, n_iter=self.n_iter,
+                               random_state=self.random_state).fit(x)
+        return x
+
+    def kneighbors(self, X, n_neighbors: int = None, return_distance: bool = True):
+        '''Recherche approchée des plus proches voisins (même API que sklearn)
+
+        Args:
+            X (?): array-like, shape = [n_queries, n_features]
+        Kwargs:
+            n_neighbors (int): nombre de voisins (si None, self.n_neighbors)
+            return_distance (bool): si les distances doivent être retournées
+        Returns:
+            np.ndarray: distances (si return_distance), shape = [n_queries, n_neighbors]
+            np.ndarray: indices, shape = [n_queries, n_neighbors]
+        '''
+        check_is_fitted(self, 'index_')
+        X = check_array(X, dtype=np.float32)
+        distances, indices = self.index_.query(X, n_neighbors if n_neighbors is not None else self.n_neighbors)
+        return (distances, indices) if return_distance else indices
+
+    def _get_weights(self, distances: np.ndarray):
+        '''Poids des voisins (cf. sklearn.neighbors._base._get_weights)
+
+        Args:
+            distances (np.ndarray): shape = [n_queries, n_neighbors]
+        Returns:
+            np.ndarray: shape = [n_queries, n_neighbors]
+        '''
+        if self.weights == 'uniform':
+            return np.ones_like(distances)
+        with np.errstate(divide='ignore'):
+            weights = 1. / distances
+        # Distance nulle : seuls les voisins confondus comptent
+        exact_match = np.isinf(weights).any(axis=1)
+        weights[exact_match] = np.isinf(weights[exact_match]).astype(float)
+        return weights
+
+
+class ApproximateKNeighborsClassifier(_ApproximateKNeighborsMixin, ClassifierMixin, BaseEstimator):
+    '''K-nearest Neighbors approché (index IVF) - Classification (API sklearn, mono ou multi-output)'''
+
+    def __init__(self, n_neighbors: int = 5, weights: str = 'uniform', n_lists: int = None, n_probe: int = 8,
+                 n_iter: int = 10, random_state: int = 42):
+        '''Initialisation de la classe
+
+        Kwargs:
+            n_neighbors (int): nombre de voisins
+            weights (str): 'uniform' ou 'distance'
+            n_lists (int): nombre de clusters de l'index. Si None, racine carrée du nombre de lignes.
+            n_probe (int): nombre de clusters visités par requête (compromis vitesse / recall)
+            n_iter (int): nombre d'itérations du k-means
+            random_state (int): graine aléatoire
+        '''
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        '''Entrainement du modèle (construction de l'index)
+
+        Args:
+            X (?): array-like, shape = [n_samples, n_features]
+            y (?): array-like, shape = [n_samples] ou [n_samples, n_outputs]
+        Returns:
+            ApproximateKNeighborsClassifier: self
+        '''
+        self._fit_index(X)
+        y = np.asarray(y)
+        self.outputs_2d_ = y.ndim > 1
+        y = y.reshape(-1, 1) if not self.outputs_2d_ else y
+        self.classes_, self.y_ = [], np.empty(y.shape, dtype=np.int64)
+        for k in range(y.shape[1]):
+            classes, self.y_[:, k] = np.unique(y[:, k], return_inverse=True)
+            self.classes_.append(classes)
+        if not self.outputs_2d_:
+            self.classes_ = self.classes_[0]
+        return self
+
+    def predict_proba(self, X):
+        '''Prédictions probabilité
+
+        Args:
+            X (?): array-like, shape = [n_queries, n_features]
+        Returns:
+            np.ndarray (ou list si multi-output): shape = [n_queries, n_classes]
+        '''
+        distances, indices = self.kneighbors(X)
+        weights = self._get_weights(distances)
+        all_classes = self.classes_ if self.outputs_2d_ else [self.classes_]
+        probas = []
+        for k, classes in enumerate(all_classes):
+            proba = np.zeros((indices.shape[0], len(classes)))
+            np.add.at(proba, (np.arange(indices.shape[0])[:, None], self.y_[indices, k]), weights)
+            proba /= proba.sum(axis=1, keepdims=True)
+            probas.append(proba)
+        return probas if self.outputs_2d_ else probas[0]
+
+    def predict(self, X):
+        '''Prédictions
+
+        Args:
+            X (?): array-like, shape = [n_queries, n_features]
+        Returns:
+            np.ndarray: shape = [n_queries] ou [n_queries, n_outputs]
+        '''
+        probas = self.predict_proba(X)
+        if not self.outputs_2d_:
+            return self.classes_[probas.argmax(axis=1)]
+        return np.stack([classes[proba.argmax(axis=1)] for classes, proba in zip(self.classes_, probas)], axis=1)
+
+
+class ApproximateKNeighborsRegressor(_ApproximateKNeighborsMixin, RegressorMixin, BaseEstimator):
+    '''K-nearest Neighbors approché (index IVF) - Regression (API sklearn)'''
+
+    def __init__(self, n_neighbors: int = 5, weights: str = 'uniform', n_lists: int = None, n_probe: int = 8,
+                 n_iter: int = 10, random_state: int = 42):
+        '''Initialisation de la classe
+
+        Kwargs:
+            n_neighbors (int): nombre de voisins
+            weights (str): 'uniform' ou 'distance'
+            n_lists (int): nombre de clusters de l'index. Si None, racine carrée du nombre de lignes.
+            n_probe (int): nombre de clusters visités par requête (compromis vitesse / recall)
+            n_iter (int): nombre d'itérations du k-means
+            random_state (int): graine aléatoire
+        '''
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.n_iter = n_iter
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        '''Entrainement du modèle (construction de l'index)
+
+        Args:
+            X (?): array-like, shape = [n_samples, n_features]
+            y (?): array-like, shape = [n_samples] ou [n_samples, n_outputs]
+        Returns:
+            ApproximateKNeighborsRegressor: self
+        '''
+        self._fit_index(X)
+        self.y_ = np.asarray(y, dtype=float)
+        return self
+
+    def predict(self, X):
+        '''Prédictions
+
+        Args:
+            X (?): array-like, shape = [n_queries, n_features]
+        Returns:
+            np.ndarray: shape = [n_queries] ou [n_queries, n_outputs]
+        '''
+        distances, indices = self.kneighbors(X)
+        weights = self._get_weights(distances)
+        neighbors_y = self.y_[indices]
+        if neighbors_y.ndim == 2:
+            return (neighbors_y * weights).sum(axis=1) / weights.sum(axis=1)
+        return (neighbors_y * weights[:, :, None]).sum(axis=1) / weights.sum(axis=1)[:, None]
+
+
+def compute_recall(estimator, x, n_neighbors: int = None, max_samples: int = 1000, random_state: int = 42):
+    '''Calcule le recall de la recherche approchée par rapport à la recherche exacte
+
+    recall = part moyenne des vrais n_neighbors plus proches voisins retrouvés par l'index
+
+    Args:
+        estimator (ApproximateKNeighborsClassifier | ApproximateKNeighborsRegressor): estimateur entraîné
+        x (?): array-like, shape = [n_queries, n_features], requêtes
+    Kwargs:
+        n_neighbors (int): nombre de voisins (si None, estimator.n_neighbors)
+        max_samples (int): nombre maximal de requêtes (échantillonnées), la recherche exacte étant coûteuse
+        random_state (int): graine aléatoire de l'échantillonnage
+    Returns:
+        float: recall dans [0, 1]
+    '''
+    x = check_array(x, dtype=np.float32)
+    if x.shape[0] > max_samples:
+        x = x[np.random.RandomState(random_state).choice(x.shape[0], size=max_samples, replace=False)]
+    n_neighbors = n_neighbors if n_neighbors is not None else estimator.n_neighbors
+    index = estimator.index_
+    n_neighbors = min(n_neighbors, index.data_.shape[0])
+    approx_indices = estimator.kneighbors(x, n_neighbors=n_neighbors, return_distance=False)
+    exact_indices = NearestNeighbors(n_neighbors=n_neighbors, algorithm='brute').fit(index.data_).kneighbors(x, return_distance=False)
+    exact_indices = index.ids_[exact_indices]
+    matches = [len(np.intersect1d(approx, exact)) for approx, exact in zip(approx_indices, exact_indices)]
+    return float(np.sum(matches) / (x.shape[0] * n_neighbors))
+
+
+def get_and_save_recall(model, df_x, type_data: str = '', model_logger=None):
+    '''Calcule, log et sauvegarde le recall de l'index approché d'un modèle KNN (ModelKNNClassifier / ModelKNNRegressor)
+
+    Args:
+        model (ModelPipeline): modèle KNN entraîné, avec knn_backend != 'sklearn'
+        df_x (pd.DataFrame): DataFrame en entrée de la prédiction
+    Kwargs:
+        type_data (str): type du dataset (validation, test, ...)
+        model_logger (ModelLogger): classe custom pour logger les métriques dans ML Flow
+    Returns:
+        float: recall dans [0, 1]
+    '''
+    # Estimateur entraîné (pas de OneVsRest / OneVsOne avec un backend approché)
+    estimator = model.pipeline['knn']
+    x, _ = model._check_input_format(df_x)
+    recall = compute_recall(estimator, x)
+
+    model.logger.info(f"Recall {model.knn_backend} vs recherche exacte{' ' + type_data if len(type_data) > 0 else ''} : {round(recall, 5)}")
+    recall_path = os.path.join(model.model_dir, f"ann_recall{'_' + type_data if len(type_data) > 0 else ''}@{round(recall, 5)}")
+    with open(recall_path, 'w') as f:
+        pass
+    if model_logger is not None:
+        model_logger.log_metric(f"ann_recall{'_' + type_data if len(type_data) > 0 else ''}", recall)
+    return recall
+
+
+if __name__ == '__main__':
+    logger.error("Ce script ne doit pas être exécuté, il s'agit d'un package.")
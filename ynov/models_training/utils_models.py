@@ -9,18 +9,35 @@
 # - stratified_split -> Séparation du dataframe en train et en test de manière stratifiée
 # - remove_small_classes -> Fonction pour supprimer les classes pas assez représentées
 # - display_train_test_shape -> Fonction pour afficher la taille d'une répartition train/test
+# - get_xgboost_fit_data -> Fonction pour préparer les données d'entraînement d'un xgboost sans copies inutiles
+# - balance_n_jobs -> Fonction pour répartir les coeurs entre tâches parallèles et threads de chaque tâche
+# - get_target_columns -> Fonction pour préparer des cibles multi-label (éventuellement sparse) à un accès par colonne
+# - get_target_column -> Fonction pour extraire la cible d'un label (seule cette colonne est densifiée)
+# - get_one_hot_probas -> Fonction pour transformer des prédictions en "probabilités" one-hot (e.g. stratégie 'ovo')
+# - indicators_to_tuples -> Fonction pour transformer des indicatrices multi-label en tuples (classes ou probabilités)
+# - get_optimal_thresholds -> Fonction pour calculer les seuils de décision optimaux (F1) de chaque label d'un multi-label
 # - preprocess_model_multilabel -> Fonction pour préparer une dataframe à un modèle multi-label
 # - load_pipeline -> Chargement d'une pipeline depuis le dossier des pipelines
 # - load_model -> Fonction pour load un model à partir d'un chemin
 # - get_columns_pipeline -> Function to retrieve a pipeline wanted columns, and mandatory ones
 # - apply_pipeline -> Fonction pour appliquer une pipeline fitted à une dataframe
+# - get_pipeline_fingerprint -> Fonction pour obtenir une empreinte d'une pipeline fitted (pipelines identiques -> même empreinte)
 # - predict -> Fonction pour obtenir les prédictions d'un modèle sur un contenu
 # - predict_with_proba -> Fonction pour obtenir les prédictions d'un modèle sur un contenu, avec probabilités
 # - search_hp_cv -> Fonction pour effectuer une recherche d'hyperparamètres
+# - get_model_class -> Fonction pour récupérer une classe de modèle à partir de son nom (classifiers / regressors)
+# - dump_shared_data -> Fonction pour écrire des données sur disque, pour les partager entre processus (memory-mapping)
+# - load_shared_data -> Fonction pour charger des données partagées (memory-mapped, sans copie)
+# - run_on_shared_data -> Fonction pour exécuter des tâches en parallèle (processus) sur des données partagées
+#
+# Classes :
+# - SparseTargetMultiOutputClassifier -> MultiOutputClassifier acceptant des cibles multi-label sparse
 
 
 import os
 import json
+import hashlib
+import importlib
 import math
 import dill
 import dill as pickle
@@ -28,15 +45,21 @@ import pprint
 import logging
 import gc
 import shutil
+import joblib
+import tempfile
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from datetime import datetime
+from joblib import Parallel, delayed
 from sklearn.compose import ColumnTransformer
 from sklearn.model_selection import train_test_split, KFold, StratifiedKFold
+from sklearn.multioutput import MultiOutputClassifier, _fit_estimator
 from sklearn.preprocessing import MultiLabelBinarizer
 from sklearn.utils.validation import check_is_fitted
 from ynov import utils
 from ynov.preprocessing import preprocess
+from ynov.monitoring import instrumentation
 
 
 # Get logger
@@ -159,7 +182,281 @@ def display_train_test_shape(df_train: pd.DataFrame, df_test: pd.DataFrame, df_s
     logger.info(f"{round(100 * df_test.shape[0] / df_shape, 2)}% des données sont dans le test")
 
 
-def preprocess_model_multilabel(df: pd.DataFrame, y_col, classes: list = None):
+def get_xgboost_fit_data(x_train, y_train, x_valid=None, y_valid=None, validation_split: float = 0.2,
+                         with_shuffle: bool = True, eval_train_size=None):
+    '''Fonction pour préparer les données d'entraînement d'un xgboost sans copies inutiles
+
+    Les données sont converties en numpy sans copie quand c'est possible (e.g. DataFrame d'un seul type),
+    les matrices sparse restent au format CSR.
+    Le split train/valid (si pas de jeu de validation) et le shuffle se font par index :
+    une seule copie des données de train au maximum (aucune si with_shuffle à False et jeu de validation fourni).
+    Le train n'est évalué que si eval_train_size est renseigné, sur un sous-échantillon.
+
+    Args:
+        x_train (?): array-like, shape = [n_samples, n_features]
+        y_train (?): array-like, shape = [n_samples, n_targets]
+    Kwargs:
+        x_valid (?): array-like, shape = [n_samples, n_features]
+        y_valid (?): array-like, shape = [n_samples, n_targets]
+        validation_split (float): fraction validation split, si pas de jeu de validation
+        with_shuffle (bool): si x, y doivent être mélangés
+        eval_train_size (float ou int): taille du sous-échantillon du train à évaluer à chaque itération
+            float dans ]0, 1] -> fraction du train, int -> nombre de lignes, None -> pas d'évaluation du train
+    Raises:
+        ValueError: si eval_train_size n'est pas valide
+    Returns:
+        np.ndarray | sparse.csr_matrix: x_train (les données sparse restent sparse)
+        np.ndarray: y_train
+        list: eval_set, le dernier élément (validation) est utilisé pour l'early stopping
+    '''
+    if eval_train_size is not None:
+        if isinstance(eval_train_size, bool) or not isinstance(eval_train_size, (float, int)):
+            raise ValueError("L'objet eval_train_size doit être un float, un int ou None")
+        if isinstance(eval_train_size, float) and not 0 < eval_train_size <= 1:
+            raise ValueError("L'objet eval_train_size doit être dans ]0, 1] s'il s'agit d'un float")
+        if isinstance(eval_train_size, int) and eval_train_size < 1:
+            raise ValueError("L'objet eval_train_size doit être strictement positif s'il s'agit d'un int")
+
+    def to_numpy(data):
+        # to_numpy / asarray ne copient pas si les données sont déjà homogènes
+        # Sparse : on garde une matrice CSR (indexable par lignes, acceptée par xgboost), sans densifier
+        if sparse.issparse(data):
+            return data.tocsr()
+        if isinstance(data, (pd.DataFrame, pd.Series)):
+            return data.to_numpy()
+        return np.asarray(data)
+
+    x_train, y_train = to_numpy(x_train), to_numpy(y_train)
+    n_rows = x_train.shape[0]
+    if x_valid is None or y_valid is None:
+        logger.warning(f"Attention, pas de jeu de validation. On va donc split le jeu de training (fraction valid = {validation_split})")
+        # Split par index (shuffle inclus, cf. train_test_split)
+        p = np.random.permutation(n_rows)
+        n_valid = int(math.ceil(n_rows * validation_split))
+        valid_index, train_index = p[:n_valid], p[n_valid:]
+        x_valid, y_valid = x_train[valid_index], y_train[valid_index]
+        x_train, y_train = x_train[train_index], y_train[train_index]
+    else:
+        x_valid, y_valid = to_numpy(x_valid), to_numpy(y_valid)
+        if with_shuffle:
+            p = np.random.permutation(n_rows)
+            x_train, y_train = x_train[p], y_train[p]
+
+    # Eval set : validation en dernier (utilisée pour l'early stopping)
+    eval_set = [(x_valid, y_valid)]
+    if eval_train_size is not None:
+        n_train = x_train.shape[0]
+        n_eval = int(math.ceil(n_train * eval_train_size)) if isinstance(eval_train_size, float) else min(int(eval_train_size), n_train)
+        if n_eval >= n_train:
+            # Mêmes objets que le train : xgboost réutilise la DMatrix d'entraînement
+            eval_set.insert(0, (x_train, y_train))
+        else:
+            eval_index = np.sort(np.random.choice(n_train, size=n_eval, replace=False))
+            eval_set.insert(0, (x_train[eval_index], y_train[eval_index]))
+    return x_train, y_train, eval_set
+
+
+def balance_n_jobs(n_tasks: int, n_jobs: int = None, inner_n_jobs: int = None):
+    '''Fonction pour répartir les coeurs entre tâches parallèles et threads de chaque tâche
+
+    e.g. un modèle par label (MultiOutputClassifier) : n_jobs labels en parallèle, chacun avec inner_n_jobs threads,
+    sans dépasser le nombre de coeurs (évite la sur-souscription).
+
+    Args:
+        n_tasks (int): nombre de tâches (e.g. nombre de labels)
+    Kwargs:
+        n_jobs (int): nombre de tâches en parallèle (convention joblib : None -> 1, -1 -> tous les coeurs)
+        inner_n_jobs (int): nombre de threads par tâche. Si None (ou négatif), les coeurs sont répartis entre les tâches parallèles.
+            Sinon, le nombre de tâches en parallèle est limité à n_cpus // inner_n_jobs.
+    Raises:
+        ValueError: si n_tasks n'est pas strictement positif
+        ValueError: si n_jobs vaut 0
+    Returns:
+        int: nombre de tâches en parallèle
+        int: nombre de threads par tâche
+    '''
+    if n_tasks < 1:
+        raise ValueError("L'objet n_tasks doit être strictement positif")
+    if n_jobs == 0:
+        raise ValueError("L'objet n_jobs ne peut pas valoir 0")
+    n_cpus = joblib.cpu_count()
+    if n_jobs is None:
+        n_jobs = 1
+    elif n_jobs < 0:
+        n_jobs = max(n_cpus + 1 + n_jobs, 1)
+    n_jobs = min(n_jobs, n_tasks)
+    if inner_n_jobs is None or inner_n_jobs < 1:
+        inner_n_jobs = max(n_cpus // n_jobs, 1)
+    else:
+        n_jobs = min(n_jobs, max(n_cpus // inner_n_jobs, 1))
+    return n_jobs, inner_n_jobs
+
+
+def get_target_columns(y):
+    '''Fonction pour préparer des cibles multi-label à un accès par colonne (un label à la fois)
+
+    Args:
+        y (?): array-like or sparse matrix, shape = [n_samples, n_outputs]
+    Returns:
+        ?: matrice CSC si y est sparse (pas de densification), np.ndarray sinon
+    '''
+    return y.tocsc() if sparse.issparse(y) else np.asarray(y)
+
+
+def get_target_column(y, i: int):
+    '''Fonction pour extraire la cible d'un label (seule cette colonne est densifiée)
+
+    Args:
+        y (?): cibles préparées par get_target_columns
+        i (int): indice du label
+    Returns:
+        np.ndarray: shape = [n_samples]
+    '''
+    return y[:, i].toarray().ravel() if sparse.issparse(y) else y[:, i]
+
+
+class SparseTargetMultiOutputClassifier(MultiOutputClassifier):
+    '''MultiOutputClassifier acceptant des cibles multi-label sparse
+
+    sklearn passe y[:, i] (sparse) à chaque estimateur, ce qui échoue. Ici chaque label est extrait de la
+    matrice CSC et densifié seul (une colonne à la fois) : la matrice des cibles n'est jamais densifiée.
+    Cibles denses : comportement inchangé.
+    '''
+
+    def fit(self, X, y, sample_weight=None, **fit_params):
+        '''Fit un estimateur par label
+
+        Args:
+            X (?): array-like or sparse matrix, shape = [n_samples, n_features]
+            y (?): array-like or sparse matrix, shape = [n_samples, n_outputs]
+        Kwargs:
+            sample_weight (?): array-like, shape = [n_samples]
+        Returns:
+            SparseTargetMultiOutputClassifier: self
+        '''
+        if not sparse.issparse(y):
+            return super().fit(X, y, sample_weight=sample_weight, **fit_params)
+        y = get_target_columns(y)
+        self.estimators_ = Parallel(n_jobs=self.n_jobs)(
+            delayed(_fit_estimator)(self.estimator, X, get_target_column(y, i), sample_weight, **fit_params)
+            for i in range(y.shape[1])
+        )
+        self.classes_ = [estimator.classes_ for estimator in self.estimators_]
+        if hasattr(self.estimators_[0], 'n_features_in_'):
+            self.n_features_in_ = self.estimators_[0].n_features_in_
+        if hasattr(self.estimators_[0], 'feature_names_in_'):
+            self.feature_names_in_ = self.estimators_[0].feature_names_in_
+        return self
+
+
+def get_one_hot_probas(preds, list_classes: list):
+    '''Fonction pour transformer des prédictions en "probabilités" one-hot (e.g. stratégie 'ovo', qui ne prédit pas de probas)
+
+    1. pour la classe prédite, 0. sinon. Recherche vectorisée des indices des classes (pas de boucle Python par ligne).
+
+    Args:
+        preds (?): array-like, shape = [n_samples], classes prédites
+        list_classes (list): liste des classes, dans l'ordre des colonnes de probabilités
+    Raises:
+        ValueError: si une prédiction n'est pas dans list_classes
+    Returns:
+        np.ndarray: shape = [n_samples, n_classes]
+    '''
+    indices = pd.Index(list_classes).get_indexer(np.asarray(preds))
+    if (indices < 0).any():
+        raise ValueError("Certaines prédictions ne font pas partie de list_classes")
+    probas = np.zeros((len(indices), len(list_classes)))
+    probas[np.arange(len(indices)), indices] = 1.
+    return probas
+
+
+def indicators_to_tuples(indicators, values):
+    '''Fonction pour transformer des indicatrices multi-label (0/1) en tuples de valeurs (classes ou probabilités)
+
+    Les indicatrices sont passées en CSR : les valeurs sélectionnées sont récupérées en une seule indexation,
+    il ne reste qu'un découpage par ligne (pas de compress par ligne).
+
+    Args:
+        indicators (?): array-like or sparse matrix, shape = [n_samples, n_classes], indicatrices 0/1
+        values (?): array-like, shape = [n_classes] (mêmes valeurs pour chaque ligne, e.g. classes)
+            ou shape = [n_samples, n_classes] (valeurs par ligne, e.g. probabilités)
+    Returns:
+        list: liste de n_samples tuples
+    '''
+    indicators = sparse.csr_matrix(indicators)
+    indicators.eliminate_zeros()
+    indicators.sort_indices()
+    values = np.asarray(values)
+    if values.ndim == 1:
+        selected = values[indicators.indices]
+    else:
+        rows = np.repeat(np.arange(indicators.shape[0]), np.diff(indicators.indptr))
+        selected = values[rows, indicators.indices]
+    # Découpage sur des listes Python (bien plus rapide que des tuples de scalaires numpy)
+    selected, indptr = selected.tolist(), indicators.indptr.tolist()
+    return [tuple(selected[start:end]) for start, end in zip(indptr[:-1], indptr[1:])]
+
+
+def get_optimal_thresholds(y_true, y_proba, default_threshold: float = 0.5, max_block_size: int = 2 ** 24):
+    '''Fonction pour calculer les seuils de décision optimaux (F1) de chaque label d'un multi-label
+
+    Un seul balayage vectorisé par label : les probas sont triées par ordre décroissant, et les sommes cumulées
+    des vrais positifs donnent le F1 de toutes les coupures possibles (F1 = 2 * TP / (nb prédits positifs + nb positifs)).
+    Pour trier sans argsort, la proba (float32 positif, dont les bits sont ordonnés comme les valeurs) et l'indicatrice
+    sont regroupées dans une même clé entière.
+    Le seuil retenu est le milieu entre la dernière proba prédite positive et la suivante.
+    Les labels sont traités par blocs de colonnes pour borner la mémoire.
+
+    Args:
+        y_true (?): array-like or sparse matrix, shape = [n_samples, n_labels], indicatrices 0/1
+        y_proba (?): array-like, shape = [n_samples, n_labels], probabilités
+    Kwargs:
+        default_threshold (float): seuil des labels sans positif dans y_true
+        max_block_size (int): nombre maximal de valeurs traitées à la fois
+    Raises:
+        ValueError: si y_true et y_proba n'ont pas la même shape
+        ValueError: si des probabilités sont négatives
+    Returns:
+        np.ndarray: shape = [n_labels], seuils (prédiction positive si proba >= seuil)
+    '''
+    if y_true.shape != y_proba.shape:
+        raise ValueError(f"Les objets y_true ({y_true.shape}) et y_proba ({y_proba.shape}) doivent avoir la même shape")
+    if sparse.issparse(y_true):
+        y_true = y_true.tocsc()
+    n_samples, n_labels = y_proba.shape
+    thresholds = np.full(n_labels, default_threshold, dtype=float)
+    if n_samples == 0:
+        return thresholds
+    block_size = max(max_block_size // n_samples, 1)
+    predicted_positives = np.arange(1, n_samples + 1)[None, :]
+    for start in range(0, n_labels, block_size):
+        end = min(start + block_size, n_labels)
+        # Une ligne par label (tri sur des données contiguës) ; + 0 : -0. -> 0.
+        probas = np.ascontiguousarray(np.asarray(y_proba[:, start:end], dtype=np.float32).T) + np.float32(0)
+        if (probas < 0).any():
+            raise ValueError("Les probabilités doivent être positives")
+        truth = y_true[:, start:end]
+        truth = truth.toarray() if sparse.issparse(truth) else np.asarray(truth)
+        # Tri décroissant des clés (proba, indicatrice) & vrais positifs cumulés : TP si on prédit positives les k premières lignes
+        keys = probas.view(np.uint32).astype(np.int64) * 2 + (truth.T > 0)
+        keys.sort(axis=1)
+        keys = keys[:, ::-1]
+        true_positives = np.cumsum(keys & 1, axis=1)
+        nb_positives = true_positives[:, -1]
+        f1 = 2 * true_positives / (predicted_positives + nb_positives[:, None])
+        # On ne peut couper qu'à la fin d'un groupe de probas égales
+        sorted_probas = (keys >> 1).astype(np.uint32).view(np.float32)
+        f1[:, :-1][sorted_probas[:, :-1] == sorted_probas[:, 1:]] = -1
+        best = f1.argmax(axis=1)
+        rows = np.arange(end - start)
+        next_probas = sorted_probas[rows, np.minimum(best + 1, n_samples - 1)].astype(float)
+        # Toutes les lignes prédites positives -> seuil à 0
+        best_thresholds = np.where(best + 1 < n_samples, (sorted_probas[rows, best] + next_probas) / 2, 0.)
+        thresholds[start:end] = np.where(nb_positives > 0, best_thresholds, default_threshold)
+    return thresholds
+
+
+def preprocess_model_multilabel(df: pd.DataFrame, y_col, classes: list = None, sparse_output: bool = False):
     '''Fonction pour préparer une dataframe à un modèle de classification multi-label
 
     Args:
@@ -172,19 +469,27 @@ def preprocess_model_multilabel(df: pd.DataFrame, y_col, classes: list = None):
         y_col (str ou int): nom de la colonne à utiliser pour l'apprentissage - y
     Kwargs:
         classes (list): liste de classes à considérer
+        sparse_output (bool): si les cibles doivent être retournées en matrice CSR plutôt qu'ajoutées à la dataframe
+            (une colonne dense par classe multiplie la taille de la dataframe quand il y a beaucoup de labels)
     Raises:
         TypeError: si l'objet y_col n'est pas du type str ou int
         TypeError: si l'objet ohe n'est pas du type bool
     Returns:
-        DataFrame: dataframe pour l'apprentissage
-        list: liste des colonnes 'y'
+        DataFrame: dataframe pour l'apprentissage (si sparse_output à False)
+        OU
+        sparse.csr_matrix: cibles, lignes dans l'ordre de df (si sparse_output à True)
+        list: liste des colonnes 'y' (i.e. classes)
     '''
-    # TODO: ajouter possibilité sortie en sparse
     logger.info("Preprocess dataframe pour model multi-label")
     if type(y_col) not in (str, int):
         raise TypeError('L\'objet y_col doit être du type str ou int.')
     # Process
     logger.info("Preparing dataset for multi-label format. Might take several minutes.")
+    # Sparse : matrice CSR des cibles, la dataframe n'est pas modifiée
+    if sparse_output:
+        mlb = MultiLabelBinarizer(classes=classes, sparse_output=True)
+        y = sparse.csr_matrix(mlb.fit_transform(df[y_col]))
+        return y, list(mlb.classes_)
     # /!\ The reset_index is compulsory in order to have the same indexes between df, and MLB transformed values
     df = df.reset_index(drop=True)
     # Apply MLB
@@ -194,6 +499,7 @@ def preprocess_model_multilabel(df: pd.DataFrame, y_col, classes: list = None):
     return df, list(mlb.classes_)
 
 
+@instrumentation.timed()
 def load_pipeline(pipeline_dir: str, is_path: bool = False):
     '''Chargement d'une pipeline depuis le dossier des pipelines
 
@@ -239,6 +545,7 @@ def load_pipeline(pipeline_dir: str, is_path: bool = False):
     return pipeline_dict['preprocess_pipeline'], pipeline_dict['preprocess_str']
 
 
+@instrumentation.timed()
 def load_model(model_dir: str, is_path: bool = False):
     '''Fonction pour load un model à partir d'un chemin
 
@@ -315,7 +622,11 @@ def get_columns_pipeline(preprocess_pipeline: ColumnTransformer):
     # On commence par vérifier que la pipeline est bien fitted
     check_is_fitted(preprocess_pipeline)
     # On récupère les noms de colonnes en entrées
-    columns_in = preprocess_pipeline._feature_names_in.tolist()
+    # (attribut renommé feature_names_in_ à partir de scikit-learn 1.0)
+    if hasattr(preprocess_pipeline, 'feature_names_in_'):
+        columns_in = preprocess_pipeline.feature_names_in_.tolist()
+    else:
+        columns_in = preprocess_pipeline._feature_names_in.tolist()
     # On récupère les noms de colonnes "obligatoires"
     if preprocess_pipeline._remainder[1] == 'drop':
         # Si drop, on récupère depuis _columns
@@ -327,7 +638,8 @@ def get_columns_pipeline(preprocess_pipeline: ColumnTransformer):
     return columns_in, mandatory_columns
 
 
-def apply_pipeline(df: pd.DataFrame, preprocess_pipeline: ColumnTransformer):
+@instrumentation.timed()
+def apply_pipeline(df: pd.DataFrame, preprocess_pipeline: ColumnTransformer, sparse_output: bool = False):
     '''Fonction pour appliquer une pipeline fitted à une dataframe
 
     Problème :
@@ -337,13 +649,21 @@ def apply_pipeline(df: pd.DataFrame, preprocess_pipeline: ColumnTransformer):
     Solution (expérimental 14/04/2021):
         On ajoute les colonnes "inutiles" par des NaNs
 
+    Sortie sparse (e.g. OneHotEncoder, CountVectorizer) : avec sparse_output, la matrice n'est pas densifiée
+    (pd.DataFrame(...) sur une sortie sparse alloue n_samples x n_features) et les noms de colonnes sont retournés à part.
+
     Args:
         df (pd.DataFrame): dataframe à preprocessed
         preprocess_pipeline (ColumnTransformer): pipeline à utiliser
+    Kwargs:
+        sparse_output (bool): si la sortie doit être une matrice CSR + la liste des colonnes (plutôt qu'une DataFrame)
     Raises:
         ValueError: s'il manque des colonnes obligatoires
     Returns:
-        pd.DataFrame: DataFrame preprocessed
+        pd.DataFrame: DataFrame preprocessed (si sparse_output à False)
+        OU
+        sparse.csr_matrix: données preprocessed (si sparse_output à True)
+        list: noms des colonnes (si sparse_output à True)
     '''
     columns_in, mandatory_columns = get_columns_pipeline(preprocess_pipeline)
 
@@ -367,13 +687,39 @@ def apply_pipeline(df: pd.DataFrame, preprocess_pipeline: ColumnTransformer):
         df[col] = np.nan
 
     # Apply transform on reordered columns
-    preprocessed_x = preprocess_pipeline.transform(df[columns_in])
+    with instrumentation.span('apply_pipeline.transform'):
+        preprocessed_x = preprocess_pipeline.transform(df[columns_in])
+    instrumentation.incr('apply_pipeline.rows', df.shape[0])
+    # Sortie sparse : CSR (format attendu par les estimateurs) + colonnes à part
+    if sparse_output:
+        columns = preprocess.get_columns_from_pipeline(preprocess_pipeline, preprocessed_x.shape[1])
+        if columns is None:
+            columns = list(range(preprocessed_x.shape[1]))
+        return sparse.csr_matrix(preprocessed_x), columns
     # Reconstruct dataframe & return
     preprocessed_df = pd.DataFrame(preprocessed_x)
     preprocessed_df = preprocess.retrieve_columns_from_pipeline(preprocessed_df, preprocess_pipeline)
     return preprocessed_df
 
 
+def get_pipeline_fingerprint(preprocess_pipeline):
+    '''Fonction pour obtenir une empreinte d'une pipeline fitted
+
+    Empreinte du pickle de la pipeline : contrairement à pipeline.info (paramètres uniquement),
+    deux pipelines n'ont la même empreinte que si leur état fitted est identique (e.g. chargées depuis une même pipeline).
+    Le pickle d'un objet juste fitted peut différer de celui de sa copie rechargée (mémo du pickler) :
+    l'empreinte est calculée après un aller-retour, stable ensuite.
+
+    Args:
+        preprocess_pipeline (ColumnTransformer): pipeline (None si pas de preprocessing)
+    Returns:
+        str: empreinte (sha1), None si pas de pipeline
+    '''
+    if preprocess_pipeline is None:
+        return None
+    return hashlib.sha1(pickle.dumps(pickle.loads(pickle.dumps(preprocess_pipeline)))).hexdigest()
+
+
 def predict(content: pd.DataFrame, model):
     '''Fonction pour obtenir les prédictions d'un modèle sur un contenu
 
@@ -392,9 +738,12 @@ def predict(content: pd.DataFrame, model):
     '''
     logger.debug('Appel à la fonction utils_models.predict')
 
-    # Apply preprocessing
+    # Apply preprocessing (sortie sparse gardée sparse, cf. apply_pipeline)
     if model.preprocess_pipeline is not None:
-        df_prep = apply_pipeline(content, model.preprocess_pipeline)
+        if getattr(model.preprocess_pipeline, 'sparse_output_', False):
+            df_prep, _ = apply_pipeline(content, model.preprocess_pipeline, sparse_output=True)
+        else:
+            df_prep = apply_pipeline(content, model.preprocess_pipeline)
     else:
         df_prep = content.copy()
         logger.warning("On ne trouve pas de pipeline de preprocessing - on considère no preprocessing, mais ce n'est pas normal !")
@@ -435,9 +784,12 @@ def predict_with_proba(content: pd.DataFrame, model):
     if not model.model_type == 'classifier':
         raise ValueError(f"Le type de modèle ({model.model_type}) n'est pas supporté par la fonction predict_with_proba")
 
-    # Apply preprocessing
+    # Apply preprocessing (sortie sparse gardée sparse, cf. apply_pipeline)
     if model.preprocess_pipeline is not None:
-        df_prep = apply_pipeline(content, model.preprocess_pipeline)
+        if getattr(model.preprocess_pipeline, 'sparse_output_', False):
+            df_prep, _ = apply_pipeline(content, model.preprocess_pipeline, sparse_output=True)
+        else:
+            df_prep = apply_pipeline(content, model.preprocess_pipeline)
     else:
         df_prep = content.copy()
         logger.warning("On ne trouve pas de pipeline de preprocessing - on considère no preprocessing, mais ce n'est pas normal !")
@@ -450,8 +802,8 @@ def predict_with_proba(content: pd.DataFrame, model):
         prediction = model.inverse_transform(predictions)
         proba = list(probas.max(axis=1))
     else:
-        prediction = [tuple(np.array(model.list_classes).compress(indicators)) for indicators in predictions]
-        proba = [tuple(np.array(probas[i]).compress(indicators)) for i, indicators in enumerate(predictions)]
+        prediction = indicators_to_tuples(predictions, model.list_classes)
+        proba = indicators_to_tuples(predictions, probas)
 
     # Return only first element if dataframe has one row
     if content.shape[0] == 1:
@@ -543,12 +895,16 @@ def search_hp_cv_classifier(model_cls, model_params: dict, hp_params: dict, scor
     # Gestion format x_train & y_train
     #################
 
-    if type(kwargs_fit['x_train']) not in [pd.Series, pd.DataFrame]:
+    # Les matrices sparse (e.g. cibles multi-label CSR) sont gardées telles quelles (sélection des lignes par index)
+    if type(kwargs_fit['x_train']) not in [pd.Series, pd.DataFrame] and not sparse.issparse(kwargs_fit['x_train']):
         kwargs_fit['x_train'] = pd.Series(kwargs_fit['x_train'].copy())
 
-    if type(kwargs_fit['y_train']) not in [pd.Series, pd.DataFrame]:
+    if type(kwargs_fit['y_train']) not in [pd.Series, pd.DataFrame] and not sparse.issparse(kwargs_fit['y_train']):
         kwargs_fit['y_train'] = pd.Series(kwargs_fit['y_train'].copy())
 
+    def take_rows(data, index):
+        return data.iloc[index] if isinstance(data, (pd.Series, pd.DataFrame)) else data[index]
+
     #################
     # Process
     #################
@@ -578,8 +934,8 @@ def search_hp_cv_classifier(model_cls, model_params: dict, hp_params: dict, scor
         for j, (train_index, valid_index) in enumerate(k_fold.split(kwargs_fit['x_train'], kwargs_fit['y_train'])):
             logger.info(f"Recherche n°{i + 1}/{nb_search} - fit n°{j + 1}/{n_splits}")
             # get tmp x, y
-            x_train, x_valid = kwargs_fit['x_train'].iloc[train_index], kwargs_fit['x_train'].iloc[valid_index]
-            y_train, y_valid = kwargs_fit['y_train'].iloc[train_index], kwargs_fit['y_train'].iloc[valid_index]
+            x_train, x_valid = take_rows(kwargs_fit['x_train'], train_index), take_rows(kwargs_fit['x_train'], valid_index)
+            y_train, y_valid = take_rows(kwargs_fit['y_train'], train_index), take_rows(kwargs_fit['y_train'], valid_index)
             # Get tmp model
             # On gère le model_dir
             tmp_model_dir = os.path.join(utils.get_models_path(), datetime.now().strftime("tmp_%Y_%m_%d-%H_%M_%S"))
@@ -639,5 +995,105 @@ def search_hp_cv_classifier(model_cls, model_params: dict, hp_params: dict, scor
     return best_model
 
 
+def get_model_class(model_cls: str):
+    '''Fonction pour récupérer une classe de modèle à partir de son nom
+
+    Args:
+        model_cls (str): nom de la classe, précédé de son module, e.g. 'model_rf_classifier.ModelRFClassifier'
+            Le module est cherché dans classifiers puis regressors (ou 'regressors.model_rf_regressor.ModelRFRegressor')
+    Raises:
+        ValueError: si model_cls n'est pas au format module.Classe
+        ValueError: si la classe n'est pas trouvée
+    Returns:
+        type: classe du modèle
+    '''
+    if '.' not in model_cls:
+        raise ValueError(f"L'objet model_cls ({model_cls}) doit être au format 'module.Classe' (e.g. 'model_rf_classifier.ModelRFClassifier')")
+    module_name, cls_name = model_cls.rsplit('.', 1)
+    if module_name.startswith(('classifiers.', 'regressors.')):
+        candidates = [f"ynov.models_training.{module_name}"]
+    else:
+        candidates = [f"ynov.models_training.{subpackage}.{module_name}" for subpackage in ['classifiers', 'regressors']]
+    for candidate in candidates:
+        try:
+            module = importlib.import_module(candidate)
+        except ModuleNotFoundError as e:
+            # Seulement si c'est le module lui-même qui manque (pas une de ses dépendances)
+            if e.name != candidate:
+                raise
+            continue
+        if hasattr(module, cls_name):
+            return getattr(module, cls_name)
+    raise ValueError(f"Impossible de trouver la classe de modèle {model_cls}")
+
+
+def dump_shared_data(data: dict, folder: str):
+    '''Fonction pour écrire des données sur disque, pour les partager entre processus (cf. load_shared_data)
+
+    Les arrays numpy (y compris ceux des DataFrames & des matrices sparse) sont écrits non compressés :
+    ils peuvent ensuite être memory-mapped par chaque processus, sans copie (pages partagées par l'OS).
+
+    Args:
+        data (dict): données à partager (e.g. {'x_train': x_train, 'y_train': y_train})
+        folder (str): dossier où écrire les données
+    Returns:
+        dict: chemin du fichier de chaque entrée
+    '''
+    os.makedirs(folder, exist_ok=True)
+    paths = {}
+    for key, value in data.items():
+        paths[key] = os.path.join(folder, f"{key}.joblib")
+        joblib.dump(value, paths[key])
+    return paths
+
+
+def load_shared_data(paths: dict):
+    '''Fonction pour charger des données partagées (cf. dump_shared_data)
+
+    Les arrays numpy sont memory-mapped en lecture seule (les colonnes object, e.g. str, sont chargées en mémoire).
+
+    Args:
+        paths (dict): chemin du fichier de chaque entrée
+    Returns:
+        dict: données
+    '''
+    return {key: joblib.load(path, mmap_mode='r') for key, path in paths.items()}
+
+
+def _run_task_on_shared_data(func, task, paths: dict):
+    '''Fonction exécutée par chaque processus de run_on_shared_data : chargement (memory-mapped) des données, puis tâche'''
+    return func(task, load_shared_data(paths))
+
+
+def run_on_shared_data(func, tasks: list, data: dict, n_jobs: int = None, folder: str = None):
+    '''Fonction pour exécuter func(task, data) pour chaque tâche, en parallèle (processus), sur des données partagées
+
+    Les données sont écrites une seule fois sur disque (cf. dump_shared_data) et memory-mapped par chaque processus :
+    pas de copie par tâche, quel que soit le nombre de processus. Les threads de chaque processus (BLAS, OpenMP)
+    sont limités par joblib pour ne pas dépasser le nombre de coeurs.
+
+    Args:
+        func (function): fonction à exécuter, func(task, data) (doit être picklable, e.g. fonction de module ou de script)
+        tasks (list): liste des tâches
+        data (dict): données à partager
+    Kwargs:
+        n_jobs (int): nombre de processus (convention joblib : None -> 1, -1 -> tous les coeurs)
+        folder (str): dossier où écrire les données partagées (supprimé à la fin). Si None, dossier temporaire.
+    Returns:
+        list: résultat de chaque tâche (même ordre que tasks)
+    '''
+    if len(tasks) == 0:
+        return []
+    n_jobs, _ = balance_n_jobs(len(tasks), n_jobs)
+    folder = tempfile.mkdtemp(prefix='ynov_shared_') if folder is None else folder
+    try:
+        paths = dump_shared_data(data, folder)
+        return joblib.Parallel(n_jobs=n_jobs, backend='loky')(
+            joblib.delayed(_run_task_on_shared_data)(func, task, paths) for task in tasks
+        )
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
 if __name__ == '__main__':
     logger.error("Ce script ne doit pas être exécuté, il s'agit d'un package.")
\ No newline at end of file
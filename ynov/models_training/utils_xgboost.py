@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+## Utils - fonctions-outils pour l'apprentissage xgboost en mémoire externe
+# Auteurs : Agence dataservices
+# Date : 19/10/2026
+#
+# Fonctions :
+# - is_external_data -> Indique si des données d'entraînement doivent passer par la mémoire externe
+# - get_chunks_factory -> Retourne une fonction générant les chunks d'un fichier ou d'un itérateur
+# - prepare_external_data -> Prépare un modèle (x_col, y_col, pipeline) & la validation pour un fit en mémoire externe
+# - get_unique_labels -> Retourne les valeurs uniques de la cible (une passe sur les chunks)
+# - ChunksDataIter -> Itérateur xgboost sur des chunks de DataFrame
+# - train_external_memory -> Entraînement d'un modèle xgboost (API sklearn) à partir de chunks
+#
+# Permet d'entraîner un xgboost sur un jeu de données plus gros que la RAM : xgboost ne garde
+# en mémoire qu'un chunk à la fois et écrit un cache (pages) sur disque.
+# Cf. https://xgboost.readthedocs.io/en/stable/tutorials/external_memory.html
+
+
+import os
+import shutil
+import inspect
+import logging
+import tempfile
+import numpy as np
+import pandas as pd
+import xgboost
+from ynov import utils
+
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+
+def is_external_data(data):
+    '''Indique si des données d'entraînement doivent passer par la mémoire externe
+
+    Args:
+        data (?): données d'entraînement
+    Returns:
+        bool: si data est un chemin de fichier, une fonction retournant des chunks (ou un générateur, refusé ensuite)
+    '''
+    return isinstance(data, str) or inspect.isgenerator(data) or (callable(data) and not isinstance(data, (pd.DataFrame, pd.Series, np.ndarray)))
+
+
+def get_chunks_factory(data, chunksize: int = 100000, sep: str = ',', encoding: str = 'utf-8'):
+    '''Retourne une fonction générant les chunks (DataFrames) d'un fichier ou d'un itérateur
+
+    xgboost parcourt les données plusieurs fois : il faut donc pouvoir recréer l'itérateur.
+
+    Args:
+        data (str | function): chemin d'un fichier .csv (e.g. sortie de 1_preprocess_data.py) ou .parquet,
+            ou fonction sans argument retournant un itérable de DataFrames
+    Kwargs:
+        chunksize (int): nombre de lignes par chunk (fichiers uniquement)
+        sep (str): séparateur du fichier csv
+        encoding (str): encodage du fichier csv
+    Raises:
+        ValueError: si data est un générateur (non réutilisable)
+        ValueError: si le fichier n'est pas un .csv ou un .parquet
+        FileNotFoundError: si le fichier n'existe pas
+        TypeError: si data n'est ni un chemin, ni une fonction
+    Returns:
+        function: fonction sans argument retournant un itérateur de DataFrames
+    '''
+    if inspect.isgenerator(data):
+        raise ValueError("Un générateur ne peut pas être parcouru plusieurs fois : fournir une fonction qui retourne le générateur")
+    if isinstance(data, str):
+        if not data.endswith(('.csv', '.parquet')):
+            raise ValueError(f"Le fichier {data} doit être un .csv ou un .parquet")
+        if not os.path.isfile(data):
+            raise FileNotFoundError(f"Le fichier {data} n'existe pas")
+        if data.endswith('.csv'):
+            def chunks_factory():
+                chunks, _ = utils.read_csv(data, sep=sep, encoding=encoding, chunksize=chunksize)
+                return iter(chunks)
+            return chunks_factory
+        # Parquet : import local, pyarrow est une dépendance optionnelle
+        def chunks_factory():
+            import pyarrow.parquet as pq
+            return (batch.to_pandas() for batch in pq.ParquetFile(data).iter_batches(batch_size=chunksize))
+        return chunks_factory
+    if callable(data):
+        return lambda: iter(data())
+    raise TypeError("L'objet data doit être un chemin de fichier ou une fonction retournant des chunks")
+
+
+def prepare_external_data(model, data, y_col=None, x_valid=None, y_valid=None, chunksize: int = 100000):
+    '''Prépare un modèle (x_col, y_col, pipeline) & la validation pour un fit en mémoire externe
+
+    Le premier chunk est utilisé pour vérifier le format des données (cf. ModelClass._check_input_format).
+
+    Args:
+        model (ModelClass): modèle à entraîner
+        data (str | function): chemin d'un fichier ou fonction retournant des chunks (cf. get_chunks_factory)
+    Kwargs:
+        y_col (str | list): colonne cible. Si None, on utilise model.y_col.
+        x_valid (?): chemin d'un fichier .csv contenant x & y, ou array-like, shape = [n_samples, n_features]
+        y_valid (?): array-like, shape = [n_samples] (si x_valid n'est pas un chemin)
+        chunksize (int): nombre de lignes par chunk (fichiers uniquement)
+    Raises:
+        ValueError: si la colonne cible n'est pas connue
+        NotImplementedError: si plusieurs colonnes cibles
+        ValueError: si pas de jeu de validation (nécessaire à l'early stopping)
+        ValueError: si les données sont vides
+    Returns:
+        function: fonction retournant un itérateur de DataFrames
+        ?: x_valid
+        ?: y_valid
+    '''
+    chunks_factory = get_chunks_factory(data, chunksize=chunksize)
+    if y_col is None:
+        y_col = model.y_col
+    if y_col is None:
+        raise ValueError("En mémoire externe, la colonne cible doit être donnée (y_train ou y_col du modèle)")
+    if type(y_col) == list:
+        if len(y_col) != 1:
+            raise NotImplementedError("L'entraînement en mémoire externe ne gère pas plusieurs colonnes cibles")
+        y_col = y_col[0]
+    if x_valid is None:
+        raise ValueError("L'entraînement en mémoire externe nécessite un jeu de validation (x_valid) pour l'early stopping")
+
+    # Vérification du format sur le premier chunk (set x_col, y_col, pipeline, columns_in, ...)
+    first_chunk = next(chunks_factory(), None)
+    if first_chunk is None:
+        raise ValueError("Les données d'entraînement sont vides")
+    x_col = model.x_col if model.x_col is not None else [col for col in first_chunk.columns if col != y_col]
+    # y en DataFrame si y_col n'est pas encore set, pour récupérer le nom de la colonne
+    y_first_chunk = first_chunk[[y_col]] if model.y_col is None else first_chunk[y_col]
+    model._check_input_format(first_chunk[x_col], y_first_chunk, fit_function=True)
+    del first_chunk, y_first_chunk
+
+    # Validation gardée en mémoire
+    if isinstance(x_valid, str):
+        df_valid, _ = utils.read_csv(x_valid)
+        x_valid, y_valid = df_valid[model.x_col], df_valid[y_col]
+    elif y_valid is None:
+        raise ValueError("L'argument y_valid est obligatoire si x_valid n'est pas un chemin de fichier")
+    x_valid, y_valid = model._check_input_format(x_valid, y_valid, fit_function=False)
+    return chunks_factory, x_valid, y_valid
+
+
+def get_unique_labels(chunks_factory, y_col):
+    '''Retourne les valeurs uniques de la cible (une passe sur les chunks, seule la cible est gardée)
+
+    Args:
+        chunks_factory (function): fonction retournant un itérateur de DataFrames
+        y_col (str | int): colonne cible
+    Returns:
+        np.ndarray: valeurs uniques triées
+    '''
+    unique_labels = np.array([])
+    for chunk in chunks_factory():
+        unique_labels = np.union1d(unique_labels, chunk[y_col].unique())
+    return unique_labels
+
+
+class ChunksDataIter(xgboost.DataIter):
+    '''Itérateur xgboost sur des chunks de DataFrame'''
+
+    def __init__(self, chunks_factory, x_col: list, y_col, cache_prefix: str = None):
+        '''Initialisation de la classe
+
+        Args:
+            chunks_factory (function): fonction retournant un itérateur de DataFrames (cf. get_chunks_factory)
+            x_col (list): colonnes x
+            y_col (str | int): colonne cible
+        Kwargs:
+            cache_prefix (str): préfixe du cache disque (mémoire externe). Si None, données concaténées en mémoire.
+        '''
+        self.chunks_factory = chunks_factory
+        self.x_col = x_col
+        self.y_col = y_col
+        self.nb_rows = 0
+        self._iterator = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        '''Passe le chunk suivant à xgboost
+
+        Args:
+            input_data (function): fonction xgboost qui consomme le chunk
+        Returns:
+            int: 1 s'il reste des données, 0 sinon
+        '''
+        if self._iterator is None:
+            self._iterator = self.chunks_factory()
+            self.nb_rows = 0
+        chunk = next(self._iterator, None)
+        if chunk is None:
+            return 0
+        # float32 : format interne de xgboost, évite une copie supplémentaire
+        input_data(data=chunk[self.x_col].to_numpy(dtype=np.float32), label=chunk[self.y_col].to_numpy())
+        self.nb_rows += chunk.shape[0]
+        return 1
+
+    def reset(self):
+        '''Remet l'itérateur au début'''
+        self._iterator = None
+
+
+def train_external_memory(model, chunks_factory, x_col: list, y_col, x_valid, y_valid,
+                          early_stopping_rounds: int = None, n_classes: int = None, verbose: bool = True, xgb_model=None):
+    '''Entraînement d'un modèle xgboost (API sklearn) à partir de chunks
+
+    Le train est construit en mémoire externe (cache disque temporaire, supprimé à la fin) ;
+    la validation, utilisée pour l'early stopping, est gardée en mémoire.
+    Le booster entraîné est ensuite chargé dans le modèle sklearn (predict, save, ... inchangés).
+
+    Args:
+        model (XGBModel): modèle XGBClassifier ou XGBRegressor
+        chunks_factory (function): fonction retournant un itérateur de DataFrames
+        x_col (list): colonnes x
+        y_col (str | int): colonne cible
+        x_valid (?): array-like, shape = [n_samples, n_features]
+        y_valid (?): array-like, shape = [n_samples]
+    Kwargs:
+        early_stopping_rounds (int): nombre d'itérations sans amélioration avant arrêt
+        n_classes (int): nombre de classes (classification uniquement, labels encodés 0 ... n_classes - 1)
+        verbose (bool): si l'évaluation doit être affichée à chaque itération
+        xgb_model (Booster): booster à partir duquel continuer le boosting (entraînement incrémental)
+    Raises:
+        ValueError: si une cible de validation n'est pas dans 0 ... n_classes - 1
+    Returns:
+        XGBModel: le modèle entraîné
+    '''
+    y_valid = np.asarray(y_valid)
+    if n_classes is not None and not np.isin(y_valid, np.arange(n_classes)).all():
+        raise ValueError(f"Les classes de validation doivent être encodées entre 0 et {n_classes - 1}")
+
+    # Paramètres natifs (même logique que le fit sklearn)
+    params = model.get_xgb_params()
+    if n_classes is not None and n_classes > 2:
+        params['objective'] = 'multi:softprob'
+        params['num_class'] = n_classes
+    num_boost_round = model.n_estimators if model.n_estimators is not None else 100
+
+    cache_dir = tempfile.mkdtemp(prefix='ynov_xgboost_cache_')
+    try:
+        data_iter = ChunksDataIter(chunks_factory, x_col, y_col, cache_prefix=os.path.join(cache_dir, 'cache'))
+        dtrain = xgboost.DMatrix(data_iter, missing=model.missing)
+        logger.info(f"Mémoire externe : {data_iter.nb_rows} lignes d'entraînement")
+        dvalid = xgboost.DMatrix(np.asarray(x_valid, dtype=np.float32), label=y_valid, missing=model.missing)
+        evals_result = {}
+        booster = xgboost.train(params, dtrain, num_boost_round=num_boost_round, evals=[(dvalid, 'validation_0')],
+                                early_stopping_rounds=early_stopping_rounds, evals_result=evals_result,
+                                verbose_eval=verbose, xgb_model=xgb_model)
+        del dtrain, data_iter
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # Chargement du booster dans le modèle sklearn (set aussi n_classes_, objective, best_iteration, ...)
+    model.load_model(bytearray(booster.save_raw(raw_format='ubj')))
+    model.evals_result_ = evals_result
+    return model
+
+
+if __name__ == '__main__':
+    logger.error("Ce script ne doit pas être exécuté, il s'agit d'un package.")
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+
+## Benchmark des performances (temps & mémoire) du preprocessing et des modèles
+# Auteurs : Agence dataservices
+# Date : 19/10/2026
+#
+# Fonctions :
+# - make_synthetic_dataset -> Génère un jeu de données synthétique reproductible
+# - measure -> Mesure le temps d'exécution et le pic mémoire d'une fonction
+# - run_benchmark -> Lance le benchmark de toutes les étapes sur un jeu de données synthétique
+# - save_report -> Sauvegarde un rapport de benchmark au format .json
+# - load_report -> Charge un rapport de benchmark au format .json
+# - compare_to_baseline -> Compare des résultats de benchmark à une baseline
+#
+# Le benchmark tourne hors ligne (pas de ML Flow, données générées à la volée).
+# Chaque étape est isolée : une erreur est enregistrée dans le rapport sans stopper le benchmark.
+
+
+import os
+import gc
+import sys
+import time
+import json
+import shutil
+import logging
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from ynov import utils
+from ynov.preprocessing import preprocess
+from ynov.preprocessing.column_preprocessors import AutoBinner, EmbeddingTransformer
+from ynov.models_training import utils_models
+from ynov.models_training.classifiers.model_gbt_classifier import ModelGBTClassifier
+from ynov.models_training.classifiers.model_knn_classifier import ModelKNNClassifier
+from ynov.models_training.classifiers.model_lgbm_classifier import ModelLGBMClassifier
+from ynov.models_training.classifiers.model_logistic_regression_classifier import ModelLogisticRegressionClassifier
+from ynov.models_training.classifiers.model_rf_classifier import ModelRFClassifier
+from ynov.models_training.classifiers.model_xgboost_classifier import ModelXgboostClassifier
+from ynov.models_training.regressors.model_gbt_regressor import ModelGBTRegressor
+from ynov.models_training.regressors.model_knn_regressor import ModelKNNRegressor
+from ynov.models_training.regressors.model_lgbm_regressor import ModelLGBMRegressor
+from ynov.models_training.regressors.model_rf_regressor import ModelRFRegressor
+from ynov.models_training.regressors.model_xgboost_regressor import ModelXgboostRegressor
+
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# Modèles benchmarkés : {nom: (classe, paramètres)}
+# Paramètres volontairement légers pour que le benchmark reste rapide
+CLASSIFIERS = {
+    'gbt_classifier': (ModelGBTClassifier, {'gbt_params': {'n_estimators': 20}}),
+    'knn_classifier': (ModelKNNClassifier, {}),
+    'lgbm_classifier': (ModelLGBMClassifier, {'lgbm_params': {'n_estimators': 20, 'verbose': -1}}),
+    'logistic_regression_classifier': (ModelLogisticRegressionClassifier, {}),
+    'rf_classifier': (ModelRFClassifier, {'rf_params': {'n_estimators': 20}}),
+    'xgboost_classifier': (ModelXgboostClassifier, {'xgboost_params': {'n_estimators': 20}}),
+}
+REGRESSORS = {
+    'gbt_regressor': (ModelGBTRegressor, {'gbt_params': {'n_estimators': 20}}),
+    'knn_regressor': (ModelKNNRegressor, {}),
+    'lgbm_regressor': (ModelLGBMRegressor, {'lgbm_params': {'n_estimators': 20, 'verbose': -1}}),
+    'rf_regressor': (ModelRFRegressor, {'rf_params': {'n_estimators': 20}}),
+    'xgboost_regressor': (ModelXgboostRegressor, {'xgboost_params': {'n_estimators': 20}}),
+}
+
+RESULTS_COLUMNS = ['stage', 'status', 'duration', 'peak_memory', 'error']
+
+
+def make_synthetic_dataset(n_rows: int = 10000, n_num_cols: int = 10, n_cat_cols: int = 2, n_categories: int = 20,
+                           n_classes: int = 2, nan_rate: float = 0.0, seed: int = 42):
+    '''Génère un jeu de données synthétique reproductible
+
+    Les colonnes numériques sont nommées num_i, les colonnes catégorielles cat_i (valeurs word_j).
+    Deux cibles sont générées à partir d'une combinaison linéaire des colonnes numériques :
+    'target_classif' (n_classes classes équilibrées) et 'target_reg' (continue).
+
+    Kwargs:
+        n_rows (int): nombre de lignes
+        n_num_cols (int): nombre de colonnes numériques
+        n_cat_cols (int): nombre de colonnes catégorielles
+        n_categories (int): nombre de catégories par colonne catégorielle
+        n_classes (int): nombre de classes de la cible de classification
+        nan_rate (float): proportion de valeurs manquantes dans les colonnes numériques
+        seed (int): graine aléatoire
+    Raises:
+        ValueError: si n_rows < n_classes
+        ValueError: si n_num_cols < 1
+        ValueError: si n_classes < 2
+        ValueError: si nan_rate n'est pas dans [0, 1[
+    Returns:
+        pd.DataFrame: jeu de données synthétique
+    '''
+    if n_num_cols < 1:
+        raise ValueError("Le jeu de données doit contenir au moins une colonne numérique")
+    if n_classes < 2:
+        raise ValueError("Le nombre de classes doit être supérieur ou égal à 2")
+    if n_rows < n_classes:
+        raise ValueError("Le nombre de lignes doit être supérieur ou égal au nombre de classes")
+    if not 0 <= nan_rate < 1:
+        raise ValueError("L'objet nan_rate doit être compris dans [0, 1[")
+
+    rng = np.random.default_rng(seed)
+    x_num = rng.normal(size=(n_rows, n_num_cols))
+    weights = rng.normal(size=n_num_cols)
+    score = x_num @ weights + rng.normal(scale=0.5, size=n_rows)
+
+    df = pd.DataFrame(x_num, columns=[f'num_{i}' for i in range(n_num_cols)])
+    categories = np.array([f'word_{j}' for j in range(n_categories)])
+    for i in range(n_cat_cols):
+        # Distribution non uniforme pour que l'AutoBinner ait des catégories à regrouper
+        proba = rng.dirichlet(np.ones(n_categories) * 0.5)
+        df[f'cat_{i}'] = categories[rng.choice(n_categories, size=n_rows, p=proba)]
+    if nan_rate > 0:
+        num_cols = [f'num_{i}' for i in range(n_num_cols)]
+        df[num_cols] = df[num_cols].mask(rng.random(size=(n_rows, n_num_cols)) < nan_rate)
+
+    # Classes équilibrées via les quantiles du score
+    quantiles = np.quantile(score, np.linspace(0, 1, n_classes + 1)[1:-1])
+    df['target_classif'] = np.array([f'class_{k}' for k in range(n_classes)])[np.searchsorted(quantiles, score)]
+    df['target_reg'] = score
+    return df
+
+
+def measure(func, *args, track_memory: bool = True, **kwargs):
+    '''Mesure le temps d'exécution et le pic mémoire d'une fonction
+
+    Args:
+        func (function): fonction à exécuter
+        *args: arguments de la fonction
+    Kwargs:
+        track_memory (bool): si le pic mémoire doit être mesuré (tracemalloc, ralentit l'exécution)
+        **kwargs: kwargs de la fonction
+    Returns:
+        ?: résultat de la fonction
+        float: durée d'exécution (en secondes)
+        float: pic mémoire alloué pendant l'exécution (en Mo, None si track_memory est à False)
+    '''
+    gc.collect()
+    if track_memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        duration = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1] / 1024 ** 2 if track_memory else None
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+    return result, duration, peak_memory
+
+
+class _BenchmarkRunner:
+    '''Classe utilitaire enregistrant le résultat de chaque étape du benchmark'''
+
+    def __init__(self, track_memory: bool = True):
+        self.track_memory = track_memory
+        self.results = []
+
+    def run(self, stage: str, func, *args, **kwargs):
+        '''Lance une étape du benchmark
+
+        Args:
+            stage (str): nom de l'étape
+            func (function): fonction à exécuter
+        Returns:
+            ?: résultat de la fonction (None en cas d'erreur)
+            bool: si l'étape s'est déroulée sans erreur
+        '''
+        logger.info(f"Benchmark - {stage}")
+        try:
+            result, duration, peak_memory = measure(func, *args, track_memory=self.track_memory, **kwargs)
+        except Exception as e:
+            logger.warning(f"Benchmark - {stage} : erreur ({repr(e)})")
+            self.results.append({'stage': stage, 'status': 'error', 'duration': None, 'peak_memory': None, 'error': repr(e)})
+            return None, False
+        self.results.append({'stage': stage, 'status': 'ok', 'duration': duration, 'peak_memory': peak_memory, 'error': None})
+        return result, True
+
+    def skip(self, stage: str, reason: str):
+        '''Enregistre une étape non exécutée
+
+        Args:
+            stage (str): nom de l'étape
+            reason (str): raison
+        '''
+        self.results.append({'stage': stage, 'status': 'skipped', 'duration': None, 'peak_memory': None, 'error': reason})
+
+    def get_results(self):
+        '''Retourne les résultats du benchmark
+
+        Returns:
+            pd.DataFrame: une ligne par étape
+        '''
+        return pd.DataFrame(self.results, columns=RESULTS_COLUMNS)
+
+
+def _benchmark_model(runner: _BenchmarkRunner, name: str, model_cls, model_params: dict, x_train, y_train,
+                     x_test, y_test, x_col: list, y_col: str, tmp_dir: str, is_classifier: bool):
+    '''Benchmark d'un modèle : fit, predict, predict_proba, get_and_save_metrics, save & load
+
+    Args:
+        runner (_BenchmarkRunner): runner du benchmark
+        name (str): nom du modèle
+        model_cls (?): classe du modèle
+        model_params (dict): paramètres du modèle
+        x_train (pd.DataFrame): données d'entraînement
+        y_train (pd.Series): cible d'entraînement
+        x_test (pd.DataFrame): données de test
+        y_test (pd.Series): cible de test
+        x_col (list): colonnes x
+        y_col (str): colonne cible
+        tmp_dir (str): dossier temporaire dans lequel sauvegarder le modèle
+        is_classifier (bool): si le modèle est un classifieur
+    '''
+    model_dir = os.path.join(tmp_dir, name)
+    stages = ['fit', 'predict'] + (['predict_proba'] if is_classifier else []) + ['get_and_save_metrics', 'save', 'load']
+    model = model_cls(x_col=x_col, y_col=y_col, model_dir=model_dir, **model_params)
+    model.logger.setLevel(logging.ERROR)
+    _, ok = runner.run(f'{name}.fit', model.fit, x_train, y_train)
+    if not ok:
+        for stage in stages[1:]:
+            runner.skip(f'{name}.{stage}', 'fit en erreur')
+        return
+    y_pred, _ = runner.run(f'{name}.predict', model.predict, x_test)
+    if is_classifier:
+        runner.run(f'{name}.predict_proba', model.predict_proba, x_test)
+    if y_pred is not None:
+        runner.run(f'{name}.get_and_save_metrics', model.get_and_save_metrics, y_test, y_pred, type_data='benchmark')
+    else:
+        runner.skip(f'{name}.get_and_save_metrics', 'predict en erreur')
+    _, ok = runner.run(f'{name}.save', model.save, json_data={'benchmark': True})
+    if ok:
+        runner.run(f'{name}.load', utils_models.load_model, model_dir, is_path=True)
+    else:
+        runner.skip(f'{name}.load', 'save en erreur')
+    del model
+    shutil.rmtree(model_dir, ignore_errors=True)
+
+
+def run_benchmark(n_rows: int = 10000, n_num_cols: int = 10, n_cat_cols: int = 2, n_categories: int = 20,
+                  n_classes: int = 2, seed: int = 42, models: list = None, with_search_hp: bool = True,
+                  track_memory: bool = True):
+    '''Lance le benchmark de toutes les étapes sur un jeu de données synthétique
+
+    Étapes : preprocess_P1 (fit & apply_pipeline), AutoBinner, EmbeddingTransformer,
+    puis pour chaque modèle : fit, predict, predict_proba (classifieurs), get_and_save_metrics, save & load,
+    et enfin search_hp_cv_classifier.
+
+    Kwargs:
+        n_rows (int): nombre de lignes du jeu de données synthétique
+        n_num_cols (int): nombre de colonnes numériques
+        n_cat_cols (int): nombre de colonnes catégorielles
+        n_categories (int): nombre de catégories par colonne catégorielle
+        n_classes (int): nombre de classes
+        seed (int): graine aléatoire
+        models (list): modèles à benchmarker (clés de CLASSIFIERS & REGRESSORS). Si None, tous les modèles.
+        with_search_hp (bool): si search_hp_cv_classifier doit être benchmarké
+        track_memory (bool): si le pic mémoire doit être mesuré
+    Raises:
+        ValueError: si un modèle n'est pas connu
+    Returns:
+        pd.DataFrame: résultats (colonnes : stage, status, duration, peak_memory, error)
+    '''
+    all_models = {**CLASSIFIERS, **REGRESSORS}
+    if models is None:
+        models = list(all_models.keys())
+    unknown_models = [m for m in models if m not in all_models.keys()]
+    if len(unknown_models) > 0:
+        raise ValueError(f"Modèles inconnus : {unknown_models} (possibles : {list(all_models.keys())})")
+
+    runner = _BenchmarkRunner(track_memory=track_memory)
+    df = make_synthetic_dataset(n_rows=n_rows, n_num_cols=n_num_cols, n_cat_cols=n_cat_cols,
+                                n_categories=n_categories, n_classes=n_classes, seed=seed)
+    df_train, df_test = utils_models.normal_split(df, test_size=0.25, seed=seed)
+    df_train, df_test = df_train.reset_index(drop=True), df_test.reset_index(drop=True)
+    num_cols = [col for col in df.columns if col.startswith('num_')]
+    cat_cols = [col for col in df.columns if col.startswith('cat_')]
+
+    # Preprocessing
+    pipeline = preprocess.preprocess_P1()
+    runner.run('preprocess_P1.fit', pipeline.fit, df_train[num_cols + cat_cols])
+    df_train_prep, _ = runner.run('preprocess_P1.apply_pipeline', utils_models.apply_pipeline, df_train, pipeline)
+    df_test_prep, _ = runner.run('preprocess_P1.apply_pipeline_test', utils_models.apply_pipeline, df_test, pipeline)
+    if len(cat_cols) > 0:
+        binner = AutoBinner()
+        runner.run('AutoBinner.fit', binner.fit, df_train[cat_cols])
+        runner.run('AutoBinner.transform', binner.transform, df_test[cat_cols])
+        rng = np.random.default_rng(seed)
+        embedding = {f'word_{j}': rng.normal(size=50).tolist() for j in range(n_categories)}
+        embedder = EmbeddingTransformer(embedding)
+        runner.run('EmbeddingTransformer.fit', embedder.fit, df_train[cat_cols[:1]])
+        runner.run('EmbeddingTransformer.transform', embedder.transform, df_test[cat_cols[:1]])
+
+    # Models
+    if df_train_prep is None or df_test_prep is None:
+        x_train, x_test = df_train[num_cols], df_test[num_cols]
+    else:
+        x_train, x_test = df_train_prep, df_test_prep
+    x_col = list(x_train.columns)
+    tmp_dir = tempfile.mkdtemp(prefix='ynov_benchmark_')
+    try:
+        for name in models:
+            model_cls, model_params = all_models[name]
+            is_classifier = name in CLASSIFIERS
+            y_col = 'target_classif' if is_classifier else 'target_reg'
+            _benchmark_model(runner, name, model_cls, model_params, x_train, df_train[y_col], x_test, df_test[y_col],
+                             x_col, y_col, tmp_dir, is_classifier)
+            gc.collect()
+
+        # Hyperparameters search
+        if with_search_hp:
+            model_params = {'x_col': x_col, 'y_col': 'target_classif', 'multi_label': False}
+            hp_params = {'rf_params': [{'n_estimators': 10}, {'n_estimators': 20}]}
+            kwargs_fit = {'x_train': x_train, 'y_train': df_train['target_classif']}
+            best_model, ok = runner.run('search_hp_cv_classifier', utils_models.search_hp_cv_classifier, ModelRFClassifier,
+                                        model_params, hp_params, 'accuracy', kwargs_fit, n_splits=3)
+            if ok:
+                shutil.rmtree(best_model.model_dir, ignore_errors=True)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return runner.get_results()
+
+
+def save_report(df_results: pd.DataFrame, file_path: str, metadata: dict = None):
+    '''Sauvegarde un rapport de benchmark au format .json
+
+    Args:
+        df_results (pd.DataFrame): résultats du benchmark (cf. run_benchmark)
+        file_path (str): chemin du fichier à créer
+    Kwargs:
+        metadata (dict): informations à ajouter au rapport (e.g. paramètres du benchmark)
+    Raises:
+        ValueError: si file_path ne termine pas par .json
+    '''
+    if not file_path.endswith('.json'):
+        raise ValueError("L'objet file_path doit terminer par '.json'")
+    if metadata is None:
+        metadata = {}
+    report = {
+        'metadata': {
+            'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            **metadata,
+        },
+        'results': df_results.replace({np.nan: None}).to_dict(orient='records'),
+    }
+    dir_path = os.path.dirname(file_path)
+    if dir_path != '' and not os.path.isdir(dir_path):
+        os.makedirs(dir_path)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, cls=utils.NpEncoder)
+
+
+def load_report(file_path: str):
+    '''Charge un rapport de benchmark au format .json
+
+    Args:
+        file_path (str): chemin du rapport
+    Raises:
+        FileNotFoundError: si le fichier n'existe pas
+    Returns:
+        pd.DataFrame: résultats du benchmark
+        dict: metadata du rapport
+    '''
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Le fichier {file_path} n'existe pas")
+    with open(file_path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    return pd.DataFrame(report['results'], columns=RESULTS_COLUMNS), report.get('metadata', {})
+
+
+def compare_to_baseline(df_results: pd.DataFrame, df_baseline: pd.DataFrame, time_tolerance: float = 0.25,
+                        memory_tolerance: float = 0.25, min_duration: float = 0.05):
+    '''Compare des résultats de benchmark à une baseline
+
+    Une étape est en régression si :
+        - elle était 'ok' dans la baseline et ne l'est plus
+        - sa durée dépasse celle de la baseline de plus de time_tolerance (en relatif)
+          (seulement si la durée de la baseline est supérieure à min_duration, pour éviter le bruit)
+        - son pic mémoire dépasse celui de la baseline de plus de memory_tolerance (en relatif)
+    Les étapes absentes de la baseline ne sont pas comparées.
+
+    Args:
+        df_results (pd.DataFrame): résultats du benchmark
+        df_baseline (pd.DataFrame): résultats de la baseline
+    Kwargs:
+        time_tolerance (float): dégradation relative du temps tolérée (0.25 -> +25 %)
+        memory_tolerance (float): dégradation relative de la mémoire tolérée
+        min_duration (float): durée minimale (en secondes) de la baseline pour comparer les temps
+    Raises:
+        ValueError: si time_tolerance ou memory_tolerance est négatif
+    Returns:
+        pd.DataFrame: comparaison par étape (colonnes : stage, status, status_baseline, duration, duration_baseline,
+            duration_ratio, peak_memory, peak_memory_baseline, peak_memory_ratio, regression, reason)
+    '''
+    if time_tolerance < 0 or memory_tolerance < 0:
+        raise ValueError("Les tolérances doivent être positives")
+    df_compare = df_results[['stage', 'status', 'duration', 'peak_memory']].merge(
+        df_baseline[['stage', 'status', 'duration', 'peak_memory']], on='stage', how='inner', suffixes=('', '_baseline'))
+    for col in ['duration', 'duration_baseline', 'peak_memory', 'peak_memory_baseline']:
+        df_compare[col] = df_compare[col].astype(float)
+    df_compare['duration_ratio'] = df_compare['duration'] / df_compare['duration_baseline']
+    df_compare['peak_memory_ratio'] = df_compare['peak_memory'] / df_compare['peak_memory_baseline']
+
+    broken = (df_compare['status_baseline'] == 'ok') & (df_compare['status'] != 'ok')
+    slower = (df_compare['duration_baseline'] >= min_duration) & (df_compare['duration_ratio'] > 1 + time_tolerance)
+    heavier = (df_compare['peak_memory_baseline'] > 0) & (df_compare['peak_memory_ratio'] > 1 + memory_tolerance)
+    df_compare['regression'] = broken | slower | heavier
+    df_compare['reason'] = np.select([broken, slower, heavier], ['status', 'duration', 'peak_memory'], default='')
+    return df_compare[['stage', 'status', 'status_baseline', 'duration', 'duration_baseline', 'duration_ratio',
+                       'peak_memory', 'peak_memory_baseline', 'peak_memory_ratio', 'regression', 'reason']]
+
+
+if __name__ == '__main__':
+    logger.error("Ce script ne doit pas être exécuté, il s'agit d'un package.")
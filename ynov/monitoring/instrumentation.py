@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+## Instrumentation légère (spans & compteurs) des étapes de train/predict
+# Auteurs : Agence dataservices
+# Date : 19/10/2026
+#
+# Fonctions :
+# - enable -> Active l'instrumentation
+# - disable -> Désactive l'instrumentation
+# - is_enabled -> Indique si l'instrumentation est active
+# - reset -> Vide les spans et compteurs enregistrés
+# - span -> Context manager permettant de chronométrer un bloc de code
+# - timed -> Décorateur permettant de chronométrer une fonction
+# - incr -> Incrémente un compteur
+# - get_report -> Retourne une DataFrame avec les statistiques des spans et compteurs
+# - export -> Exporte le rapport dans un fichier .json ou .csv
+# - log_to_model_logger -> Envoie le rapport sur ML Flow via un ModelLogger
+#
+# Par défaut l'instrumentation est désactivée : chaque span se résume alors à un test sur un booléen.
+# Elle peut être activée via instrumentation.enable() ou la variable d'environnement YNOV_INSTRUMENTATION=1
+# Si le suivi mémoire est actif (cf. memory_tracker), chaque span est aussi suivi en mémoire.
+
+
+import os
+import json
+import time
+import logging
+import functools
+import threading
+import pandas as pd
+from ynov import utils
+from ynov.monitoring import memory_tracker
+
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# État global de l'instrumentation
+_state = {'enabled': os.environ.get('YNOV_INSTRUMENTATION', '0') not in ['', '0', 'false', 'False']}
+# Statistiques par span : {name: {'count', 'total', 'min', 'max'}}
+_spans = {}
+# Compteurs : {name: value}
+_counters = {}
+_lock = threading.Lock()
+# Spans actifs par thread : un span déjà ouvert du même nom n'est pas recompté
+# (e.g. méthode surchargée qui appelle super() avec le même décorateur)
+_local = threading.local()
+
+
+def enable():
+    '''Active l'instrumentation'''
+    _state['enabled'] = True
+
+
+def disable():
+    '''Désactive l'instrumentation (les statistiques déjà enregistrées sont conservées)'''
+    _state['enabled'] = False
+
+
+def is_enabled():
+    '''Indique si l'instrumentation est active
+
+    Returns:
+        bool: si l'instrumentation est active
+    '''
+    return _state['enabled']
+
+
+def reset():
+    '''Vide les spans et compteurs enregistrés'''
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def _record(name: str, duration: float):
+    '''Enregistre la durée d'un span
+
+    Args:
+        name (str): nom du span
+        duration (float): durée en secondes
+    '''
+    with _lock:
+        stats = _spans.get(name)
+        if stats is None:
+            _spans[name] = {'count': 1, 'total': duration, 'min': duration, 'max': duration}
+        else:
+            stats['count'] += 1
+            stats['total'] += duration
+            if duration < stats['min']:
+                stats['min'] = duration
+            if duration > stats['max']:
+                stats['max'] = duration
+
+
+def _get_active_spans():
+    '''Retourne l'ensemble des spans actifs du thread courant
+
+    Returns:
+        set: noms des spans actifs
+    '''
+    active = getattr(_local, 'active', None)
+    if active is None:
+        active = set()
+        _local.active = active
+    return active
+
+
+class _Span:
+    '''Context manager chronométrant un bloc de code'''
+
+    __slots__ = ('name', 'start', 'nested', 'memory_record')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = None
+        self.nested = False
+        self.memory_record = None
+
+    def __enter__(self):
+        active = _get_active_spans()
+        self.nested = self.name in active
+        if not self.nested:
+            active.add(self.name)
+            if memory_tracker.is_enabled():
+                self.memory_record = memory_tracker._start(self.name)
+            if _state['enabled']:
+                self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self.nested:
+            if self.start is not None:
+                _record(self.name, time.perf_counter() - self.start)
+            if self.memory_record is not None:
+                memory_tracker._stop(self.memory_record)
+            _get_active_spans().discard(self.name)
+        return False
+
+
+class _NoOpSpan:
+    '''Context manager vide, utilisé quand l'instrumentation est désactivée'''
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NOOP_SPAN = _NoOpSpan()
+
+
+def span(name: str):
+    '''Context manager permettant de chronométrer un bloc de code
+
+    e.g.
+        with instrumentation.span('apply_pipeline'):
+            ...
+
+    Args:
+        name (str): nom du span
+    Returns:
+        ?: context manager
+    '''
+    if not _state['enabled'] and not memory_tracker._state['enabled']:
+        return _NOOP_SPAN
+    return _Span(name)
+
+
+def timed(name: str = None):
+    '''Décorateur permettant de chronométrer une fonction
+
+    Pour les méthodes, le nom de la classe de l'instance est ajouté en préfixe
+    (e.g. 'ModelRFClassifier.predict'), sauf si un nom est précisé.
+
+    Kwargs:
+        name (str): nom du span (par défaut, le qualname de la fonction)
+    Returns:
+        function: le décorateur
+    '''
+    def decorator(func):
+        # Méthode si le premier argument est self
+        is_method = func.__code__.co_varnames[:1] == ('self',)
+        default_name = func.__qualname__.split('.')[-1] if is_method else func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled'] and not memory_tracker._state['enabled']:
+                return func(*args, **kwargs)
+            if name is not None:
+                span_name = name
+            elif is_method and len(args) > 0:
+                span_name = f"{type(args[0]).__name__}.{default_name}"
+            else:
+                span_name = default_name
+            with _Span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def incr(name: str, value: float = 1):
+    '''Incrémente un compteur
+
+    Args:
+        name (str): nom du compteur
+    Kwargs:
+        value (float): valeur à ajouter
+    '''
+    if not _state['enabled']:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def get_report():
+    '''Retourne une DataFrame avec les statistiques des spans et compteurs
+
+    Returns:
+        pd.DataFrame: une ligne par span ou compteur
+            (colonnes : name, type, count, total, mean, min, max)
+    '''
+    with _lock:
+        rows = [
+            {'name': name, 'type': 'span', 'count': stats['count'], 'total': stats['total'],
+             'mean': stats['total'] / stats['count'], 'min': stats['min'], 'max': stats['max']}
+            for name, stats in _spans.items()
+        ]
+        rows += [
+            {'name': name, 'type': 'counter', 'count': None, 'total': value,
+             'mean': None, 'min': None, 'max': None}
+            for name, value in _counters.items()
+        ]
+    df_report = pd.DataFrame(rows, columns=['name', 'type', 'count', 'total', 'mean', 'min', 'max'])
+    return df_report.sort_values(['type', 'total'], ascending=[False, False]).reset_index(drop=True)
+
+
+def export(file_path: str):
+    '''Exporte le rapport dans un fichier .json ou .csv
+
+    Args:
+        file_path (str): chemin du fichier à créer
+    Raises:
+        ValueError: si file_path ne termine pas par .json ou .csv
+    '''
+    if not file_path.endswith('.json') and not file_path.endswith('.csv'):
+        raise ValueError("L'objet file_path doit terminer par '.json' ou '.csv'")
+    df_report = get_report()
+    if file_path.endswith('.csv'):
+        df_report.to_csv(file_path, sep=',', index=False, encoding='utf-8')
+    else:
+        json_dict = {
+            'spans': {row['name']: {k: row[k] for k in ['count', 'total', 'mean', 'min', 'max']}
+                      for _, row in df_report[df_report['type'] == 'span'].iterrows()},
+            'counters': {row['name']: row['total'] for _, row in df_report[df_report['type'] == 'counter'].iterrows()},
+        }
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(json_dict, f, indent=4, cls=utils.NpEncoder)
+
+
+def log_to_model_logger(model_logger, prefix: str = 'time'):
+    '''Envoie le rapport sur ML Flow via un ModelLogger
+
+    Args:
+        model_logger (ModelLogger): classe custom pour logger les métriques dans ML Flow
+    Kwargs:
+        prefix (str): préfixe des métriques
+    '''
+    df_report = get_report()
+    metrics = {}
+    for _, row in df_report.iterrows():
+        if row['type'] == 'span':
+            metrics[f"{prefix} --- {row['name']} --- total"] = row['total']
+            metrics[f"{prefix} --- {row['name']} --- count"] = row['count']
+        else:
+            metrics[f"{prefix} --- {row['name']}"] = row['total']
+    # On garde seulement les clés acceptées par ML FLOW
+    metrics = {k: v for k, v in metrics.items() if model_logger.valid_name(k)}
+    if len(metrics) > 0:
+        model_logger.log_metrics(metrics)
+
+
+if __name__ == '__main__':
+    logger.error("Ce script ne doit pas être exécuté, il s'agit d'un package.")
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+
+## Suivi de la consommation mémoire (pic RSS & allocations tracées) par étape
+# Auteurs : Agence dataservices
+# Date : 19/10/2026
+#
+# Fonctions :
+# - enable -> Active le suivi mémoire
+# - disable -> Désactive le suivi mémoire
+# - is_enabled -> Indique si le suivi mémoire est actif
+# - get_settings -> Retourne les paramètres du suivi mémoire (à passer à enable, e.g. dans un autre processus)
+# - reset -> Vide les statistiques enregistrées
+# - get_rss -> Retourne la mémoire résidente (RSS) courante du process
+# - track -> Context manager permettant de suivre la mémoire d'un bloc de code
+# - get_report -> Retourne une DataFrame avec les statistiques mémoire par étape
+# - save -> Sauvegarde le rapport dans un dossier (e.g. dossier du modèle)
+# - log_to_model_logger -> Envoie le rapport sur ML Flow via un ModelLogger
+#
+# Par défaut le suivi est désactivé. Il peut être activé via memory_tracker.enable()
+# ou la variable d'environnement YNOV_MEMORY_TRACKER=1.
+# Une fois actif, tous les spans de ynov.monitoring.instrumentation (fit, predict, apply_pipeline,
+# get_and_save_metrics, ...) sont suivis automatiquement.
+#
+# Le pic RSS d'une étape est obtenu par échantillonnage (thread en arrière-plan) : un pic plus court
+# que l'intervalle d'échantillonnage peut être manqué. Les allocations tracées (tracemalloc) sont exactes,
+# mais ralentissent l'exécution et ne voient que les allocations passant par Python (numpy inclus).
+#
+# Chaque thread a sa propre pile d'étapes : le pic d'une étape est crédité aux étapes englobantes du même thread.
+# Le RSS et tracemalloc étant globaux au process, les étapes concurrentes (autres threads) voient aussi ce pic.
+
+
+import os
+import sys
+import json
+import logging
+import threading
+import tracemalloc
+import pandas as pd
+from ynov import utils
+
+
+# Get logger
+logger = logging.getLogger(__name__)
+
+# État global du suivi mémoire
+_state = {
+    'enabled': False,
+    'trace_allocations': True,
+    'sampling_interval': 0.01,
+    'started_tracemalloc': False,
+}
+# Statistiques par étape : {name: {'count', 'rss_start', 'rss_end', 'peak_rss', 'rss_increase', 'traced_peak'}}
+_stages = {}
+# Étapes en cours, tous threads confondus
+_active = []
+# Pile des étapes en cours du thread (la dernière est la plus imbriquée)
+_local = threading.local()
+_lock = threading.Lock()
+_sampler = {'thread': None, 'stop': None}
+
+_MB = 1024 ** 2
+
+
+def get_rss():
+    '''Retourne la mémoire résidente (RSS) courante du process
+
+    Sous Linux, lecture de /proc/self/statm. Sinon, on se rabat sur le pic RSS du process (module resource).
+
+    Returns:
+        int: RSS en octets (None si non disponible)
+    '''
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS, en kilo-octets ailleurs
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def _sample_loop(stop_event: threading.Event):
+    '''Boucle d'échantillonnage du RSS (thread en arrière-plan)
+
+    Args:
+        stop_event (threading.Event): évènement d'arrêt
+    '''
+    while not stop_event.wait(_state['sampling_interval']):
+        if len(_active) == 0:
+            continue
+        rss = get_rss()
+        if rss is None:
+            continue
+        with _lock:
+            for record in _active:
+                if rss > record['peak_rss']:
+                    record['peak_rss'] = rss
+
+
+def enable(trace_allocations: bool = True, sampling_interval: float = 0.01):
+    '''Active le suivi mémoire
+
+    Kwargs:
+        trace_allocations (bool): si les allocations doivent être tracées via tracemalloc (plus précis, plus lent)
+        sampling_interval (float): intervalle d'échantillonnage du RSS (en secondes)
+    Raises:
+        ValueError: si sampling_interval n'est pas strictement positif
+    '''
+    if sampling_interval <= 0:
+        raise ValueError("L'objet sampling_interval doit être strictement positif")
+    _state['trace_allocations'] = trace_allocations
+    _state['sampling_interval'] = sampling_interval
+    if trace_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _state['started_tracemalloc'] = True
+    if _sampler['thread'] is None:
+        stop_event = threading.Event()
+        thread = threading.Thread(target=_sample_loop, args=(stop_event,), name='ynov-memory-tracker', daemon=True)
+        thread.start()
+        _sampler['thread'], _sampler['stop'] = thread, stop_event
+    _state['enabled'] = True
+
+
+def disable():
+    '''Désactive le suivi mémoire (les statistiques déjà enregistrées sont conservées)'''
+    _state['enabled'] = False
+    if _sampler['thread'] is not None:
+        _sampler['stop'].set()
+        _sampler['thread'].join()
+        _sampler['thread'], _sampler['stop'] = None, None
+    if _state['started_tracemalloc']:
+        tracemalloc.stop()
+        _state['started_tracemalloc'] = False
+
+
+def is_enabled():
+    '''Indique si le suivi mémoire est actif
+
+    Returns:
+        bool: si le suivi mémoire est actif
+    '''
+    return _state['enabled']
+
+
+def get_settings():
+    '''Retourne les paramètres du suivi mémoire (à passer à enable, e.g. dans un autre processus)
+
+    Returns:
+        dict: trace_allocations & sampling_interval
+    '''
+    return {'trace_allocations': _state['trace_allocations'], 'sampling_interval': _state['sampling_interval']}
+
+
+def reset():
+    '''Vide les statistiques enregistrées'''
+    with _lock:
+        _stages.clear()
+
+
+def _get_stack():
+    '''Retourne la pile des étapes en cours du thread courant
+
+    Returns:
+        list: étapes en cours du thread (la dernière est la plus imbriquée)
+    '''
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _remove_record(records: list, record: dict):
+    '''Retire un enregistrement d'une liste, par identité (deux étapes peuvent avoir le même contenu)
+
+    Args:
+        records (list): liste d'enregistrements
+        record (dict): enregistrement à retirer
+    '''
+    for i in range(len(records) - 1, -1, -1):
+        if records[i] is record:
+            del records[i]
+            return
+
+
+def _credit_traced_peak(records: list, peak: int):
+    '''Crédite un pic tracemalloc à des étapes en cours (à appeler avec _lock)
+
+    Args:
+        records (list): étapes à créditer
+        peak (int): pic des allocations tracées (en octets)
+    '''
+    for record in records:
+        if record['traced_start'] is not None:
+            record['traced_peak'] = max(record['traced_peak'], peak)
+
+
+def _start(name: str):
+    '''Démarre le suivi d'une étape
+
+    Args:
+        name (str): nom de l'étape
+    Returns:
+        dict: enregistrement de l'étape (à passer à _stop)
+    '''
+    rss = get_rss() or 0
+    record = {'name': name, 'rss_start': rss, 'peak_rss': rss, 'traced_start': None, 'traced_peak': 0}
+    with _lock:
+        if _state['trace_allocations'] and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            record['traced_start'] = current
+            # reset_peak efface le pic des étapes en cours (tous threads) : on le leur crédite avant
+            _credit_traced_peak(_active, peak)
+            tracemalloc.reset_peak()
+        _active.append(record)
+    _get_stack().append(record)
+    return record
+
+
+def _stop(record: dict):
+    '''Termine le suivi d'une étape et enregistre ses statistiques
+
+    Args:
+        record (dict): enregistrement retourné par _start
+    '''
+    rss = get_rss() or 0
+    traced_peak = None
+    stack = _get_stack()
+    _remove_record(stack, record)
+    with _lock:
+        _remove_record(_active, record)
+        if record['traced_start'] is not None and tracemalloc.is_tracing():
+            peak = max(record['traced_peak'], tracemalloc.get_traced_memory()[1])
+            traced_peak = max(peak - record['traced_start'], 0)
+            # Le pic de l'étape compte aussi pour les étapes englobantes (même thread)
+            _credit_traced_peak(stack, peak)
+        peak_rss = max(record['peak_rss'], rss)
+        stats = _stages.get(record['name'])
+        if stats is None:
+            _stages[record['name']] = {
+                'count': 1,
+                'rss_start': record['rss_start'],
+                'rss_end': rss,
+                'peak_rss': peak_rss,
+                'rss_increase': peak_rss - record['rss_start'],
+                'traced_peak': traced_peak,
+            }
+        else:
+            stats['count'] += 1
+            stats['rss_start'] = record['rss_start']
+            stats['rss_end'] = rss
+            stats['peak_rss'] = max(stats['peak_rss'], peak_rss)
+            stats['rss_increase'] = max(stats['rss_increase'], peak_rss - record['rss_start'])
+            if traced_peak is not None:
+                stats['traced_peak'] = max(stats['traced_peak'] or 0, traced_peak)
+
+
+class _Tracker:
+    '''Context manager suivant la mémoire d'un bloc de code'''
+
+    __slots__ = ('name', 'record')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.record = None
+
+    def __enter__(self):
+        self.record = _start(self.name)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _stop(self.record)
+        return False
+
+
+class _NoOpTracker:
+    '''Context manager vide, utilisé quand le suivi est désactivé'''
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NOOP_TRACKER = _NoOpTracker()
+
+
+def track(name: str):
+    '''Context manager permettant de suivre la mémoire d'un bloc de code
+
+    e.g.
+        with memory_tracker.track('load_dataset'):
+            ...
+
+    Args:
+        name (str): nom de l'étape
+    Returns:
+        ?: context manager
+    '''
+    if not _state['enabled']:
+        return _NOOP_TRACKER
+    return _Tracker(name)
+
+
+def get_report():
+    '''Retourne une DataFrame avec les statistiques mémoire par étape (en Mo)
+
+    Returns:
+        pd.DataFrame: une ligne par étape
+            (colonnes : name, count, rss_start, rss_end, peak_rss, rss_increase, traced_peak)
+            rss_increase est le pic RSS de l'étape moins le RSS au début de l'étape
+            traced_peak est le pic des allocations tracées pendant l'étape (None si tracemalloc inactif)
+    '''
+    columns = ['name', 'count', 'rss_start', 'rss_end', 'peak_rss', 'rss_increase', 'traced_peak']
+    with _lock:
+        rows = [
+            {'name': name, 'count': stats['count'],
+             **{k: stats[k] / _MB if stats[k] is not None else None
+                for k in ['rss_start', 'rss_end', 'peak_rss', 'rss_increase', 'traced_peak']}}
+            for name, stats in _stages.items()
+        ]
+    df_report = pd.DataFrame(rows, columns=columns)
+    return df_report.sort_values('rss_increase', ascending=False).reset_index(drop=True)
+
+
+def save(save_dir: str, file_name: str = 'memory_usage.json'):
+    '''Sauvegarde le rapport dans un dossier (e.g. dossier du modèle, à côté de configurations.json)
+
+    Args:
+        save_dir (str): dossier de sauvegarde
+    Kwargs:
+        file_name (str): nom du fichier
+    Raises:
+        FileNotFoundError: si le dossier save_dir n'existe pas
+    Returns:
+        str: chemin du fichier créé
+    '''
+    if not os.path.isdir(save_dir):
+        raise FileNotFoundError(f"Le dossier {save_dir} n'existe pas")
+    df_report = get_report()
+    json_dict = {
+        'unit': 'MB',
+        'max_rss_process': _get_max_rss_process(),
+        'stages': {row['name']: {k: row[k] for k in df_report.columns if k != 'name'}
+                   for _, row in df_report.iterrows()},
+    }
+    file_path = os.path.join(save_dir, file_name)
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump(json_dict, f, indent=4, cls=utils.NpEncoder)
+    return file_path
+
+
+def _get_max_rss_process():
+    '''Retourne le pic RSS du process depuis son lancement (en Mo)
+
+    Returns:
+        float: pic RSS (None si non disponible)
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss / _MB if sys.platform == 'darwin' else max_rss / 1024
+
+
+def log_to_model_logger(model_logger, prefix: str = 'memory'):
+    '''Envoie le rapport sur ML Flow via un ModelLogger
+
+    Args:
+        model_logger (ModelLogger): classe custom pour logger les métriques dans ML Flow
+    Kwargs:
+        prefix (str): préfixe des métriques
+    '''
+    df_report = get_report()
+    metrics = {}
+    for _, row in df_report.iterrows():
+        metrics[f"{prefix} --- {row['name']} --- peak_rss"] = row['peak_rss']
+        metrics[f"{prefix} --- {row['name']} --- rss_increase"] = row['rss_increase']
+        if row['traced_peak'] is not None and not pd.isna(row['traced_peak']):
+            metrics[f"{prefix} --- {row['name']} --- traced_peak"] = row['traced_peak']
+    # On garde seulement les clés acceptées par ML FLOW
+    metrics = {k: v for k, v in metrics.items() if model_logger.valid_name(k)}
+    if len(metrics) > 0:
+        model_logger.log_metrics(metrics)
+
+
+# Activation via variable d'environnement
+if os.environ.get('YNOV_MEMORY_TRACKER', '0') not in ['', '0', 'false', 'False']:
+    enable()
+
+
+if __name__ == '__main__':
+    logger.error("Ce script ne doit pas être exécuté, il s'agit d'un package.")
@@ -10,6 +10,7 @@
 import logging
 import re
 import math
+import time
 import uuid
 import mlflow
 import socket
@@ -47,6 +48,58 @@ def is_running(host: str, port: int, logger):
     return reachable
 
 
+# Cache de l'état des hosts : {(host, port): {'reachable', 'checked_at', 'nb_failures', 'retry_at'}}
+# Partagé entre toutes les instances de ModelLogger (un même serveur n'est checké qu'une fois par TTL)
+_hosts_health = {}
+
+
+def is_running_cached(host: str, port: int, logger, ttl: float = 60, max_backoff: float = 600):
+    '''Fonction permettant de vérifier si un host est up & running, avec mise en cache du résultat
+
+    - Si le dernier check est OK et date de moins de ttl secondes, on ne refait pas de connexion
+    - Si le host est KO, on ne retente pas avant un délai qui double à chaque échec (circuit breaker),
+    borné par max_backoff secondes
+
+    Args:
+        host (str): URI de l'host
+        port (int): port à checker
+        logger (?): logger d'une instance de ModelLogger
+    Kwargs:
+        ttl (float): durée de validité (en secondes) d'un check OK
+        max_backoff (float): délai maximal (en secondes) entre deux tentatives si le host est KO
+    Returns:
+        bool: si l'host est joignable
+    '''
+    key = (host, port)
+    now = time.monotonic()
+    state = _hosts_health.get(key)
+
+    # Cache valide -> on ne fait pas d'appel réseau
+    if state is not None:
+        if state['reachable'] and now - state['checked_at'] < ttl:
+            return True
+        if not state['reachable'] and now < state['retry_at']:
+            return False
+
+    # Sinon, on (re)teste la connexion
+    reachable = is_running(host, port, logger)
+    if reachable:
+        if state is not None and not state['reachable']:
+            logger.info(f'Monitoring - MlFlow  @ {host} de nouveau joignable')
+        _hosts_health[key] = {'reachable': True, 'checked_at': now, 'nb_failures': 0, 'retry_at': now}
+    else:
+        nb_failures = state['nb_failures'] + 1 if state is not None else 1
+        backoff = min(ttl * 2 ** (nb_failures - 1), max_backoff)
+        logger.warning(f'Monitoring - MlFlow  @ {host} KO ({nb_failures} échec(s)) -> prochaine tentative dans {backoff}s')
+        _hosts_health[key] = {'reachable': False, 'checked_at': now, 'nb_failures': nb_failures, 'retry_at': now + backoff}
+    return reachable
+
+
+def reset_hosts_health():
+    '''Fonction pour vider le cache de l'état des hosts (force un nouveau check au prochain appel)'''
+    _hosts_health.clear()
+
+
 def is_local(host: str):
     '''Fonction to check is ml flow is running in local
 
@@ -82,8 +135,9 @@ def is_mlflow_up(func):
             # On check si on peut run
             if is_local(self.tracking_uri):
                 to_run = True  # OK car local
-            elif is_running(self.tracking_uri, 80, self.logger):
-                to_run = True  # OK car still running
+            elif is_running_cached(self.tracking_uri, 80, self.logger,
+                                   ttl=self.health_check_ttl, max_backoff=self.health_check_max_backoff):
+                to_run = True  # OK car still running (check mis en cache)
             else:
                 to_run = False  # KO
 
@@ -107,26 +161,38 @@ class ModelLogger:
     _default_name = f'ynov-approche-{uuid.uuid4()}'
     _default_tracking_uri = ''
 
-    def __init__(self, tracking_uri: str = None, experiment_name: str = None):
+    def __init__(self, tracking_uri: str = None, experiment_name: str = None,
+                 health_check_ttl: float = 60, health_check_max_backoff: float = 600):
         '''Initialisation de la classe
 
         Kwargs:
             tracking_uri (str): URI du tracking server
             experiment_name (str): nom de l'expérimentaiton à activer
+            health_check_ttl (float): durée (en secondes) pendant laquelle un check OK du serveur est réutilisé
+            health_check_max_backoff (float): délai maximal (en secondes) entre deux checks si le serveur est KO
         Raises:
             TypeError : si l'objet tracking_uri n'est pas du type str
             TypeError : si l'objet experiment_name n'est pas du type str
+            ValueError : si l'objet health_check_ttl n'est pas positif
+            ValueError : si l'objet health_check_max_backoff est inférieur à health_check_ttl
         '''
         if tracking_uri is not None and type(tracking_uri) is not str:
             raise TypeError('tracking_uri doit être du type str')
         if experiment_name is not None and type(experiment_name) is not str:
             raise TypeError('experiment_name doit être de type str')
+        if health_check_ttl < 0:
+            raise ValueError('health_check_ttl doit être positif')
+        if health_check_max_backoff < health_check_ttl:
+            raise ValueError('health_check_max_backoff doit être supérieur ou égal à health_check_ttl')
 
         # Get logger
         self.logger = logging.getLogger(__name__)
         # Set tracking URI & experiment name
         self.tracking_uri = tracking_uri if tracking_uri is not None else self._default_tracking_uri
         self.experiment_name = experiment_name if experiment_name is not None else self._default_name
+        # Paramètres du cache de l'état du serveur
+        self.health_check_ttl = health_check_ttl
+        self.health_check_max_backoff = health_check_max_backoff
         # On initie le tracking
         # On met un try...except pour tester si ml flow est bien joignable
         try:
@@ -15,10 +15,23 @@ import pandas as pd
 from sklearn.base import BaseEstimator
 from sklearn.utils.validation import check_is_fitted
 from sklearn.preprocessing._function_transformer import FunctionTransformer
+from ynov import utils
+from ynov.monitoring import instrumentation
 
 logger = logging.getLogger(__name__)
 
 
+def get_output_dtype(dtype=None):
+    '''Fonction pour récupérer le type des données en sortie d'un transformer
+
+    Kwargs:
+        dtype (type): type demandé (e.g. np.float32)
+    Returns:
+        type: dtype si renseigné, sinon la précision globale (cf. utils.set_float_precision), None si pas de conversion
+    '''
+    return dtype if dtype is not None else utils.get_float_dtype()
+
+
 class AutoLogTransform(BaseEstimator):
     """Application automatiquement une log transformation sur des données numériques si
     la distribution des variables est asymétriques (abs(skew)>min_skewness) et qu'il y a une amplitude
@@ -31,11 +44,13 @@ class AutoLogTransform(BaseEstimator):
     min_skewness : Float : valeur absolu de l'asymétrie (skewness) requise pour appliquer une log transformation
     min_amplitude : float : valeur minimale de l'amplitude entre le 10e pourcentile et le 90e pourcentile
     requise pour appliquer une log transformation
+    dtype : type des données en sortie (e.g. np.float32). Si None, précision globale (cf. utils.set_float_precision)
     """
-    def __init__(self, min_skewness=2, min_amplitude=10E3):
+    def __init__(self, min_skewness=2, min_amplitude=10E3, dtype=None):
         # Set attributes
         self.min_skewness = min_skewness
         self.min_amplitude = min_amplitude
+        self.dtype = dtype
 
         # Columns on which to apply the transformation
         # Set on fit
@@ -63,6 +78,7 @@ class AutoLogTransform(BaseEstimator):
         else:
             return X.copy()
 
+    @instrumentation.timed()
     def fit(self, X, y=None):
         """Fit transformer
 
@@ -93,9 +109,11 @@ class AutoLogTransform(BaseEstimator):
             # Update applicable_columns_index
             self.applicable_columns_index = list(amp[amp>self.min_amplitude].index)
 
+        self.dtype_ = get_output_dtype(self.dtype)
         self.fitted_ = True
         return self
 
+    @instrumentation.timed()
     def transform(self, X):
         """Transform X - apply log on applicable columns
         Parameters
@@ -123,7 +141,7 @@ class AutoLogTransform(BaseEstimator):
             X.iloc[:, self.applicable_columns_index] = np.log(X.iloc[:, self.applicable_columns_index])
 
         # Compatibilité -> on retourne des np array
-        return X.to_numpy()
+        return X.to_numpy(dtype=getattr(self, 'dtype_', None))
 
     def fit_transform(self, X, y=None):
         """Apply both fit & transform"""
@@ -139,8 +157,9 @@ class ThresholdingTransform(BaseEstimator):
     tresholds : list<tuple> : chaque tuple contient (nom_colonne,val_min,val_max) si val_min et/ou val_max
     ne sont pas fournies, le seuillage s'effectue sur les valeurs des quantiles observées
     quantiles : tuple(min_q, max_q)
+    dtype : type des données en sortie (e.g. np.float32). Si None, précision globale (cf. utils.set_float_precision)
     """
-    def __init__(self, thresholds: list = None, quantiles : tuple = (0.05, 0.95)):
+    def __init__(self, thresholds: list = None, quantiles : tuple = (0.05, 0.95), dtype=None):
         if thresholds is None:
             raise ValueError("Tresholds is empty, a list<tuple> is required with each tuple : ([val_min], [val_max])")
         if type(quantiles) is not tuple or not 0 < quantiles[0] < 1 or not 0 < quantiles[1] < 1 or not quantiles[0] < quantiles[1]:
@@ -151,6 +170,7 @@ class ThresholdingTransform(BaseEstimator):
         self.thresholds = thresholds
         self.fitted_thresholds = []
         self.quantiles = quantiles
+        self.dtype = dtype
 
     def _validate_input(self, X):
         '''Function to validate input format
@@ -171,6 +191,7 @@ class ThresholdingTransform(BaseEstimator):
         else:
             return X.copy()
 
+    @instrumentation.timed()
     def fit(self, X, y=None):
         """Fit the ThresholdingTransform on X.
 
@@ -198,9 +219,11 @@ class ThresholdingTransform(BaseEstimator):
                 val_max = X.iloc[:, col_index].quantile(q=self.quantiles[1])
             self.fitted_thresholds.append((col_index, val_min, val_max))
 
+        self.dtype_ = get_output_dtype(self.dtype)
         self.fitted_ = True
         return self
 
+    @instrumentation.timed()
     def transform(self, X):
         """Impute all missing values in X.
 
@@ -220,7 +243,7 @@ class ThresholdingTransform(BaseEstimator):
             X.iloc[:, col_index][X.iloc[:, col_index] < val_min] = val_min
             X.iloc[:, col_index][X.iloc[:, col_index] > val_max] = val_max
 
-        return X.to_numpy() # Compatibilité -> on retourne des np array
+        return X.to_numpy(dtype=getattr(self, 'dtype_', None)) # Compatibilité -> on retourne des np array
 
     def fit_transform(self, X, y=None):
         """Apply both fit & transform"""
@@ -281,6 +304,7 @@ class AutoBinner(BaseEstimator):
     def _set_categories(self, col_index, values):
         self.kept_cat_by_index[col_index] = values
 
+    @instrumentation.timed()
     def fit(self, X, y=None):
         """Fit the AutoBinner on X.
 
@@ -330,6 +354,7 @@ class AutoBinner(BaseEstimator):
         self.fitted_ = True
         return self
 
+    @instrumentation.timed()
     def transform(self, X):
         """Impute all missing values in X.
 
@@ -358,7 +383,7 @@ class AutoBinner(BaseEstimator):
 class EmbeddingTransformer(BaseEstimator):
     """Constructs a transformer that apply an embedding mapping to Categorical columns"""
 
-    def __init__(self, embedding, none_strategy='zeros'):
+    def __init__(self, embedding, none_strategy='zeros', dtype=None):
         '''Initialisation de la classe EmbeddingTransformer
 
         Args:
@@ -368,6 +393,7 @@ class EmbeddingTransformer(BaseEstimator):
         Kwargs:
             none_strategy (str): strategy to fill elements not in embedding
                 - zeros: only 0s
+            dtype (type): type des données en sortie (e.g. np.float32). Si None, précision globale (cf. utils.set_float_precision)
         Raises:
             TypeError: si embedding pas au bon format
             ValueError: si strategy "none" non reconnu
@@ -398,6 +424,7 @@ class EmbeddingTransformer(BaseEstimator):
         # Get embedding size
         self.embedding_size = len(embedding[list(embedding.keys())[0]])
         # Other params
+        self.dtype = dtype
         self.n_features = None
         self.n_missed = 0
 
@@ -420,6 +447,7 @@ class EmbeddingTransformer(BaseEstimator):
         else:
             return X.copy()
 
+    @instrumentation.timed()
     def fit(self, X, y=None):
         """Fit transformer
 
@@ -440,9 +468,11 @@ class EmbeddingTransformer(BaseEstimator):
 
         # Nothing to do
 
+        self.dtype_ = get_output_dtype(self.dtype)
         self.fitted_ = True
         return self
 
+    @instrumentation.timed()
     def transform(self, X):
         """Transform X - embedding mapping
         Parameters
@@ -474,7 +504,7 @@ class EmbeddingTransformer(BaseEstimator):
             if perc_missed != 0:
                 logger.warning(f"Attention, {self.n_missed} ({perc_missed} %) éléments non présents dans l'embedding pour la colonne {col}")
 
-        return new_df.to_numpy() # Compatibilité -> on retourne des np array
+        return new_df.to_numpy(dtype=getattr(self, 'dtype_', None)) # Compatibilité -> on retourne des np array
 
     def fit_transform(self, X, y=None):
         """Apply both fit & transform"""
@@ -16,6 +16,7 @@ from sklearn.preprocessing import FunctionTransformer, StandardScaler, MinMaxSca
 from sklearn.feature_extraction.text import CountVectorizer, _VectorizerMixin
 from sklearn.feature_selection import SelectKBest, SelectorMixin
 from sklearn.impute import SimpleImputer
+from ynov import utils
 from ynov.preprocessing import column_preprocessors
 
 
@@ -60,13 +61,23 @@ def get_pipeline(preprocess_str: str):
 
 def preprocess_P1():
     '''Fonction principale pour preprocess le jeu de données
+    Si une précision globale est définie (cf. utils.set_float_precision), les sorties sont dans cette précision
+    (conversion en entrée des colonnes numériques : imputation & standardisation se font aussi en float32)
 
     Returns:
         pd.DataFrame: DataFrame modifiée (features uniquement)
     '''
-    numeric_pipeline = make_pipeline(SimpleImputer(strategy='median'), StandardScaler())
-    cat_pipeline = make_pipeline(SimpleImputer(strategy='most_frequent'), OneHotEncoder(handle_unknown='ignore'))
-    text_pipeline = make_pipeline(CountVectorizer(), SelectKBest(k=5))
+    float_dtype = utils.get_float_dtype()
+    if float_dtype is None:
+        numeric_pipeline = make_pipeline(SimpleImputer(strategy='median'), StandardScaler())
+        cat_pipeline = make_pipeline(SimpleImputer(strategy='most_frequent'), OneHotEncoder(handle_unknown='ignore'))
+        text_pipeline = make_pipeline(CountVectorizer(), SelectKBest(k=5))
+    else:
+        # SimpleImputer & StandardScaler conservent le type float32 s'il est donné en entrée
+        numeric_pipeline = make_pipeline(FunctionTransformer(np.asarray, kw_args={'dtype': float_dtype}),
+                                         SimpleImputer(strategy='median'), StandardScaler())
+        cat_pipeline = make_pipeline(SimpleImputer(strategy='most_frequent'), OneHotEncoder(handle_unknown='ignore', dtype=float_dtype))
+        text_pipeline = make_pipeline(CountVectorizer(dtype=float_dtype), SelectKBest(k=5))
 
     # Check https://scikit-learn.org/stable/modules/generated/sklearn.compose.make_column_selector.html
     # and https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.select_dtypes.html#pandas.DataFrame.select_dtypes
@@ -107,29 +118,45 @@ def preprocess_auto():
     pass
 
 
-def retrieve_columns_from_pipeline(df: pd.DataFrame, pipeline: ColumnTransformer):
-    '''Function to retrieve columns name after preprocessing
+def get_columns_from_pipeline(pipeline: ColumnTransformer, nb_columns: int):
+    '''Function to retrieve columns name after preprocessing, sans construire de DataFrame
+    (e.g. sortie sparse, les noms de colonnes sont alors portés à part)
 
     Args:
-        df (pd.DataFrame): dataframe après preprocessing (sans target)
         pipeline (ColumnTransformer): pipeline utilisée
+        nb_columns (int): nombre de colonnes en sortie de la pipeline
     Returns:
-        pd.DataFrame: dataframe avec colonnes
+        list: noms des colonnes (None si la récupération échoue)
     '''
     #EXPERIMENTAL : on try catch tout ça
     try:
         # Check if fitted:
         if not hasattr(pipeline, '_columns'):
-            raise AttributeError("La pipeline doit être fit pour utiliser la fonction retrieve_columns_from_pipeline")
-        new_columns = get_ct_feature_names(pipeline)
-        assert len(new_columns) == df.shape[1], "On ne retrouve pas le même nombre de colonnes" +\
-                                                f" entre la DataFrame preprocessed ({df.shape[1]})" +\
-                                                f" et la pipeline ({len(new_columns)})."
-        df.columns = new_columns
+            raise AttributeError("La pipeline doit être fit pour utiliser la fonction get_columns_from_pipeline")
+        new_columns = list(get_ct_feature_names(pipeline))
+        assert len(new_columns) == nb_columns, "On ne retrouve pas le même nombre de colonnes" +\
+                                               f" entre les données preprocessed ({nb_columns})" +\
+                                               f" et la pipeline ({len(new_columns)})."
+        return new_columns
     except Exception as e:
         logger.error("On n'annule la récupération des noms de colonnes (expérimental)")
         logger.error("On continue quand même")
         logger.error(repr(e))
+        return None
+
+
+def retrieve_columns_from_pipeline(df: pd.DataFrame, pipeline: ColumnTransformer):
+    '''Function to retrieve columns name after preprocessing
+
+    Args:
+        df (pd.DataFrame): dataframe après preprocessing (sans target)
+        pipeline (ColumnTransformer): pipeline utilisée
+    Returns:
+        pd.DataFrame: dataframe avec colonnes
+    '''
+    new_columns = get_columns_from_pipeline(pipeline, df.shape[1])
+    if new_columns is not None:
+        df.columns = new_columns
     return df
 
 
@@ -137,13 +164,17 @@ def get_feature_out(estimator, features_in):
     '''Fonction pour récupérer le nom d'une colonne en sortie d'un estimator
     From : https://stackoverflow.com/questions/57528350/can-you-consistently-keep-track-of-column-labels-using-sklearns-transformer-api
     '''
-    if hasattr(estimator, 'get_feature_names'):
-        if isinstance(estimator, _VectorizerMixin):
-            # handling all vectorizers
-            return [f'vec_{f}' \
-                for f in estimator.get_feature_names()]
-        else:
-            return estimator.get_feature_names(features_in)
+    if isinstance(estimator, _VectorizerMixin):
+        # handling all vectorizers (get_feature_names supprimée à partir de sklearn 1.2)
+        feature_names = estimator.get_feature_names_out() if hasattr(estimator, 'get_feature_names_out') else estimator.get_feature_names()
+        return [f'vec_{f}' for f in feature_names]
+    elif hasattr(estimator, 'get_feature_names'):
+        return estimator.get_feature_names(features_in)
+    elif isinstance(estimator, OneHotEncoder):
+        # Equivalent de l'ancien get_feature_names(features_in) : pas de vérification des noms vus au fit
+        drop_idx = estimator.drop_idx_ if estimator.drop_idx_ is not None else [None] * len(estimator.categories_)
+        return [f'{feature}_{category}' for feature, categories, idx in zip(features_in, estimator.categories_, drop_idx)
+                for i, category in enumerate(categories) if i != idx]
     elif isinstance(estimator, SelectorMixin):
         return np.array(features_in)[estimator.get_support()]
     else:
@@ -172,7 +203,9 @@ def get_ct_feature_names(ct):
                 features_out = get_feature_out(estimator, features)
             output_features.extend(features_out)
         elif estimator == 'passthrough':
-            output_features.extend(ct._feature_names_in[features])
+            # feature_names_in_ à partir de sklearn 1.0 (anciennement _feature_names_in)
+            feature_names_in = ct.feature_names_in_ if hasattr(ct, 'feature_names_in_') else ct._feature_names_in
+            output_features.extend(feature_names_in[features])
 
     return output_features
 
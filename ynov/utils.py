@@ -7,6 +7,12 @@
 # Fonctions :
 # - read_csv -> Fonction pour lire un csv en analysant la première ligne
 # - to_csv -> Fonction pour écrire un csv en gérant la première ligne
+# - read_npz -> Fonction pour lire un jeu de données sparse (.npz) : features CSR, colonnes, cibles & première ligne
+# - to_npz -> Fonction pour écrire un jeu de données sparse (.npz) sans densifier les features
+# - set_float_precision -> Fonction pour définir la précision globale des données numériques (float32 / float64)
+# - get_float_dtype -> Retourne le type float à utiliser pour les données numériques (None si pas de précision définie)
+# - cast_float_precision -> Fonction pour convertir des features numériques à la précision globale
+# - downcast_df -> Fonction pour réduire la mémoire d'une DataFrame (float32, plus petits entiers, catégories)
 # - display_shape -> Affichage du nombre de lignes et nombre de colonnes d'une table
 # - get_chunk_limits -> Fonction to get chunk limits from a pandas series or dataframe
 # - trained_needed -> Décorateur pour s'assurer qu'un modèle à déjà été trained
@@ -25,6 +31,7 @@ import json
 import pkg_resources
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from collections.abc import Iterable
 
 
@@ -32,6 +39,7 @@ from collections.abc import Iterable
 logger = logging.getLogger(__name__)
 
 DIR_PATH = None  # IMPORTANT : VARIABLE A SET EN PROD POUR POINTER SUR LES REPERTOIRES DATA ET MODELS
+FLOAT_PRECISION = None  # Précision des données numériques (None -> types par défaut, 'float32' -> mémoire divisée par 2), cf. set_float_precision
 
 
 # TODO: rajouter une fonction datalake_query pour récupérer des données du lac
@@ -41,7 +49,7 @@ DIR_PATH = None  # IMPORTANT : VARIABLE A SET EN PROD POUR POINTER SUR LES REPER
 #  - Plus fonctionnelle car mise à jour Kerberos
 
 
-def read_csv(file_path: str, sep: str = ',', encoding: str = 'utf-8', **kwargs):
+def read_csv(file_path: str, sep: str = ',', encoding: str = 'utf-8', downcast: bool = None, **kwargs):
     '''Fonction pour lire un csv en analysant la première ligne
 
     Args:
@@ -49,6 +57,9 @@ def read_csv(file_path: str, sep: str = ',', encoding: str = 'utf-8', **kwargs):
     Kwargs:
         sep (str): Séparateur du fichier de données
         encoding (str): Encodage du fichier de données
+        downcast (bool): si les types doivent être réduits (cf. downcast_df)
+            Si None, uniquement si la précision globale est float32 (cf. set_float_precision)
+            Lecture par chunks : pas de conversion en catégories (catégories différentes d'un chunk à l'autre)
         kwargs: kwargs pour pandas
     Raises:
         ValueError : si l'objet file_path ne termine pas par .csv
@@ -73,6 +84,15 @@ def read_csv(file_path: str, sep: str = ',', encoding: str = 'utf-8', **kwargs):
     else:
         df = pd.read_csv(file_path, sep=sep, encoding=encoding, **kwargs)
 
+    # Réduction des types
+    if downcast is None:
+        downcast = FLOAT_PRECISION == 'float32'
+    if downcast:
+        if kwargs.get('chunksize') is not None or kwargs.get('iterator', False):
+            df = (downcast_df(chunk, categorical=False) for chunk in df)
+        else:
+            df = downcast_df(df)
+
     # If no metadata, return only the dataframe
     if not has_metada:
         return df, None
@@ -108,6 +128,168 @@ def to_csv(df: pd.DataFrame, file_path: str, first_line: str = None, sep: str =
         df.to_csv(f, sep=sep, encoding=encoding, index=None, **kwargs)
 
 
+def read_npz(file_path: str):
+    '''Fonction pour lire un jeu de données sparse (.npz, cf. to_npz)
+
+    Args:
+        file_path (str): Chemin vers le fichier avec les données
+    Raises:
+        ValueError : si l'objet file_path ne termine pas par .npz
+        FileNotFoundError : si l'objet file_path n'est pas un fichier existant
+    Returns:
+        sparse.csr_matrix: features
+        list: noms des colonnes des features
+        pd.DataFrame: cibles (None si pas de cibles sauvegardées)
+        str: première ligne (métadata, e.g. '#pipeline'), None si pas renseignée
+    '''
+    if not file_path.endswith('.npz'):
+        raise ValueError('L\'objet file_path doit terminé par ".npz".')
+    if not os.path.isfile(file_path):
+        raise FileNotFoundError(f"Le fichier {file_path} n'existe pas.")
+
+    with np.load(file_path, allow_pickle=False) as loaded:
+        x = sparse.csr_matrix((loaded['data'], loaded['indices'], loaded['indptr']), shape=tuple(loaded['shape']))
+        columns = loaded['columns'].tolist()
+        y_columns = loaded['y_columns'].tolist()
+        df_y = pd.DataFrame({col: loaded[f'y_{i}'] for i, col in enumerate(y_columns)}) if len(y_columns) > 0 else None
+        first_line = str(loaded['first_line'])
+    float_dtype = get_float_dtype()
+    if float_dtype is not None and x.dtype != float_dtype:
+        x = x.astype(float_dtype)
+    return x, columns, df_y, (first_line if len(first_line) > 0 else None)
+
+
+def to_npz(x, file_path: str, columns: list, first_line: str = None, df_y: pd.DataFrame = None, compressed: bool = True):
+    '''Fonction pour écrire un jeu de données sparse (.npz) sans densifier les features
+
+    Un seul fichier : features au format CSR (data, indices, indptr, shape), noms des colonnes,
+    cibles (une array par colonne, type conservé si numérique, str sinon) & première ligne (métadata).
+    Pas de pickle : le fichier se relit avec allow_pickle=False.
+
+    Args:
+        x (?): features, matrice sparse (ou array-like, converti en CSR)
+        file_path (str): Chemin vers le fichier à créer
+        columns (list): noms des colonnes des features
+    Kwargs:
+        first_line (str): Première ligne (métadata, e.g. '#pipeline')
+        df_y (pd.DataFrame): cibles à sauvegarder avec les features
+        compressed (bool): si le fichier doit être compressé
+    Raises:
+        ValueError : si l'objet file_path ne termine pas par .npz
+        ValueError : si le nombre de colonnes ne correspond pas aux features
+        ValueError : si les cibles n'ont pas le même nombre de lignes que les features
+    '''
+    if not file_path.endswith('.npz'):
+        raise ValueError('L\'objet file_path doit terminé par ".npz".')
+    x = sparse.csr_matrix(x)
+    if len(columns) != x.shape[1]:
+        raise ValueError(f"Le nombre de colonnes ({len(columns)}) ne correspond pas aux features ({x.shape[1]})")
+    arrays = {
+        'data': x.data,
+        'indices': x.indices,
+        'indptr': x.indptr,
+        'shape': np.array(x.shape),
+        'columns': np.array([str(col) for col in columns]),
+        'first_line': np.array(first_line if first_line is not None else ''),
+    }
+    y_columns = []
+    if df_y is not None:
+        if df_y.shape[0] != x.shape[0]:
+            raise ValueError(f"Les cibles ({df_y.shape[0]} lignes) et les features ({x.shape[0]} lignes) n'ont pas le même nombre de lignes")
+        for i, col in enumerate(df_y.columns):
+            values = df_y[col].to_numpy()
+            arrays[f'y_{i}'] = values if pd.api.types.is_numeric_dtype(values) else values.astype(str)
+            y_columns.append(str(col))
+    arrays['y_columns'] = np.array(y_columns, dtype=str)
+    save_function = np.savez_compressed if compressed else np.savez
+    save_function(file_path, **arrays)
+
+
+def set_float_precision(precision: str = None):
+    '''Fonction pour définir la précision globale des données numériques
+
+    Utilisée par les lecteurs (read_csv, read_npz), les pipelines de preprocessing & les modèles.
+    En float32, la mémoire (et la bande passante) nécessaire aux features est divisée par 2.
+
+    Kwargs:
+        precision (str): 'float32', 'float64' ou None (types par défaut, pas de conversion)
+    Raises:
+        ValueError : si la précision n'est pas une option valide
+    '''
+    global FLOAT_PRECISION
+    if precision not in [None, 'float32', 'float64']:
+        raise ValueError(f"La précision {precision} n'est pas une option valide ([None, 'float32', 'float64'])")
+    FLOAT_PRECISION = precision
+
+
+def get_float_dtype():
+    '''Retourne le type float à utiliser pour les données numériques (cf. set_float_precision)
+
+    Returns:
+        type: np.float32 ou np.float64, None si pas de précision définie
+    '''
+    return {'float32': np.float32, 'float64': np.float64}.get(FLOAT_PRECISION)
+
+
+def cast_float_precision(x):
+    '''Fonction pour convertir des features numériques à la précision globale (cf. set_float_precision)
+
+    Pas de copie si les données sont déjà au bon type ou si aucune précision n'est définie.
+    Les colonnes non numériques (e.g. catégories) d'une DataFrame sont laissées telles quelles.
+
+    Args:
+        x (?): array-like or sparse matrix, shape = [n_samples, n_features]
+    Returns:
+        ?: x converti
+    '''
+    float_dtype = get_float_dtype()
+    if float_dtype is None:
+        return x
+    if isinstance(x, pd.DataFrame):
+        to_cast = {col: float_dtype for col, dtype in x.dtypes.items()
+                   if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) and dtype != float_dtype}
+        return x.astype(to_cast) if len(to_cast) > 0 else x
+    if isinstance(x, pd.Series):
+        return x.astype(float_dtype) if pd.api.types.is_numeric_dtype(x.dtype) and x.dtype != float_dtype else x
+    if (sparse.issparse(x) or isinstance(x, np.ndarray)) and np.issubdtype(x.dtype, np.number) and x.dtype != float_dtype:
+        return x.astype(float_dtype)
+    return x
+
+
+def downcast_df(df: pd.DataFrame, categorical: bool = True, max_category_ratio: float = 0.5):
+    '''Fonction pour réduire la mémoire d'une DataFrame
+
+    - floats -> float32 (ou la précision globale si définie, cf. set_float_precision)
+    - entiers -> plus petit type entier possible
+    - chaînes de caractères -> 'category' si peu de valeurs différentes
+
+    Args:
+        df (pd.DataFrame): données à convertir
+    Kwargs:
+        categorical (bool): si les colonnes de chaînes de caractères peuvent être converties en 'category'
+        max_category_ratio (float): ratio maximal (valeurs uniques / lignes) pour une conversion en 'category'
+    Returns:
+        pd.DataFrame: données converties (nouvelle DataFrame)
+    '''
+    float_dtype = get_float_dtype() or np.float32
+    new_types = {}
+    for col, dtype in df.dtypes.items():
+        if pd.api.types.is_bool_dtype(dtype):
+            continue
+        elif pd.api.types.is_float_dtype(dtype):
+            if dtype != float_dtype:
+                new_types[col] = float_dtype
+        elif pd.api.types.is_integer_dtype(dtype):
+            new_dtype = pd.to_numeric(df[col], downcast='integer').dtype
+            if new_dtype != dtype:
+                new_types[col] = new_dtype
+        elif categorical and pd.api.types.is_object_dtype(dtype) and df.shape[0] > 0:
+            # Seulement des str (e.g. pas de listes, non hashables)
+            if pd.api.types.infer_dtype(df[col], skipna=True) == 'string' and df[col].nunique() <= max_category_ratio * df.shape[0]:
+                new_types[col] = 'category'
+    return df.astype(new_types) if len(new_types) > 0 else df.copy()
+
+
 def display_shape(df: pd.DataFrame):
     '''Affichage du nombre de lignes et nombre de colonnes d'une table
 